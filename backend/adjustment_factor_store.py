@@ -0,0 +1,277 @@
+"""
+复权因子仓库 - 持久化每只股票的除权事件与累积复权因子
+每个市场一个SQLite文件（data/cache/adjustment_factors/<market>.sqlite）：
+- stocks: 每只股票已处理到的最后一根K线（日期、收盘价）
+- events: 除权事件日期、除权因子（除权后价格/除权前价格）及截至该事件的累积因子
+
+新K线到来时只检测上次处理之后的部分并追加事件；复权时按日期查出每根K线的累积因子，
+前复权/后复权都只需一次乘法。
+日线与分钟线分别存放：日线条目以股票代码为键，分钟线以 "<股票代码>@<周期>"（如 sz000001@5min）为键。
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .config import ADJUSTMENT_FACTOR_PATH
+except ImportError:
+    from config import ADJUSTMENT_FACTOR_PATH
+
+# 与 AdjustmentProcessor 简化复权保持一致的跳跃阈值
+JUMP_THRESHOLD = 0.15
+
+
+def _market_from_symbol(symbol: str) -> str:
+    return 'ds' if '#' in symbol else symbol[:2]
+
+
+def timeframe_of(index: pd.DatetimeIndex) -> str:
+    """按K线时间推断周期：全部为零点时为 '1day'，否则按K线间隔的中位数，如 '5min'"""
+    if len(index) < 2 or (index == index.normalize()).all():
+        return '1day'
+    minutes = int(round(np.median(np.diff(index.asi8)) / 60e9))
+    return f'{max(minutes, 1)}min'
+
+
+def _entry_key(symbol: str, timeframe: str) -> str:
+    return symbol if timeframe == '1day' else f'{symbol}@{timeframe}'
+
+
+def detect_jumps(close: np.ndarray, prev_close: Optional[float] = None):
+    """
+    检测价格跳跃（可能的除权点）
+
+    Args:
+        close: 收盘价序列
+        prev_close: close[0] 之前一根K线的收盘价（增量检测时提供）
+
+    Returns:
+        (行号数组, 除权因子数组)，行号相对于 close
+    """
+    close = np.asarray(close, dtype=float)
+    if prev_close is not None:
+        close = np.concatenate([[prev_close], close])
+    if len(close) < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    before, after = close[:-1], close[1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_changes = np.abs(after / before - 1)
+    positions = np.flatnonzero((price_changes > JUMP_THRESHOLD) & (before > 0) & (after > 0)) + 1
+    factors = close[positions] / close[positions - 1]
+    if prev_close is not None:
+        positions = positions - 1
+    return positions, factors
+
+
+class AdjustmentFactorStore:
+    """按市场分库的复权因子仓库，进程内缓存已加载的股票条目"""
+
+    def __init__(self, store_dir: Optional[str] = None):
+        self.store_dir = store_dir or ADJUSTMENT_FACTOR_PATH
+        self._connections: Dict[str, sqlite3.Connection] = {}
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.RLock()
+
+    # --- 存储 ---
+
+    def _connect(self, market: str) -> sqlite3.Connection:
+        conn = self._connections.get(market)
+        if conn is None:
+            os.makedirs(self.store_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.store_dir, f'{market}.sqlite'),
+                                   timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS stocks (
+                symbol TEXT PRIMARY KEY,
+                first_date INTEGER NOT NULL,
+                last_date INTEGER NOT NULL,
+                last_close REAL NOT NULL)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS events (
+                symbol TEXT NOT NULL,
+                date INTEGER NOT NULL,
+                factor REAL NOT NULL,
+                cum_factor REAL NOT NULL,
+                PRIMARY KEY (symbol, date))''')
+            conn.commit()
+            self._connections[market] = conn
+        return conn
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+            self._entries.clear()
+
+    def _load_entry(self, symbol: str) -> Optional[dict]:
+        entry = self._entries.get(symbol)
+        if entry is not None:
+            return entry
+        conn = self._connect(_market_from_symbol(symbol))
+        row = conn.execute('SELECT first_date, last_date, last_close FROM stocks WHERE symbol = ?',
+                           (symbol,)).fetchone()
+        if row is None:
+            return None
+        events = conn.execute('SELECT date, factor, cum_factor FROM events WHERE symbol = ? ORDER BY date',
+                              (symbol,)).fetchall()
+        events = np.array(events, dtype=float).reshape(-1, 3)
+        entry = {
+            'first_date': row[0],
+            'last_date': row[1],
+            'last_close': row[2],
+            'dates': events[:, 0].astype(np.int64),
+            'factors': events[:, 1],
+            'cum_factors': events[:, 2],
+        }
+        self._entries[symbol] = entry
+        return entry
+
+    def _save_entry(self, symbol: str, entry: dict, replace: bool):
+        conn = self._connect(_market_from_symbol(symbol))
+        with conn:
+            if replace:
+                conn.execute('DELETE FROM events WHERE symbol = ?', (symbol,))
+                new_events = range(len(entry['dates']))
+            else:
+                new_events = range(entry.pop('saved_events', 0), len(entry['dates']))
+            conn.executemany(
+                'INSERT OR REPLACE INTO events (symbol, date, factor, cum_factor) VALUES (?, ?, ?, ?)',
+                [(symbol, int(entry['dates'][i]), float(entry['factors'][i]), float(entry['cum_factors'][i]))
+                 for i in new_events])
+            conn.execute(
+                'INSERT OR REPLACE INTO stocks (symbol, first_date, last_date, last_close) VALUES (?, ?, ?, ?)',
+                (symbol, int(entry['first_date']), int(entry['last_date']), float(entry['last_close'])))
+        self._entries[symbol] = entry
+
+    # --- 因子维护 ---
+
+    @staticmethod
+    def _build_entry(dates: np.ndarray, close: np.ndarray) -> dict:
+        positions, factors = detect_jumps(close)
+        return {
+            'first_date': int(dates[0]),
+            'last_date': int(dates[-1]),
+            'last_close': float(close[-1]),
+            'dates': dates[positions].astype(np.int64),
+            'factors': factors,
+            'cum_factors': np.cumprod(factors),
+        }
+
+    @staticmethod
+    def _matches(entry: dict, dates: np.ndarray, close: np.ndarray) -> bool:
+        """校验传入数据与已存因子来自同一份未复权数据（已复权的数据会在除权点处失配）"""
+        in_range = (entry['dates'] > dates[0]) & (entry['dates'] <= dates[-1])
+        if in_range.any():
+            positions = np.searchsorted(dates, entry['dates'][in_range])
+            if not np.array_equal(dates[positions], entry['dates'][in_range]):
+                return False
+            ratios = close[positions] / close[positions - 1]
+            if not np.allclose(ratios, entry['factors'][in_range], rtol=1e-9, atol=0):
+                return False
+        if dates[0] <= entry['last_date'] <= dates[-1]:
+            pos = np.searchsorted(dates, entry['last_date'])
+            if dates[pos] != entry['last_date'] or close[pos] != entry['last_close']:
+                return False
+        return True
+
+    def update(self, symbol: str, df: pd.DataFrame, timeframe: Optional[str] = None) -> Optional[dict]:
+        """
+        用最新的未复权数据更新某只股票某个周期的因子，只处理上次之后新增的K线
+
+        Args:
+            timeframe: K线周期，未指定时按 df 的时间索引推断
+
+        Returns:
+            因子条目；传入已复权的数据（与已存因子不一致且没有跳跃）时返回None且不修改仓库
+        """
+        if df is None or len(df) == 0:
+            return None
+        symbol = _entry_key(symbol, timeframe or timeframe_of(df.index))
+        dates = df.index.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        close = df['close'].to_numpy(dtype=float)
+
+        with self._lock:
+            entry = self._load_entry(symbol)
+            if entry is None or dates[0] < entry['first_date']:
+                # 首次处理或提供了更早的历史：全量计算
+                entry = self._build_entry(dates, close)
+                self._save_entry(symbol, entry, replace=True)
+                return entry
+
+            if not self._matches(entry, dates, close):
+                # 不一致：传入数据本身仍有跳跃（未复权数据）说明仓库已过期，按传入数据重建；
+                # 没有跳跃则多半是已复权的数据，不修改仓库
+                if len(detect_jumps(close)[0]) == 0:
+                    return None
+                entry = self._build_entry(dates, close)
+                self._save_entry(symbol, entry, replace=True)
+                return entry
+
+            if dates[-1] > entry['last_date']:
+                if dates[0] > entry['last_date']:
+                    return None  # 新数据与已处理部分之间有缺口
+                start = int(np.searchsorted(dates, entry['last_date'])) + 1
+                positions, factors = detect_jumps(close[start:], prev_close=entry['last_close'])
+                last_cum = entry['cum_factors'][-1] if len(entry['cum_factors']) else 1.0
+                entry = dict(entry)
+                entry['saved_events'] = len(entry['dates'])
+                entry['dates'] = np.concatenate([entry['dates'], dates[start:][positions]])
+                entry['factors'] = np.concatenate([entry['factors'], factors])
+                entry['cum_factors'] = np.concatenate([entry['cum_factors'], last_cum * np.cumprod(factors)])
+                entry['last_date'] = int(dates[-1])
+                entry['last_close'] = float(close[-1])
+                self._save_entry(symbol, entry, replace=False)
+            return entry
+
+    def get_multiplier(self, symbol: str, df: pd.DataFrame, adjustment_type: str,
+                       timeframe: Optional[str] = None) -> Optional[np.ndarray]:
+        """
+        返回 df 每行的复权乘数（价格乘以它、成交量除以它），必要时先增量更新因子
+        前复权以 df 最后一根K线为基准，后复权以第一根K线为基准，与简化复权的结果一致
+        """
+        entry = self.update(symbol, df, timeframe)
+        if entry is None:
+            return None
+        dates = df.index.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+        cum = np.concatenate([[1.0], entry['cum_factors']])
+        cum_at = cum[np.searchsorted(entry['dates'], dates, side='right')]
+        if adjustment_type == 'forward':
+            return cum_at[-1] / cum_at
+        if adjustment_type == 'backward':
+            multiplier = cum_at[0] / cum_at
+            # 与简化复权一致：最后一根K线上的除权不做后复权
+            if len(dates) > 1 and cum_at[-1] != cum_at[-2]:
+                multiplier[-1] = multiplier[-2]
+            return multiplier
+        return None
+
+    def get_factor_table(self, symbol: str, timeframe: str = '1day') -> Optional[pd.DataFrame]:
+        """已存的除权事件表（date, factor, cum_factor）"""
+        with self._lock:
+            entry = self._load_entry(_entry_key(symbol, timeframe))
+        if entry is None:
+            return None
+        return pd.DataFrame({
+            'date': pd.to_datetime(entry['dates']),
+            'factor': entry['factors'],
+            'cum_factor': entry['cum_factors'],
+        })
+
+
+_default_store: Optional[AdjustmentFactorStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_factor_store() -> AdjustmentFactorStore:
+    """进程级共享的默认复权因子仓库"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = AdjustmentFactorStore()
+        return _default_store
@@ -10,6 +10,13 @@ from dataclasses import dataclass
 from datetime import datetime
 import os
 
+try:
+    from .config import USE_ADJUSTMENT_FACTOR_STORE
+    from .adjustment_factor_store import AdjustmentFactorStore, get_factor_store, detect_jumps
+except ImportError:
+    from config import USE_ADJUSTMENT_FACTOR_STORE
+    from adjustment_factor_store import AdjustmentFactorStore, get_factor_store, detect_jumps
+
 @dataclass
 class AdjustmentConfig:
     """复权配置"""
@@ -18,12 +25,21 @@ class AdjustmentConfig:
     include_splits: bool = True     # 是否包含拆股调整
     cache_enabled: bool = True      # 是否启用缓存
     
+# factor_store 参数的默认值：按 config.USE_ADJUSTMENT_FACTOR_STORE 决定是否使用全局默认仓库
+DEFAULT_FACTOR_STORE = object()
+
 class AdjustmentProcessor:
     """复权处理器"""
     
-    def __init__(self, config: Optional[AdjustmentConfig] = None):
+    def __init__(self, config: Optional[AdjustmentConfig] = None,
+                 factor_store: Optional[AdjustmentFactorStore] = DEFAULT_FACTOR_STORE):
         self.config = config or AdjustmentConfig()
         self.adjustment_cache = {}
+        # 持久化的复权因子仓库：显式传入仓库时使用，传入None时不使用；
+        # 未指定时仅在config中开启 USE_ADJUSTMENT_FACTOR_STORE 后使用全局默认仓库
+        if factor_store is DEFAULT_FACTOR_STORE:
+            factor_store = get_factor_store() if USE_ADJUSTMENT_FACTOR_STORE else None
+        self.factor_store = factor_store
         
     def process_data(self, df: pd.DataFrame, stock_code: str = None) -> pd.DataFrame:
         """
@@ -46,8 +62,8 @@ class AdjustmentProcessor:
             if len(cached_data) == len(df):  # 简单的缓存有效性检查
                 return cached_data.copy()
         
-        # 执行复权处理
-        adjusted_df = self._apply_adjustment(df.copy(), stock_code)
+        # 执行复权处理（各调整函数返回新的DataFrame，不修改输入）
+        adjusted_df = self._apply_adjustment(df, stock_code)
         
         # 缓存结果
         if cache_key and self.config.cache_enabled:
@@ -62,6 +78,12 @@ class AdjustmentProcessor:
         adjustment_factors = self._load_adjustment_factors(stock_code)
         
         if adjustment_factors is None or adjustment_factors.empty:
+            # 优先使用复权因子仓库中持久化的累积因子（只增量检测新K线），一次乘法完成复权
+            if self.factor_store is not None and stock_code and len(df) >= 2:
+                multiplier = self.factor_store.get_multiplier(stock_code, df, self.config.adjustment_type)
+                if multiplier is not None:
+                    return self._apply_multiplier(df, multiplier)
+            
             # 如果没有复权因子数据，使用简化的复权处理
             return self._apply_simple_adjustment(df)
         
@@ -91,103 +113,109 @@ class AdjustmentProcessor:
         当没有精确的复权因子数据时，使用价格跳跃检测进行近似复权
         """
         if len(df) < 2:
-            return df
+            return df.copy()
         
-        # 检测价格跳跃（可能的除权点）
-        price_changes = df['close'].pct_change().abs()
+        # 检测价格跳跃（可能的除权点），超过15%的价格变化可能是除权
+        # 除权因子 = 除权后价格 / 除权前价格
+        jump_positions, jump_factors = detect_jumps(df['close'].to_numpy(dtype=float))
         
-        # 设定跳跃阈值（超过15%的价格变化可能是除权）
-        jump_threshold = 0.15
-        jump_points = price_changes > jump_threshold
+        if len(jump_positions) == 0:
+            return df.copy()  # 没有检测到跳跃，返回原数据
         
-        if not jump_points.any():
-            return df  # 没有检测到跳跃，返回原数据
+        if self.config.adjustment_type == 'backward':
+            # 与原实现保持一致：最后一根K线上的跳跃不做后复权
+            keep = jump_positions < len(df) - 1
+            jump_positions, jump_factors = jump_positions[keep], jump_factors[keep]
         
-        # 应用复权调整
-        adjusted_df = df.copy()
+        return self._apply_event_factors(df, jump_positions, jump_factors)
+    
+    def _apply_event_factors(self, df: pd.DataFrame, positions: np.ndarray, factors: np.ndarray) -> pd.DataFrame:
+        """
+        按除权事件调整价格
         
+        Args:
+            positions: 除权日所在行号（该行起为除权后价格）
+            factors: 每个事件的除权因子（除权后价格 / 除权前价格）
+        """
         if self.config.adjustment_type == 'forward':
-            # 前复权：调整除权日之前的数据
-            adjusted_df = self._apply_forward_adjustment(adjusted_df, jump_points)
+            multiplier = self._forward_multiplier(len(df), positions, factors)
         elif self.config.adjustment_type == 'backward':
-            # 后复权：调整除权日之后的数据
-            adjusted_df = self._apply_backward_adjustment(adjusted_df, jump_points)
-        
-        return adjusted_df
+            multiplier = self._backward_multiplier(len(df), positions, factors)
+        else:
+            return df.copy()
+        return self._apply_multiplier(df, multiplier)
+    
+    @staticmethod
+    def _event_factor_vector(length: int, positions: np.ndarray, factors: np.ndarray) -> np.ndarray:
+        """每行的除权因子向量，无事件的行为1，同一行多个事件相乘"""
+        row_factors = np.ones(length)
+        np.multiply.at(row_factors, np.asarray(positions, dtype=np.int64), np.asarray(factors, dtype=float))
+        return row_factors
     
-    def _apply_forward_adjustment(self, df: pd.DataFrame, jump_points: pd.Series) -> pd.DataFrame:
-        """应用前复权调整"""
+    def _forward_multiplier(self, length: int, positions: np.ndarray, factors: np.ndarray) -> np.ndarray:
+        """前复权乘数：每行乘以其后所有除权事件因子的累积乘积，最新价格保持不变"""
+        row_factors = self._event_factor_vector(length, positions, factors)
+        multiplier = np.ones(length)
+        multiplier[:-1] = np.cumprod(row_factors[:0:-1])[::-1]
+        return multiplier
+    
+    def _backward_multiplier(self, length: int, positions: np.ndarray, factors: np.ndarray) -> np.ndarray:
+        """后复权乘数：每行除以截至该行所有除权事件因子的累积乘积，最早价格保持不变"""
+        row_factors = self._event_factor_vector(length, positions, factors)
+        return 1.0 / np.cumprod(row_factors)
+    
+    def _apply_multiplier(self, df: pd.DataFrame, multiplier: np.ndarray) -> pd.DataFrame:
+        """将乘数一次性作用于所有价格列，成交量反向调整"""
         adjusted_df = df.copy()
         
-        # 从最后一个跳跃点开始，向前调整
-        jump_indices = jump_points[jump_points].index
+        price_columns = [col for col in ['open', 'high', 'low', 'close'] if col in df.columns]
+        if price_columns:
+            adjusted_df[price_columns] = df[price_columns].to_numpy(dtype=float) * multiplier[:, None]
         
-        for jump_idx in reversed(jump_indices):
-            jump_pos = df.index.get_loc(jump_idx)
-            if jump_pos == 0:
-                continue
-                
-            # 计算调整因子
-            before_price = df.iloc[jump_pos - 1]['close']
-            after_price = df.iloc[jump_pos]['close']
-            
-            if before_price > 0 and after_price > 0:
-                adjustment_factor = after_price / before_price
-                
-                # 调整跳跃点之前的所有数据
-                price_columns = ['open', 'high', 'low', 'close']
-                for col in price_columns:
-                    if col in adjusted_df.columns:
-                        adjusted_df.iloc[:jump_pos, adjusted_df.columns.get_loc(col)] *= adjustment_factor
-                
-                # 调整成交量（反向调整）
-                if 'volume' in adjusted_df.columns:
-                    volume_col = adjusted_df.columns.get_loc('volume')
-                    adjusted_df.iloc[:jump_pos, volume_col] = (
-                        adjusted_df.iloc[:jump_pos, volume_col].astype(float) / adjustment_factor
-                    ).astype(adjusted_df.dtypes['volume'])
+        # 调整成交量（反向调整）
+        if 'volume' in df.columns:
+            adjusted_df['volume'] = (df['volume'].to_numpy(dtype=float) / multiplier).astype(df.dtypes['volume'])
         
         return adjusted_df
     
-    def _apply_backward_adjustment(self, df: pd.DataFrame, jump_points: pd.Series) -> pd.DataFrame:
-        """应用后复权调整"""
-        adjusted_df = df.copy()
+    def _apply_factor_adjustment(self, df: pd.DataFrame, factors: pd.DataFrame) -> pd.DataFrame:
+        """
+        使用精确的复权因子进行调整
+        
+        factors 每行一个除权除息事件，包含 date 列以及：
+        - factor: 直接给出的除权因子（除权后价格 / 除权前价格），或
+        - dividend: 每股现金分红; bonus_ratio: 每股送转股比例; split_ratio: 拆股比例
+          除权因子 = (前收盘 - 分红) / (前收盘 × (1 + 送转比例) × 拆股比例)
+        """
+        if len(df) < 2 or factors is None or factors.empty:
+            return df.copy()
         
-        # 从第一个跳跃点开始，向后调整
-        jump_indices = jump_points[jump_points].index
+        event_dates = pd.to_datetime(factors['date']).to_numpy(dtype='datetime64[ns]')
+        positions = np.searchsorted(df.index.to_numpy(dtype='datetime64[ns]'), event_dates, side='left')
+        # 只有落在数据区间内部的事件才有"除权前"价格
+        in_range = (positions > 0) & (positions < len(df))
+        positions = positions[in_range]
+        if len(positions) == 0:
+            return df.copy()
         
-        for jump_idx in jump_indices:
-            jump_pos = df.index.get_loc(jump_idx)
-            if jump_pos >= len(df) - 1:
-                continue
-                
-            # 计算调整因子
-            before_price = df.iloc[jump_pos - 1]['close']
-            after_price = df.iloc[jump_pos]['close']
+        if 'factor' in factors.columns:
+            event_factors = factors['factor'].to_numpy(dtype=float)[in_range]
+        else:
+            prev_close = df['close'].to_numpy(dtype=float)[positions - 1]
+            events = factors[in_range]
+            
+            def column(name, default):
+                if name not in events.columns:
+                    return np.full(len(events), default)
+                return events[name].fillna(default).to_numpy(dtype=float)
             
-            if before_price > 0 and after_price > 0:
-                adjustment_factor = before_price / after_price
-                
-                # 调整跳跃点之后的所有数据
-                price_columns = ['open', 'high', 'low', 'close']
-                for col in price_columns:
-                    if col in adjusted_df.columns:
-                        adjusted_df.iloc[jump_pos:, adjusted_df.columns.get_loc(col)] *= adjustment_factor
-                
-                # 调整成交量（反向调整）
-                if 'volume' in adjusted_df.columns:
-                    volume_col = adjusted_df.columns.get_loc('volume')
-                    adjusted_df.iloc[jump_pos:, volume_col] = (
-                        adjusted_df.iloc[jump_pos:, volume_col].astype(float) / adjustment_factor
-                    ).astype(adjusted_df.dtypes['volume'])
+            dividend = column('dividend', 0.0) if self.config.include_dividends else 0.0
+            bonus_ratio = column('bonus_ratio', 0.0) if self.config.include_splits else 0.0
+            split_ratio = column('split_ratio', 1.0) if self.config.include_splits else 1.0
+            event_factors = (prev_close - dividend) / (prev_close * (1 + bonus_ratio) * split_ratio)
         
-        return adjusted_df
-    
-    def _apply_factor_adjustment(self, df: pd.DataFrame, factors: pd.DataFrame) -> pd.DataFrame:
-        """使用精确的复权因子进行调整"""
-        # TODO: 实现精确的复权因子调整
-        # 这里应该根据复权因子数据进行精确计算
-        return df
+        valid = np.isfinite(event_factors) & (event_factors > 0)
+        return self._apply_event_factors(df, positions[valid], event_factors[valid])
     
     def get_adjustment_info(self, df_original: pd.DataFrame, df_adjusted: pd.DataFrame) -> dict:
         """获取复权调整信息"""
@@ -0,0 +1,157 @@
+"""
+股票池分析执行器 - 各分析器批量处理股票的统一并行入口
+1. CPU密集的 pandas 计算默认使用进程池绕开GIL；kind='thread' 用于以I/O为主的任务，工作数为1时在当前线程执行
+2. 分析器对象在每个工作进程初始化时传入一次（fork下直接继承，不逐任务序列化），任务只传股票代码和少量参数
+3. 股票按块提交，结果按输入顺序返回；单只股票异常或超时时该位置返回默认值并记录，不影响其他股票
+   超时依靠工作进程中的 SIGALRM 实现，线程池与当前线程执行时不中断任务
+"""
+import math
+import signal
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from . import config as _config
+except ImportError:
+    import config as _config
+
+ANALYSIS_EXECUTOR_KIND = _config.ANALYSIS_EXECUTOR_KIND
+ANALYSIS_EXECUTOR_WORKERS = _config.ANALYSIS_EXECUTOR_WORKERS
+ANALYSIS_TASK_TIMEOUT = _config.ANALYSIS_TASK_TIMEOUT
+
+# 工作进程内由初始化函数设置
+_worker_target = None
+_worker_timeout = None
+
+
+class TaskTimeout(Exception):
+    """单个任务超过 task_timeout"""
+
+
+def _raise_timeout(signum, frame):
+    raise TaskTimeout()
+
+
+def _init_worker(target, task_timeout: Optional[float]):
+    """工作进程初始化：保存分析器对象，按需安装超时信号处理"""
+    global _worker_target, _worker_timeout
+    _worker_target = target
+    _worker_timeout = task_timeout if hasattr(signal, 'setitimer') else None
+    if _worker_timeout:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+
+
+def _call(target, method: str, item, args: Tuple, kwargs: Dict, timeout: Optional[float]) -> Tuple[bool, Any]:
+    """执行单个任务，返回 (是否成功, 结果或错误信息)"""
+    try:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            return True, getattr(target, method)(item, *args, **kwargs)
+        finally:
+            if timeout:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except TaskTimeout:
+        return False, f'超时（超过 {timeout} 秒）'
+    except Exception as e:
+        return False, f'{type(e).__name__}: {e}'
+
+
+def _run_chunk(method: str, chunk: List, args: Tuple, kwargs: Dict, target=None) -> List[Tuple[bool, Any]]:
+    """执行一块任务；target为None时使用工作进程初始化时保存的分析器"""
+    if target is None:
+        return [_call(_worker_target, method, item, args, kwargs, _worker_timeout) for item in chunk]
+    return [_call(target, method, item, args, kwargs, None) for item in chunk]
+
+
+class AnalysisExecutor:
+    """对同一个分析器对象的方法按股票批量并行调用"""
+
+    def __init__(self, target, kind: str = None, max_workers: int = None,
+                 chunksize: int = None, task_timeout: Optional[float] = -1,
+                 logger: logging.Logger = None):
+        """
+        Args:
+            target: 分析器对象，任务为 getattr(target, method)(股票, *args, **kwargs)
+            kind: 'process' / 'thread'，默认取 ANALYSIS_EXECUTOR_KIND
+            max_workers: 工作数，默认取 ANALYSIS_EXECUTOR_WORKERS
+            chunksize: 每块股票数，默认使每个工作约分到4块
+            task_timeout: 单只股票的超时秒数，None不限，默认取 ANALYSIS_TASK_TIMEOUT
+        """
+        self.target = target
+        self.kind = kind or ANALYSIS_EXECUTOR_KIND
+        if self.kind not in ('process', 'thread'):
+            raise ValueError(f"不支持的执行方式: {self.kind}")
+        self.max_workers = max(1, max_workers or ANALYSIS_EXECUTOR_WORKERS)
+        self.chunksize = chunksize
+        self.task_timeout = ANALYSIS_TASK_TIMEOUT if task_timeout == -1 else task_timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.failures: List[Tuple[Any, str]] = []
+        self.last_run: Dict[str, Any] = {}
+
+    def map(self, method: str, items: Sequence, *args,
+            default: Any = None,
+            on_error: Callable[[Any, str], Any] = None,
+            on_result: Callable[[int, Any, Any], None] = None,
+            **kwargs) -> List:
+        """
+        对每个 item 调用 target.method(item, *args, **kwargs)，结果按 items 的顺序返回
+        失败的位置为 on_error(item, 错误信息) 的返回值，未提供时为 default；
+        on_result(下标, item, 结果) 在主线程中按完成顺序调用，可用于显示进度
+        """
+        items = list(items)
+        results = [default] * len(items)
+        self.failures = []
+        if not items:
+            return results
+
+        workers = min(self.max_workers, len(items))
+        chunksize = self.chunksize or max(1, math.ceil(len(items) / (workers * 4)))
+        starts = list(range(0, len(items), chunksize))
+        start_time = time.perf_counter()
+
+        def collect(start, outcomes):
+            for offset, (ok, value) in enumerate(outcomes):
+                index = start + offset
+                if not ok:
+                    self.failures.append((items[index], value))
+                    self.logger.warning(f"处理 {items[index]} 失败: {value}")
+                    value = on_error(items[index], value) if on_error else default
+                results[index] = value
+                if on_result:
+                    on_result(index, items[index], value)
+
+        if workers == 1:
+            for start in starts:
+                collect(start, _run_chunk(method, items[start:start + chunksize], args, kwargs, self.target))
+        else:
+            if self.kind == 'process':
+                executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                               initargs=(self.target, self.task_timeout))
+                target = None
+            else:
+                executor = ThreadPoolExecutor(max_workers=workers)
+                target = self.target
+            with executor:
+                futures = {executor.submit(_run_chunk, method, items[start:start + chunksize], args, kwargs, target): start
+                           for start in starts}
+                for future in as_completed(futures):
+                    start = futures[future]
+                    try:
+                        outcomes = future.result()
+                    except Exception as e:
+                        # 工作进程异常退出等，整块记为失败
+                        outcomes = [(False, f'{type(e).__name__}: {e}')] * len(items[start:start + chunksize])
+                    collect(start, outcomes)
+
+        self.last_run = {
+            'kind': self.kind if workers > 1 else 'inline',
+            'workers': workers,
+            'chunks': len(starts),
+            'chunksize': chunksize,
+            'failed': len(self.failures),
+            'elapsed': time.perf_counter() - start_time
+        }
+        return results
@@ -4,7 +4,7 @@ import glob
 import numpy as np
 import pandas as pd
 from datetime import datetime
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, jsonify, request, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 import data_loader
 import indicators
@@ -15,6 +15,13 @@ from adjustment_processor import create_adjustment_config, create_adjustment_pro
 from portfolio_manager import create_portfolio_manager
 from strategy_manager import strategy_manager
 from config_manager import config_manager
+from indicator_cache import get_cache_stats, clear_indicator_cache
+from response_cache import ResponseCache, file_signature, make_key
+from payload_encoding import encode_dates, encode_columns, negotiate_encoding
+from chart_window import ChartWindow, slice_with_warmup, downsample_ohlc
+from config import (ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_MAX_BYTES, ANALYSIS_CACHE_PATH,
+                    USE_ANALYSIS_DISK_CACHE, ANALYSIS_COLUMNAR_PRECISION, ANALYSIS_WARMUP_BARS,
+                    ANALYSIS_PAGE_BARS)
 
 # --- 配置路径 ---
 backend_dir = os.path.dirname(os.path.abspath(__file__))
@@ -26,6 +33,15 @@ CORE_POOL_FILE = os.path.join(RESULT_PATH, 'core_pool.json')
 app = Flask(__name__, static_folder=frontend_dir, static_url_path='')
 CORS(app)
 
+INTRADAY_TIMEFRAMES = ['5min', '10min', '15min', '30min', '60min']
+INTRADAY_MINUTES = {'5min': 5, '10min': 10, '15min': 15, '30min': 30, '60min': 60}
+KLINE_COLUMNS = ['open', 'close', 'low', 'high', 'volume']
+INDICATOR_COLUMNS = ['ma13', 'ma45', 'dif', 'dea', 'macd', 'k', 'd', 'j', 'rsi6', 'rsi12', 'rsi24']
+
+# /api/analysis 的序列化结果缓存，键包含数据文件的mtime/大小，文件更新后自动失效
+analysis_cache = ResponseCache(max_entries=ANALYSIS_CACHE_MAX_ENTRIES, max_bytes=ANALYSIS_CACHE_MAX_BYTES,
+                               disk_dir=ANALYSIS_CACHE_PATH if USE_ANALYSIS_DISK_CACHE else None)
+
 # --- 核心池管理辅助函数 (合并后的版本) ---
 def load_core_pool_from_file():
     """从文件加载核心池数据"""
@@ -186,8 +202,11 @@ def get_signals_summary():
         except Exception as e:
             return jsonify({"error": f"无法获取策略 '{strategy}' 的信号: {str(e)}"}), 500
 
-def get_timeframe_data(stock_code, timeframe='daily'):
-    """获取指定周期的数据"""
+def get_timeframe_data(stock_code, timeframe='daily', start=None, end=None, lookback=0, count=None):
+    """
+    获取指定周期的数据，分时周期可用start/end只读取所需时间窗口，
+    count为窗口内最后的K线数，lookback为窗口之前多读的K线数（按周期折算成5分钟记录数）
+    """
     if '#' in stock_code:
         market = 'ds'
     else:
@@ -204,7 +223,11 @@ def get_timeframe_data(stock_code, timeframe='daily'):
                 return None, f"Data file not found: {file_path}"
             return data_loader.get_daily_data(file_path), None
         
-        min5_df = data_loader.get_5min_data(min5_file)
+        # 重采样周期的一根K线由多条5分钟记录组成，多读一根以补齐窗口起点所在的不完整K线
+        records_per_bar = INTRADAY_MINUTES[timeframe] // 5
+        min5_df = data_loader.get_5min_data(
+            min5_file, start=start, end=end, lookback=(lookback + 1) * records_per_bar,
+            count=count * records_per_bar if count is not None else None)
         if min5_df is None:
             # 如果分时数据加载失败，回退到日线数据
             print(f"⚠️ 分时数据加载失败，回退到日线数据")
@@ -283,15 +306,138 @@ def get_timeframe_data(stock_code, timeframe='daily'):
     else:
         return None, f"Unsupported timeframe: {timeframe}"
 
+def get_timeframe_source_files(stock_code, timeframe='daily'):
+    """get_timeframe_data 可能读取的数据文件（分时周期包含回退用的日线文件）"""
+    market = 'ds' if '#' in stock_code else stock_code[:2]
+    files = [os.path.join(BASE_PATH, market, 'lday', f'{stock_code}.day')]
+    if timeframe in ['5min', '10min', '15min', '30min', '60min']:
+        files.insert(0, os.path.join(BASE_PATH, market, 'fzline', f'{stock_code}.lc5'))
+    return files
+
+def analysis_cache_key(stock_code, strategy_name, timeframe, adjustment_type, data_format='records', precision=None,
+                       window=None, include_backtest=True):
+    """分析结果缓存键：请求参数 + 策略配置 + 数据文件签名"""
+    strategy_id = config_manager.find_strategy_by_old_id(strategy_name)
+    strategy_config = strategy_manager.strategy_configs.get(strategy_id) if strategy_id else None
+    window_key = window.cache_key() if window is not None and window.active else None
+    return make_key('analysis', stock_code, strategy_name, timeframe, adjustment_type, data_format, precision,
+                    window_key, include_backtest, strategy_config,
+                    file_signature(get_timeframe_source_files(stock_code, timeframe)))
+
+def parse_chart_window(args, default_count=None):
+    """
+    从请求参数解析图表窗口（start/end/before/count/max_points）；参数非法时抛出 ValueError。
+    窗口后多取的K线覆盖回测向后寻找周期底部/顶部的范围，使窗口末尾的信号状态与全量计算一致
+    """
+    def positive_int(name, default=None):
+        value = args.get(name)
+        if value in (None, ''):
+            return default
+        value = int(value)
+        if value <= 0:
+            raise ValueError(f"{name} must be positive")
+        return value
+
+    dates = {}
+    for name in ('start', 'end', 'before'):
+        value = args.get(name) or None
+        if value is not None:
+            pd.Timestamp(value)
+        dates[name] = value
+    return ChartWindow(count=positive_int('count', default_count), max_points=positive_int('max_points'),
+                       warmup=ANALYSIS_WARMUP_BARS, lookahead=2 * backtester.MAX_LOOKAHEAD_DAYS, **dates)
+
+def format_chart_date(timestamp, timeframe):
+    """与K线数据相同的日期格式：分时到分钟，其余到日"""
+    if not hasattr(timestamp, 'strftime'):
+        return str(timestamp)
+    return timestamp.strftime('%Y-%m-%d %H:%M' if timeframe in INTRADAY_TIMEFRAMES else '%Y-%m-%d')
+
 @app.route('/api/analysis/<stock_code>')
 def get_stock_analysis(stock_code):
+    """
+    format=columnar 时 kline_data/indicator_data 为 {字段: 数组}，日期单独编码在 dates 中，
+    浮点数按 precision 位小数四舍五入；默认仍为逐行记录。响应体按 Accept-Encoding 压缩。
+    start/end（闭区间）或 count（最后N根）只返回该窗口，指标在窗口前多取的预热K线上计算；
+    可见K线超过 max_points 时按桶聚合降采样。指定窗口参数时响应中带 window 描述，
+    回测汇总基于窗口及其前后的预热/前瞻K线
+    """
     try:
-        strategy_name = request.args.get('strategy', 'PRE_CROSS')
-        adjustment_type = request.args.get('adjustment', 'forward')
-        timeframe = request.args.get('timeframe', 'daily')
-        
-        # 获取指定周期的数据
-        df, error = get_timeframe_data(stock_code, timeframe)
+        window = parse_chart_window(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid window: {e}"}), 400
+    return analysis_response(stock_code, window)
+
+@app.route('/api/analysis/<stock_code>/bars')
+def get_stock_analysis_bars(stock_code):
+    """
+    平移时按需加载更早的K线：返回 before（不含）之前的 count 根K线及其指标和信号点，不含回测汇总；
+    响应中 window.start 作为下一页的 before，window.has_more_before 表示是否还有更早的数据
+    """
+    try:
+        window = parse_chart_window(request.args, default_count=ANALYSIS_PAGE_BARS)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid window: {e}"}), 400
+    return analysis_response(stock_code, window, include_backtest=False)
+
+def analysis_response(stock_code, window, include_backtest=True):
+    """分析接口的公共流程：查缓存、计算、压缩协商与条件请求"""
+    strategy_name = request.args.get('strategy', 'PRE_CROSS')
+    adjustment_type = request.args.get('adjustment', 'forward')
+    timeframe = request.args.get('timeframe', 'daily')
+    data_format = request.args.get('format', 'records')
+    if data_format not in ('records', 'columnar'):
+        return jsonify({"error": f"Unsupported format: {data_format}"}), 400
+    precision = None
+    if data_format == 'columnar':
+        precision = min(max(request.args.get('precision', ANALYSIS_COLUMNAR_PRECISION, type=int), 0), 8)
+
+    key = analysis_cache_key(stock_code, strategy_name, timeframe, adjustment_type, data_format, precision,
+                             window, include_backtest)
+    cached = analysis_cache.get(key)
+    cache_status = 'HIT'
+    if cached is None:
+        result = compute_stock_analysis(stock_code, strategy_name, adjustment_type, timeframe,
+                                        data_format, precision, window, include_backtest)
+        if isinstance(result, tuple):
+            # 错误响应不缓存
+            return result
+        cached = analysis_cache.put(key, result.get_data())
+        cache_status = 'MISS'
+
+    body, encoding = analysis_cache.encoded(key, cached, negotiate_encoding(request.headers.get('Accept-Encoding')))
+    response = app.response_class(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        # 不同压缩方式的响应体不同，ETag 也要区分
+        response.set_etag(f"{cached.etag}-{encoding}")
+    else:
+        response.set_etag(cached.etag)
+    # 浏览器每次都带 If-None-Match 重新验证，数据未变时返回304
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Cache'] = cache_status
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+        analysis_cache.record_not_modified()
+    return response
+
+def compute_stock_analysis(stock_code, strategy_name, adjustment_type, timeframe, data_format='records',
+                           precision=ANALYSIS_COLUMNAR_PRECISION, window=None, include_backtest=True):
+    """加载数据、复权、计算指标、应用策略与回测并序列化；出错时返回 (响应, 状态码)"""
+    window = window or ChartWindow()
+    try:
+        # 获取指定周期的数据；分时周期从窗口起点（含预热）读到文件末尾。
+        # 终点在复权之后再截取：前复权因子取决于窗口之后的除权事件。
+        # 后复权以加载的第一根K线为基准，只读部分历史会改变基准，与翻页加载的更早K线在接缝处错位，
+        # 因此后复权总是对完整历史复权后再截取
+        latest_window = window.end is None and window.before is None
+        if adjustment_type != 'backward' and timeframe in INTRADAY_TIMEFRAMES and (
+                window.start is not None or (window.count is not None and latest_window)):
+            df, error = get_timeframe_data(stock_code, timeframe, start=window.start, lookback=window.warmup,
+                                           count=window.count if latest_window else None)
+        else:
+            df, error = get_timeframe_data(stock_code, timeframe)
         if df is None:
             return jsonify({"error": error}), 404
         
@@ -302,6 +448,11 @@ def get_stock_analysis(stock_code):
             df = adjustment_processor.process_data(df, stock_code)
             print(f"📊 复权处理 {stock_code}: {adjustment_type}")  # 调试信息
 
+        # 截取窗口及其前后的预热/前瞻K线，lo:hi 为可见部分
+        df, lo, hi = slice_with_warmup(df, window)
+        if hi <= lo:
+            return jsonify({"error": "No data in requested window"}), 404
+
         # 计算指标（使用复权后的数据）
         df['ma13'] = indicators.calculate_ma(df, 13)
         df['ma45'] = indicators.calculate_ma(df, 45)
@@ -361,12 +512,17 @@ def get_stock_analysis(stock_code):
         if isinstance(signals, tuple) and len(signals) > 0:
             print(f"警告：策略{strategy_name} 返回了一个元组，自动取第一个元素作为信号，原始信号{signals}")
             signals = signals[0]
+        # 回测覆盖已加载的全部K线（含预热与前瞻），跨越窗口边界的信号周期与全量计算分组一致
         backtest_results = backtester.run_backtest(df, signals)
+
+        # 可见部分（超过 max_points 时降采样）
+        view, bucket_size = downsample_ohlc(df.iloc[lo:hi][KLINE_COLUMNS + INDICATOR_COLUMNS], window.max_points)
         
         # 构建信号点 - 修复：使用回测中实际的入场价格
         signal_points = []
-        if signals is not None and not signals[signals != ''].empty:
-            signal_df = df[signals != '']
+        visible_signals = signals.iloc[lo:hi] if isinstance(signals, pd.Series) else signals
+        if signals is not None and not visible_signals[visible_signals != ''].empty:
+            signal_df = df.iloc[lo:hi][visible_signals != '']
             # 修复：使用正确的键名 'entry_idx' 而不是 'entry_index'
             trade_results = {trade['entry_idx']: trade for trade in backtest_results.get('trades', [])}
             for idx, row in signal_df.iterrows():
@@ -394,16 +550,50 @@ def get_stock_analysis(stock_code):
                 else:
                     date_str = str(idx)
                 
-                signal_points.append({
+                signal_point = {
                     'date': date_str,
                     'price': display_price, 
                     'state': final_state,
                     'original_state': original_state
-                })
+                }
+                if bucket_size > 1:
+                    # 降采样后信号点落在所在桶的日期上，bar_date 保留原始K线时间
+                    signal_point['bar_date'] = date_str
+                    signal_point['date'] = format_chart_date(view.index[(idx_pos - lo) // bucket_size], timeframe)
+                signal_points.append(signal_point)
+
+        # 序列化回测结果
+        if isinstance(backtest_results, dict):
+            backtest_results = json.loads(json.dumps(backtest_results, default=lambda x: x.item() if isinstance(x, (np.integer, np.floating)) else bool(x) if isinstance(x, np.bool_) else None))
+
+        extra = {}
+        if window.active:
+            extra['window'] = {
+                'start': format_chart_date(view.index[0], timeframe),
+                'end': format_chart_date(view.index[-1], timeframe),
+                'bars': hi - lo,
+                'points': len(view),
+                'bucket_size': bucket_size,
+                'has_more_before': lo > 0,
+            }
+        if not include_backtest:
+            backtest_results = None
+
+        if data_format == 'columnar':
+            # 列式：整列转换，不经过逐行字典
+            return jsonify({
+                'format': 'columnar',
+                'dates': encode_dates(view.index, intraday=timeframe in INTRADAY_TIMEFRAMES),
+                'kline_data': encode_columns(view, KLINE_COLUMNS, precision),
+                'indicator_data': encode_columns(view, INDICATOR_COLUMNS, precision),
+                'signal_points': signal_points,
+                'backtest_results': backtest_results,
+                **extra
+            })
 
         # 准备返回数据
-        df.replace({np.nan: None}, inplace=True)
-        df_reset = df.reset_index()
+        view = view.replace({np.nan: None})
+        df_reset = view.reset_index()
         
         # 处理不同类型的时间索引
         index_col = df_reset.columns[0]
@@ -413,25 +603,22 @@ def get_stock_analysis(stock_code):
             df_reset = df_reset.rename(columns={index_col: 'date'})
         
         # 根据周期类型格式化日期
-        if timeframe in ['5min', '10min', '15min', '30min', '60min']:
+        if timeframe in INTRADAY_TIMEFRAMES:
             # 分时数据显示时间
             df_reset['date'] = pd.to_datetime(df_reset['date']).dt.strftime('%Y-%m-%d %H:%M')
         else:
             # 日线、周线、月线数据只显示日期
             df_reset['date'] = pd.to_datetime(df_reset['date']).dt.strftime('%Y-%m-%d')
         
-        kline_data = df_reset[['date', 'open', 'close', 'low', 'high', 'volume']].to_dict('records')
-        indicator_data = df_reset[['date', 'ma13', 'ma45', 'dif', 'dea', 'macd', 'k', 'd', 'j', 'rsi6', 'rsi12', 'rsi24']].to_dict('records')
-        
-        # 序列化回测结果
-        if isinstance(backtest_results, dict):
-            backtest_results = json.loads(json.dumps(backtest_results, default=lambda x: x.item() if isinstance(x, (np.integer, np.floating)) else bool(x) if isinstance(x, np.bool_) else None))
+        kline_data = df_reset[['date'] + KLINE_COLUMNS].to_dict('records')
+        indicator_data = df_reset[['date'] + INDICATOR_COLUMNS].to_dict('records')
 
         return jsonify({
             'kline_data': kline_data,
             'indicator_data': indicator_data,
             'signal_points': signal_points,
-            'backtest_results': backtest_results
+            'backtest_results': backtest_results,
+            **extra
         })
     except Exception as e:
         import traceback
@@ -439,6 +626,20 @@ def get_stock_analysis(stock_code):
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
 
+@app.route('/api/cache/indicators', methods=['GET', 'DELETE'])
+def indicator_cache_stats():
+    """查看或清空共享指标缓存（命中/未命中计数）"""
+    if request.method == 'DELETE':
+        clear_indicator_cache()
+    return jsonify(get_cache_stats())
+
+@app.route('/api/cache/analysis', methods=['GET', 'DELETE'])
+def analysis_cache_stats():
+    """查看或清空分析结果缓存（内存/磁盘命中、未命中、304次数）"""
+    if request.method == 'DELETE':
+        analysis_cache.clear()
+    return jsonify(analysis_cache.stats())
+
 @app.route('/api/trading_advice/<stock_code>')
 def get_trading_advice(stock_code):
     try:
@@ -699,13 +900,20 @@ def manage_portfolio():
 
 @app.route('/api/portfolio/scan', methods=['POST'])
 def scan_portfolio():
-    """扫描所有持仓并生成分析报告"""
+    """
+    扫描所有持仓并生成分析报告；数据未变化的持仓复用上次结果，force=1 时全部重新分析。
+    stream=1 时以 Server-Sent Events 推送：每完成一个持仓一条 position 事件，最后一条 done 事件
+    """
+    force_refresh = request.args.get('force') == '1'
     try:
         portfolio_manager = create_portfolio_manager()
-        
-        # 后端自动判断是否需要重新扫描
-        # 首先尝试获取缓存结果
-        results = portfolio_manager.scan_all_positions(force_refresh=False)
+
+        if request.args.get('stream') == '1':
+            return Response(stream_with_context(portfolio_scan_events(portfolio_manager, force_refresh)),
+                            mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+        results = portfolio_manager.scan_all_positions(force_refresh=force_refresh)
         
         return jsonify({'success': True, 'results': results})
     except Exception as e:
@@ -713,6 +921,17 @@ def scan_portfolio():
         traceback.print_exc()
         return jsonify({'error': f'持仓扫描失败: {str(e)}'}), 500
 
+def portfolio_scan_events(portfolio_manager, force_refresh=False):
+    """持仓扫描事件转换为SSE文本"""
+    try:
+        for event in portfolio_manager.iter_scan_positions(force_refresh):
+            name = event.pop('type')
+            yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        yield f"event: error\ndata: {json.dumps({'error': f'持仓扫描失败: {str(e)}'}, ensure_ascii=False)}\n\n"
+
 @app.route('/api/portfolio/analysis/<stock_code>')
 def get_position_analysis(stock_code):
     """获取单个持仓的详细分析"""
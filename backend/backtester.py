@@ -151,10 +151,8 @@ def group_signals_by_cycle(df, signal_series):
     signal_cycles = []
     current_cycle = None
     
-    for idx, state in signal_series.items():
-        if state == '':
-            continue
-            
+    # 只遍历非空信号，避免为每根K线创建索引对象
+    for idx, state in signal_series[signal_series != ''].items():
         if state == 'PRE':
             # 开始新周期
             if current_cycle is None:
@@ -272,19 +270,8 @@ def find_cycle_bottom_and_top(df, cycle_info):
         print(f"寻找周期底部和顶部失败: {e}")
         return None, None, None, None
 
-def run_backtest(df, signal_series):
-    """
-    优化的回测函数：按周期分组，从底部到顶部计算收益，添加趋势确认
-    """
-    if signal_series is None:
-        return {"total_signals": 0, "message": "无信号数据"}
-    
-    # 按周期分组信号
-    cycle_signals = group_signals_by_cycle(df, signal_series)
-    
-    if not cycle_signals:
-        return {"total_signals": 0, "message": "在历史数据中未发现有效信号周期"}
-
+def _collect_trades_by_cycle(df, cycle_signals):
+    """逐周期计算交易明细（通用实现：支持重复索引、缺失值等非常规数据）"""
     trades = []
     valid_entry_indices = []
     
@@ -394,6 +381,202 @@ def run_backtest(df, signal_series):
             print(f"Error processing cycle signal at index {signal_idx}: {e}")
             continue
 
+    return trades, valid_entry_indices
+
+def _window_extreme_pos(values, starts, ends, find_max=False):
+    """
+    每个窗口 values[starts[i]:ends[i] + 1] 中首个最小值（或最大值）的位置，与 idxmin/idxmax 一致
+    空窗口（ends < starts）返回 starts
+    """
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.int64)
+    width = max(int((ends - starts).max()) + 1, 1)
+    positions = starts[:, None] + np.arange(width)
+    window = values[np.minimum(positions, len(values) - 1)].astype(np.float64)
+    window[positions > ends[:, None]] = -np.inf if find_max else np.inf
+    offsets = window.argmax(axis=1) if find_max else window.argmin(axis=1)
+    return starts + offsets
+
+
+def backtest_kernel(high, low, close, signal_pos, states, start_pos, post_pos,
+                    lookback_days=5, lookahead_days=3, confirmation_days=5):
+    """
+    向量化回测内核：一次计算全部信号周期的入场价、趋势确认、周期底部/顶部、最大回撤和见顶天数
+    计算口径与 get_optimal_entry_price / check_trend_confirmation / find_cycle_bottom_and_top 逐项一致
+
+    Args:
+        high, low, close: 按位置排列的价格数组（不含缺失值）
+        signal_pos: 各周期入场信号的位置
+        states: 各周期信号状态（'PRE'/'MID'/'POST'）
+        start_pos: 各周期开始位置
+        post_pos: 各周期POST信号位置，没有POST时为-1
+
+    Returns:
+        dict: 各字段均为与信号一一对应的数组
+    """
+    n = len(close)
+    signal_pos = np.asarray(signal_pos, dtype=np.int64)
+    start_pos = np.asarray(start_pos, dtype=np.int64)
+    post_pos = np.asarray(post_pos, dtype=np.int64)
+    states = np.asarray(states, dtype=object)
+    is_pre, is_post = states == 'PRE', states == 'POST'
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # MACD零轴过滤：5日前收盘价到信号当天最高价的涨幅
+        base_price = close[np.maximum(signal_pos - lookback_days, 0)]
+        price_increase = (high[signal_pos] - base_price) / base_price
+        excluded = (signal_pos >= 1) & (price_increase > 0.25)
+
+        # 入场价：PRE取信号后数天低点，POST取信号前数天回调低点，MID取当天低点
+        window_start = np.where(is_pre, signal_pos + 1,
+                                np.where(is_post, np.maximum(signal_pos - lookback_days, 0), signal_pos))
+        window_end = np.where(is_pre, np.minimum(signal_pos + lookahead_days, n - 1), signal_pos)
+        entry_pos = _window_extreme_pos(low, window_start, window_end)
+        pre_at_end = is_pre & (window_end < window_start)
+        entry_pos = np.where(pre_at_end, signal_pos, entry_pos)
+        entry_price = np.where(pre_at_end, close[signal_pos], low[entry_pos])
+
+        # 趋势确认：入场后 confirmation_days 天的收盘价相对入场日收盘价
+        confirm_len = np.clip(n - entry_pos - 1, 0, confirmation_days)
+        confirm_positions = entry_pos[:, None] + 1 + np.arange(confirmation_days)
+        base_close = close[entry_pos][:, None]
+        changes = (close[np.minimum(confirm_positions, n - 1)] - base_close) / base_close
+        in_window = np.arange(confirmation_days) < confirm_len[:, None]
+        positive_days = ((changes > 0) & in_window).sum(axis=1)
+        final_change = changes[np.arange(len(entry_pos)), np.maximum(confirm_len - 1, 0)]
+
+        # 周期底部：有POST时到POST后5天，否则到开始后15天；顶部：从底部起 MAX_LOOKAHEAD_DAYS 天内
+        cycle_end = np.where(post_pos >= 0, np.minimum(post_pos + 5, n - 1), np.minimum(start_pos + 15, n - 1))
+        bottom_pos = _window_extreme_pos(low, start_pos, cycle_end)
+        top_start = np.maximum(bottom_pos, start_pos)
+        top_pos = _window_extreme_pos(high, top_start, np.minimum(top_start + MAX_LOOKAHEAD_DAYS, n - 1),
+                                      find_max=True)
+        bottom_price, top_price = low[bottom_pos], high[top_pos]
+        cycle_max_pnl = (top_price - bottom_price) / bottom_price
+        actual_max_pnl = np.where((top_price != 0) & (entry_price != 0),
+                                  (top_price - entry_price) / entry_price, 0)
+
+        # 最大回撤：入场到顶部之间的最低价（顶部不晚于入场时只看入场当天）
+        trough_pos = _window_extreme_pos(low, entry_pos, np.maximum(top_pos, entry_pos))
+        max_drawdown = (low[trough_pos] - entry_price) / entry_price
+
+    return {
+        'excluded': excluded,
+        'price_increase': price_increase,
+        'entry_pos': entry_pos,
+        'entry_price': entry_price,
+        'pre_at_end': pre_at_end,
+        'confirm_len': confirm_len,
+        'positive_days': positive_days,
+        'final_change': final_change,
+        'bottom_pos': bottom_pos,
+        'bottom_price': bottom_price,
+        'top_pos': top_pos,
+        'top_price': top_price,
+        'cycle_max_pnl': cycle_max_pnl,
+        'actual_max_pnl': actual_max_pnl,
+        'max_drawdown': max_drawdown,
+        'days_to_peak': np.maximum(top_pos - entry_pos, 0),
+    }
+
+
+def _kernel_applicable(df, signal_series):
+    """向量化内核要求：索引唯一且与信号对齐，价格列齐全且为有限值；否则走逐周期实现"""
+    if not isinstance(signal_series, pd.Series) or not df.index.is_unique:
+        return False
+    if not signal_series.index.equals(df.index):
+        return False
+    if not {'high', 'low', 'close'}.issubset(df.columns):
+        return False
+    prices = df[['high', 'low', 'close']]
+    return all(np.issubdtype(dtype, np.number) for dtype in prices.dtypes) and bool(np.isfinite(prices.to_numpy()).all())
+
+
+def _entry_strategy(state, signal_pos, entry_pos, pre_at_end):
+    if state == 'PRE':
+        if pre_at_end:
+            return "PRE状态-信号当天收盘价"
+        return f"PRE状态-信号后{entry_pos - signal_pos}天低点买入"
+    if state == 'MID':
+        return "MID状态-当天低点买入"
+    return f"POST状态-信号前{signal_pos - entry_pos}天回调低点买入"
+
+
+def _collect_trades_vectorized(df, cycle_signals):
+    """用 backtest_kernel 计算全部周期，再组装成与 _collect_trades_by_cycle 相同的交易明细"""
+    index = df.index
+    signal_pos = index.get_indexer([signal_idx for signal_idx, _, _ in cycle_signals])
+    start_pos = index.get_indexer([cycle_info['start_idx'] for _, _, cycle_info in cycle_signals])
+    post_labels = [cycle_info['post_idx'] for _, _, cycle_info in cycle_signals]
+    post_pos = np.full(len(cycle_signals), -1, dtype=np.int64)
+    has_post = [i for i, label in enumerate(post_labels) if label is not None]
+    if has_post:
+        post_pos[has_post] = index.get_indexer([post_labels[i] for i in has_post])
+
+    result = backtest_kernel(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(),
+                             signal_pos, [state for _, state, _ in cycle_signals], start_pos, post_pos)
+
+    trades = []
+    valid_entry_indices = []
+    for i, (signal_idx, signal_state, cycle_info) in enumerate(cycle_signals):
+        if result['excluded'][i]:
+            print(f"信号被过滤: 五日内涨幅{result['price_increase'][i]:.1%}超过25%，排除高低风险")
+            continue
+
+        confirm_len = int(result['confirm_len'][i])
+        if confirm_len == 0:
+            trend_confirmed, trend_reason = False, "无后续数据"
+        else:
+            positive_ratio = int(result['positive_days'][i]) / confirm_len
+            final_change = result['final_change'][i]
+            trend_confirmed = positive_ratio >= 0.6 and final_change > -0.02
+            trend_reason = f"确认期5天，上涨天数比例{positive_ratio:.1%}，期末涨幅{final_change:.1%}"
+
+        actual_max_pnl = result['actual_max_pnl'][i]
+        entry_pos = int(result['entry_pos'][i])
+        trades.append({
+            "signal_idx": int(signal_pos[i]),
+            "signal_state": signal_state,
+            "entry_idx": entry_pos,
+            "entry_price": float(result['entry_price'][i]),
+            "entry_strategy": _entry_strategy(signal_state, int(signal_pos[i]), entry_pos,
+                                              result['pre_at_end'][i]),
+            "bottom_idx": int(result['bottom_pos'][i]),
+            "bottom_price": float(result['bottom_price'][i]),
+            "top_idx": int(result['top_pos'][i]),
+            "top_price": float(result['top_price'][i]),
+            "cycle_max_pnl": float(result['cycle_max_pnl'][i]),
+            "actual_max_pnl": float(actual_max_pnl),
+            "max_drawdown": float(result['max_drawdown'][i]),
+            "days_to_peak": int(result['days_to_peak'][i]),
+            "trend_confirmed": trend_confirmed,
+            "trend_reason": trend_reason,
+            "is_success": bool(trend_confirmed and actual_max_pnl >= PROFIT_TARGET_FOR_SUCCESS),
+            "cycle_info": cycle_info
+        })
+        valid_entry_indices.append(int(signal_pos[i]))
+
+    return trades, valid_entry_indices
+
+
+def run_backtest(df, signal_series):
+    """
+    优化的回测函数：按周期分组，从底部到顶部计算收益，添加趋势确认
+    """
+    if signal_series is None:
+        return {"total_signals": 0, "message": "无信号数据"}
+    
+    # 按周期分组信号
+    cycle_signals = group_signals_by_cycle(df, signal_series)
+    
+    if not cycle_signals:
+        return {"total_signals": 0, "message": "在历史数据中未发现有效信号周期"}
+
+    if _kernel_applicable(df, signal_series):
+        trades, valid_entry_indices = _collect_trades_vectorized(df, cycle_signals)
+    else:
+        trades, valid_entry_indices = _collect_trades_by_cycle(df, cycle_signals)
+
     if not trades:
         return {"total_signals": len(cycle_signals), "message": "信号周期过于靠近数据末尾，无法完成回测"}
 
@@ -0,0 +1,103 @@
+"""
+图表窗口与降采样
+1. 按 start/end（闭区间）、before（不含）、count（窗口内最后N根）确定可见窗口，
+   并在窗口前多取 warmup 根K线用于指标预热：均线等定长窗口指标与全量计算相同，
+   MACD/KDJ/RSI 等递推指标的初值影响随预热逐步衰减，与全量计算只是近似一致；
+   lookahead 为窗口之后多取的K线数，使窗口末尾附近的信号也能按完整的后续走势回测
+2. 可见K线数超过 max_points 时按固定根数分桶：开=首根开盘，高=最高，低=最低，收=末根收盘，量=合计，
+   指标取桶内最后一根的值（相当于临时切换到更粗的周期，K线形态的极值不会丢失）
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+OHLC_AGGREGATES = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+
+@dataclass(frozen=True)
+class ChartWindow:
+    """图表窗口参数；全部为空时表示完整历史、不降采样"""
+    start: Optional[str] = None
+    end: Optional[str] = None
+    before: Optional[str] = None
+    count: Optional[int] = None
+    max_points: Optional[int] = None
+    warmup: int = 0
+    lookahead: int = 0
+
+    @property
+    def active(self) -> bool:
+        return any(value is not None for value in (self.start, self.end, self.before, self.count, self.max_points))
+
+    @property
+    def trims(self) -> bool:
+        """是否只取历史的一部分（仅 max_points 时仍需完整历史）"""
+        return any(value is not None for value in (self.start, self.end, self.before, self.count))
+
+    def cache_key(self) -> Tuple:
+        return (self.start, self.end, self.before, self.count, self.max_points, self.warmup, self.lookahead)
+
+
+def window_bounds(index: pd.DatetimeIndex, window: ChartWindow) -> Tuple[int, int]:
+    """可见窗口在索引中的位置 [lo, hi)；日期无法解析时抛出 ValueError"""
+    lo, hi = 0, len(index)
+    if window.start is not None or window.end is not None:
+        # 字符串切片按日期粒度闭区间匹配，如 end='2024-03-01' 包含当天所有分时K线
+        bounds = index.slice_indexer(window.start, window.end)
+        lo, hi = bounds.start or 0, bounds.stop if bounds.stop is not None else len(index)
+    if window.before is not None:
+        hi = min(hi, int(index.searchsorted(pd.Timestamp(window.before), 'left')))
+    if window.count is not None:
+        lo = max(lo, hi - window.count)
+    return int(lo), int(max(lo, hi))
+
+
+def slice_with_warmup(df: pd.DataFrame, window: ChartWindow) -> Tuple[pd.DataFrame, int, int]:
+    """
+    截取可见窗口及其前后的预热/前瞻K线，返回 (数据副本, 窗口起始位置, 窗口结束位置)，
+    即可见部分为 data.iloc[lo:hi]
+    """
+    if not window.trims:
+        return df, 0, len(df)
+    lo, hi = window_bounds(df.index, window)
+    load_lo = max(0, lo - window.warmup)
+    load_hi = min(len(df), hi + window.lookahead)
+    return df.iloc[load_lo:load_hi].copy(), lo - load_lo, hi - load_lo
+
+
+def bucket_starts(length: int, max_points: Optional[int]) -> Optional[np.ndarray]:
+    """每个桶的起始位置；不需要降采样时返回None"""
+    if not max_points or length <= max_points:
+        return None
+    bucket_size = -(-length // max_points)
+    return np.arange(0, length, bucket_size)
+
+
+def downsample_ohlc(df: pd.DataFrame, max_points: Optional[int]) -> Tuple[pd.DataFrame, int]:
+    """
+    超过 max_points 根时按固定根数分桶聚合，返回 (降采样后的数据, 每桶根数)；
+    桶的索引取桶内第一根K线的时间
+    """
+    starts = bucket_starts(len(df), max_points)
+    if starts is None:
+        return df, 1
+    ends = np.append(starts[1:], len(df)) - 1
+    columns: Dict[str, np.ndarray] = {}
+    for name in df.columns:
+        values = df[name].to_numpy()
+        aggregate = OHLC_AGGREGATES.get(name, 'last')
+        if aggregate == 'first':
+            columns[name] = values[starts]
+        elif aggregate == 'last':
+            columns[name] = values[ends]
+        elif aggregate == 'max':
+            columns[name] = np.fmax.reduceat(values.astype(float), starts)
+        elif aggregate == 'min':
+            columns[name] = np.fmin.reduceat(values.astype(float), starts)
+        elif values.dtype.kind in 'iu':
+            columns[name] = np.add.reduceat(values, starts)
+        else:
+            columns[name] = np.add.reduceat(np.nan_to_num(values.astype(float)), starts)
+    return pd.DataFrame(columns, index=df.index[starts]), int(starts[1] - starts[0])
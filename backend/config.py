@@ -11,6 +11,53 @@ import os
 # 数据路径配置
 BASE_PATH = os.path.expanduser("~/.local/share/tdxcfv/drive_c/tc/vipdoc")
 
+# 全市场列式K线仓库（market_bar_store.py），筛选器可选用其替代逐个读取.day文件
+BAR_STORE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'cache', 'bar_store'))
+USE_BAR_STORE = False
+
+# 复权因子仓库（adjustment_factor_store.py），按市场持久化除权事件与累积复权因子；默认关闭，
+# 开启后未显式指定仓库的 AdjustmentProcessor 都会读写该目录
+ADJUSTMENT_FACTOR_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'cache', 'adjustment_factors'))
+USE_ADJUSTMENT_FACTOR_STORE = False
+
+# 增量筛选（incremental_indicators.py）：按市场保存每只股票的MACD/KDJ/RSI递推状态，
+# 每日只推进新K线，策略条件在最近 INCREMENTAL_TAIL_ROWS 行上判断
+INDICATOR_STATE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'cache', 'indicator_state'))
+USE_INCREMENTAL_SCREENING = False
+INCREMENTAL_TAIL_ROWS = 10
+
+# 后台筛选任务（screening_jobs.py）：结果持久化目录、保留的已结束任务数、进度推送最小间隔（秒）
+SCREENING_JOB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'result', 'screening_jobs'))
+SCREENING_JOBS_KEPT = 20
+SCREENING_PROGRESS_INTERVAL = 0.5
+
+# 滚动前推优化（walk_forward.py）：训练/测试窗口长度（K线数），各折的指标数组与参数搜索结果按数据指纹缓存
+WALK_FORWARD_CACHE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'cache', 'walk_forward'))
+WALK_FORWARD_TRAIN_DAYS = 500
+WALK_FORWARD_TEST_DAYS = 120
+
+# /api/analysis 响应缓存（response_cache.py）：内存LRU的条目数与总字节上限；启用磁盘层时重启后仍可命中
+ANALYSIS_CACHE_MAX_ENTRIES = 128
+ANALYSIS_CACHE_MAX_BYTES = 256 * 1024 * 1024
+ANALYSIS_CACHE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'cache', 'analysis_responses'))
+USE_ANALYSIS_DISK_CACHE = False
+# format=columnar 时浮点数保留的小数位数（请求可用 precision 参数覆盖）
+ANALYSIS_COLUMNAR_PRECISION = 4
+# 图表窗口（chart_window.py）：窗口前用于指标预热的K线数，/api/analysis/<code>/bars 每页默认K线数
+ANALYSIS_WARMUP_BARS = 250
+ANALYSIS_PAGE_BARS = 1000
+
+# 持仓扫描（portfolio_manager.py）：并行分析持仓的进程数，需要分析的持仓不超过1个时在当前进程执行
+PORTFOLIO_SCAN_WORKERS = min(8, os.cpu_count() or 1)
+
+# 共享指标缓存（indicator_cache.py）：每个进程缓存的指标结果条目数与总字节上限
+INDICATOR_CACHE_MAX_ENTRIES = 2048
+INDICATOR_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# 多周期K线缓存（timeframe_cube.py）：各周期数据及其派生结果按股票缓存的条目数与总字节上限
+TIMEFRAME_CUBE_MAX_ENTRIES = 64
+TIMEFRAME_CUBE_MAX_BYTES = 512 * 1024 * 1024
+
 # 市场配置
 MARKETS = ['sh', 'sz', 'bj']
 
@@ -27,5 +74,15 @@ DEFAULT_DATA_LENGTH = 500
 MAX_CONCURRENT_STRATEGIES = 5
 ENABLE_PARALLEL_PROCESSING = True
 
+# 流式筛选（streaming_screener.py）：imap_unordered的chunksize、最大在途任务数、吞吐量报告间隔（秒）
+STREAM_CHUNKSIZE = 16
+STREAM_MAX_PENDING = 512
+STREAM_REPORT_INTERVAL = 5.0
+
+# 股票池分析执行器（analysis_executor.py）：执行方式（process/thread）、工作数、单只股票的超时秒数（None 不限）
+ANALYSIS_EXECUTOR_KIND = 'process'
+ANALYSIS_EXECUTOR_WORKERS = os.cpu_count() or 1
+ANALYSIS_TASK_TIMEOUT = 120
+
 # 日志配置
 LOG_LEVEL = "INFO"
\ No newline at end of file
@@ -44,7 +44,13 @@ def _get_market_from_stock_code(stock_code: str) -> str:
     # 默认返回前两位作为市场代码
     return prefix
 
-def get_full_data_with_indicators(stock_code: str, adjustment_type: str = 'forward') -> Optional[pd.DataFrame]:
+def get_daily_file_path(stock_code: str) -> str:
+    """股票日线 .day 文件路径"""
+    market = _get_market_from_stock_code(stock_code)
+    return os.path.join(BASE_PATH, market, 'lday', f'{stock_code}.day')
+
+def get_full_data_with_indicators(stock_code: str, adjustment_type: str = 'forward',
+                                  raw_df: Optional[pd.DataFrame] = None) -> Optional[pd.DataFrame]:
     """
     【统一数据入口】
     获取单只股票的完整历史数据，并计算好所有通用技术指标。
@@ -52,18 +58,21 @@ def get_full_data_with_indicators(stock_code: str, adjustment_type: str = 'forwa
     Args:
         stock_code: 股票代码，如 'sh600006' 或 '31#01772'
         adjustment_type: 复权类型，'forward'(前复权), 'backward'(后复权), 'none'(不复权)
+        raw_df: 已加载的原始日线数据（如来自列式K线仓库），提供时跳过文件读取
     
     Returns:
         包含所有技术指标的DataFrame，失败时返回None
     """
     try:
         # 1. 加载数据 - 修复港股市场识别
-        market = _get_market_from_stock_code(stock_code)
-        file_path = os.path.join(BASE_PATH, market, 'lday', f'{stock_code}.day')
-        if not os.path.exists(file_path):
-            return None
+        if raw_df is not None:
+            df = raw_df.copy()
+        else:
+            file_path = get_daily_file_path(stock_code)
+            if not os.path.exists(file_path):
+                return None
+            df = data_loader.get_daily_data(file_path, stock_code)
         
-        df = data_loader.get_daily_data(file_path, stock_code)
         if df is None or len(df) < 100:
             return None
         
@@ -1,12 +1,104 @@
 import os
+import bisect
 import struct
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+# --- .day文件的NumPy结构化记录格式 (每条32字节) ---
+# 沪深A股: 日期(I), OHLC(4*I, 价格*100), 成交额(f), 成交量(I), 保留(I)
+DAY_RECORD_DTYPE = np.dtype([
+    ('date', '<u4'), ('open', '<u4'), ('high', '<u4'), ('low', '<u4'), ('close', '<u4'),
+    ('amount', '<f4'), ('volume', '<u4'), ('reserved', '<u4')
+])
+# 港股: 日期(I), OHLC(4*f), 成交额(f), 成交量(I), 保留(i)
+HK_DAY_RECORD_DTYPE = np.dtype([
+    ('date', '<u4'), ('open', '<f4'), ('high', '<f4'), ('low', '<f4'), ('close', '<f4'),
+    ('amount', '<f4'), ('volume', '<u4'), ('reserved', '<i4')
+])
+
+
+def decode_yyyymmdd(dates):
+    """
+    将YYYYMMDD格式的整数数组向量化转换为datetime64[ns]数组。
+
+    Returns:
+        tuple: (日期数组, 有效掩码)。非法日期(如月份为0、2月30日)对应掩码为False。
+    """
+    dates = np.asarray(dates, dtype=np.int64)
+    year = dates // 10000
+    month = (dates // 100) % 100
+    day = dates % 100
+
+    valid = (year >= 1) & (year <= 9999) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+    # 先将非法值替换为安全值，避免datetime64溢出
+    year = np.where(valid, year, 1970)
+    month = np.where(valid, month, 1)
+    day = np.where(valid, day, 1)
+
+    month_start = (year - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1).astype('timedelta64[M]')
+    result = month_start.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')
+
+    # 日期超出当月天数时会滚动到下个月，据此剔除
+    valid &= result.astype('datetime64[M]') == month_start
+    return result.astype('datetime64[ns]'), valid
+
+
+def decode_day_records(buffer, stock_code=None):
+    """
+    将.day文件的原始字节一次性解码为DataFrame。
+
+    Args:
+        buffer: bytes/bytearray/memoryview，长度不是32整数倍时忽略末尾残缺记录
+        stock_code: 股票代码，包含'#'时按港股格式解析
+
+    Returns:
+        以date为DatetimeIndex的DataFrame，无有效数据时返回None
+    """
+    is_hk_stock = bool(stock_code) and '#' in stock_code
+    record_dtype = HK_DAY_RECORD_DTYPE if is_hk_stock else DAY_RECORD_DTYPE
+    count = len(buffer) // record_dtype.itemsize
+    if count == 0:
+        return None
+
+    records = np.frombuffer(buffer, dtype=record_dtype, count=count)
+    dates, valid = decode_yyyymmdd(records['date'])
+
+    price_divisor = 1.0 if is_hk_stock else 100.0
+    prices = {col: records[col].astype(np.float64) / price_divisor for col in ('open', 'high', 'low', 'close')}
+    valid &= ~(prices['open'] <= 0)
+
+    if not valid.any():
+        return None
+
+    df = pd.DataFrame({
+        'open': prices['open'][valid],
+        'high': prices['high'][valid],
+        'low': prices['low'][valid],
+        'close': prices['close'][valid],
+        'volume': records['volume'][valid].astype(np.int64),
+        'amount': records['amount'][valid].astype(np.float64)
+    }, index=pd.DatetimeIndex(dates[valid], name='date'))
+
+    if not df.index.is_monotonic_increasing:
+        df = df.iloc[np.argsort(df.index.values, kind='stable')]
+    return df
+
+
 def get_daily_data(file_path, stock_code=None):
     """
     从.day文件读取完整的日线数据。
     【已合并】能自动识别并解析沪深A股和港股两种不同的文件格式。
+    【向量化】整文件一次读入并按结构化dtype解码，日期使用整数运算批量转换。
+    """
+    with open(file_path, 'rb') as f:
+        buffer = f.read()
+    return decode_day_records(buffer, stock_code)
+
+def _get_daily_data_struct(file_path, stock_code=None):
+    """
+    逐条struct解包的旧版.day解析器。
+    保留用于与向量化解析器做一致性校验，业务代码请使用get_daily_data。
     """
     data = []
     record_size = 32
@@ -70,10 +162,142 @@ def get_daily_data(file_path, stock_code=None):
     df.set_index('date', inplace=True) # 设置日期为索引，确保是DatetimeIndex
     return df
 
-def get_5min_data(file_path):
+# .lc5文件记录格式: 日期(H), 时间(H), OHLC(4*f), 成交量(f), 成交额(f), 保留(I)
+LC5_RECORD_DTYPE = np.dtype([
+    ('date', '<u2'), ('time', '<u2'), ('open', '<f4'), ('high', '<f4'), ('low', '<f4'),
+    ('close', '<f4'), ('volume', '<f4'), ('amount', '<f4'), ('reserved', '<u4')
+])
+
+
+def _lc5_sort_key(packed_date, packed_time):
+    """将打包的日期/时间合成单调递增的整数键（月*100+日 < 2048，因此日期字段本身按时间有序）"""
+    return (int(packed_date) << 16) | int(packed_time)
+
+
+def _lc5_key_for_timestamp(ts, side):
+    """把时间点转换为.lc5排序键；side='left'时秒级以下部分向上取整到下一分钟"""
+    ts = pd.Timestamp(ts)
+    if side == 'left' and (ts.second or ts.microsecond or ts.nanosecond):
+        ts = ts.floor('min') + pd.Timedelta(minutes=1)
+    if ts.year < 2004:
+        return -1
+    if ts.year > 2004 + 31:
+        return 1 << 32
+    packed_date = (ts.year - 2004) * 2048 + ts.month * 100 + ts.day
+    return _lc5_sort_key(packed_date, ts.hour * 60 + ts.minute)
+
+
+def _lc5_window_end(end):
+    """
+    窗口终点：只精确到日（或月、年）的字符串取该时段的最后一分钟，
+    与 DatetimeIndex 按字符串切片的闭区间一致，如 end='2024-01-19' 包含当天所有K线
+    """
+    if isinstance(end, str):
+        try:
+            return pd.Period(end).end_time.floor('min')
+        except ValueError:
+            pass
+    return end
+
+
+def decode_lc5_records(records):
+    """
+    向量化解码.lc5结构化记录数组。
+
+    Returns:
+        以datetime为DatetimeIndex的DataFrame，无有效数据时返回None
+    """
+    if len(records) == 0:
+        return None
+
+    packed_date = records['date'].astype(np.int64)
+    packed_time = records['time'].astype(np.int64)
+    year = packed_date // 2048 + 2004
+    month = (packed_date % 2048) // 100
+    day = (packed_date % 2048) % 100
+    hour = packed_time // 60
+    minute = packed_time % 60
+
+    dates, valid = decode_yyyymmdd(year * 10000 + month * 100 + day)
+    valid &= hour < 24
+    valid &= ~(records['open'] <= 0)
+    if not valid.any():
+        return None
+
+    timestamps = dates[valid] + (packed_time[valid] * 60).astype('timedelta64[s]')
+    df = pd.DataFrame({
+        col: records[col][valid].astype(np.float64)
+        for col in ('open', 'high', 'low', 'close', 'volume', 'amount')
+    }, index=pd.DatetimeIndex(timestamps.astype('datetime64[ns]'), name='datetime'))
+
+    if not df.index.is_monotonic_increasing:
+        df = df.iloc[np.argsort(df.index.values, kind='stable')]
+    return df
+
+
+def get_5min_data(file_path, start=None, end=None, lookback=0, count=None):
     """
     从.lc5文件读取5分钟线数据
     文件格式说明: 每32字节一条记录
+    - 2字节: 日期 (ushort), (year - 2004) * 2048 + month * 100 + day
+      解码时日需取 (packed_date % 2048) % 100，直接对100取余会把年份偏移混入日
+    - 2字节: 时间 (ushort), hour * 60 + minute
+    - 4字节: open (float)
+    - 4字节: high (float)
+    - 4字节: low (float)
+    - 4字节: close (float)
+    - 4字节: volume (float)
+    - 4字节: amount (float)
+    - 4字节: (保留)
+
+    【零拷贝】文件以np.memmap方式映射，日期/时间字段向量化解码。
+    指定start/end(闭区间)时，在按时间排序的记录上二分查找，只物化所需窗口；
+    只到日的 end（如 '2024-01-19'）包含当天全部K线。
+    count: 只取窗口内最后count条；lookback: 窗口之前额外多取的记录数（供指标预热）
+    """
+    file_size = os.path.getsize(file_path)
+    num_records = file_size // LC5_RECORD_DTYPE.itemsize
+    if num_records == 0:
+        return None
+
+    records = np.memmap(file_path, dtype=LC5_RECORD_DTYPE, mode='r', shape=(num_records,))
+    try:
+        lo, hi = 0, num_records
+        if start is not None or end is not None:
+            sort_key = lambda record: _lc5_sort_key(record['date'], record['time'])
+            if start is not None:
+                lo = bisect.bisect_left(records, _lc5_key_for_timestamp(start, 'left'), key=sort_key)
+            if end is not None:
+                hi = bisect.bisect_right(records, _lc5_key_for_timestamp(_lc5_window_end(end), 'right'),
+                                        lo=lo, key=sort_key)
+        if count is not None:
+            lo = max(lo, hi - count)
+        lo = max(0, lo - lookback)
+
+        if start is not None or end is not None or count is not None:
+            window = np.array(records[lo:hi])
+            keys = (window['date'].astype(np.int64) << 16) | window['time'].astype(np.int64)
+            if np.any(np.diff(keys) < 0):
+                # 文件未按时间排序，二分查找结果不可信，退回全量解码后过滤
+                df = decode_lc5_records(np.array(records))
+                if df is None:
+                    return None
+                window_lo, window_hi = df.index.slice_indexer(start, end).indices(len(df))[:2]
+                if count is not None:
+                    window_lo = max(window_lo, window_hi - count)
+                df = df.iloc[max(0, window_lo - lookback):window_hi]
+                return df if not df.empty else None
+        else:
+            window = np.array(records)
+    finally:
+        del records
+
+    return decode_lc5_records(window)
+
+def _get_5min_data_struct(file_path):
+    """
+    逐条struct解包的旧版.lc5解析器，保留用于一致性校验。
+    文件格式说明: 每32字节一条记录
     - 2字节: 日期 (ushort), (year - 2004) * 2048 + month * 100 + day
     - 2字节: 时间 (ushort), hour * 60 + minute
     - 4字节: open (float)
@@ -101,7 +325,7 @@ def get_5min_data(file_path):
                 # 解码日期
                 year = packed_date // 2048 + 2004
                 month = (packed_date % 2048) // 100
-                day = packed_date % 100
+                day = (packed_date % 2048) % 100
 
                 # 解码时间
                 hour = packed_time // 60
@@ -132,8 +356,8 @@ def get_5min_data(file_path):
     df.set_index('datetime', inplace=True)
     return df
 
-def get_multi_timeframe_data(stock_code, base_path=None):
-    """获取多周期数据（日线 + 5分钟线）"""
+def get_multi_timeframe_data(stock_code, base_path=None, start=None, end=None):
+    """获取多周期数据（日线 + 5分钟线），start/end用于限定5分钟线的读取窗口"""
     if base_path is None:
         base_path = os.path.expanduser("~/.local/share/tdxcfv/drive_c/tc/vipdoc")
     
@@ -168,7 +392,7 @@ def get_multi_timeframe_data(stock_code, base_path=None):
     # 加载5分钟线数据
     if os.path.exists(min5_file):
         try:
-            result['min5_data'] = get_5min_data(min5_file)
+            result['min5_data'] = get_5min_data(min5_file, start=start, end=end)
             result['data_status']['min5_available'] = result['min5_data'] is not None
         except Exception as e:
             print(f"加载5分钟线数据失败 {stock_code}: {e}")
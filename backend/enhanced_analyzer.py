@@ -11,9 +11,10 @@ from typing import Dict, List, Tuple, Optional
 import data_loader
 import strategies
 import indicators
-from parametric_advisor import ParametricTradingAdvisor, TradingParameters
+from parametric_advisor import ParametricTradingAdvisor, TradingParameters, ParameterGridEvaluator
 from trading_advisor import TradingAdvisor
 from performance_optimizer import OptimizedParameterSearch, SmartCache
+from analysis_executor import AnalysisExecutor
 
 class EnhancedTradingAnalyzer:
     """增强交易分析器 - 性能优化版本"""
@@ -182,11 +183,8 @@ class EnhancedTradingAnalyzer:
             return {'error': f'参数化分析失败: {e}'}
     
     def _quick_optimize(self, df, signals):
-        """快速参数优化（增强多线程版本）"""
+        """快速参数优化（批量回测版本）"""
         try:
-            from concurrent.futures import ThreadPoolExecutor, as_completed
-            import itertools
-            import multiprocessing
             import time
             
             start_time = time.time()
@@ -199,66 +197,14 @@ class EnhancedTradingAnalyzer:
                 'max_holding_days': [20, 30]
             }
             
-            combinations = list(itertools.product(*param_ranges.values()))
-            total_combinations = len(combinations)
+            param_sets = ParameterGridEvaluator.grid(param_ranges)
+            total_combinations = len(param_sets)
             
-            # 动态确定线程数
-            max_workers = min(multiprocessing.cpu_count() * 2, total_combinations, 32)
+            print(f"⚙️ 参数优化: 测试 {total_combinations} 种组合 (批量回测)")
             
-            print(f"⚙️ 参数优化: 测试 {total_combinations} 种组合 (线程数: {max_workers})")
-            
-            def test_parameter_combination(combination):
-                """测试单个参数组合"""
-                try:
-                    test_params = TradingParameters()
-                    test_params.pre_entry_discount = combination[0]
-                    test_params.moderate_stop = combination[1]
-                    test_params.moderate_profit = combination[2]
-                    test_params.max_holding_days = combination[3]
-                    
-                    test_advisor = ParametricTradingAdvisor(test_params)
-                    result = test_advisor.backtest_parameters(df, signals, 'moderate')
-                    
-                    if 'error' not in result and result['total_trades'] >= 1:
-                        # 综合评分：胜率 * 0.6 + 平均收益 * 0.4
-                        score = result['win_rate'] * 0.6 + max(0, result['avg_pnl']) * 0.4
-                        return (score, test_params, result)
-                    else:
-                        return (0, None, None)
-                except Exception as e:
-                    return (0, None, None)
-            
-            best_params = None
-            best_score = -1
-            best_result = None
-            completed = 0
-            
-            # 使用多线程并行测试参数组合
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # 批量提交任务
-                future_to_combination = {
-                    executor.submit(test_parameter_combination, combo): combo 
-                    for combo in combinations
-                }
-                
-                # 处理完成的任务
-                for future in as_completed(future_to_combination):
-                    completed += 1
-                    
-                    # 每完成25%显示一次进度
-                    if completed % max(1, total_combinations // 4) == 0 or completed == total_combinations:
-                        progress = completed / total_combinations * 100
-                        elapsed = time.time() - start_time
-                        print(f"   ⏳ 参数优化进度: {progress:.1f}% ({completed}/{total_combinations}, 耗时: {elapsed:.1f}秒)")
-                    
-                    try:
-                        score, params, result = future.result()
-                        if score > best_score:
-                            best_score = score
-                            best_params = params
-                            best_result = result
-                    except Exception as e:
-                        continue
+            # 综合评分：胜率 * 0.6 + 平均收益 * 0.4，所有组合一次计算
+            evaluator = ParameterGridEvaluator(df, signals, 'moderate')
+            best_score, best_params, best_result = evaluator.best_composite(param_sets)
             
             total_time = time.time() - start_time
             print(f"✅ 参数优化完成! 耗时: {total_time:.2f}秒, 最佳得分: {best_score:.3f}")
@@ -487,48 +433,30 @@ class EnhancedTradingAnalyzer:
         except Exception as e:
             return {'error': f'生成建议失败: {e}'}
     
-    def batch_analyze_stocks(self, stock_codes, use_optimized_params=True, max_workers=None):
-        """批量分析股票 (多线程版本)"""
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-        import multiprocessing
-        
-        # 自动确定线程数
-        if max_workers is None:
-            max_workers = min(multiprocessing.cpu_count() * 2, len(stock_codes), 16)
-        
-        print(f"🚀 开始多线程批量分析 {len(stock_codes)} 只股票 (线程数: {max_workers})")
+    def batch_analyze_stocks(self, stock_codes, use_optimized_params=True, max_workers=None, kind=None):
+        """批量分析股票 (多进程版本，kind='thread' 时使用线程池)"""
+        executor = AnalysisExecutor(self, kind=kind, max_workers=max_workers)
+        print(f"🚀 开始批量分析 {len(stock_codes)} 只股票 "
+              f"({'进程' if executor.kind == 'process' else '线程'}数: {min(executor.max_workers, len(stock_codes))})")
         
-        results = {}
         completed = 0
         
-        # 使用线程池执行分析
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            future_to_stock = {
-                executor.submit(self.analyze_stock_comprehensive, stock_code, use_optimized_params): stock_code 
-                for stock_code in stock_codes
-            }
-            
-            # 处理完成的任务
-            for future in as_completed(future_to_stock):
-                stock_code = future_to_stock[future]
-                completed += 1
-                
-                try:
-                    result = future.result()
-                    results[stock_code] = result
-                    
-                    if 'error' not in result:
-                        score = result['overall_score']['total_score']
-                        grade = result['overall_score']['grade']
-                        action = result['recommendation']['action']
-                        print(f"✅ [{completed}/{len(stock_codes)}] {stock_code}: 评分 {score:.1f}, 等级 {grade}, 建议 {action}")
-                    else:
-                        print(f"❌ [{completed}/{len(stock_codes)}] {stock_code}: {result['error']}")
-                        
-                except Exception as e:
-                    print(f"❌ [{completed}/{len(stock_codes)}] {stock_code}: 处理异常 {e}")
-                    results[stock_code] = {'error': f'处理异常: {e}'}
+        def report(index, stock_code, result):
+            nonlocal completed
+            completed += 1
+            if 'error' not in result:
+                score = result['overall_score']['total_score']
+                grade = result['overall_score']['grade']
+                action = result['recommendation']['action']
+                print(f"✅ [{completed}/{len(stock_codes)}] {stock_code}: 评分 {score:.1f}, 等级 {grade}, 建议 {action}")
+            else:
+                print(f"❌ [{completed}/{len(stock_codes)}] {stock_code}: {result['error']}")
+        
+        # 结果字典按输入顺序排列
+        analyses = executor.map('analyze_stock_comprehensive', stock_codes, use_optimized_params,
+                                on_error=lambda stock_code, error: {'error': f'处理异常: {error}'},
+                                on_result=report)
+        results = dict(zip(stock_codes, analyses))
         
         # 生成排名
         valid_results = {k: v for k, v in results.items() if 'error' not in v}
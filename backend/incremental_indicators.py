@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量指标状态 - 每日筛选只推进新K线
+1. 为每只股票保存指标递推状态：MACD的快慢EMA与DEA、RSI的Wilder平均涨跌幅、KDJ的K/D值
+   及最近n根最高/最低价，外加最近若干行的指标值（供策略条件判断）
+2. 新K线到来时按 pandas ewm(adjust=False) 完全相同的递推公式推进状态，结果与全量重算一致
+3. 策略条件只在最近 tail_rows 行上判断（strategies.*_signals）
+4. 状态按市场存放在SQLite（data/cache/indicator_state/<market>.sqlite），
+   .day文件只读取上次处理位置之后的尾部记录
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass, asdict, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import data_loader
+    from . import indicators
+    from .market_bar_store import StoreBarRef, RECORD_SIZE, load_bar_source
+    from .config import INDICATOR_STATE_PATH, INCREMENTAL_TAIL_ROWS
+except ImportError:
+    import data_loader
+    import indicators
+    from market_bar_store import StoreBarRef, RECORD_SIZE, load_bar_source
+    from config import INDICATOR_STATE_PATH, INCREMENTAL_TAIL_ROWS
+
+import strategies
+
+# 支持增量判断的策略：只依赖MACD/KDJ/RSI，且信号只取决于最近几行
+INCREMENTAL_STRATEGIES = ('MACD_ZERO_AXIS', 'TRIPLE_CROSS', 'PRE_CROSS')
+
+
+@dataclass
+class IndicatorParams:
+    """增量状态对应的指标参数，参数变化时状态需要重建"""
+    fast: int = 12
+    slow: int = 26
+    signal: int = 9
+    kdj_n: int = 9
+    kdj_k: int = 9
+    kdj_d: int = 3
+    rsi_periods: List[int] = field(default_factory=lambda: [6, 14])
+    tail_rows: int = INCREMENTAL_TAIL_ROWS
+
+    @classmethod
+    def from_strategy_config(cls, config=None, tail_rows: int = INCREMENTAL_TAIL_ROWS) -> 'IndicatorParams':
+        config = config or strategies.get_strategy_config('')
+        # 零轴策略判断最近 post_cross_days 天内的金叉，需要再多一行计算shift
+        tail_rows = max(tail_rows, config.post_cross_days + 1)
+        return cls(config.macd.fast_period, config.macd.slow_period, config.macd.signal_period,
+                   config.kdj.n_period, config.kdj.k_period, config.kdj.d_period,
+                   sorted({config.rsi.period_short, config.rsi.period_long}), tail_rows)
+
+    def key(self) -> str:
+        return json.dumps(asdict(self), sort_keys=True)
+
+
+# --- 与 pandas ewm(adjust=False) 相同的递推 ---
+
+def _alpha_from_span(span):
+    return 1. / (1. + (span - 1) / 2)
+
+
+def _alpha_from_com(com):
+    return 1. / (1. + com)
+
+
+def _alpha_from_alpha(alpha):
+    return 1. / (1. + (1 - alpha) / alpha)
+
+
+def _ewm_step(prev: float, value: float, alpha: float) -> float:
+    """单步指数平滑，逐位复现 pandas ewm(adjust=False).mean() 的计算顺序"""
+    if prev != prev:  # 尚未出现有效值
+        return value
+    if value != value:
+        return prev
+    old_wt = 1. - alpha
+    if prev != value:
+        prev = (old_wt * prev + alpha * value) / (old_wt + alpha)
+    return prev
+
+
+def _rsi_value(avg_gain: float, avg_loss: float) -> float:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = np.float64(avg_gain) / np.float64(avg_loss)
+        rsi = 100 - (100 / (1 + rs))
+    return 100.0 if rsi != rsi else float(rsi)
+
+
+# --- 状态构建与推进 ---
+
+def init_state(df: pd.DataFrame, params: IndicatorParams, source_size: int = None) -> dict:
+    """由完整历史一次性计算状态（首次运行、参数变化或历史被改写时）"""
+    price = df['close']
+    dif, dea = indicators.calculate_macd(df, fast=params.fast, slow=params.slow, signal=params.signal)
+    k, d, j = indicators.calculate_kdj(df, n=params.kdj_n, k_period=params.kdj_k, d_period=params.kdj_d)
+
+    tail = slice(-params.tail_rows, None)
+    tail_values = {
+        'date': df.index[tail].asi8.tolist(),
+        'close': price.iloc[tail].tolist(),
+        'dif': dif.iloc[tail].tolist(),
+        'dea': dea.iloc[tail].tolist(),
+        'k': k.iloc[tail].tolist(),
+        'd': d.iloc[tail].tolist(),
+        'j': j.iloc[tail].tolist(),
+    }
+
+    delta = price.diff(1)
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    rsi_state = {}
+    for period in params.rsi_periods:
+        avg_gain = gain.ewm(alpha=1/period, adjust=False).mean()
+        avg_loss = loss.ewm(alpha=1/period, adjust=False).mean()
+        rsi_state[str(period)] = [float(avg_gain.iloc[-1]), float(avg_loss.iloc[-1])]
+        tail_values[f'rsi{period}'] = indicators.calculate_rsi(df, period).iloc[tail].tolist()
+
+    window = slice(-params.kdj_n, None)
+    return {
+        'params': params.key(),
+        'rows': len(df),
+        'last_date': int(df.index[-1].value),
+        'last_close': float(price.iloc[-1]),
+        'source_size': source_size,
+        'ema_fast': float(price.ewm(span=params.fast, adjust=False).mean().iloc[-1]),
+        'ema_slow': float(price.ewm(span=params.slow, adjust=False).mean().iloc[-1]),
+        'dea': float(dea.iloc[-1]),
+        'k': float(k.iloc[-1]),
+        'd': float(d.iloc[-1]),
+        'rsi': rsi_state,
+        'highs': df['high'].iloc[window].tolist(),
+        'lows': df['low'].iloc[window].tolist(),
+        'tail': tail_values,
+    }
+
+
+def advance_state(state: dict, new_bars: pd.DataFrame, params: IndicatorParams) -> dict:
+    """用新K线推进状态（逐根递推，每日通常只有一根）"""
+    state = json.loads(json.dumps(state))  # 深拷贝，不修改传入的状态
+    alpha_fast, alpha_slow = _alpha_from_span(params.fast), _alpha_from_span(params.slow)
+    alpha_signal = _alpha_from_span(params.signal)
+    alpha_k, alpha_d = _alpha_from_com((params.kdj_k - 1) / 2), _alpha_from_com((params.kdj_d - 1) / 2)
+    tail = state['tail']
+
+    for date, high, low, close in zip(new_bars.index.asi8, new_bars['high'].to_numpy(float),
+                                      new_bars['low'].to_numpy(float), new_bars['close'].to_numpy(float)):
+        # MACD
+        state['ema_fast'] = _ewm_step(state['ema_fast'], close, alpha_fast)
+        state['ema_slow'] = _ewm_step(state['ema_slow'], close, alpha_slow)
+        dif = state['ema_fast'] - state['ema_slow']
+        state['dea'] = _ewm_step(state['dea'], dif, alpha_signal)
+
+        # KDJ：最近n根的最高/最低价
+        state['highs'] = (state['highs'] + [float(high)])[-params.kdj_n:]
+        state['lows'] = (state['lows'] + [float(low)])[-params.kdj_n:]
+        if len(state['highs']) < params.kdj_n:
+            rsv = np.nan
+        else:
+            high_n, low_n = max(state['highs']), min(state['lows'])
+            high_minus_low = high_n - low_n
+            rsv = ((close - low_n) / high_minus_low) * 100 if high_minus_low != 0 else 0.0
+        state['k'] = _ewm_step(state['k'], rsv, alpha_k)
+        state['d'] = _ewm_step(state['d'], state['k'], alpha_d)
+
+        # RSI（Wilder平滑）
+        delta = close - state['last_close']
+        gain = delta if delta > 0 else 0.0
+        loss = -(delta if delta < 0 else 0.0)
+        rsi_values = {}
+        for period in params.rsi_periods:
+            alpha = _alpha_from_alpha(1 / period)
+            avg_gain, avg_loss = state['rsi'][str(period)]
+            avg_gain, avg_loss = _ewm_step(avg_gain, gain, alpha), _ewm_step(avg_loss, loss, alpha)
+            state['rsi'][str(period)] = [avg_gain, avg_loss]
+            rsi_values[period] = _rsi_value(avg_gain, avg_loss)
+
+        state['rows'] += 1
+        state['last_date'] = int(date)
+        state['last_close'] = float(close)
+
+        row = {'date': int(date), 'close': float(close), 'dif': dif, 'dea': state['dea'],
+               'k': state['k'], 'd': state['d'], 'j': 3 * state['k'] - 2 * state['d']}
+        row.update({f'rsi{p}': v for p, v in rsi_values.items()})
+        for column, value in row.items():
+            tail[column] = (tail[column] + [value])[-params.tail_rows:]
+
+    return state
+
+
+def state_frame(state: dict) -> pd.DataFrame:
+    """最近 tail_rows 行的指标值"""
+    tail = dict(state['tail'])
+    index = pd.DatetimeIndex(pd.to_datetime(tail.pop('date')), name='date')
+    return pd.DataFrame(tail, index=index, dtype=float)
+
+
+def _may_signal(tail: dict, strategy_name: str, config) -> bool:
+    """
+    最新一根K线上各策略的必要条件（标量判断）。绝大多数股票在这里就被排除，
+    只有可能出信号的才构造DataFrame交给 strategies.*_signals 做完整判断
+    """
+    dif, dea = tail['dif'], tail['dea']
+    if strategy_name == 'MACD_ZERO_AXIS':
+        bar, prev_bar = dif[-1] - dea[-1], dif[-2] - dea[-2]
+        return -config.macd.zero_axis_range < bar < config.macd.zero_axis_range and bar > prev_bar
+    if strategy_name == 'TRIPLE_CROSS':
+        return dif[-2] < dea[-2] and dif[-1] > dea[-1] and dea[-1] < config.macd.dea_threshold
+    if strategy_name == 'PRE_CROSS':
+        k, d, j = tail['k'], tail['d'], tail['j']
+        return j[-1] > k[-1] > d[-1] and k[-1] > k[-2] and dif[-1] < dea[-1]
+    return True
+
+
+def evaluate_signal(state: dict, strategy_name: str, config=None):
+    """
+    在最近几行上判断策略在最新一根K线的信号，与对完整历史调用 strategies.apply_* 的最后一个值一致
+
+    Returns:
+        MACD_ZERO_AXIS 返回 ''/'PRE'/'MID'/'POST'，其余策略返回 bool
+    """
+    config = config or strategies.get_strategy_config(strategy_name)
+    if not _may_signal(state['tail'], strategy_name, config):
+        return '' if strategy_name == 'MACD_ZERO_AXIS' else False
+    tail = state_frame(state)
+    if strategy_name == 'MACD_ZERO_AXIS':
+        return strategies.macd_zero_axis_signals(tail['dif'], tail['dea'], config).iloc[-1]
+    rsi_short, rsi_long = tail[f'rsi{config.rsi.period_short}'], tail[f'rsi{config.rsi.period_long}']
+    if strategy_name == 'TRIPLE_CROSS':
+        signals = strategies.triple_cross_signals(tail['dif'], tail['dea'], tail['k'], tail['d'],
+                                                  rsi_short, rsi_long, config)
+    elif strategy_name == 'PRE_CROSS':
+        signals = strategies.pre_cross_signals(tail['dif'], tail['dea'], tail['k'], tail['d'], tail['j'],
+                                               rsi_short, config)
+    else:
+        raise ValueError(f"策略 {strategy_name} 不支持增量判断")
+    return bool(signals.iloc[-1])
+
+
+# --- 读取新K线 ---
+
+def read_new_bars(source, state: dict, stock_code: str = None) -> Tuple[Optional[pd.DataFrame], Optional[int]]:
+    """
+    读取状态之后新增的K线
+
+    Returns:
+        (新K线DataFrame, 已读取到的.day文件字节数)；数据源与状态不一致（文件被截断、历史被改写）时为 (None, None)
+    """
+    last_date = pd.Timestamp(state['last_date'])
+    if isinstance(source, StoreBarRef):
+        df = load_bar_source(source)
+        if df is None:
+            return None, None
+        pos = df.index.searchsorted(last_date)
+        if pos >= len(df) or df.index[pos] != last_date or df['close'].iloc[pos] != state['last_close']:
+            return None, None
+        return df.iloc[pos + 1:], None
+
+    consumed = state.get('source_size')
+    if consumed is None or consumed < RECORD_SIZE or os.path.getsize(source) < consumed:
+        return None, None
+    # 从上次处理的最后一条记录开始读，用它校验历史未被改写
+    start = consumed - consumed % RECORD_SIZE - RECORD_SIZE
+    with open(source, 'rb') as f:
+        f.seek(start)
+        buffer = f.read()
+    tail_df = data_loader.decode_day_records(buffer, stock_code)
+    if tail_df is None or tail_df.index[0] != last_date or tail_df['close'].iloc[0] != state['last_close']:
+        return None, None
+    return tail_df.iloc[1:], start + len(buffer) - len(buffer) % RECORD_SIZE
+
+
+# --- 持久化 ---
+
+def _market_from_symbol(symbol: str) -> str:
+    return 'ds' if '#' in symbol else symbol[:2]
+
+
+class IndicatorStateStore:
+    """按市场分库保存增量指标状态（symbol + 参数 → 状态JSON）"""
+
+    def __init__(self, store_dir: str = None):
+        self.store_dir = store_dir or INDICATOR_STATE_PATH
+        self._connections: Dict[str, sqlite3.Connection] = {}
+        self._lock = threading.RLock()
+
+    def _connect(self, market: str) -> sqlite3.Connection:
+        conn = self._connections.get(market)
+        if conn is None:
+            os.makedirs(self.store_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.store_dir, f'{market}.sqlite'),
+                                   timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS states (
+                symbol TEXT NOT NULL,
+                params TEXT NOT NULL,
+                state TEXT NOT NULL,
+                PRIMARY KEY (symbol, params))''')
+            conn.commit()
+            self._connections[market] = conn
+        return conn
+
+    def get(self, symbol: str, params: IndicatorParams) -> Optional[dict]:
+        with self._lock:
+            row = self._connect(_market_from_symbol(symbol)).execute(
+                'SELECT state FROM states WHERE symbol = ? AND params = ?', (symbol, params.key())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_many(self, items: List[Tuple[str, dict]]):
+        """批量写入 [(symbol, state)]"""
+        by_market: Dict[str, list] = {}
+        for symbol, state in items:
+            by_market.setdefault(_market_from_symbol(symbol), []).append(
+                (symbol, state['params'], json.dumps(state)))
+        with self._lock:
+            for market, rows in by_market.items():
+                conn = self._connect(market)
+                with conn:
+                    conn.executemany('INSERT OR REPLACE INTO states (symbol, params, state) VALUES (?, ?, ?)', rows)
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
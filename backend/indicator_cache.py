@@ -0,0 +1,166 @@
+"""
+共享指标缓存 - 同一份K线数据的MACD/KDJ/RSI只计算一次
+键为 (数据指纹, 指标名, 参数, 复权方式)。数据指纹由索引和OHLCV列的内容哈希得到，
+因此向DataFrame追加指标列不影响命中，而价格数据发生变化（如复权）会自动失效。
+缓存按条目数和结果占用的字节数淘汰；全市场筛选每只股票只处理一次，
+处理完一只股票后用 scope() 释放该股票的条目，避免缓存随股票数增长。
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .config import INDICATOR_CACHE_MAX_ENTRIES, INDICATOR_CACHE_MAX_BYTES
+except ImportError:
+    from config import INDICATOR_CACHE_MAX_ENTRIES, INDICATOR_CACHE_MAX_BYTES
+
+FINGERPRINT_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    """计算DataFrame价格数据的内容指纹"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(len(df)).encode())
+    index = df.index
+    if isinstance(index, pd.DatetimeIndex):
+        h.update(np.ascontiguousarray(index.asi8).tobytes())
+    else:
+        h.update(pd.util.hash_pandas_object(index, index=False).to_numpy().tobytes())
+    for col in FINGERPRINT_COLUMNS:
+        if col in df.columns:
+            h.update(col.encode())
+            h.update(np.ascontiguousarray(df[col].to_numpy(dtype=float)).tobytes())
+    return h.hexdigest()
+
+
+def _copy_result(result):
+    """返回结果的副本，避免调用方原地修改污染缓存"""
+    if isinstance(result, (pd.Series, pd.DataFrame)):
+        return result.copy()
+    if isinstance(result, tuple):
+        return tuple(_copy_result(item) for item in result)
+    if isinstance(result, dict):
+        return {key: _copy_result(value) for key, value in result.items()}
+    return result
+
+
+def _result_bytes(result) -> int:
+    """估算缓存结果占用的字节数（只计数值，不计共享的索引）"""
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(index=False).sum())
+    if isinstance(result, pd.Series):
+        return int(result.memory_usage(index=False))
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    if isinstance(result, (tuple, list)):
+        return sum(_result_bytes(item) for item in result)
+    if isinstance(result, dict):
+        return sum(_result_bytes(value) for value in result.values())
+    return 0
+
+
+class IndicatorCache:
+    """线程安全的LRU指标缓存，按条目数与字节数淘汰，带命中/未命中计数"""
+
+    def __init__(self, max_entries: int = INDICATOR_CACHE_MAX_ENTRIES,
+                 max_bytes: int = INDICATOR_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, df: pd.DataFrame, indicator: str, params: Hashable,
+                       adjustment: Optional[str], compute: Callable[[], Any], copy: bool = True):
+        """
+        命中则返回缓存结果，否则调用 compute() 计算并缓存
+        copy=False 时直接返回缓存对象本身，调用方必须保证只读
+        """
+        if not self.enabled:
+            return compute()
+
+        key = (data_fingerprint(df), indicator, params, adjustment or 'none')
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                cached = self._entries[key]
+                return _copy_result(cached) if copy else cached
+            self.misses += 1
+
+        result = compute()
+        size = _result_bytes(result)
+        if size > self.max_bytes:
+            return result  # 单个结果超过上限时不缓存
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._sizes[key]
+            self._entries[key] = _copy_result(result) if copy else result
+            self._sizes[key] = size
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(evicted)
+        return result
+
+    def release(self):
+        """释放全部条目，保留命中/未命中计数"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    @contextmanager
+    def scope(self):
+        """在 with 块结束时释放条目，用于逐只股票处理、结果不会再被复用的场景"""
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+# 进程级共享实例（多进程筛选时每个worker各有一份）
+indicator_cache = IndicatorCache()
+
+
+def get_indicator_cache() -> IndicatorCache:
+    return indicator_cache
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    return indicator_cache.stats()
+
+
+def clear_indicator_cache():
+    indicator_cache.clear()
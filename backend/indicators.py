@@ -14,6 +14,11 @@ try:
 except ImportError:
     from adjustment_processor import AdjustmentProcessor, AdjustmentConfig, create_adjustment_config
 
+try:
+    from .indicator_cache import indicator_cache
+except ImportError:
+    from indicator_cache import indicator_cache
+
 @dataclass
 class IndicatorConfig:
     """指标配置基类"""
@@ -96,6 +101,27 @@ def calculate_volume_ma(df: pd.DataFrame, config: Optional[VolumeIndicatorConfig
     else:  # sma
         return df['volume'].rolling(window=config.ma_period).mean()
 
+def _adjustment_key(adjustment_config: Optional[AdjustmentConfig], stock_code: Optional[str]) -> Optional[str]:
+    """指标缓存键中的复权部分：复权结果依赖股票代码（复权因子），需一并区分"""
+    if adjustment_config is None:
+        return None
+    return f"{adjustment_config.adjustment_type}:{stock_code or ''}"
+
+def _get_working_df(df: pd.DataFrame, adjustment_config: Optional[AdjustmentConfig],
+                    stock_code: Optional[str]) -> pd.DataFrame:
+    """
+    获取指标计算用的数据
+    指标函数只读取价格列，不复权时直接返回原DataFrame；
+    复权时按 (数据指纹, 复权方式, 股票) 缓存复权后的DataFrame，同一只股票的多个指标共用一份
+    """
+    if adjustment_config is None or adjustment_config.adjustment_type == 'none':
+        return df
+    return indicator_cache.get_or_compute(
+        df, 'adjusted_frame', (), _adjustment_key(adjustment_config, stock_code),
+        lambda: AdjustmentProcessor(adjustment_config).process_data(df, stock_code),
+        copy=False
+    )
+
 def calculate_macd(df: pd.DataFrame, 
                   fast: Optional[int] = None, 
                   slow: Optional[int] = None, 
@@ -126,11 +152,14 @@ def calculate_macd(df: pd.DataFrame,
         price_type = config.price_type
         adjustment_config = config.adjustment_config
     
-    # 应用复权处理
-    working_df = df.copy()
-    if adjustment_config is not None:
-        processor = AdjustmentProcessor(adjustment_config)
-        working_df = processor.process_data(working_df, stock_code)
+    return indicator_cache.get_or_compute(
+        df, 'macd', (fast, slow, signal, price_type), _adjustment_key(adjustment_config, stock_code),
+        lambda: _compute_macd(df, fast, slow, signal, price_type, adjustment_config, stock_code)
+    )
+
+def _compute_macd(df, fast, slow, signal, price_type, adjustment_config, stock_code):
+    # 应用复权处理（无复权时直接读取原数据的列，不复制）
+    working_df = _get_working_df(df, adjustment_config, stock_code)
     
     # 获取价格序列
     price = get_price_series(working_df, price_type)
@@ -173,18 +202,14 @@ def calculate_kdj(df: pd.DataFrame,
         smoothing_method = config.smoothing_method
         adjustment_config = config.adjustment_config
     
-    # 应用复权处理
-    working_df = df.copy()
-    if adjustment_config is not None:
-        processor = AdjustmentProcessor(adjustment_config)
-        working_df = processor.process_data(working_df, stock_code)
-        
-        # 记录复权信息（用于调试）
-        if stock_code:
-            adj_info = processor.get_adjustment_info(df, working_df)
-            #print(f"📊 KDJ复权处理 {stock_code}: {adj_info['adjustment_type']}, "
-             #     f"调整次数: {adj_info['adjustments_applied']}, "
-              #    f"价格比例: {adj_info['price_change_ratio']:.4f}")
+    return indicator_cache.get_or_compute(
+        df, 'kdj', (n, k_period, d_period, smoothing_method), _adjustment_key(adjustment_config, stock_code),
+        lambda: _compute_kdj(df, n, k_period, d_period, smoothing_method, adjustment_config, stock_code)
+    )
+
+def _compute_kdj(df, n, k_period, d_period, smoothing_method, adjustment_config, stock_code):
+    # 应用复权处理（无复权时直接读取原数据的列，不复制）
+    working_df = _get_working_df(df, adjustment_config, stock_code)
     
     # 计算RSV
     low_n = working_df['low'].rolling(window=n).min()
@@ -235,11 +260,14 @@ def calculate_rsi(df: pd.DataFrame,
         smoothing_method = config.smoothing_method
         adjustment_config = config.adjustment_config
     
-    # 应用复权处理
-    working_df = df.copy()
-    if adjustment_config is not None:
-        processor = AdjustmentProcessor(adjustment_config)
-        working_df = processor.process_data(working_df, stock_code)
+    return indicator_cache.get_or_compute(
+        df, 'rsi', (period, price_type, smoothing_method), _adjustment_key(adjustment_config, stock_code),
+        lambda: _compute_rsi(df, period, price_type, smoothing_method, adjustment_config, stock_code)
+    )
+
+def _compute_rsi(df, period, price_type, smoothing_method, adjustment_config, stock_code):
+    # 应用复权处理（无复权时直接读取原数据的列，不复制）
+    working_df = _get_working_df(df, adjustment_config, stock_code)
     
     # 获取价格序列
     price = get_price_series(working_df, price_type)
@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场列式K线仓库
+功能：
+1. 将一个市场下所有股票的日线打包进单个列式文件（<market>.bars），
+   配合symbol→区段索引（<market>.json），整个市场只需一次mmap
+2. sync命令按源文件mtime/size增量追加新K线，无需重读整个历史
+3. 为各筛选器提供统一的数据源抽象：.day文件路径或仓库引用
+
+文件布局：
+- <market>.bars 由若干"数据段"顺序组成，每个数据段包含N行，
+  按列连续存放 date/open/high/low/close/volume/amount，每列8字节；
+  压缩后写入新一代的数据文件 <market>.<代数>.bars，索引切换后再删除旧文件
+- <market>.json 记录当前数据文件名、数据段位置、每只股票所在的(段, 起始行, 行数)区段
+  以及源文件的mtime/size，用于判断增量
+"""
+
+import os
+import sys
+import glob
+import json
+import logging
+from typing import Dict, List, Optional, NamedTuple, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+
+import data_loader
+from config import BASE_PATH, MARKETS, BAR_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+# 列定义：所有列均为8字节，数据段内各列按8字节对齐，可直接在int64映射上做视图
+BAR_COLUMNS = [
+    ('date', np.dtype('<i8')),     # datetime64[ns]的整数表示
+    ('open', np.dtype('<f8')),
+    ('high', np.dtype('<f8')),
+    ('low', np.dtype('<f8')),
+    ('close', np.dtype('<f8')),
+    ('volume', np.dtype('<i8')),
+    ('amount', np.dtype('<f8')),
+]
+STORE_VERSION = 1
+RECORD_SIZE = 32
+# 单个数据段的最大行数，全量构建时分批落盘以控制内存
+SEGMENT_ROWS = 2_000_000
+# 数据段数量或失效行比例超过阈值时自动压缩
+MAX_SEGMENTS = 32
+MAX_DEAD_RATIO = 0.3
+
+
+class StoreBarRef(NamedTuple):
+    """仓库中单只股票的轻量引用，可安全地传给子进程"""
+    store_dir: str
+    market: str
+    symbol: str
+
+
+def _empty_index(market: str) -> Dict:
+    return {
+        'version': STORE_VERSION,
+        'market': market,
+        'generation': 0,
+        'data_file': f'{market}.bars',
+        'file_size': 0,
+        'segments': [],
+        'symbols': {},
+        'dead_rows': 0
+    }
+
+
+class MarketBarStore:
+    """全市场列式K线仓库"""
+
+    def __init__(self, store_dir: str = None, base_path: str = None):
+        """
+        Args:
+            store_dir: 仓库目录，默认 data/cache/bar_store
+            base_path: 通达信vipdoc目录，sync时从这里读取.day文件
+        """
+        self.store_dir = store_dir or BAR_STORE_PATH
+        self.base_path = base_path or BASE_PATH
+        os.makedirs(self.store_dir, exist_ok=True)
+
+        self._indexes: Dict[str, Dict] = {}
+        self._mmaps: Dict[str, np.memmap] = {}
+
+    # ------------------------------------------------------------------
+    # 路径与索引
+    # ------------------------------------------------------------------
+    def _data_path(self, market: str, index: Dict = None) -> str:
+        """索引对应的数据文件；旧版索引没有 data_file 字段时为 <market>.bars"""
+        if index is None:
+            index = self._load_index(market)
+        return os.path.join(self.store_dir, index.get('data_file') or f'{market}.bars')
+
+    def _index_path(self, market: str) -> str:
+        return os.path.join(self.store_dir, f'{market}.json')
+
+    def _load_index(self, market: str) -> Dict:
+        if market not in self._indexes:
+            index_path = self._index_path(market)
+            index = None
+            if os.path.exists(index_path):
+                try:
+                    with open(index_path, 'r', encoding='utf-8') as f:
+                        index = json.load(f)
+                    if index.get('version') != STORE_VERSION:
+                        logger.warning(f"仓库索引版本不匹配，将重建: {index_path}")
+                        index = None
+                except (json.JSONDecodeError, IOError) as e:
+                    logger.error(f"读取仓库索引失败，将重建 {index_path}: {e}")
+                    index = None
+            self._indexes[market] = index or _empty_index(market)
+        return self._indexes[market]
+
+    def _save_index(self, market: str, index: Dict):
+        """原子写入索引：先写临时文件再替换"""
+        index_path = self._index_path(market)
+        tmp_path = index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+        self._indexes[market] = index
+
+    def _get_mmap(self, market: str) -> Optional[np.memmap]:
+        index = self._load_index(market)
+        if index['file_size'] == 0:
+            return None
+        mm = self._mmaps.get(market)
+        if mm is None or mm.shape[0] * 8 != index['file_size']:
+            mm = np.memmap(self._data_path(market), dtype='<i8', mode='r',
+                           shape=(index['file_size'] // 8,))
+            self._mmaps[market] = mm
+        return mm
+
+    def close(self):
+        """释放所有内存映射"""
+        self._mmaps.clear()
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def markets(self) -> List[str]:
+        """仓库中已有数据的市场"""
+        return sorted(
+            os.path.basename(p)[:-len('.json')]
+            for p in glob.glob(os.path.join(self.store_dir, '*.json'))
+        )
+
+    def symbols(self, market: str) -> List[str]:
+        """某个市场中的全部股票代码"""
+        return sorted(self._load_index(market)['symbols'].keys())
+
+    def get_arrays(self, symbol: str, market: str = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        获取单只股票的列数组。只有一个区段时返回内存映射上的只读视图（零拷贝）。
+        """
+        market = market or _market_from_symbol(symbol)
+        index = self._load_index(market)
+        entry = index['symbols'].get(symbol)
+        if not entry or entry['rows'] == 0:
+            return None
+
+        mm = self._get_mmap(market)
+        if mm is None:
+            return None
+
+        pieces = {name: [] for name, _ in BAR_COLUMNS}
+        for seg_id, row_start, rows in entry['extents']:
+            segment = index['segments'][seg_id]
+            base = segment['offset'] // 8
+            for col_pos, (name, dtype) in enumerate(BAR_COLUMNS):
+                start = base + col_pos * segment['rows'] + row_start
+                pieces[name].append(mm[start:start + rows].view(dtype))
+
+        return {
+            name: parts[0] if len(parts) == 1 else np.concatenate(parts)
+            for name, parts in pieces.items()
+        }
+
+    def get_frame(self, symbol: str, market: str = None) -> Optional[pd.DataFrame]:
+        """获取单只股票的日线DataFrame，格式与 data_loader.get_daily_data 一致"""
+        arrays = self.get_arrays(symbol, market)
+        if arrays is None:
+            return None
+        index = pd.DatetimeIndex(arrays['date'].view('datetime64[ns]'), name='date')
+        return pd.DataFrame(
+            {name: arrays[name] for name, _ in BAR_COLUMNS if name != 'date'},
+            index=index
+        )
+
+    def iter_frames(self, market: str) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """按代码顺序遍历一个市场的全部股票"""
+        for symbol in self.symbols(market):
+            df = self.get_frame(symbol, market)
+            if df is not None:
+                yield symbol, df
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def _append_segments(self, market: str, index: Dict, chunks: List[Tuple[str, pd.DataFrame]],
+                         data_path: str = None):
+        """把若干 (symbol, df) 作为一个新数据段追加到数据文件末尾"""
+        rows = sum(len(df) for _, df in chunks)
+        if rows == 0:
+            return
+
+        seg_id = len(index['segments'])
+        offset = index['file_size']
+        data_path = data_path or self._data_path(market, index)
+
+        columns = {name: [] for name, _ in BAR_COLUMNS}
+        row_cursor = 0
+        for symbol, df in chunks:
+            columns['date'].append(df.index.values.astype('datetime64[ns]').view('<i8'))
+            for name, dtype in BAR_COLUMNS[1:]:
+                columns[name].append(df[name].to_numpy(dtype=dtype))
+            entry = index['symbols'][symbol]
+            entry['extents'].append([seg_id, row_cursor, len(df)])
+            entry['rows'] += len(df)
+            entry['last_date'] = int(columns['date'][-1][-1])
+            row_cursor += len(df)
+
+        # 截断到索引记录的大小，丢弃上次异常中断留下的尾部垃圾
+        mode = 'r+b' if os.path.exists(data_path) else 'wb'
+        with open(data_path, mode) as f:
+            f.truncate(offset)
+            f.seek(offset)
+            for name, dtype in BAR_COLUMNS:
+                f.write(np.concatenate(columns[name]).astype(dtype, copy=False).tobytes())
+
+        index['segments'].append({'offset': offset, 'rows': rows})
+        index['file_size'] = offset + rows * 8 * len(BAR_COLUMNS)
+
+    def _read_tail(self, file_path: str, symbol: str, start_byte: int) -> Optional[pd.DataFrame]:
+        with open(file_path, 'rb') as f:
+            f.seek(start_byte)
+            buffer = f.read()
+        return data_loader.decode_day_records(buffer, symbol)
+
+    def _last_row_matches(self, symbol: str, market: str, row: pd.Series) -> bool:
+        arrays = self.get_arrays(symbol, market)
+        if arrays is None:
+            return False
+        return all(
+            arrays[name][-1] == row[name]
+            for name, _ in BAR_COLUMNS if name != 'date'
+        )
+
+    def sync(self, markets: List[str] = None, verbose: bool = False) -> Dict[str, Dict[str, int]]:
+        """
+        增量同步：只追加各源文件自上次同步以来新增的K线。
+
+        - 源文件mtime和size均未变化：跳过
+        - 文件变大：从上次读到的最后一条记录开始读取尾部，最后一条与仓库一致时只追加新记录
+        - 其他情况（文件被截断、历史被改写）：整只股票重新载入，旧区段计为失效行
+        - 源文件已删除（退市等）：从索引中移除该股票，旧区段计为失效行
+
+        Returns:
+            每个市场的统计 {'files', 'skipped', 'appended', 'reloaded', 'removed', 'new_rows'}
+        """
+        markets = markets or MARKETS
+        stats = {}
+
+        for market in markets:
+            index = self._load_index(market)
+            market_stats = {'files': 0, 'skipped': 0, 'appended': 0, 'reloaded': 0, 'removed': 0, 'new_rows': 0}
+            pending: List[Tuple[str, pd.DataFrame]] = []
+            pending_rows = 0
+
+            lday_dir = os.path.join(self.base_path, market, 'lday')
+            files = sorted(glob.glob(os.path.join(lday_dir, '*.day')))
+            seen = set()
+            for file_path in files:
+                market_stats['files'] += 1
+                symbol = os.path.basename(file_path).split('.')[0]
+                seen.add(symbol)
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    continue
+
+                entry = index['symbols'].get(symbol)
+                if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                    market_stats['skipped'] += 1
+                    continue
+
+                new_df = None
+                if entry and entry['rows'] > 0 and st.st_size >= entry['size'] and entry['size'] >= RECORD_SIZE:
+                    tail_start = entry['size'] - entry['size'] % RECORD_SIZE - RECORD_SIZE
+                    tail_df = self._read_tail(file_path, symbol, tail_start)
+                    last_date = pd.Timestamp(entry['last_date'])
+                    if tail_df is not None and last_date in tail_df.index and \
+                            self._last_row_matches(symbol, market, tail_df.loc[last_date]):
+                        new_df = tail_df[tail_df.index > last_date]
+                        market_stats['appended'] += 1
+
+                if new_df is None:
+                    new_df = data_loader.get_daily_data(file_path, symbol)
+                    if entry:
+                        index['dead_rows'] += entry['rows']
+                        market_stats['reloaded'] += 1
+                    entry = {'extents': [], 'rows': 0, 'last_date': None}
+                    index['symbols'][symbol] = entry
+
+                entry['mtime_ns'] = st.st_mtime_ns
+                entry['size'] = st.st_size
+
+                if new_df is not None and not new_df.empty:
+                    pending.append((symbol, new_df))
+                    pending_rows += len(new_df)
+                    market_stats['new_rows'] += len(new_df)
+
+                if pending_rows >= SEGMENT_ROWS:
+                    self._append_segments(market, index, pending)
+                    pending, pending_rows = [], 0
+
+            self._append_segments(market, index, pending)
+
+            # 源文件已不存在的股票不再提供；lday目录本身不存在时（路径配置错误）不清空仓库
+            if os.path.isdir(lday_dir):
+                for symbol in [s for s in index['symbols'] if s not in seen]:
+                    index['dead_rows'] += index['symbols'].pop(symbol)['rows']
+                    market_stats['removed'] += 1
+
+            self._save_index(market, index)
+            self._mmaps.pop(market, None)
+
+            live_rows = sum(e['rows'] for e in index['symbols'].values())
+            if len(index['segments']) > MAX_SEGMENTS or \
+                    (live_rows and index['dead_rows'] / (live_rows + index['dead_rows']) > MAX_DEAD_RATIO):
+                self.compact(market)
+
+            stats[market] = market_stats
+            if verbose:
+                print(f"  {market}: 文件 {market_stats['files']}, 跳过 {market_stats['skipped']}, "
+                      f"追加 {market_stats['appended']}, 重载 {market_stats['reloaded']}, "
+                      f"移除 {market_stats['removed']}, 新增K线 {market_stats['new_rows']}")
+            logger.info(f"仓库同步完成 {market}: {market_stats}")
+
+        return stats
+
+    def compact(self, market: str):
+        """
+        重写数据文件，使每只股票在单个数据段内连续存放并回收失效行
+        新数据写入下一代数据文件，索引原子替换后才删除旧文件：
+        中途失败时旧索引仍指向完整的旧数据文件，不会读到错位的K线
+        """
+        index = self._load_index(market)
+        new_index = _empty_index(market)
+        new_index['generation'] = index.get('generation', 0) + 1
+        new_index['data_file'] = f"{market}.{new_index['generation']}.bars"
+        new_path = self._data_path(market, new_index)
+
+        # 在新一代数据文件上构建数据段
+        if os.path.exists(new_path):
+            os.remove(new_path)
+        pending, pending_rows = [], 0
+        for symbol in sorted(index['symbols']):
+            entry = index['symbols'][symbol]
+            new_index['symbols'][symbol] = {
+                'extents': [], 'rows': 0, 'last_date': None,
+                'mtime_ns': entry['mtime_ns'], 'size': entry['size']
+            }
+            df = self.get_frame(symbol, market)
+            if df is None:
+                continue
+            pending.append((symbol, df))
+            pending_rows += len(df)
+            if pending_rows >= SEGMENT_ROWS:
+                self._append_segments(market, new_index, pending, new_path)
+                pending, pending_rows = [], 0
+        self._append_segments(market, new_index, pending, new_path)
+
+        self._mmaps.pop(market, None)
+        self._save_index(market, new_index)
+        self._remove_stale_data(market)
+        logger.info(f"仓库压缩完成 {market}: {len(new_index['segments'])} 个数据段")
+
+    def _remove_stale_data(self, market: str):
+        """删除当前索引不再引用的数据文件（旧一代或中断的压缩留下的文件）"""
+        current = os.path.basename(self._data_path(market))
+        candidates = glob.glob(os.path.join(self.store_dir, f'{market}.bars')) + \
+            glob.glob(os.path.join(self.store_dir, f'{market}.*.bars'))
+        for path in candidates:
+            if os.path.basename(path) != current:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"删除旧数据文件失败 {path}: {e}")
+
+
+# ----------------------------------------------------------------------
+# 筛选器数据源抽象
+# ----------------------------------------------------------------------
+_worker_stores: Dict[str, MarketBarStore] = {}
+
+
+def _market_from_symbol(symbol: str) -> str:
+    return 'ds' if '#' in symbol else symbol[:2]
+
+
+def collect_bar_sources(markets: List[str] = None, base_path: str = None,
+                        use_store: bool = False, store_dir: str = None,
+                        sync_first: bool = True) -> List[tuple]:
+    """
+    收集筛选任务的数据源列表 [(source, market)]。
+
+    use_store为False时source为.day文件路径（原有行为）；
+    为True时先增量同步仓库，再返回 StoreBarRef，整个市场只需一次mmap。
+    """
+    markets = markets or MARKETS
+    base_path = base_path or BASE_PATH
+
+    if not use_store:
+        all_files = []
+        for market in markets:
+            files = glob.glob(os.path.join(base_path, market, 'lday', '*.day'))
+            all_files.extend([(f, market) for f in files])
+        return all_files
+
+    store = MarketBarStore(store_dir, base_path)
+    if sync_first:
+        store.sync(markets)
+    return [
+        (StoreBarRef(store.store_dir, market, symbol), market)
+        for market in markets
+        for symbol in store.symbols(market)
+    ]
+
+
+def iter_bar_sources(markets: List[str] = None, base_path: str = None,
+                     use_store: bool = False, store_dir: str = None,
+                     sync_first: bool = True) -> Iterator[tuple]:
+    """
+    collect_bar_sources 的惰性版本：边扫描目录边产出 (source, market)，
+    流式筛选时无需先收集整个市场的文件列表
+    """
+    markets = markets or MARKETS
+    base_path = base_path or BASE_PATH
+
+    if use_store:
+        yield from collect_bar_sources(markets, base_path, use_store=True,
+                                       store_dir=store_dir, sync_first=sync_first)
+        return
+
+    for market in markets:
+        lday_dir = os.path.join(base_path, market, 'lday')
+        if not os.path.isdir(lday_dir):
+            continue
+        with os.scandir(lday_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.day') and entry.is_file():
+                    yield entry.path, market
+
+
+def bar_source_code(source) -> str:
+    """从数据源中取出股票代码"""
+    if isinstance(source, StoreBarRef):
+        return source.symbol
+    return os.path.basename(source).split('.')[0]
+
+
+def load_bar_source(source, stock_code: str = None) -> Optional[pd.DataFrame]:
+    """加载数据源对应的日线DataFrame；子进程内按仓库目录复用同一个内存映射"""
+    if isinstance(source, StoreBarRef):
+        store = _worker_stores.get(source.store_dir)
+        if store is None:
+            store = MarketBarStore(source.store_dir)
+            _worker_stores[source.store_dir] = store
+        return store.get_frame(source.symbol, source.market)
+    return data_loader.get_daily_data(source, stock_code)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='全市场列式K线仓库')
+    parser.add_argument('command', choices=['sync', 'compact', 'info'], help='执行的操作')
+    parser.add_argument('--markets', nargs='+', default=MARKETS, help='市场列表')
+    parser.add_argument('--store-dir', default=BAR_STORE_PATH, help='仓库目录')
+    parser.add_argument('--base-path', default=BASE_PATH, help='通达信vipdoc目录')
+    args = parser.parse_args()
+
+    store = MarketBarStore(args.store_dir, args.base_path)
+    if args.command == 'sync':
+        print(f"🔄 同步K线仓库: {args.store_dir}")
+        store.sync(args.markets, verbose=True)
+    elif args.command == 'compact':
+        for market in args.markets:
+            store.compact(market)
+            print(f"✅ {market} 压缩完成")
+    else:
+        for market in args.markets:
+            index = store._load_index(market)
+            live_rows = sum(e['rows'] for e in index['symbols'].values())
+            print(f"{market}: {len(index['symbols'])} 只股票, {live_rows} 条K线, "
+                  f"{len(index['segments'])} 个数据段, 失效行 {index['dead_rows']}, "
+                  f"文件 {index['file_size'] / 1024 / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
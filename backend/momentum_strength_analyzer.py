@@ -14,7 +14,6 @@ from typing import Dict, List, Tuple, Optional
 import json
 import logging
 from dataclasses import dataclass, asdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -23,6 +22,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import data_loader
 import indicators
+from analysis_executor import AnalysisExecutor
 
 @dataclass
 class MomentumConfig:
@@ -505,19 +505,9 @@ class MomentumStrengthAnalyzer:
         """分析股票池"""
         self.logger.info(f"开始分析 {len(stock_list)} 只股票的强势程度")
         
-        results = []
-        
-        def analyze_single_stock(symbol):
-            return self.analyze_stock_strength(symbol)
-        
-        # 并行分析
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            futures = [executor.submit(analyze_single_stock, symbol) for symbol in stock_list]
-            
-            for future in as_completed(futures):
-                result = future.result()
-                if result is not None:
-                    results.append(result)
+        # 并行分析，结果按股票列表顺序返回
+        executor = AnalysisExecutor(self, logger=self.logger)
+        results = [result for result in executor.map('analyze_stock_strength', stock_list) if result is not None]
         
         # 按最终得分排序
         results.sort(key=lambda x: x.final_score, reverse=True)
@@ -19,6 +19,7 @@ sys.path.append(os.path.dirname(__file__))
 
 from multi_timeframe_data_manager import MultiTimeframeDataManager
 from multi_timeframe_signal_generator import MultiTimeframeSignalGenerator
+from portfolio_simulator import simulate_portfolio
 
 class MultiTimeframeBacktester:
     """多周期回测引擎"""
@@ -40,7 +41,9 @@ class MultiTimeframeBacktester:
             'stop_loss_pct': 0.08,      # 止损比例
             'take_profit_pct': 0.15,    # 止盈比例
             'min_hold_periods': 3,      # 最小持仓周期
-            'max_hold_periods': 50      # 最大持仓周期
+            'max_hold_periods': 50,     # 最大持仓周期
+            'entry_score_threshold': 0.3,      # 开仓所需的信号得分绝对值
+            'entry_confidence_threshold': 0.6  # 开仓所需的置信度
         }
         
         # 回测结果存储
@@ -115,12 +118,99 @@ class MultiTimeframeBacktester:
                               start_date: str, 
                               end_date: str,
                               strategy_types: List[str]) -> Dict:
-        """回测单只股票"""
+        """回测单只股票（单只股票独占账户的 simulate_portfolio）"""
+        try:
+            result = self.run_portfolio_backtest([stock_code], start_date, end_date, strategy_types)
+            if 'error' in result:
+                return result
+            
+            return {
+                'stock_code': stock_code,
+                'backtest_period': result['backtest_period'],
+                'final_capital': result['final_capital'],
+                'total_trades': result['total_trades'],
+                'performance_metrics': result['performance_metrics'],
+                'trades': result['trades'],
+                'equity_curve': result['equity_curve']
+            }
+            
+        except Exception as e:
+            self.logger.error(f"回测 {stock_code} 失败: {e}")
+            return {'error': str(e)}
+    
+    def run_portfolio_backtest(self, 
+                               stock_list: List[str], 
+                               start_date: str = None, 
+                               end_date: str = None,
+                               strategy_types: List[str] = None) -> Dict:
+        """
+        多只股票共用一个账户的按K线同步回测
+        各股票的信号与价格先对齐到所有股票时间轴的并集上，再由 simulate_portfolio 推进；
+        同一时点按 stock_list 的顺序处理各股票的开平仓
+        """
+        try:
+            stocks = []
+            for stock_code in stock_list:
+                historical_data = self._get_historical_data(stock_code, start_date, end_date)
+                if 'error' in historical_data:
+                    self.logger.warning(f"  {stock_code} 无历史数据: {historical_data['error']}")
+                    continue
+                time_index = self._get_unified_index(historical_data)
+                if len(time_index) == 0:
+                    continue
+                signals = self._precompute_signals(stock_code, time_index, historical_data, strategy_types)
+                stocks.append((stock_code, time_index, self._get_price_array(time_index, historical_data), signals))
+            
+            if not stocks:
+                return {'error': '没有可回测的股票数据'}
+            
+            # 所有股票时间轴的并集
+            times = stocks[0][1]
+            for _, time_index, _, _ in stocks[1:]:
+                times = times.union(time_index)
+            shape = (len(times), len(stocks))
+            prices = np.full(shape, np.nan)
+            scores = np.zeros(shape)
+            confidences = np.zeros(shape)
+            for column, (_, time_index, price_array, signals) in enumerate(stocks):
+                rows = times.get_indexer(time_index)
+                prices[rows, column] = price_array
+                scores[rows, column] = signals['final_score'].to_numpy()
+                confidences[rows, column] = signals['confidence_level'].to_numpy()
+            
+            stock_codes = [stock_code for stock_code, _, _, _ in stocks]
+            backtest_state = simulate_portfolio(times, prices, scores, confidences, stock_codes, self.backtest_config)
+            performance_metrics = self._calculate_performance_metrics(backtest_state)
+            
+            return {
+                'stock_list': stock_codes,
+                'backtest_period': {'start': start_date, 'end': end_date},
+                'final_capital': backtest_state['capital'],
+                'total_trades': len(backtest_state['trades']),
+                'performance_metrics': performance_metrics,
+                'open_positions': backtest_state['positions'],
+                'trades': backtest_state['trades'],
+                'equity_curve': backtest_state['equity_curve']
+            }
+            
+        except Exception as e:
+            self.logger.error(f"组合回测失败: {e}")
+            return {'error': str(e)}
+    
+    def _backtest_single_stock_reference(self, 
+                                        stock_code: str, 
+                                        start_date: str, 
+                                        end_date: str,
+                                        strategy_types: List[str]) -> Dict:
+        """逐时点循环回测单只股票（参考实现，simulate_portfolio 的结果与之逐笔一致）"""
         try:
             # 获取历史数据
             historical_data = self._get_historical_data(stock_code, start_date, end_date)
             if 'error' in historical_data:
                 return historical_data
+            historical_data['signals'] = self._precompute_signals(
+                stock_code, self._get_unified_index(historical_data), historical_data, strategy_types
+            )
             
             # 初始化回测状态
             backtest_state = {
@@ -205,23 +295,59 @@ class MultiTimeframeBacktester:
     
     def _get_unified_time_index(self, historical_data: Dict) -> List:
         """获取统一的时间索引"""
+        return self._get_unified_index(historical_data).tolist()
+    
+    def _get_unified_index(self, historical_data: Dict) -> pd.DatetimeIndex:
+        """回测时间轴：优先使用日线数据的时间索引，没有日线时使用其他周期"""
         try:
             # 使用日线数据的时间索引作为基准
             if '1day' in historical_data['timeframes']:
                 daily_data = historical_data['timeframes']['1day']
                 if daily_data is not None and not daily_data.empty:
-                    return daily_data.index.tolist()
+                    return daily_data.index
             
             # 如果没有日线数据，使用其他周期
             for timeframe, df in historical_data['timeframes'].items():
                 if df is not None and not df.empty:
-                    return df.index.tolist()
+                    return df.index
             
-            return []
+            return pd.DatetimeIndex([])
             
         except Exception as e:
             self.logger.error(f"获取统一时间索引失败: {e}")
-            return []
+            return pd.DatetimeIndex([])
+    
+    def _get_price_array(self, time_index: pd.DatetimeIndex, historical_data: Dict) -> np.ndarray:
+        """时间轴上各时点的收盘价，取值顺序与 _get_current_price 相同（先日线，再其他周期），无数据为NaN"""
+        prices = np.full(len(time_index), np.nan)
+        frames = historical_data['timeframes']
+        ordered = (['1day'] if '1day' in frames else []) + [tf for tf in frames if tf != '1day']
+        for timeframe in ordered:
+            df = frames[timeframe]
+            missing = np.isnan(prices)
+            if df is None or df.empty or not missing.any():
+                continue
+            df = df[~df.index.duplicated(keep='last')]
+            rows = df.index.get_indexer(time_index[missing])
+            found = rows >= 0
+            values = prices[missing]
+            values[found] = df['close'].to_numpy(dtype=float)[rows[found]]
+            prices[missing] = values
+        return prices
+    
+    def _precompute_signals(self, 
+                            stock_code: str, 
+                            time_index: pd.DatetimeIndex, 
+                            historical_data: Dict,
+                            strategy_types: List[str]) -> pd.DataFrame:
+        """
+        一次生成时间轴上所有时点的信号（final_score、confidence_level）
+        与原逐时点实现相同，这里仍是模拟信号，用于验证回测流程；替换为真实的历史信号时只需改写本方法
+        """
+        return pd.DataFrame({
+            'final_score': np.random.uniform(-0.5, 0.5, len(time_index)),
+            'confidence_level': np.random.uniform(0.3, 0.8, len(time_index))
+        }, index=time_index)
     
     def _generate_historical_signals(self, 
                                    stock_code: str, 
@@ -230,18 +356,15 @@ class MultiTimeframeBacktester:
                                    strategy_types: List[str]) -> Dict:
         """生成历史时点的信号"""
         try:
-            # 简化处理，直接使用当前信号生成逻辑，避免复杂的历史数据切片
-            # 在实际应用中，这里应该基于历史时点的数据生成信号
-            
-            # 为了避免时间比较问题，我们直接使用现有数据生成信号
-            # 这是一个简化的回测实现，主要用于验证系统架构
+            # 读取 _precompute_signals 预先生成的信号
+            signal_row = historical_data['signals'].loc[current_time]
             
             return {
                 'timestamp': current_time,
                 'composite_signal': {
-                    'final_score': np.random.uniform(-0.5, 0.5),  # 模拟信号
+                    'final_score': signal_row['final_score'],
                     'signal_strength': 'neutral',
-                    'confidence_level': np.random.uniform(0.3, 0.8)
+                    'confidence_level': signal_row['confidence_level']
                 },
                 'risk_assessment': {
                     'overall_risk_level': 'medium'
@@ -278,7 +401,8 @@ class MultiTimeframeBacktester:
             # 交易决策逻辑
             if not current_position:  # 无持仓
                 # 开仓条件
-                if abs(final_score) > 0.3 and confidence_level > 0.6:
+                if (abs(final_score) > self.backtest_config['entry_score_threshold'] and
+                        confidence_level > self.backtest_config['entry_confidence_threshold']):
                     self._open_position(
                         stock_code, current_time, current_price, 
                         final_score, backtest_state
@@ -17,14 +17,19 @@ from pathlib import Path
 # 添加backend目录到路径
 sys.path.append(os.path.dirname(__file__))
 
-import data_loader
 import indicators
+from timeframe_cube import get_shared_cube, TimeframeCube
 
 class MultiTimeframeDataManager:
     """多周期数据管理器"""
     
-    def __init__(self, cache_dir: str = "analysis_cache"):
-        """初始化多周期数据管理器"""
+    def __init__(self, cache_dir: str = "analysis_cache", base_path: Optional[str] = None,
+                 cube: Optional[TimeframeCube] = None):
+        """
+        初始化多周期数据管理器
+        各周期K线及同步数据/指标结果保存在 cube 中（默认进程内共享），
+        信号生成、监控、回测各自创建的管理器不会重复加载和重采样同一只股票
+        """
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         
@@ -50,9 +55,9 @@ class MultiTimeframeDataManager:
             '5min': 0.005    # 微调权重
         }
         
-        # 数据缓存
-        self.data_cache = {}
-        self.indicators_cache = {}
+        # 多周期K线缓存，数据文件变化时条目及其派生结果自动更新
+        self.base_path = base_path
+        self.cube = cube or get_shared_cube()
         
         # 日志设置
         self.logger = logging.getLogger(__name__)
@@ -63,20 +68,22 @@ class MultiTimeframeDataManager:
             timeframes = list(self.timeframes.keys())
         
         try:
-            self.logger.info(f"获取{stock_code}的多周期数据: {timeframes}")
-            
-            # 检查缓存
-            cache_key = f"{stock_code}_{'-'.join(timeframes)}"
-            if cache_key in self.data_cache:
-                cache_data = self.data_cache[cache_key]
-                if self._is_cache_valid(cache_data):
-                    return cache_data
+            entry = self.cube.get(stock_code, self.base_path)
+            if entry is None:
+                return {'error': f'无法获取{stock_code}的基础数据'}
             
-            # 获取基础数据
-            multi_data = data_loader.get_multi_timeframe_data(stock_code)
+            return self.cube.derived(entry, ('sync', tuple(timeframes)),
+                                     lambda: self._build_synchronized_data(stock_code, entry.frames, timeframes))
             
-            if not multi_data['data_status']['daily_available'] and not multi_data['data_status']['min5_available']:
-                return {'error': f'无法获取{stock_code}的基础数据'}
+        except Exception as e:
+            self.logger.error(f"获取{stock_code}多周期数据失败: {e}")
+            return {'error': str(e)}
+    
+    def _build_synchronized_data(self, stock_code: str, frames: Dict[str, pd.DataFrame],
+                                 timeframes: List[str]) -> Dict:
+        """由缓存的各周期K线构建同步数据集"""
+        try:
+            self.logger.info(f"获取{stock_code}的多周期数据: {timeframes}")
             
             # 构建多周期数据集
             synchronized_data = {
@@ -90,7 +97,7 @@ class MultiTimeframeDataManager:
             # 处理每个时间周期
             for timeframe in timeframes:
                 try:
-                    tf_data = self._get_timeframe_data(multi_data, timeframe)
+                    tf_data = frames.get(timeframe)
                     if tf_data is not None and not tf_data.empty:
                         # 数据质量检查
                         quality_info = self._check_data_quality(tf_data, timeframe)
@@ -111,47 +118,14 @@ class MultiTimeframeDataManager:
                 alignment_info = self._align_timeframes(synchronized_data['timeframes'])
                 synchronized_data['alignment_info'] = alignment_info
             
-            # 缓存结果
-            self.data_cache[cache_key] = synchronized_data
-            
             return synchronized_data
             
         except Exception as e:
             self.logger.error(f"获取{stock_code}多周期数据失败: {e}")
             return {'error': str(e)}
     
-    def _get_timeframe_data(self, multi_data: Dict, timeframe: str) -> Optional[pd.DataFrame]:
-        """获取指定时间周期的数据"""
-        try:
-            if timeframe == '1day':
-                # 日线数据
-                return multi_data.get('daily_data')
-            
-            elif timeframe == '5min':
-                # 5分钟数据
-                return multi_data.get('min5_data')
-            
-            elif timeframe == '1week':
-                # 周线数据需要从日线数据重采样
-                daily_data = multi_data.get('daily_data')
-                if daily_data is None or daily_data.empty:
-                    return None
-                return self._resample_data(daily_data, timeframe)
-            
-            else:
-                # 其他周期需要从5分钟数据重采样
-                min5_data = multi_data.get('min5_data')
-                if min5_data is None or min5_data.empty:
-                    return None
-                
-                return self._resample_data(min5_data, timeframe)
-                
-        except Exception as e:
-            self.logger.error(f"获取{timeframe}数据失败: {e}")
-            return None
-    
     def _resample_data(self, min5_data: pd.DataFrame, target_timeframe: str) -> pd.DataFrame:
-        """将5分钟数据重采样到目标时间周期"""
+        """将5分钟数据重采样到目标时间周期（逐周期的参考实现，cube 中的聚合结果与之一致）"""
         try:
             freq = self.timeframes[target_timeframe]['freq']
             
@@ -351,13 +325,20 @@ class MultiTimeframeDataManager:
             if timeframes is None:
                 timeframes = list(self.timeframes.keys())
             
-            # 检查指标缓存
-            cache_key = f"{stock_code}_indicators_{'-'.join(timeframes)}"
-            if cache_key in self.indicators_cache:
-                cache_data = self.indicators_cache[cache_key]
-                if self._is_cache_valid(cache_data):
-                    return cache_data
+            entry = self.cube.get(stock_code, self.base_path)
+            if entry is None:
+                return {'error': f'无法获取{stock_code}的基础数据'}
             
+            return self.cube.derived(entry, ('indicators', tuple(timeframes)),
+                                     lambda: self._build_indicators(stock_code, timeframes))
+            
+        except Exception as e:
+            self.logger.error(f"计算{stock_code}多周期指标失败: {e}")
+            return {'error': str(e)}
+    
+    def _build_indicators(self, stock_code: str, timeframes: List[str]) -> Dict:
+        """计算各周期指标及跨周期分析"""
+        try:
             # 获取多周期数据
             sync_data = self.get_synchronized_data(stock_code, timeframes)
             if 'error' in sync_data:
@@ -391,9 +372,6 @@ class MultiTimeframeDataManager:
                 cross_analysis = self._analyze_cross_timeframe_patterns(indicators_result['timeframes'])
                 indicators_result['cross_timeframe_analysis'] = cross_analysis
             
-            # 缓存结果
-            self.indicators_cache[cache_key] = indicators_result
-            
             return indicators_result
             
         except Exception as e:
@@ -663,31 +641,15 @@ class MultiTimeframeDataManager:
             self.logger.error(f"跨周期分析失败: {e}")
             return {'error': str(e)}
     
-    def _is_cache_valid(self, cache_data: Dict, max_age_minutes: int = 30) -> bool:
-        """检查缓存是否有效"""
-        try:
-            if 'last_update' not in cache_data:
-                return False
-            
-            last_update = datetime.fromisoformat(cache_data['last_update'])
-            age = datetime.now() - last_update
-            
-            return age.total_seconds() < max_age_minutes * 60
-            
-        except:
-            return False
-    
     def clear_cache(self):
-        """清空缓存"""
-        self.data_cache.clear()
-        self.indicators_cache.clear()
+        """清空缓存（共享的 cube 对所有管理器生效）"""
+        self.cube.clear()
         self.logger.info("缓存已清空")
     
     def get_cache_info(self) -> Dict:
         """获取缓存信息"""
         return {
-            'data_cache_size': len(self.data_cache),
-            'indicators_cache_size': len(self.indicators_cache),
+            'cube': self.cube.stats(),
             'supported_timeframes': list(self.timeframes.keys()),
             'timeframe_weights': self.timeframe_weights
         }
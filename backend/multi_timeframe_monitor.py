@@ -11,6 +11,8 @@ import pandas as pd
 import numpy as np
 import threading
 import time
+import bisect
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Callable
 import logging
@@ -23,6 +25,56 @@ sys.path.append(os.path.dirname(__file__))
 from multi_timeframe_data_manager import MultiTimeframeDataManager
 from multi_timeframe_signal_generator import MultiTimeframeSignalGenerator
 from notification_system import NotificationSystem
+from response_cache import file_signature
+from timeframe_cube import source_files
+
+# 单只股票刷新耗时直方图的桶上界（秒），超过最后一个上界的计入溢出桶
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """单只股票的信号刷新耗时分布"""
+    
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+    
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+    
+    def quantile(self, q: float) -> float:
+        """按桶估计分位数（取所在桶的上界，溢出桶取最大值）"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+    
+    def to_dict(self) -> Dict:
+        buckets = {f'<={bound}s': count for bound, count in zip(self.bounds, self.counts)}
+        buckets[f'>{self.bounds[-1]}s'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'avg': self.total / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': self.max,
+            'last': self.last,
+            'buckets': buckets
+        }
+
 
 class MultiTimeframeMonitor:
     """多周期实时监控器"""
@@ -43,13 +95,23 @@ class MultiTimeframeMonitor:
             'max_stocks': 100,      # 最大监控股票数
             'alert_cooldown': 300,  # 预警冷却时间（秒）
             'history_length': 1000, # 历史记录长度
-            'auto_cleanup': True    # 自动清理过期数据
+            'auto_cleanup': True,   # 自动清理过期数据
+            'max_workers': 4,       # 同时刷新信号的最大股票数
+            'spread_ratio': 0.5     # 需要刷新的股票在更新间隔的前这一比例内均匀提交，避免集中刷新
         }
         
         # 监控状态
         self.monitored_stocks = set()
         self.monitoring_active = False
         self.monitor_thread = None
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        # 信号历史、预警历史与冷却时间由刷新线程和监控线程共同读写
+        self._alert_lock = threading.RLock()
+        
+        # 上次成功刷新时数据文件（.day/.lc5）的签名，文件未变化的股票不重新计算
+        self.data_signatures = {}
+        self.latency_histograms = defaultdict(LatencyHistogram)
         
         # 数据存储
         self.signal_history = defaultdict(lambda: deque(maxlen=self.monitoring_config['history_length']))
@@ -87,7 +149,9 @@ class MultiTimeframeMonitor:
             'total_alerts': 0,
             'successful_signals': 0,
             'failed_signals': 0,
-            'avg_update_time': 0.0
+            'skipped_signals': 0,
+            'avg_update_time': 0.0,
+            'last_cycle': {}
         }
         
         self.logger = logging.getLogger(__name__)
@@ -124,12 +188,12 @@ class MultiTimeframeMonitor:
                 self.monitored_stocks.remove(stock_code)
                 
                 # 清理历史数据
-                if stock_code in self.signal_history:
-                    del self.signal_history[stock_code]
-                if stock_code in self.alert_history:
-                    del self.alert_history[stock_code]
-                if stock_code in self.last_alerts:
-                    del self.last_alerts[stock_code]
+                with self._alert_lock:
+                    self.signal_history.pop(stock_code, None)
+                    self.alert_history.pop(stock_code, None)
+                    self.last_alerts.pop(stock_code, None)
+                self.data_signatures.pop(stock_code, None)
+                self.latency_histograms.pop(stock_code, None)
                 
                 self.logger.info(f"从监控列表移除 {stock_code}")
                 return True
@@ -152,6 +216,7 @@ class MultiTimeframeMonitor:
                 return False
             
             self.monitoring_active = True
+            self._stop_event.clear()
             self.monitoring_stats['start_time'] = datetime.now()
             
             # 启动监控线程
@@ -173,6 +238,7 @@ class MultiTimeframeMonitor:
                 return True
             
             self.monitoring_active = False
+            self._stop_event.set()
             
             # 等待监控线程结束
             if self.monitor_thread and self.monitor_thread.is_alive():
@@ -195,70 +261,133 @@ class MultiTimeframeMonitor:
         while self.monitoring_active:
             try:
                 loop_start_time = time.time()
+                update_interval = self.monitoring_config['update_interval']
                 
-                # 更新所有监控股票的信号
-                self._update_all_signals()
+                # 更新数据有变化的股票的信号，提交时间分散在间隔内
+                self._update_all_signals(spread_over=update_interval * self.monitoring_config['spread_ratio'])
                 
                 # 检查预警条件
                 self._check_alert_conditions()
                 
                 # 更新统计信息
                 loop_duration = time.time() - loop_start_time
-                self.monitoring_stats['total_updates'] += 1
-                self.monitoring_stats['avg_update_time'] = (
-                    (self.monitoring_stats['avg_update_time'] * (self.monitoring_stats['total_updates'] - 1) + loop_duration) /
-                    self.monitoring_stats['total_updates']
-                )
+                with self._stats_lock:
+                    self.monitoring_stats['total_updates'] += 1
+                    self.monitoring_stats['avg_update_time'] = (
+                        (self.monitoring_stats['avg_update_time'] * (self.monitoring_stats['total_updates'] - 1) + loop_duration) /
+                        self.monitoring_stats['total_updates']
+                    )
                 
                 # 自动清理过期数据
                 if self.monitoring_config['auto_cleanup']:
                     self._cleanup_expired_data()
                 
-                # 等待下次更新
-                time.sleep(self.monitoring_config['update_interval'])
+                # 等待到本轮间隔结束，停止监控时立即返回
+                self._stop_event.wait(max(0.0, update_interval - loop_duration))
                 
             except Exception as e:
                 self.logger.error(f"监控循环错误: {e}")
-                time.sleep(5)  # 错误后短暂等待
+                self._stop_event.wait(5)  # 错误后短暂等待
     
-    def _update_all_signals(self):
-        """更新所有监控股票的信号"""
-        for stock_code in list(self.monitored_stocks):  # 使用list避免迭代时修改
+    def _update_all_signals(self, spread_over: float = 0.0, force: bool = False) -> Dict:
+        """
+        更新监控股票的信号
+        只刷新数据文件签名（mtime、大小）与上次成功刷新时不同的股票，force=True 时全部刷新；
+        刷新在最多 max_workers 个线程中并发执行，spread_over > 0 时各股票的提交时间在这段时间内均匀分布
+        """
+        stocks = list(self.monitored_stocks)  # 使用list避免迭代时修改
+        due = {}
+        for stock_code in stocks:
             try:
-                self._update_stock_signal(stock_code)
+                signature = self._data_signature(stock_code)
             except Exception as e:
-                self.logger.error(f"更新 {stock_code} 信号失败: {e}")
+                self.logger.error(f"读取 {stock_code} 数据文件状态失败: {e}")
+                signature = None
+            if force or signature is None or self.data_signatures.get(stock_code) != signature:
+                due[stock_code] = signature
+        
+        cycle_start = time.time()
+        refreshed = 0
+        if due:
+            spacing = spread_over / len(due) if spread_over > 0 else 0.0
+            max_workers = max(1, min(self.monitoring_config['max_workers'], len(due)))
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mtf-monitor') as executor:
+                futures = {}
+                for i, stock_code in enumerate(due):
+                    if i and spacing and self._stop_event.wait(spacing):
+                        break
+                    futures[executor.submit(self._timed_update, stock_code)] = stock_code
+                for future in as_completed(futures):
+                    stock_code = futures[future]
+                    if future.result():
+                        refreshed += 1
+                        if due[stock_code] is not None:
+                            self.data_signatures[stock_code] = due[stock_code]
+        
+        cycle = {
+            'time': datetime.now().isoformat(),
+            'monitored': len(stocks),
+            'due': len(due),
+            'refreshed': refreshed,
+            'skipped': len(stocks) - len(due),
+            'duration': time.time() - cycle_start
+        }
+        with self._stats_lock:
+            self.monitoring_stats['skipped_signals'] += cycle['skipped']
+            self.monitoring_stats['last_cycle'] = cycle
+        return cycle
+    
+    def _data_signature(self, stock_code: str):
+        """股票日线与5分钟线文件的签名"""
+        return file_signature(source_files(stock_code, getattr(self.data_manager, 'base_path', None)))
+    
+    def _timed_update(self, stock_code: str) -> bool:
+        """刷新单个股票并记录耗时"""
+        start = time.perf_counter()
+        try:
+            success = self._update_stock_signal(stock_code)
+        except Exception as e:
+            self.logger.error(f"更新 {stock_code} 信号失败: {e}")
+            success = False
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.latency_histograms[stock_code].observe(elapsed)
+            self.monitoring_stats['successful_signals' if success else 'failed_signals'] += 1
+        return success
     
-    def _update_stock_signal(self, stock_code: str):
-        """更新单个股票的信号"""
+    def _update_stock_signal(self, stock_code: str) -> bool:
+        """更新单个股票的信号，成功时返回True"""
         try:
             # 生成最新信号
             signal_result = self.signal_generator.generate_composite_signals(stock_code)
             
             if 'error' in signal_result:
                 self.logger.warning(f"{stock_code} 信号生成失败: {signal_result['error']}")
-                return
+                return False
             
             # 添加时间戳
             signal_result['timestamp'] = datetime.now().isoformat()
             
             # 存储到历史记录
-            self.signal_history[stock_code].append(signal_result)
+            with self._alert_lock:
+                self.signal_history[stock_code].append(signal_result)
             
             # 检查信号变化
             self._analyze_signal_changes(stock_code, signal_result)
+            return True
             
         except Exception as e:
             self.logger.error(f"更新 {stock_code} 信号失败: {e}")
+            return False
     
     def _analyze_signal_changes(self, stock_code: str, current_signal: Dict):
         """分析信号变化"""
         try:
-            history = self.signal_history[stock_code]
-            if len(history) < 2:
-                return
-            
-            previous_signal = history[-2]
+            with self._alert_lock:
+                history = self.signal_history.get(stock_code)
+                if history is None or len(history) < 2:
+                    return
+                previous_signal = history[-2]
             
             # 比较信号强度变化
             current_strength = current_signal.get('composite_signal', {}).get('signal_strength', 'neutral')
@@ -296,43 +425,48 @@ class MultiTimeframeMonitor:
     def _check_stock_alerts(self, stock_code: str):
         """检查单个股票的预警条件"""
         try:
-            history = self.signal_history[stock_code]
-            if len(history) == 0:
-                return
-            
-            current_signal = history[-1]
-            
-            # 检查冷却时间
-            if self._is_in_cooldown(stock_code):
-                return
-            
-            alerts_triggered = []
-            
-            # 1. 检查信号收敛预警
-            if self.alert_conditions['signal_convergence']['enabled']:
-                convergence_alert = self._check_signal_convergence(stock_code, current_signal)
-                if convergence_alert:
-                    alerts_triggered.append(convergence_alert)
-            
-            # 2. 检查趋势变化预警
-            if self.alert_conditions['trend_change']['enabled']:
-                trend_alert = self._check_trend_change(stock_code, current_signal)
-                if trend_alert:
-                    alerts_triggered.append(trend_alert)
-            
-            # 3. 检查突破预警
-            if self.alert_conditions['breakout']['enabled']:
-                breakout_alert = self._check_breakout(stock_code, current_signal)
-                if breakout_alert:
-                    alerts_triggered.append(breakout_alert)
-            
-            # 4. 检查风险等级变化预警
-            if self.alert_conditions['risk_level_change']['enabled']:
-                risk_alert = self._check_risk_level_change(stock_code, current_signal)
-                if risk_alert:
-                    alerts_triggered.append(risk_alert)
-            
-            # 发送预警
+            # 读取历史、判断冷却与记录预警在同一把锁内完成，刷新线程追加信号时不会交错
+            with self._alert_lock:
+                history = self.signal_history.get(stock_code)
+                if not history:
+                    return
+                
+                current_signal = history[-1]
+                
+                # 检查冷却时间
+                if self._is_in_cooldown(stock_code):
+                    return
+                
+                alerts_triggered = []
+                
+                # 1. 检查信号收敛预警
+                if self.alert_conditions['signal_convergence']['enabled']:
+                    convergence_alert = self._check_signal_convergence(stock_code, current_signal)
+                    if convergence_alert:
+                        alerts_triggered.append(convergence_alert)
+                
+                # 2. 检查趋势变化预警
+                if self.alert_conditions['trend_change']['enabled']:
+                    trend_alert = self._check_trend_change(stock_code, current_signal)
+                    if trend_alert:
+                        alerts_triggered.append(trend_alert)
+                
+                # 3. 检查突破预警
+                if self.alert_conditions['breakout']['enabled']:
+                    breakout_alert = self._check_breakout(stock_code, current_signal)
+                    if breakout_alert:
+                        alerts_triggered.append(breakout_alert)
+                
+                # 4. 检查风险等级变化预警
+                if self.alert_conditions['risk_level_change']['enabled']:
+                    risk_alert = self._check_risk_level_change(stock_code, current_signal)
+                    if risk_alert:
+                        alerts_triggered.append(risk_alert)
+                
+                for alert in alerts_triggered:
+                    self._record_alert(stock_code, alert)
+            
+            # 发送预警（通知在锁外发送）
             for alert in alerts_triggered:
                 self._send_alert(stock_code, alert)
             
@@ -480,9 +614,9 @@ class MultiTimeframeMonitor:
         
         return (datetime.now() - last_alert_time).total_seconds() < cooldown_period
     
-    def _send_alert(self, stock_code: str, alert: Dict):
-        """发送预警"""
-        try:
+    def _record_alert(self, stock_code: str, alert: Dict):
+        """记录预警时间、预警历史与统计"""
+        with self._alert_lock:
             # 记录预警时间
             self.last_alerts[stock_code] = datetime.now()
             
@@ -493,10 +627,14 @@ class MultiTimeframeMonitor:
                 'alert': alert
             }
             self.alert_history[stock_code].append(alert_record)
-            
-            # 更新统计
+        
+        # 更新统计
+        with self._stats_lock:
             self.monitoring_stats['total_alerts'] += 1
-            
+    
+    def _send_alert(self, stock_code: str, alert: Dict):
+        """发送预警（预警已由 _record_alert 记录）"""
+        try:
             # 构建通知消息
             message = f"【{stock_code}】{alert['message']}"
             
@@ -522,31 +660,40 @@ class MultiTimeframeMonitor:
         except Exception as e:
             self.logger.error(f"清理过期数据失败: {e}")
     
+    def _stats_snapshot(self) -> Dict:
+        with self._stats_lock:
+            return self.monitoring_stats.copy()
+    
     def get_monitoring_status(self) -> Dict:
-        """获取监控状态"""
+        """获取监控状态，latency 为每只股票的刷新耗时直方图"""
+        with self._stats_lock:
+            stats = self.monitoring_stats.copy()
+            latency = {stock_code: histogram.to_dict()
+                       for stock_code, histogram in self.latency_histograms.items()}
         return {
             'monitoring_active': self.monitoring_active,
             'monitored_stocks_count': len(self.monitored_stocks),
             'monitored_stocks': list(self.monitored_stocks),
-            'stats': self.monitoring_stats.copy(),
+            'stats': stats,
+            'latency': latency,
             'alert_conditions': self.alert_conditions.copy(),
             'config': self.monitoring_config.copy()
         }
     
     def get_stock_signal_history(self, stock_code: str, limit: int = 10) -> List[Dict]:
         """获取股票信号历史"""
-        if stock_code not in self.signal_history:
-            return []
-        
-        history = list(self.signal_history[stock_code])
+        with self._alert_lock:
+            if stock_code not in self.signal_history:
+                return []
+            history = list(self.signal_history[stock_code])
         return history[-limit:] if limit > 0 else history
     
     def get_stock_alert_history(self, stock_code: str, limit: int = 10) -> List[Dict]:
         """获取股票预警历史"""
-        if stock_code not in self.alert_history:
-            return []
-        
-        history = list(self.alert_history[stock_code])
+        with self._alert_lock:
+            if stock_code not in self.alert_history:
+                return []
+            history = list(self.alert_history[stock_code])
         return history[-limit:] if limit > 0 else history
     
     def _generate_monitoring_report(self):
@@ -562,7 +709,7 @@ class MultiTimeframeMonitor:
                     'end_time': datetime.now().isoformat(),
                     'duration_hours': (datetime.now() - self.monitoring_stats['start_time']).total_seconds() / 3600 if self.monitoring_stats['start_time'] else 0
                 },
-                'statistics': self.monitoring_stats.copy(),
+                'statistics': self._stats_snapshot(),
                 'monitored_stocks': list(self.monitored_stocks),
                 'alert_summary': self._generate_alert_summary(),
                 'performance_analysis': self._analyze_monitoring_performance()
@@ -589,7 +736,9 @@ class MultiTimeframeMonitor:
                 'most_active_stocks': []
             }
             
-            for stock_code, alerts in self.alert_history.items():
+            with self._alert_lock:
+                alert_history = {stock_code: list(alerts) for stock_code, alerts in self.alert_history.items()}
+            for stock_code, alerts in alert_history.items():
                 for alert_record in alerts:
                     alert = alert_record['alert']
                     alert_summary['total_alerts'] += 1
@@ -14,7 +14,6 @@ from typing import Dict, List, Tuple, Optional
 import json
 import logging
 from dataclasses import dataclass, asdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -23,6 +22,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import data_loader
 import indicators
+from analysis_executor import AnalysisExecutor
 
 @dataclass
 class TimeframeConfig:
@@ -619,19 +619,9 @@ class MultiTimeframeValidator:
         """验证股票池"""
         self.logger.info(f"开始多周期验证 {len(stock_list)} 只股票")
         
-        results = []
-        
-        def validate_single_stock(symbol):
-            return self.validate_stock(symbol)
-        
-        # 并行验证
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            futures = [executor.submit(validate_single_stock, symbol) for symbol in stock_list]
-            
-            for future in as_completed(futures):
-                result = future.result()
-                if result is not None:
-                    results.append(result)
+        # 并行验证，结果按股票列表顺序返回
+        executor = AnalysisExecutor(self, logger=self.logger)
+        results = [result for result in executor.map('validate_stock', stock_list) if result is not None]
         
         # 按多周期强势得分排序
         results.sort(key=lambda x: x.multi_timeframe_strength, reverse=True)
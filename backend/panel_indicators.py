@@ -0,0 +1,295 @@
+"""
+面板指标引擎 - 一次性计算全市场的MACD/KDJ/RSI
+所有函数接收 (时间 × 股票) 的二维数组，返回同形状的二维指标数组。
+NaN 表示该股票在该日没有K线（未上市/停牌），每只股票只在自己的K线上计算，
+结果与 indicators.calculate_macd/kdj/rsi 逐只计算一致（浮点误差范围内）。
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class PanelLayout:
+    """
+    日期对齐布局 <-> 连续布局 的转换
+
+    停牌会在日期对齐的面板中留下空洞，而逐只计算时 shift/rolling 是按该股票
+    自身的K线序列进行的。compact() 把每列的有效K线稳定地移到列首，使递推和
+    滚动窗口直接作用于连续数据；expand() 再把结果放回原日期位置。
+    """
+
+    def __init__(self, valid: np.ndarray):
+        self.valid = np.asarray(valid, dtype=bool)
+        # 无空洞（只有首部未上市或尾部缺失）时无需重排
+        first_valid = self.valid.argmax(axis=0)
+        counts = self.valid.sum(axis=0)
+        rows = np.arange(self.valid.shape[0])[:, None]
+        contiguous = (rows >= first_valid) & (rows < first_valid + counts)
+        self.is_contiguous = bool(np.array_equal(contiguous, self.valid))
+        self._order = None if self.is_contiguous else np.argsort(~self.valid, axis=0, kind='stable')
+        self.lengths = counts
+
+    @classmethod
+    def from_prices(cls, close: np.ndarray) -> 'PanelLayout':
+        return cls(~np.isnan(close))
+
+    def compact(self, values: np.ndarray) -> np.ndarray:
+        """日期对齐 -> 连续布局（有效K线移到列首，尾部为NaN）"""
+        values = np.asarray(values, dtype=float)
+        if self.is_contiguous:
+            return np.where(self.valid, values, np.nan)
+        return np.take_along_axis(np.where(self.valid, values, np.nan), self._order, axis=0)
+
+    def expand(self, values: np.ndarray, fill=np.nan) -> np.ndarray:
+        """连续布局 -> 日期对齐，无K线的位置填充 fill"""
+        values = np.asarray(values)
+        if self.is_contiguous:
+            out = values.copy()
+        else:
+            out = np.empty_like(values)
+            np.put_along_axis(out, self._order, values, axis=0)
+        out[~self.valid] = fill
+        return out
+
+
+@dataclass
+class MarketPanel:
+    """按日期对齐的全市场OHLCV面板"""
+    dates: pd.DatetimeIndex
+    symbols: List[str]
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame]) -> 'MarketPanel':
+        """由 {股票代码: get_daily_data格式DataFrame} 构建面板"""
+        symbols = [s for s, df in frames.items() if df is not None and not df.empty]
+        if not symbols:
+            empty = np.empty((0, 0))
+            return cls(pd.DatetimeIndex([]), [], empty, empty, empty, empty, empty)
+
+        dates = pd.DatetimeIndex(np.unique(np.concatenate([frames[s].index.values for s in symbols])))
+        shape = (len(dates), len(symbols))
+        arrays = {col: np.full(shape, np.nan) for col in ('open', 'high', 'low', 'close', 'volume')}
+        for j, symbol in enumerate(symbols):
+            df = frames[symbol]
+            rows = dates.get_indexer(df.index)
+            for col, arr in arrays.items():
+                if col in df.columns:
+                    arr[rows, j] = df[col].to_numpy(dtype=float)
+        return cls(dates, symbols, **arrays)
+
+    @classmethod
+    def from_bar_store(cls, store, market: str, symbols: Optional[List[str]] = None) -> 'MarketPanel':
+        """由 MarketBarStore 构建面板"""
+        if symbols is None:
+            return cls.from_frames(dict(store.iter_frames(market)))
+        return cls.from_frames({s: store.get_frame(s) for s in symbols})
+
+    @property
+    def layout(self) -> PanelLayout:
+        return PanelLayout.from_prices(self.close)
+
+    def series(self, symbol: str, values: np.ndarray) -> pd.Series:
+        """取出某只股票的指标序列（只保留该股票有K线的日期）"""
+        j = self.symbols.index(symbol)
+        mask = ~np.isnan(self.close[:, j])
+        return pd.Series(values[mask, j], index=self.dates[mask])
+
+
+# ---------------------------------------------------------------------------
+# 基础算子（作用于连续布局：每列的有效数据连续，首尾可为NaN）
+# ---------------------------------------------------------------------------
+
+def ewm_panel(values: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    按列的指数加权递推，等价于 Series.ewm(alpha=alpha, adjust=False).mean()
+    每列从第一个非NaN值开始递推，NaN行保持上一状态
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.empty_like(values)
+    state = np.full(values.shape[1:], np.nan)
+    decay = 1.0 - alpha
+    for t in range(values.shape[0]):
+        x = values[t]
+        updated = decay * state + alpha * x
+        state = np.where(np.isnan(state), x, np.where(np.isnan(x), state, updated))
+        out[t] = state
+    return out
+
+
+def shift_panel(values: np.ndarray, periods: int = 1, fill=np.nan) -> np.ndarray:
+    """按列平移，等价于 Series.shift(periods)"""
+    values = np.asarray(values)
+    if periods <= 0:
+        return values.copy()
+    out = np.empty_like(values, dtype=float if fill is np.nan else values.dtype)
+    out[:periods] = fill
+    out[periods:] = values[:-periods]
+    return out
+
+
+def _rolling_extreme(values: np.ndarray, window: int, func) -> np.ndarray:
+    """
+    van Herk/Gil-Werman 滚动极值：按窗口长度分块，块内前缀/后缀累积极值，
+    每个窗口的结果为 后缀[i-window+1] 与 前缀[i] 的极值，对每列都是O(n)且全部向量化。
+    窗口内有NaN（数据不足）时结果为NaN，与 rolling(window).min()/max() 一致。
+    """
+    values = np.asarray(values, dtype=float)
+    n = values.shape[0]
+    out = np.full_like(values, np.nan)
+    if window <= 0 or n < window:
+        return out
+    if window == 1:
+        return values.copy()
+
+    num_blocks = -(-n // window)
+    padded = np.full((num_blocks * window,) + values.shape[1:], np.nan)
+    padded[:n] = values
+    blocks = padded.reshape((num_blocks, window) + values.shape[1:])
+
+    prefix = func.accumulate(blocks, axis=1).reshape(padded.shape)[:n]
+    suffix = func.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)[:n]
+
+    out[window - 1:] = func(suffix[:n - window + 1], prefix[window - 1:])
+    return out
+
+
+def rolling_min_panel(values: np.ndarray, window: int) -> np.ndarray:
+    """按列滚动最小值，等价于 Series.rolling(window).min()"""
+    return _rolling_extreme(values, window, np.minimum)
+
+
+def rolling_max_panel(values: np.ndarray, window: int) -> np.ndarray:
+    """按列滚动最大值，等价于 Series.rolling(window).max()"""
+    return _rolling_extreme(values, window, np.maximum)
+
+
+def rolling_mean_panel(values: np.ndarray, window: int) -> np.ndarray:
+    """按列滚动均值，等价于 Series.rolling(window).mean()"""
+    values = np.asarray(values, dtype=float)
+    out = np.full_like(values, np.nan)
+    if window <= 0 or values.shape[0] < window:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+    out[window - 1:] = windows.mean(axis=-1)
+    return out
+
+
+def rolling_any_panel(flags: np.ndarray, window: int) -> np.ndarray:
+    """按列判断最近window行内是否出现过True，等价于 rolling(window, min_periods=1).sum() > 0"""
+    counts = np.cumsum(np.asarray(flags, dtype=np.int64), axis=0)
+    lagged = np.zeros_like(counts)
+    lagged[window:] = counts[:-window]
+    return (counts - lagged) > 0
+
+
+# ---------------------------------------------------------------------------
+# 指标（连续布局）
+# ---------------------------------------------------------------------------
+
+def compute_macd(close: np.ndarray, fast: int, slow: int, signal: int) -> Tuple[np.ndarray, np.ndarray]:
+    """连续布局上的MACD，返回 (dif, dea)"""
+    ema_fast = ewm_panel(close, 2.0 / (fast + 1))
+    ema_slow = ewm_panel(close, 2.0 / (slow + 1))
+    dif = ema_fast - ema_slow
+    dea = ewm_panel(dif, 2.0 / (signal + 1))
+    return dif, dea
+
+
+def compute_kdj(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                n: int, k_period: int, d_period: int,
+                smoothing_method: str = 'ema') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """连续布局上的KDJ，返回 (k, d, j)"""
+    low_n = rolling_min_panel(low, n)
+    high_n = rolling_max_panel(high, n)
+    high_minus_low = high_n - low_n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsv = np.where(high_minus_low != 0, (close - low_n) / high_minus_low * 100, 0)
+
+    if smoothing_method == 'sma':
+        k = rolling_mean_panel(rsv, k_period)
+        d = rolling_mean_panel(k, d_period)
+    else:  # ema (默认)，com=(p-1)/2 即 alpha=2/(p+1)
+        k = ewm_panel(rsv, 2.0 / (k_period + 1))
+        d = ewm_panel(k, 2.0 / (d_period + 1))
+    return k, d, 3 * k - 2 * d
+
+
+def compute_rsi(close: np.ndarray, period: int, smoothing_method: str = 'wilder') -> np.ndarray:
+    """连续布局上的RSI"""
+    delta = np.full_like(close, np.nan)
+    delta[1:] = close[1:] - close[:-1]
+    # 与 delta.where(delta > 0, 0) 一致：首根K线的NaN变化量记为0，无K线的位置保持NaN
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    missing = np.isnan(close)
+    gain[missing] = np.nan
+    loss[missing] = np.nan
+
+    if smoothing_method == 'wilder':
+        avg_gain = ewm_panel(gain, 1.0 / period)
+        avg_loss = ewm_panel(loss, 1.0 / period)
+    elif smoothing_method == 'ema':
+        avg_gain = ewm_panel(gain, 2.0 / (period + 1))
+        avg_loss = ewm_panel(loss, 2.0 / (period + 1))
+    else:  # sma
+        avg_gain = rolling_mean_panel(gain, period)
+        avg_loss = rolling_mean_panel(loss, period)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+    return np.where(np.isnan(rsi), 100.0, rsi)
+
+
+# ---------------------------------------------------------------------------
+# 公共接口（日期对齐布局）
+# ---------------------------------------------------------------------------
+
+def calculate_macd_panel(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9,
+                         layout: Optional[PanelLayout] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """面板MACD，返回 (dif, dea)"""
+    layout = layout or PanelLayout.from_prices(close)
+    dif, dea = compute_macd(layout.compact(close), fast, slow, signal)
+    return layout.expand(dif), layout.expand(dea)
+
+
+def calculate_kdj_panel(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                        n: int = 27, k_period: int = 3, d_period: int = 3,
+                        smoothing_method: str = 'ema',
+                        layout: Optional[PanelLayout] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """面板KDJ，返回 (k, d, j)"""
+    layout = layout or PanelLayout.from_prices(close)
+    k, d, j = compute_kdj(layout.compact(high), layout.compact(low), layout.compact(close),
+                   n, k_period, d_period, smoothing_method)
+    return layout.expand(k), layout.expand(d), layout.expand(j)
+
+
+def calculate_rsi_panel(close: np.ndarray, period: int = 14, smoothing_method: str = 'wilder',
+                        layout: Optional[PanelLayout] = None) -> np.ndarray:
+    """面板RSI"""
+    layout = layout or PanelLayout.from_prices(close)
+    return layout.expand(compute_rsi(layout.compact(close), period, smoothing_method))
+
+
+def compute_panel_indicators(panel: MarketPanel,
+                             macd_params: Tuple[int, int, int] = (12, 26, 9),
+                             kdj_params: Tuple[int, int, int] = (27, 3, 3),
+                             rsi_periods: Tuple[int, ...] = (6, 12, 24)) -> Dict[str, np.ndarray]:
+    """一次性计算全市场的 dif/dea/k/d/j/rsiN，共用同一个布局转换"""
+    layout = panel.layout
+    close = layout.compact(panel.close)
+    high = layout.compact(panel.high)
+    low = layout.compact(panel.low)
+
+    results = {}
+    results['dif'], results['dea'] = compute_macd(close, *macd_params)
+    results['k'], results['d'], results['j'] = compute_kdj(high, low, close, *kdj_params, 'ema')
+    for period in rsi_periods:
+        results[f'rsi{period}'] = compute_rsi(close, period, 'wilder')
+    return {name: layout.expand(values) for name, values in results.items()}
@@ -1,6 +1,8 @@
 """
 并行参数优化模块 - 多只股票同时进行参数优化
-(修改版: 使用 ProcessPoolExecutor 解决 GIL 性能问题)
+1. 单只股票的参数网格由 ParameterGridEvaluator 批量回测
+2. 参数网格分成多块时，每只股票的行情和信号只发布一次到共享内存，子进程任务只携带句柄和一段参数组合，
+   一批股票完成后统一释放共享内存；网格只有一块时（默认54种组合）进程池只有开销，在当前进程内计算
 """
 
 import os
@@ -8,72 +10,71 @@ import json
 import time
 import threading
 from datetime import datetime
-# 关键改动: 引入 ProcessPoolExecutor
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import multiprocessing
-import itertools
-import hashlib
 import gc
 
-# 关键改动: 将参数测试逻辑定义为顶层函数
-# 这对于 ProcessPoolExecutor 的正常工作至关重要，因为它需要能够 "pickle" (序列化) 这个函数
-# 以便发送到子进程中执行。
-def _test_combination_worker(df, signals, combination):
+import numpy as np
+import pandas as pd
+
+from parametric_advisor import ParameterGridEvaluator
+from shared_frame import AttachedFrame, prepare_workers, publish_frames, release_frames
+
+def _evaluate_chunk_worker(handle, param_sets):
     """
-    在独立进程中运行的工作函数。
-    注意: 这是您原始的 _test_parameter_combination 方法的逻辑。
+    在子进程中评估一只股票的一段参数组合，完成后立即卸载共享内存
+    必须是顶层函数才能被 ProcessPoolExecutor pickle；参数只有共享内存句柄和参数字典
     """
+    frame = AttachedFrame(handle)
     try:
-        # 在子进程中重新导入必要的模块
-        from parametric_advisor import TradingParameters, ParametricTradingAdvisor
-
-        test_params = TradingParameters()
-        test_params.pre_entry_discount = combination[0]
-        test_params.moderate_stop = combination[1]
-        test_params.moderate_profit = combination[2]
-        test_params.max_holding_days = combination[3]
-
-        test_advisor = ParametricTradingAdvisor(test_params)
-        result = test_advisor.backtest_parameters(df, signals, 'moderate')
-
-        if 'error' not in result and result['total_trades'] >= 1:
-            # 综合评分：胜率 * 0.6 + 平均收益 * 0.4
-            score = result['win_rate'] * 0.6 + max(0, result['avg_pnl']) * 0.4
-            return (score, test_params, result)
-        else:
-            return (0, None, None)
-    except Exception as e:
-        # 发生异常时返回一个一致的结构，避免主进程出错
-        return (0, None, None)
+        evaluator = ParameterGridEvaluator(frame.df, frame.signals, 'moderate')
+        stats = evaluator.evaluate(param_sets)
+        del evaluator
+        return stats
+    finally:
+        frame.close()
+
+
+def _can_share(df, signals):
+    """共享内存传输要求无时区的唯一日期索引、信号与行情对齐"""
+    return (isinstance(df.index, pd.DatetimeIndex) and df.index.tz is None and df.index.is_unique
+            and isinstance(signals, pd.Series) and signals.index.equals(df.index))
 
 
 class ParallelStockOptimizer:
     """并行股票参数优化器 - 同时优化多只股票的参数"""
 
-    def __init__(self, max_workers=None, max_stocks_parallel=8, cache_dir="analysis_cache"):
+    # 参数搜索空间
+    PARAM_RANGES = {
+        'pre_entry_discount': [0.02, 0.03, 0.05],
+        'moderate_stop': [0.03, 0.05, 0.08],
+        'moderate_profit': [0.10, 0.15, 0.20],
+        'max_holding_days': [20, 30]
+    }
+
+    def __init__(self, max_workers=None, max_stocks_parallel=8, cache_dir="analysis_cache",
+                 combo_chunk_size=256, param_ranges=None):
         """
         初始化并行股票参数优化器
 
         Args:
-            max_workers: 每只股票的参数优化使用的最大进程数 (原为线程数)
-            max_stocks_parallel: 同时处理的最大股票数
+            max_workers: 参数优化使用的最大进程数，默认CPU核心数；为1时在当前进程内计算
+            max_stocks_parallel: 同时发布到共享内存的最大股票数
             cache_dir: 缓存目录
+            combo_chunk_size: 每个子进程任务评估的参数组合数；参数网格不超过一块时在当前进程内计算
+            param_ranges: 参数搜索空间，默认 PARAM_RANGES
         """
-        if max_workers is None:
-            cpu_count = multiprocessing.cpu_count()
-            # 每只股票使用的进程数 = 总CPU核心数 / 并行股票数
-            # 确保至少有1个工作进程
-            max_workers = max(1, cpu_count // max_stocks_parallel)
-
-        self.max_workers = max_workers
+        self.max_workers = max_workers or multiprocessing.cpu_count()
         self.max_stocks_parallel = max_stocks_parallel
+        self.combo_chunk_size = combo_chunk_size
+        self.param_ranges = param_ranges or self.PARAM_RANGES
         self.cache_dir = cache_dir
         os.makedirs(cache_dir, exist_ok=True)
 
         self.optimization_cache = {}
         self.cache_lock = threading.Lock()
 
-        print(f"🚀 并行股票优化器初始化: 同时处理 {max_stocks_parallel} 只股票, 每只股票 {max_workers} 个进程")
+        print(f"🚀 并行股票优化器初始化: 同时处理 {max_stocks_parallel} 只股票, {self.max_workers} 个进程")
 
     def optimize_stocks_batch(self, stock_data_list):
         """
@@ -91,49 +92,31 @@ class ParallelStockOptimizer:
 
         print(f"⚙️ 开始并行优化 {total_stocks} 只股票的参数")
 
-        # 外层仍然使用线程池，因为每个任务 (_optimize_single_stock) 主要是等待
-        # 其内部的进程池完成，这是一种 I/O-bound 行为，适合用线程。
-        with ThreadPoolExecutor(max_workers=self.max_stocks_parallel) as executor:
-            future_to_stock = {}
-            for stock_data in stock_data_list:
-                stock_code = stock_data['stock_code']
-                df = stock_data['df']
-                signals = stock_data['signals']
-
-                cached_result = self._get_cached_result(stock_code)
-                if cached_result:
-                    print(f"📂 {stock_code}: 使用缓存的优化参数")
-                    results[stock_code] = cached_result
-                    continue
-
-                future = executor.submit(self._optimize_single_stock, stock_code, df, signals)
-                future_to_stock[future] = stock_code
-
-            completed = 0
-            # 使用 len(future_to_stock) 来计算总任务数，更准确
-            total_tasks = len(future_to_stock)
-            if total_tasks == 0:
-                print("✅ 所有股票均使用缓存，无需优化。")
-                return results
-
-            for future in as_completed(future_to_stock):
-                stock_code = future_to_stock[future]
-                completed += 1
-
-                try:
-                    result = future.result()
-                    results[stock_code] = result
-
-                    progress = completed / total_tasks * 100
-                    elapsed = time.time() - start_time
-                    print(f"✅ [{completed}/{total_tasks}] {stock_code}: 参数优化完成 "
-                          f"(进度: {progress:.1f}%, 耗时: {elapsed:.1f}秒)")
-
-                    self._cache_result(stock_code, result)
-
-                except Exception as e:
-                    print(f"❌ [{completed}/{total_tasks}] {stock_code}: 参数优化失败 - {e}")
-                    results[stock_code] = {'error': f'优化失败: {e}'}
+        pending = []
+        for stock_data in stock_data_list:
+            stock_code = stock_data['stock_code']
+            cached_result = self._get_cached_result(stock_code)
+            if cached_result:
+                print(f"📂 {stock_code}: 使用缓存的优化参数")
+                results[stock_code] = cached_result
+                continue
+            pending.append((stock_code, stock_data['df'], stock_data['signals']))
+
+        if not pending:
+            print("✅ 所有股票均使用缓存，无需优化。")
+            return results
+
+        progress = {'completed': 0, 'total': len(pending), 'start_time': start_time}
+        if not self._uses_process_pool():
+            for stock_code, df, signals in pending:
+                self._record_result(results, stock_code, self._optimize_single_stock(stock_code, df, signals),
+                                    progress)
+        else:
+            prepare_workers()
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                for start in range(0, len(pending), self.max_stocks_parallel):
+                    self._optimize_shared_batch(executor, pending[start:start + self.max_stocks_parallel],
+                                                results, progress)
 
         total_time = time.time() - start_time
         avg_time = total_time / total_stocks if total_stocks > 0 else 0
@@ -143,72 +126,122 @@ class ParallelStockOptimizer:
 
         return results
 
-    def _optimize_single_stock(self, stock_code, df, signals):
-        """优化单只股票的参数 (使用 ProcessPoolExecutor)"""
+    def _uses_process_pool(self):
+        """参数网格分成多块且允许多进程时才派发到进程池；只有一块时批量回测本身只需几毫秒"""
+        num_combos = len(ParameterGridEvaluator.grid(self.param_ranges))
+        return self.max_workers > 1 and num_combos > self.combo_chunk_size
+
+    def _record_result(self, results, stock_code, result, progress):
+        progress['completed'] += 1
+        completed, total_tasks = progress['completed'], progress['total']
+        results[stock_code] = result
+        if 'error' in result:
+            print(f"❌ [{completed}/{total_tasks}] {stock_code}: 参数优化失败 - {result['error']}")
+        else:
+            elapsed = time.time() - progress['start_time']
+            print(f"✅ [{completed}/{total_tasks}] {stock_code}: 参数优化完成 "
+                  f"(进度: {completed / total_tasks * 100:.1f}%, 耗时: {elapsed:.1f}秒)")
+        self._cache_result(stock_code, result)
+
+    def _optimize_shared_batch(self, executor, batch, results, progress):
+        """一批股票：发布共享内存 → 按参数分块派发 → 汇总选优 → 释放共享内存"""
+        param_sets = ParameterGridEvaluator.grid(self.param_ranges)
+        shared = []
+        for stock_code, df, signals in batch:
+            error = self._check_signals(signals)
+            if error is not None:
+                self._record_result(results, stock_code, error, progress)
+            elif not _can_share(df, signals):
+                self._record_result(results, stock_code, self._optimize_single_stock(stock_code, df, signals),
+                                    progress)
+            else:
+                shared.append((stock_code, df, signals))
+        if not shared:
+            return
+
+        batch_start = time.time()
+        frames = publish_frames([(df, signals) for _, df, signals in shared])
         try:
-            print(f"🔧 {stock_code}: 执行参数优化...")
-            start_time = time.time()
+            chunks = {}
+            future_to_chunk = {}
+            for stock_index, frame in enumerate(frames):
+                for start in range(0, len(param_sets), self.combo_chunk_size):
+                    future = executor.submit(_evaluate_chunk_worker, frame.handle,
+                                             param_sets[start:start + self.combo_chunk_size])
+                    future_to_chunk[future] = (stock_index, start)
+            remaining = [len(range(0, len(param_sets), self.combo_chunk_size))] * len(shared)
+            failed = {}
+
+            for future in as_completed(future_to_chunk):
+                stock_index, start = future_to_chunk[future]
+                try:
+                    chunks.setdefault(stock_index, {})[start] = future.result()
+                except Exception as e:
+                    failed.setdefault(stock_index, e)
+                remaining[stock_index] -= 1
+                if remaining[stock_index]:
+                    continue
 
-            if signals is None or not signals.any():
-                return {'error': '无有效信号，无法优化参数'}
+                stock_code, df, signals = shared[stock_index]
+                if stock_index in failed:
+                    chunks.pop(stock_index, None)
+                    result = {'error': f'优化失败: {failed[stock_index]}'}
+                else:
+                    # 分块结果按组合顺序拼接
+                    stock_chunks = [chunk for _, chunk in sorted(chunks.pop(stock_index).items())]
+                    stats = {key: np.concatenate([chunk[key] for chunk in stock_chunks]) for key in stock_chunks[0]}
+                    evaluator = ParameterGridEvaluator(df, signals, 'moderate')
+                    result = self._build_result(stock_code, evaluator, param_sets, stats, batch_start)
+                self._record_result(results, stock_code, result, progress)
+        finally:
+            release_frames(frames)
+
+    @staticmethod
+    def _check_signals(signals):
+        if signals is None or not signals.any():
+            return {'error': '无有效信号，无法优化参数'}
+
+        signal_count = len(signals[signals != ''])
+        if signal_count < 3:
+            return {'error': f'信号数量不足，需要至少3个信号，当前: {signal_count}'}
+        return None
 
-            signal_count = len(signals[signals != ''])
-            if signal_count < 3:
-                return {'error': f'信号数量不足，需要至少3个信号，当前: {signal_count}'}
+    def _build_result(self, stock_code, evaluator, param_sets, stats, start_time):
+        """由全部组合的统计选出最佳参数，生成并保存优化结果"""
+        best_score, best_params, best_result = evaluator.select_best_composite(param_sets, stats)
 
-            param_ranges = {
-                'pre_entry_discount': [0.02, 0.03, 0.05],
-                'moderate_stop': [0.03, 0.05, 0.08],
-                'moderate_profit': [0.10, 0.15, 0.20],
-                'max_holding_days': [20, 30]
-            }
+        optimization_result = {
+            'best_parameters': best_params.__dict__ if best_params else None,
+            'best_score': best_score,
+            'best_result': best_result,
+            'optimization_target': 'composite_score',
+            'combinations_tested': len(param_sets),
+            'optimization_time': time.time() - start_time
+        }
 
-            combinations = list(itertools.product(*param_ranges.values()))
-            total_combinations = len(combinations)
+        self._save_optimization_result(stock_code, optimization_result)
 
-            print(f"⚙️ {stock_code}: 测试 {total_combinations} 种参数组合 (进程数: {self.max_workers})")
+        return optimization_result
 
-            best_params = None
-            best_score = -1
-            best_result = None
+    def _optimize_single_stock(self, stock_code, df, signals):
+        """在当前进程内优化单只股票的参数 (使用 ParameterGridEvaluator 批量回测)"""
+        try:
+            print(f"🔧 {stock_code}: 执行参数优化...")
+            start_time = time.time()
 
-            # 关键改动: 使用 ProcessPoolExecutor 进行 CPU 密集型任务
-            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
-                future_to_combination = {
-                    executor.submit(_test_combination_worker, df, signals, combo): combo
-                    for combo in combinations
-                }
-
-                for future in as_completed(future_to_combination):
-                    try:
-                        score, params, result = future.result()
-                        if score > best_score:
-                            best_score = score
-                            best_params = params
-                            best_result = result
-                    except Exception:
-                        continue
-
-            total_time = time.time() - start_time
-
-            optimization_result = {
-                'best_parameters': best_params.__dict__ if best_params else None,
-                'best_score': best_score,
-                'best_result': best_result,
-                'optimization_target': 'composite_score',
-                'combinations_tested': total_combinations,
-                'optimization_time': total_time
-            }
+            error = self._check_signals(signals)
+            if error is not None:
+                return error
 
-            self._save_optimization_result(stock_code, optimization_result)
+            param_sets = ParameterGridEvaluator.grid(self.param_ranges)
+            print(f"⚙️ {stock_code}: 测试 {len(param_sets)} 种参数组合 (批量回测)")
 
-            return optimization_result
+            evaluator = ParameterGridEvaluator(df, signals, 'moderate')
+            return self._build_result(stock_code, evaluator, param_sets, evaluator.evaluate(param_sets), start_time)
 
         except Exception as e:
             return {'error': f'参数优化失败: {e}'}
 
-    # _test_parameter_combination 方法已被移除，并由顶层函数 _test_combination_worker 替代
-
     def _get_cached_result(self, stock_code):
         """获取缓存的优化结果"""
         with self.cache_lock:
@@ -404,47 +404,41 @@ class ParametricTradingAdvisor:
         optimization_results = []
         
         # 生成参数组合
-        param_combinations = list(itertools.product(*param_ranges.values()))
-        total_combinations = len(param_combinations)
+        param_sets = ParameterGridEvaluator.grid(param_ranges)
+        total_combinations = len(param_sets)
         
         print(f"📊 总共需要测试 {total_combinations} 种参数组合")
         
-        for i, combination in enumerate(param_combinations):
-            if i % 10 == 0:
-                print(f"进度: {i}/{total_combinations} ({i/total_combinations*100:.1f}%)")
-            
-            # 创建测试参数
-            test_params = TradingParameters()
-            test_params.pre_entry_discount = combination[0]
-            test_params.moderate_stop = combination[1]
-            test_params.moderate_profit = combination[2]
-            test_params.max_holding_days = combination[3]
-            
-            # 创建测试顾问
-            test_advisor = ParametricTradingAdvisor(test_params)
-            
-            # 执行回测
-            backtest_result = test_advisor.backtest_parameters(df, signals, 'moderate')
-            
-            if 'error' not in backtest_result and backtest_result['total_trades'] >= 3:
-                score = backtest_result.get(optimization_target, 0)
-                
-                result = {
-                    'parameters': asdict(test_params),
-                    'score': score,
-                    'stats': backtest_result
-                }
-                optimization_results.append(result)
-                
-                # 更新最佳参数
-                if optimization_target in ['win_rate', 'avg_pnl', 'profit_factor']:
-                    if score > best_score:
-                        best_score = score
-                        best_params = test_params
-                else:  # 对于需要最小化的目标
-                    if score < best_score:
-                        best_score = score
-                        best_params = test_params
+        # 所有组合一次批量回测
+        evaluator = ParameterGridEvaluator(df, signals, 'moderate')
+        stats = evaluator.evaluate(param_sets)
+        scores = stats.get(optimization_target, np.zeros(total_combinations))
+        
+        for i in np.flatnonzero(stats['total_trades'] >= 3):
+            score = scores[i].item()
+            optimization_results.append((score, i))
+            
+            # 更新最佳参数
+            if optimization_target in ['win_rate', 'avg_pnl', 'profit_factor']:
+                if score > best_score:
+                    best_score = score
+                    best_params = param_sets[i]
+            else:  # 对于需要最小化的目标
+                if score < best_score:
+                    best_score = score
+                    best_params = param_sets[i]
+        
+        if best_params is not None:
+            best_params = evaluator.parameters_for(best_params)
+        
+        # 只为前10个结果生成完整回测明细
+        top_results = []
+        for score, i in sorted(optimization_results, key=lambda x: x[0], reverse=True)[:10]:
+            top_results.append({
+                'parameters': asdict(evaluator.parameters_for(param_sets[i])),
+                'score': score,
+                'stats': evaluator.backtest_stats(param_sets[i])
+            })
         
         # 保存优化历史
         self.optimization_history.append({
@@ -461,7 +455,7 @@ class ParametricTradingAdvisor:
         return {
             'best_parameters': best_params,
             'best_score': best_score,
-            'optimization_results': sorted(optimization_results, key=lambda x: x['score'], reverse=True)[:10],  # 返回前10个结果
+            'optimization_results': top_results,  # 返回前10个结果
             'optimization_target': optimization_target
         }
     
@@ -506,4 +500,232 @@ class ParametricTradingAdvisor:
             
         except Exception as e:
             print(f"❌ 加载参数失败: {e}")
-            return None
\ No newline at end of file
+            return None
+
+class ParameterGridEvaluator:
+    """
+    批量参数回测，口径与 ParametricTradingAdvisor.backtest_parameters 一致
+    每个信号只截取一次入场后 max(max_holding_days) 天的高低价路径，
+    所有参数组合 × 信号的止损/止盈/超时出场一次广播计算
+    """
+
+    # 单次广播的最大元素数（组合 × 信号 × 天数），超出时按组合分块计算
+    max_chunk_elements = 4_000_000
+
+    def __init__(self, df, signals, risk_level='moderate', base_parameters: TradingParameters = None):
+        self.df = df
+        self.signals = signals
+        self.risk_level = risk_level
+        self.base_parameters = base_parameters or TradingParameters()
+        self.error = None
+        # 非常规数据（重复索引、信号未对齐等）逐组合调用 backtest_parameters
+        self.vectorized = (
+            risk_level in ('conservative', 'moderate', 'aggressive')
+            and isinstance(df.index, pd.DatetimeIndex) and df.index.is_unique
+            and isinstance(signals, pd.Series) and signals.index.equals(df.index)
+        )
+        if not self.vectorized:
+            return
+        if not signals.any():
+            self.error = '无有效信号进行回测'
+            return
+
+        # 与逐笔回测相同：信号后至少还有10根K线才参与统计
+        positions = np.flatnonzero((signals != '').to_numpy())
+        self.positions = positions[positions < len(df) - 10]
+        if len(self.positions) == 0:
+            self.error = '无有效交易进行统计'
+            return
+        self.states = signals.to_numpy()[self.positions]
+        self.close = df['close'].to_numpy()
+        self.high = df['high'].to_numpy()
+        self.low = df['low'].to_numpy()
+        self._path_days = 0
+
+    @staticmethod
+    def grid(param_ranges: Dict[str, List]) -> List[Dict]:
+        """参数空间展开为参数字典列表（顺序同 itertools.product）"""
+        keys = list(param_ranges)
+        return [dict(zip(keys, values)) for values in itertools.product(*param_ranges.values())]
+
+    def parameters_for(self, param_set: Dict) -> TradingParameters:
+        """在基础参数上覆盖给定字段"""
+        params = TradingParameters(**asdict(self.base_parameters))
+        for key, value in param_set.items():
+            setattr(params, key, value)
+        return params
+
+    def _forward_paths(self, days):
+        """各信号入场后第1..days天的最高/最低价，超出数据末尾记为NaN（比较恒为False）"""
+        if days > self._path_days:
+            n = len(self.close)
+            offsets = self.positions[:, None] + 1 + np.arange(days)
+            beyond = offsets >= n
+            offsets = np.minimum(offsets, n - 1)
+            self._high_path = np.where(beyond, np.nan, self.high[offsets])
+            self._low_path = np.where(beyond, np.nan, self.low[offsets])
+            self._path_days = days
+        return self._high_path[:, :days], self._low_path[:, :days]
+
+    def _field(self, param_sets, name):
+        default = getattr(self.base_parameters, name)
+        return np.array([param_set.get(name, default) for param_set in param_sets], dtype=np.float64)
+
+    def _simulate(self, param_sets):
+        """逐组合 × 逐信号的出场模拟，返回 (组合数, 信号数) 的数组"""
+        max_days = self._field(param_sets, 'max_holding_days').astype(np.int64)
+        days = int(max_days.max())
+        high_path, low_path = self._forward_paths(days)
+
+        # 入场价：PRE/POST 按折扣、MID 按溢价，其他状态用收盘价
+        signal_close = self.close[self.positions]
+        factor = np.ones((len(param_sets), len(self.positions)))
+        for state, values in (('PRE', 1 - self._field(param_sets, 'pre_entry_discount')),
+                              ('MID', 1 + self._field(param_sets, 'mid_entry_premium')),
+                              ('POST', 1 - self._field(param_sets, 'post_entry_discount'))):
+            factor[:, self.states == state] = values[:, None]
+        entry = signal_close * factor
+        stop_loss = entry * (1 - self._field(param_sets, f'{self.risk_level}_stop'))[:, None]
+        take_profit = entry * (1 + self._field(param_sets, f'{self.risk_level}_profit'))[:, None]
+
+        # 持有期内首个触及止损或止盈的交易日，同一天先判止损
+        hit_stop = low_path[None] <= stop_loss[..., None]
+        hit = (hit_stop | (high_path[None] >= take_profit[..., None])) & (np.arange(1, days + 1) <= max_days[:, None])[:, None]
+        exited = hit.any(axis=-1)
+        first_day = hit.argmax(axis=-1)
+        stopped = np.take_along_axis(hit_stop, first_day[..., None], axis=-1)[..., 0]
+
+        final_pos = np.minimum(self.positions + max_days[:, None], len(self.close) - 1)
+        exit_price = np.where(exited, np.where(stopped, stop_loss, take_profit), self.close[final_pos])
+        return {
+            'entry_price': entry,
+            'exit_price': exit_price,
+            'exit_pos': np.where(exited, self.positions + first_day + 1, final_pos),
+            'exit_reason': np.where(exited, np.where(stopped, 0, 1), 2),
+            'holding_days': np.where(exited, first_day + 1, final_pos - self.positions),
+            'pnl_pct': (exit_price - entry) / entry,
+        }
+
+    def evaluate(self, param_sets: List[Dict]) -> Dict[str, np.ndarray]:
+        """
+        批量计算各参数组合的回测统计
+
+        Returns:
+            dict: 键同 _calculate_backtest_stats（不含 trades_detail），值为与 param_sets 对应的数组；
+                  无法回测的组合 total_trades 为0，其余指标为NaN。
+                  avg_win/avg_loss 为掩码求和，与逐笔实现可能有末位浮点差异，其余指标逐位一致
+        """
+        if not self.vectorized:
+            return self._evaluate_by_backtest(param_sets)
+        count = len(param_sets)
+        if self.error or count == 0:
+            return self._empty_stats(count)
+
+        signal_count = len(self.positions)
+        days = int(self._field(param_sets, 'max_holding_days').max())
+        chunk = max(1, self.max_chunk_elements // (signal_count * max(days, 1)))
+        pnl = np.empty((count, signal_count))
+        holding = np.empty((count, signal_count), dtype=np.int64)
+        for start in range(0, count, chunk):
+            result = self._simulate(param_sets[start:start + chunk])
+            pnl[start:start + chunk] = result['pnl_pct']
+            holding[start:start + chunk] = result['holding_days']
+
+        wins, losses = pnl > 0, pnl < 0
+        winning, losing = wins.sum(axis=1), losses.sum(axis=1)
+        # 盈亏总和按交易顺序逐笔累加，与内置 sum 一致
+        win_sum = np.cumsum(np.where(wins, pnl, 0.0), axis=1)[:, -1]
+        loss_sum = np.cumsum(np.where(losses, pnl, 0.0), axis=1)[:, -1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {
+                'total_trades': np.full(count, signal_count),
+                'winning_trades': winning,
+                'losing_trades': losing,
+                'win_rate': winning / signal_count,
+                'avg_pnl': pnl.mean(axis=1),
+                'avg_win': np.where(winning > 0, win_sum / np.maximum(winning, 1), 0.0),
+                'avg_loss': np.where(losing > 0, loss_sum / np.maximum(losing, 1), 0.0),
+                'max_win': pnl.max(axis=1),
+                'max_loss': pnl.min(axis=1),
+                'avg_holding_days': holding.mean(axis=1),
+                'profit_factor': np.where(losing > 0, np.abs(win_sum / loss_sum), float('inf')),
+            }
+
+    _STAT_KEYS = ('total_trades', 'winning_trades', 'losing_trades', 'win_rate', 'avg_pnl', 'avg_win',
+                  'avg_loss', 'max_win', 'max_loss', 'avg_holding_days', 'profit_factor')
+
+    def _empty_stats(self, count):
+        stats = {key: np.full(count, np.nan) for key in self._STAT_KEYS}
+        stats['total_trades'] = np.zeros(count, dtype=np.int64)
+        return stats
+
+    def _evaluate_by_backtest(self, param_sets):
+        stats = self._empty_stats(len(param_sets))
+        for i, param_set in enumerate(param_sets):
+            result = self.backtest_stats(param_set)
+            if 'error' not in result:
+                for key in self._STAT_KEYS:
+                    stats[key][i] = result[key]
+        return stats
+
+    def backtest_stats(self, param_set: Dict) -> Dict:
+        """单个参数组合的完整回测结果，与 backtest_parameters 的返回值相同"""
+        params = self.parameters_for(param_set)
+        advisor = ParametricTradingAdvisor(params)
+        if not self.vectorized:
+            return advisor.backtest_parameters(self.df, self.signals, self.risk_level)
+        if self.error:
+            return {'error': self.error}
+
+        result = {key: values[0] for key, values in self._simulate([param_set]).items()}
+        dates = self.df.index
+        reasons = ('止损', '止盈', '超时出场')
+        trades = [{
+            'signal_date': dates[pos].strftime('%Y-%m-%d'),
+            'signal_state': self.states[j],
+            'entry_price': result['entry_price'][j],
+            'exit_price': result['exit_price'][j],
+            'exit_date': dates[result['exit_pos'][j]].strftime('%Y-%m-%d'),
+            'holding_days': int(result['holding_days'][j]),
+            'pnl_pct': result['pnl_pct'][j],
+            'exit_reason': reasons[result['exit_reason'][j]],
+        } for j, pos in enumerate(self.positions)]
+
+        stats = advisor._calculate_backtest_stats(trades)
+        stats['parameters_used'] = asdict(params)
+        stats['risk_level'] = self.risk_level
+        return stats
+
+    def composite_scores(self, param_sets: List[Dict], min_trades: int = 1) -> np.ndarray:
+        """
+        综合评分：胜率 * 0.6 + 平均收益 * 0.4，交易数不足的组合记为0
+        可直接作为 OptimizedParameterSearch.search 的 batch_evaluation_func
+        """
+        return self._composite(self.evaluate(param_sets), min_trades)[0]
+
+    @staticmethod
+    def _composite(stats, min_trades):
+        valid = stats['total_trades'] >= min_trades
+        return np.where(valid, stats['win_rate'] * 0.6 + np.maximum(stats['avg_pnl'], 0) * 0.4, 0), valid
+
+    def best_composite(self, param_sets: List[Dict], min_trades: int = 1):
+        """
+        综合评分最高的参数组合
+
+        Returns:
+            tuple: (最佳得分, TradingParameters 或 None, 完整回测结果 或 None)
+        """
+        if not param_sets:
+            return -1, None, None
+        return self.select_best_composite(param_sets, self.evaluate(param_sets), min_trades)
+
+    def select_best_composite(self, param_sets: List[Dict], stats: Dict[str, np.ndarray], min_trades: int = 1):
+        """根据已算好的 evaluate 统计（如子进程分块计算后拼接）选出综合评分最高的组合，返回值同 best_composite"""
+        scores, valid = self._composite(stats, min_trades)
+        # 同分时优先取有效组合，再按组合顺序取第一个
+        best = scores == scores.max()
+        best_index = int(np.argmax(best & valid)) if (best & valid).any() else int(np.argmax(best))
+        if not valid[best_index]:
+            return float(scores[best_index]), None, None
+        param_set = param_sets[best_index]
+        return float(scores[best_index]), self.parameters_for(param_set), self.backtest_stats(param_set)
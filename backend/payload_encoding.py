@@ -0,0 +1,99 @@
+"""
+图表数据的紧凑编码
+1. 列式编码：每个字段一个数组，替代逐行 to_dict('records') 重复键名；浮点数按指定精度四舍五入，NaN 输出为 null
+2. 日期编码为首根K线的epoch秒数 + 相邻K线间隔（以天或分钟为单位）的差分数组，前端累加还原
+3. 按客户端 Accept-Encoding 协商 br/gzip 压缩（brotli 为可选依赖，未安装时只用gzip）
+所有转换都在整列 numpy 数组上完成，不经过逐行的Python字典。
+"""
+import gzip
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+INTRADAY_UNIT = 60
+DAILY_UNIT = 86400
+# 小于该字节数的响应不压缩
+MIN_COMPRESS_BYTES = 1024
+
+
+def encode_dates(index: pd.Index, intraday: bool = False) -> Dict:
+    """
+    日期索引编码为 {'start': 首根K线epoch秒, 'unit': 秒数, 'deltas': [0, 相邻间隔...]}
+    时间按无时区的本地时间处理（视为UTC），前端同样以UTC格式化；非时间索引退回字符串标签
+    """
+    if not isinstance(index, pd.DatetimeIndex) or len(index) == 0:
+        return {'labels': [str(label) for label in index]}
+    unit = INTRADAY_UNIT if intraday else DAILY_UNIT
+    seconds = index.asi8 // 10 ** 9
+    if not intraday:
+        # 日线及以上只保留日期部分
+        seconds = seconds - seconds % DAILY_UNIT
+    deltas = np.empty(len(seconds), dtype=np.int64)
+    deltas[0] = 0
+    np.floor_divide(np.diff(seconds), unit, out=deltas[1:])
+    return {'start': int(seconds[0]), 'unit': unit, 'deltas': deltas.tolist()}
+
+
+def encode_column(values, precision: int) -> list:
+    """单列转换为JSON数组：整数原样输出，浮点数按精度四舍五入，NaN/inf 输出为 null"""
+    array = np.asarray(values)
+    if array.dtype.kind in 'iub':
+        return array.tolist()
+    array = array.astype(float, copy=False)
+    rounded = np.round(array, precision)
+    invalid = ~np.isfinite(array)
+    if not invalid.any():
+        return rounded.tolist()
+    column = rounded.astype(object)
+    column[invalid] = None
+    return column.tolist()
+
+
+def encode_columns(df: pd.DataFrame, columns: Iterable[str], precision: int) -> Dict[str, list]:
+    """DataFrame 的指定列编码为 {列名: 数组}；缺失的列输出全 null"""
+    encoded = {}
+    for name in columns:
+        if name in df.columns:
+            encoded[name] = encode_column(df[name].to_numpy(), precision)
+        else:
+            encoded[name] = [None] * len(df)
+    return encoded
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """根据 Accept-Encoding 选择压缩方式：优先br，其次gzip；q=0 表示拒绝"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(','):
+        parts = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[parts[0].lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    """按协商结果压缩；encoding为None时原样返回"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=5)
+    return body
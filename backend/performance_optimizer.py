@@ -15,9 +15,13 @@ import multiprocessing
 from functools import lru_cache
 import hashlib
 import pickle
+import inspect
 import gc
 import queue
 import sys
+import warnings
+
+import numpy as np
 
 # 全局性能配置
 PERFORMANCE_CONFIG = {
@@ -503,9 +507,131 @@ class SmartCache:
                 'memory_cache_limit': self.max_memory_items
             }
 
+def _check_evaluation_signature(func: Callable, with_resource: bool, name: str):
+    """评估函数须能以 (params) 调用，halving 时为 (params, resource)；签名不符时直接报错，而不是每组都记为负无穷"""
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):
+        return  # 部分内置函数无法获取签名，不检查
+    args = (None, None) if with_resource else (None,)
+    try:
+        signature.bind(*args)
+    except TypeError as e:
+        expected = '(参数, resource)' if with_resource else '(参数)'
+        raise TypeError(f"{name} 须能以 {expected} 调用: {e}") from None
+
+
+def _evaluate_one(evaluation_func: Callable, params: Dict[str, Any], resource: Optional[float]) -> float:
+    """进程池任务：评估单组参数，异常记为负无穷（必须是顶层函数才能被pickle）"""
+    try:
+        score = evaluation_func(params) if resource is None else evaluation_func(params, resource)
+        return float(score)
+    except Exception:
+        return float('-inf')
+
+
+class _ParameterSpace:
+    """参数网格的混合进制编号：按编号解码参数组合，不展开完整的 itertools.product"""
+
+    def __init__(self, parameter_space: Dict[str, List[Any]]):
+        self.names = list(parameter_space.keys())
+        self.values = [list(values) for values in parameter_space.values()]
+        self.shape = tuple(len(values) for values in self.values)
+        self.size = int(np.prod(self.shape, dtype=np.int64)) if self.shape else 0
+
+    def params(self, index: int) -> Dict[str, Any]:
+        positions = np.unravel_index(index, self.shape)
+        return {name: values[pos] for name, values, pos in zip(self.names, self.values, positions)}
+
+    def coordinates(self, indices) -> np.ndarray:
+        """各维取值下标归一化到[0, 1]，作为高斯过程的输入"""
+        positions = np.stack(np.unravel_index(np.asarray(indices, dtype=np.int64), self.shape), axis=1)
+        return positions / np.maximum(np.array(self.shape) - 1, 1)
+
+    def sample(self, rng: np.random.Generator, count: int, exclude=()) -> np.ndarray:
+        """不放回地随机抽取 count 个未评估过的编号"""
+        exclude = set(exclude)
+        count = min(count, self.size - len(exclude))
+        if count <= 0:
+            return np.empty(0, dtype=np.int64)
+        if self.size <= 200_000:
+            pool = np.setdiff1d(np.arange(self.size, dtype=np.int64), np.fromiter(exclude, np.int64, len(exclude)))
+            return rng.choice(pool, count, replace=False)
+        chosen = []
+        while len(chosen) < count:
+            for index in rng.integers(0, self.size, 2 * count).tolist():
+                if index not in exclude:
+                    exclude.add(index)
+                    chosen.append(index)
+                    if len(chosen) == count:
+                        break
+        return np.array(chosen, dtype=np.int64)
+
+
+class _SearchEvaluator:
+    """按参数编号批量评分，带结果缓存；单组评估函数在进程池中执行，批量评估函数在本进程调用"""
+
+    def __init__(self, space: _ParameterSpace, evaluation_func, batch_evaluation_func, executor):
+        self.space = space
+        self.evaluation_func = evaluation_func
+        self.batch_evaluation_func = batch_evaluation_func
+        self.executor = executor
+        self.scores_cache: Dict[Tuple[int, Optional[float]], float] = {}
+        self.evaluations = 0
+
+    def __call__(self, indices, resource: Optional[float] = None) -> np.ndarray:
+        indices = [int(index) for index in indices]
+        pending = list(dict.fromkeys(index for index in indices if (index, resource) not in self.scores_cache))
+        if pending:
+            param_sets = [self.space.params(index) for index in pending]
+            if self.batch_evaluation_func is not None:
+                args = (param_sets,) if resource is None else (param_sets, resource)
+                scores = [float(score) for score in self.batch_evaluation_func(*args)]
+            else:
+                chunksize = max(1, len(param_sets) // (getattr(self.executor, '_max_workers', 1) * 4))
+                scores = list(self.executor.map(_evaluate_one, [self.evaluation_func] * len(param_sets),
+                                                param_sets, [resource] * len(param_sets), chunksize=chunksize))
+            for index, score in zip(pending, scores):
+                self.scores_cache[(index, resource)] = score
+            self.evaluations += len(pending)
+        return np.array([self.scores_cache[(index, resource)] for index in indices], dtype=float)
+
+
+def _expected_improvement_batch(space: _ParameterSpace, rng: np.random.Generator, evaluated: List[int],
+                                scores: List[float], count: int, max_candidates: int = 4096) -> np.ndarray:
+    """用高斯过程拟合已评估的得分，返回期望提升（EI）最大的 count 个未评估组合"""
+    from sklearn.gaussian_process import GaussianProcessRegressor
+    from sklearn.gaussian_process.kernels import ConstantKernel, Matern, WhiteKernel
+    from scipy.special import ndtr
+    
+    candidates = space.sample(rng, max_candidates, exclude=evaluated)
+    y = np.asarray(scores, dtype=float)
+    finite = np.isfinite(y)
+    if len(candidates) <= count or finite.sum() < 2:
+        return candidates[:count]
+    # 评估失败的组合按已观测的最低分处理，让模型避开这片区域
+    y = np.where(finite, y, y[finite].min())
+    
+    kernel = ConstantKernel(1.0) * Matern(length_scale=np.full(len(space.shape), 0.3), nu=2.5) + WhiteKernel(1e-3)
+    model = GaussianProcessRegressor(kernel=kernel, normalize_y=True, random_state=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model.fit(space.coordinates(evaluated), y)
+        mean, std = model.predict(space.coordinates(candidates), return_std=True)
+    
+    improvement = mean - y.max() - 0.01 * np.std(y)
+    std = np.maximum(std, 1e-12)
+    z = improvement / std
+    expected = improvement * ndtr(z) + std * np.exp(-0.5 * z ** 2) / np.sqrt(2 * np.pi)
+    return candidates[np.argsort(-expected, kind='stable')[:count]]
+
+
 class OptimizedParameterSearch:
     """优化参数搜索 - 高效搜索最佳参数"""
     
+    SEARCH_STRATEGIES = ('grid', 'random', 'halving', 'bayesian')
+    DEFAULT_SEARCH_BUDGET = 200
+    
     def __init__(self, max_workers: int = 32):
         """
         初始化参数搜索
@@ -518,15 +644,38 @@ class OptimizedParameterSearch:
     
     def search(self, 
               parameter_space: Dict[str, List[Any]], 
-              evaluation_func: Callable[[Dict[str, Any]], float],
-              cache_key: Optional[str] = None) -> Dict[str, Any]:
+              evaluation_func: Optional[Callable[[Dict[str, Any]], float]] = None,
+              cache_key: Optional[str] = None,
+              batch_evaluation_func: Optional[Callable[[List[Dict[str, Any]]], List[float]]] = None,
+              strategy: str = 'grid',
+              budget: Optional[int] = None,
+              early_stopping_rounds: Optional[int] = None,
+              min_resource: Optional[float] = None,
+              reduction_factor: int = 3,
+              random_state: Optional[int] = None) -> Dict[str, Any]:
         """
         搜索最佳参数
         
         Args:
             parameter_space: 参数空间，键为参数名，值为可能的参数值列表
             evaluation_func: 评估函数，接受参数字典，返回评分（越高越好）
-            cache_key: 缓存键，如果提供则尝试使用缓存
+            cache_key: 缓存键，如果提供则尝试使用缓存；实际缓存键还包含搜索策略、预算与随机种子等，
+                       不同策略或采样参数的结果互不复用
+            batch_evaluation_func: 批量评估函数，接受全部参数字典列表，返回对应评分；
+                                   提供时一次调用评估整个网格（如基于 ParameterGridEvaluator），不再使用线程池
+            strategy: 搜索策略，见 SEARCH_STRATEGIES
+                      'grid' 穷举全部组合（线程池）；
+                      'random' 在预算内随机抽样；
+                      'halving' 逐次减半：先用少量资源评估全部候选，只把前 1/reduction_factor 晋级到更多资源；
+                      'bayesian' 高斯过程 + 期望提升（scikit-learn）选择下一批组合
+                      非 grid 策略的单组评估函数在进程池中执行，须为可pickle的顶层函数，否则退回线程池
+            budget: 最多评估的组合数（halving 为初始候选数），默认 min(网格大小, DEFAULT_SEARCH_BUDGET)
+            early_stopping_rounds: random/bayesian 连续多少轮最佳得分没有提升即停止
+            min_resource: halving 第一轮使用的资源比例，默认 1/reduction_factor^2；
+                          halving 的评估函数签名为 (params, resource)，批量评估函数为 (param_sets, resource)，
+                          resource ∈ (0, 1] 表示使用的股票/年份比例，由调用方解释
+            reduction_factor: halving 每轮保留比例的倒数，同时也是资源增长倍数
+            random_state: 随机种子
         
         Returns:
             最佳参数组合
@@ -535,11 +684,20 @@ class OptimizedParameterSearch:
         
         # 尝试从缓存获取
         if cache_key:
+            cache_key = self._search_cache_key(cache_key, strategy, budget, early_stopping_rounds,
+                                               min_resource, reduction_factor, random_state)
             cached_result = self.cache.get(cache_key)
             if cached_result:
                 print(f"📂 使用缓存的参数搜索结果: {cache_key}")
                 return cached_result
         
+        if strategy not in self.SEARCH_STRATEGIES:
+            raise ValueError(f"未知的搜索策略: {strategy}，可选: {', '.join(self.SEARCH_STRATEGIES)}")
+        if strategy != 'grid':
+            return self._adaptive_search(start_time, parameter_space, evaluation_func, batch_evaluation_func,
+                                         cache_key, strategy, budget, early_stopping_rounds, min_resource,
+                                         reduction_factor, random_state)
+        
         import itertools
         
         # 生成所有参数组合
@@ -547,10 +705,23 @@ class OptimizedParameterSearch:
         param_values = list(parameter_space.values())
         combinations = list(itertools.product(*param_values))
         
-        print(f"🔍 参数搜索: {len(combinations)} 种组合 (线程数: {self.max_workers})")
-        
         best_params = None
         best_score = float('-inf')
+        
+        if batch_evaluation_func is not None:
+            print(f"🔍 参数搜索: {len(combinations)} 种组合 (批量评估)")
+            param_sets = [dict(zip(param_names, values)) for values in combinations]
+            for params, score in zip(param_sets, batch_evaluation_func(param_sets)):
+                if score > best_score:
+                    best_score = score
+                    best_params = params
+            return self._finish_search(start_time, best_params, best_score, len(combinations), cache_key)
+        
+        if evaluation_func is None:
+            raise ValueError("需要提供 evaluation_func 或 batch_evaluation_func")
+        
+        print(f"🔍 参数搜索: {len(combinations)} 种组合 (线程数: {self.max_workers})")
+        
         progress = ProgressTracker(len(combinations), "参数搜索")
         
         # 内存中保存最近的评估结果，避免重复计算
@@ -604,19 +775,143 @@ class OptimizedParameterSearch:
                 except Exception:
                     progress.update()
         
-        # 计算搜索时间
-        search_time = time.time() - start_time
-        
         # 显示评估缓存命中率
         cache_hit_rate = eval_cache_hits / len(combinations) if combinations else 0
         print(f"📊 评估缓存命中率: {cache_hit_rate:.1%} ({eval_cache_hits}/{len(combinations)})")
         
+        return self._finish_search(start_time, best_params, best_score, len(combinations), cache_key)
+    
+    def _adaptive_search(self, start_time: float, parameter_space: Dict[str, List[Any]],
+                         evaluation_func: Optional[Callable], batch_evaluation_func: Optional[Callable],
+                         cache_key: Optional[str], strategy: str, budget: Optional[int],
+                         early_stopping_rounds: Optional[int], min_resource: Optional[float],
+                         reduction_factor: int, random_state: Optional[int]) -> Dict[str, Any]:
+        """random / halving / bayesian 搜索：按编号抽样参数组合，不展开完整网格"""
+        if evaluation_func is None and batch_evaluation_func is None:
+            raise ValueError("需要提供 evaluation_func 或 batch_evaluation_func")
+        if batch_evaluation_func is not None:
+            _check_evaluation_signature(batch_evaluation_func, strategy == 'halving', 'batch_evaluation_func')
+        else:
+            _check_evaluation_signature(evaluation_func, strategy == 'halving', 'evaluation_func')
+        
+        space = _ParameterSpace(parameter_space)
+        budget = min(space.size, budget or self.DEFAULT_SEARCH_BUDGET)
+        rng = np.random.default_rng(random_state)
+        workers = max(1, min(self.max_workers, multiprocessing.cpu_count()))
+        
+        executor = None
+        if batch_evaluation_func is None:
+            try:
+                pickle.dumps(evaluation_func)
+                executor = ProcessPoolExecutor(max_workers=workers)
+                pool_name = f"进程数: {workers}"
+            except Exception:
+                # lambda/闭包无法传给子进程
+                executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                pool_name = f"评估函数无法pickle, 线程数: {self.max_workers}"
+        else:
+            pool_name = "批量评估"
+        print(f"🔍 参数搜索[{strategy}]: 网格 {space.size} 种组合, 预算 {budget} ({pool_name})")
+        
+        evaluate = _SearchEvaluator(space, evaluation_func, batch_evaluation_func, executor)
+        try:
+            if budget <= 0:
+                best_index, best_score = None, float('-inf')
+            elif strategy == 'halving':
+                best_index, best_score = self._successive_halving(space, evaluate, rng, budget,
+                                                                  min_resource, reduction_factor)
+            else:
+                round_size = max(2 * workers, 8)
+                best_index, best_score = self._sequential_search(space, evaluate, rng, budget, round_size,
+                                                                 early_stopping_rounds, strategy == 'bayesian')
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        if budget > 0 and (best_index is None or not np.isfinite(best_score)):
+            raise RuntimeError(f"{strategy} 搜索评估的 {evaluate.evaluations} 组参数得分均非有限值，"
+                               f"请检查评估函数")
+        best_params = space.params(best_index) if best_index is not None else None
+        return self._finish_search(start_time, best_params, best_score, space.size, cache_key,
+                                   strategy, evaluate.evaluations)
+    
+    @staticmethod
+    def _successive_halving(space: _ParameterSpace, evaluate: _SearchEvaluator, rng: np.random.Generator,
+                            budget: int, min_resource: Optional[float], reduction_factor: int) -> Tuple[int, float]:
+        """逐次减半：每轮资源乘以 reduction_factor，只保留得分前 1/reduction_factor 的候选"""
+        eta = max(2, int(reduction_factor))
+        resource = min(1.0, min_resource if min_resource else eta ** -2)
+        candidates = space.sample(rng, budget)
+        while True:
+            scores = evaluate(candidates, resource)
+            if resource >= 1.0:
+                break
+            if len(candidates) > 1:
+                keep = max(1, int(np.ceil(len(candidates) / eta)))
+                order = np.argsort(-scores, kind='stable')[:keep]
+                candidates = candidates[order]
+                print(f"  📉 资源 {resource:.2f}: 晋级 {keep} 个候选")
+            resource = min(1.0, resource * eta)
+        best = int(np.argmax(np.where(np.isfinite(scores), scores, -np.inf)))
+        return int(candidates[best]), float(scores[best])
+    
+    @staticmethod
+    def _sequential_search(space: _ParameterSpace, evaluate: _SearchEvaluator, rng: np.random.Generator,
+                           budget: int, round_size: int, early_stopping_rounds: Optional[int],
+                           bayesian: bool) -> Tuple[int, float]:
+        """按轮评估：random 每轮随机抽样；bayesian 先随机初始化，之后每轮取期望提升最大的组合"""
+        evaluated, scores = [], []
+        best_index, best_score = None, float('-inf')
+        stale_rounds = 0
+        initial = min(budget, max(round_size, 2 * len(space.shape) + 1))
+        while len(evaluated) < budget:
+            count = min(round_size, budget - len(evaluated))
+            if bayesian and len(evaluated) >= initial:
+                indices = _expected_improvement_batch(space, rng, evaluated, scores, count)
+            else:
+                indices = space.sample(rng, count, exclude=evaluated)
+            if len(indices) == 0:
+                break
+            round_scores = evaluate(indices)
+            evaluated.extend(int(index) for index in indices)
+            scores.extend(round_scores.tolist())
+            
+            round_best = int(np.argmax(np.where(np.isfinite(round_scores), round_scores, -np.inf)))
+            if round_scores[round_best] > best_score:
+                best_index, best_score = int(indices[round_best]), float(round_scores[round_best])
+                stale_rounds = 0
+            else:
+                stale_rounds += 1
+                if early_stopping_rounds and stale_rounds >= early_stopping_rounds:
+                    print(f"  ⏹️ 连续 {stale_rounds} 轮没有提升，提前停止 (已评估 {len(evaluated)} 组)")
+                    break
+        return best_index, best_score
+
+    @staticmethod
+    def _search_cache_key(cache_key: str, strategy: str, budget: Optional[int],
+                          early_stopping_rounds: Optional[int], min_resource: Optional[float],
+                          reduction_factor: int, random_state: Optional[int]) -> str:
+        """调用方的缓存键加上影响搜索结果的参数（用作缓存文件名，只用下划线分隔）"""
+        return (f"{cache_key}_{strategy}_b{budget}_s{random_state}"
+                f"_e{early_stopping_rounds}_m{min_resource}_r{reduction_factor}")
+
+    def _finish_search(self, start_time: float, best_params: Optional[Dict[str, Any]], best_score: float,
+                       search_space_size: int, cache_key: Optional[str], strategy: str = 'grid',
+                       evaluations: Optional[int] = None) -> Dict[str, Any]:
+        """汇总搜索结果并写入缓存"""
+        # 计算搜索时间
+        search_time = time.time() - start_time
+        if evaluations is None:
+            evaluations = search_space_size
+        
         result = {
             'best_parameters': best_params,
             'best_score': best_score,
-            'search_space_size': len(combinations),
+            'search_space_size': search_space_size,
             'search_time': search_time,
-            'search_speed': len(combinations) / search_time if search_time > 0 else 0
+            'search_speed': evaluations / search_time if search_time > 0 else 0,
+            'strategy': strategy,
+            'evaluations': evaluations
         }
         
         print(f"✅ 参数搜索完成! 耗时: {search_time:.2f}秒, 最佳得分: {best_score:.3f}")
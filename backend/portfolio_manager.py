@@ -7,19 +7,32 @@
 1. 持仓列表的增删改查
 2. 深度扫描和操作建议
 3. 补仓价、预期到顶日期、卖出提醒等分析
+4. 持仓扫描在进程池中并行执行；日线文件与持仓参数均未变化的持仓复用上次的分析结果
 """
 
 import os
 import json
+import threading
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 import data_loader
 import indicators
 import strategies
 from adjustment_processor import create_adjustment_config, create_adjustment_processor
 import backtester
+from data_handler import get_daily_file_path
+from response_cache import file_signature, make_key
+from config import PORTFOLIO_SCAN_WORKERS
+
+
+def _analyze_position(manager: 'PortfolioManager', position: Dict) -> Tuple[str, Dict]:
+    """进程池任务：深度分析单个持仓（顶层函数才能被 ProcessPoolExecutor pickle）"""
+    return position['stock_code'], manager.analyze_position_deep(
+        position['stock_code'], position['purchase_price'], position['purchase_date'])
+
 
 class PortfolioManager:
     def __init__(self, data_path: str = None):
@@ -52,8 +65,7 @@ class PortfolioManager:
     
     def save_portfolio(self, portfolio: List[Dict]):
         """保存持仓列表"""
-        with open(self.portfolio_file, 'w', encoding='utf-8') as f:
-            json.dump(portfolio, f, ensure_ascii=False, indent=2)
+        _write_json_atomic(self.portfolio_file, portfolio)
     
     def add_position(self, stock_code: str, purchase_price: float, quantity: int, 
                     purchase_date: str = None, note: str = "") -> Dict:
@@ -103,6 +115,26 @@ class PortfolioManager:
                 self.save_portfolio(portfolio)
                 return True
         return False
+
+    def update_positions(self, updates: Dict[str, Dict]) -> int:
+        """批量更新多个持仓（{股票代码: 字段}），只读写一次持仓文件，返回更新的持仓数"""
+        if not updates:
+            return 0
+        portfolio = self.load_portfolio()
+        updated_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        count = 0
+        for position in portfolio:
+            fields = updates.get(position['stock_code'])
+            if fields is None:
+                continue
+            for key, value in fields.items():
+                if key in position:
+                    position[key] = value
+            position['updated_time'] = updated_time
+            count += 1
+        if count:
+            self.save_portfolio(portfolio)
+        return count
     
     def get_stock_data(self, stock_code: str, adjustment_type: str = 'forward') -> Optional[pd.DataFrame]:
         """获取股票数据 - 使用统一数据处理模块"""
@@ -199,125 +231,157 @@ class PortfolioManager:
     
     def save_scan_cache(self, cache_data: Dict):
         """保存扫描缓存"""
-        with open(self.cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, ensure_ascii=False, indent=2)
-    
-    def is_cache_valid(self, cache_time: str) -> bool:
-        """检查缓存是否有效（一个交易日内）"""
-        try:
-            cache_dt = datetime.strptime(cache_time, '%Y-%m-%d %H:%M:%S')
-            current_dt = datetime.now()
-            
-            # 如果是同一天，缓存有效
-            if cache_dt.date() == current_dt.date():
-                return True
-            
-            # 如果缓存是昨天的，但今天是周末，缓存仍然有效
-            yesterday = current_dt.date() - timedelta(days=1)
-            if cache_dt.date() == yesterday:
-                # 周六(5)和周日(6)使用上一个交易日的缓存
-                if current_dt.weekday() in [5, 6]:
-                    return True
-                # 周一使用周五的缓存
-                if current_dt.weekday() == 0 and cache_dt.weekday() == 4:
-                    return True
-            
-            return False
-        except Exception:
-            return False
-    
-    def get_cached_scan_results(self) -> Optional[Dict]:
-        """获取缓存的扫描结果"""
-        cache = self.load_scan_cache()
-        
-        if 'scan_time' in cache and 'results' in cache:
-            if self.is_cache_valid(cache['scan_time']):
-                return cache['results']
-        
-        return None
-    
-    def scan_all_positions(self, force_refresh: bool = False) -> Dict:
-        """扫描所有持仓"""
-        # 智能缓存策略：先尝试从缓存获取
-        if not force_refresh:
-            cached_results = self.get_cached_scan_results()
-            if cached_results:
-                # 添加缓存标识和提示信息
-                cached_results['from_cache'] = True
-                cached_results['cache_info'] = f'使用缓存数据（{cached_results["scan_time"]}），提升响应速度'
-                print(f"📋 使用缓存的持仓扫描结果: {cached_results['scan_time']}")
-                return cached_results
-        
-        # 执行实际扫描
+        _write_json_atomic(self.cache_file, cache_data)
+
+    def position_cache_key(self, position: Dict) -> str:
+        """单个持仓的缓存键：日线文件签名 + 影响分析结果的持仓参数"""
+        return make_key(file_signature([get_daily_file_path(position['stock_code'])]),
+                        position['purchase_price'], position['purchase_date'])
+
+    @staticmethod
+    def summarize_positions(position_results: List[Dict]) -> Dict:
+        """按已完成的持仓结果统计汇总"""
+        summary = {
+            'profitable_count': 0,
+            'loss_count': 0,
+            'total_profit_loss': 0,
+            'high_risk_count': 0,
+            'action_required_count': 0
+        }
+        for analysis in position_results:
+            if 'error' in analysis:
+                continue
+            profit_loss = analysis['profit_loss_pct']
+            if profit_loss > 0:
+                summary['profitable_count'] += 1
+            else:
+                summary['loss_count'] += 1
+            summary['total_profit_loss'] += profit_loss
+
+            if (analysis.get('risk_assessment') or {}).get('risk_level') == 'HIGH':
+                summary['high_risk_count'] += 1
+            if (analysis.get('position_advice') or {}).get('action') in ['REDUCE', 'STOP_LOSS', 'ADD']:
+                summary['action_required_count'] += 1
+        return summary
+
+    def iter_scan_positions(self, force_refresh: bool = False,
+                            max_workers: int = PORTFOLIO_SCAN_WORKERS) -> Iterator[Dict]:
+        """
+        扫描所有持仓，每完成一个持仓产出一条进度事件，最后产出完整结果：
+        {'type': 'position', 'completed', 'total', 'position', 'summary'} ... {'type': 'done', 'results'}
+        日线文件与买入价/日期均未变化的持仓直接复用上次的分析结果（force_refresh 时全部重新分析），
+        其余持仓在进程池中并行分析；持仓的 last_analysis_time 与扫描缓存在全部完成后各写入一次
+        """
         print(f"🔍 开始执行持仓深度扫描...")
         start_time = datetime.now()
-        
         portfolio = self.load_portfolio()
+        portfolio_by_code = {position['stock_code']: position for position in portfolio}
+        previous = {} if force_refresh else self.load_scan_cache().get('positions', {})
+
+        analyses: Dict[str, Dict] = {}
+        cache_entries: Dict[str, Dict] = {}
+        pending = []
+        for position in portfolio:
+            stock_code = position['stock_code']
+            key = self.position_cache_key(position)
+            entry = previous.get(stock_code)
+            if entry is not None and entry.get('key') == key:
+                analysis = dict(entry['analysis'])
+                analysis['holding_days'] = (start_time - datetime.strptime(position['purchase_date'], '%Y-%m-%d')).days
+                analyses[stock_code] = analysis
+                cache_entries[stock_code] = {'key': key, 'analysis': entry['analysis']}
+            else:
+                pending.append((position, key))
+
+        def position_event(stock_code: str) -> Dict:
+            return {
+                'type': 'position',
+                'completed': len(analyses),
+                'total': len(portfolio),
+                'position': {**portfolio_by_code[stock_code], **analyses[stock_code]},
+                'summary': self.summarize_positions(list(analyses.values())),
+            }
+
+        for stock_code in list(analyses):
+            yield position_event(stock_code)
+
+        keys = {position['stock_code']: key for position, key in pending}
+
+        def finish(stock_code: str, analysis: Dict):
+            analyses[stock_code] = analysis
+            if 'error' not in analysis:
+                # 失败的持仓不缓存，下次扫描重试
+                cache_entries[stock_code] = {'key': keys[stock_code], 'analysis': analysis}
+            print(f"📊 分析持仓 {len(analyses)}/{len(portfolio)}: {stock_code}")
+
+        if len(pending) > 1 and max_workers > 1:
+            executor = ProcessPoolExecutor(max_workers=min(max_workers, len(pending)))
+            try:
+                futures = {executor.submit(_analyze_position, self, position): position['stock_code']
+                           for position, _ in pending}
+                for future in as_completed(futures):
+                    stock_code = futures[future]
+                    try:
+                        _, analysis = future.result()
+                    except Exception as e:
+                        analysis = {'error': f'分析失败: {str(e)}'}
+                    finish(stock_code, analysis)
+                    yield position_event(stock_code)
+            finally:
+                # 客户端断开时生成器被关闭，未开始的持仓不再分析
+                executor.shutdown(wait=True, cancel_futures=True)
+        else:
+            for position, _ in pending:
+                stock_code, analysis = _analyze_position(self, position)
+                finish(stock_code, analysis)
+                yield position_event(stock_code)
+
+        positions = [{**position, **analyses[position['stock_code']]} for position in portfolio]
+        scan_duration = (datetime.now() - start_time).total_seconds()
         results = {
             'scan_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
             'total_positions': len(portfolio),
-            'positions': [],
-            'summary': {
-                'profitable_count': 0,
-                'loss_count': 0,
-                'total_profit_loss': 0,
-                'high_risk_count': 0,
-                'action_required_count': 0
-            },
-            'from_cache': False
+            'positions': positions,
+            'summary': self.summarize_positions(positions),
+            'analyzed_count': len(pending),
+            'reused_count': len(portfolio) - len(pending),
+            'from_cache': bool(portfolio) and not pending,
+            'scan_duration': f"{scan_duration:.1f}秒",
         }
-        
-        # 逐个分析持仓
-        for i, position in enumerate(portfolio, 1):
-            print(f"📊 分析持仓 {i}/{len(portfolio)}: {position['stock_code']}")
-            
-            analysis = self.analyze_position_deep(
-                position['stock_code'],
-                position['purchase_price'],
-                position['purchase_date']
-            )
-            
-            if 'error' not in analysis:
-                # 更新持仓的最后分析时间
-                self.update_position(position['stock_code'], 
-                                   last_analysis_time=analysis['analysis_time'])
-                
-                # 统计汇总
-                profit_loss = analysis['profit_loss_pct']
-                if profit_loss > 0:
-                    results['summary']['profitable_count'] += 1
-                else:
-                    results['summary']['loss_count'] += 1
-                
-                results['summary']['total_profit_loss'] += profit_loss
-                
-                if analysis['risk_assessment']['risk_level'] == 'HIGH':
-                    results['summary']['high_risk_count'] += 1
-                
-                if analysis['position_advice']['action'] in ['REDUCE', 'STOP_LOSS', 'ADD']:
-                    results['summary']['action_required_count'] += 1
-            
-            # 合并持仓基本信息和分析结果
-            position_result = {**position, **analysis}
-            results['positions'].append(position_result)
-        
-        # 计算扫描耗时
-        end_time = datetime.now()
-        scan_duration = (end_time - start_time).total_seconds()
-        results['scan_duration'] = f"{scan_duration:.1f}秒"
-        
-        # 保存到缓存
-        cache_data = {
+        if results['from_cache']:
+            results['cache_info'] = '日线数据与持仓均未变化，使用上次的分析结果'
+
+        # 批量写入：持仓文件与扫描缓存各一次原子写入
+        self.update_positions({stock_code: {'last_analysis_time': analysis['analysis_time']}
+                               for stock_code, analysis in analyses.items()
+                               if 'error' not in analysis and analysis.get('analysis_time')})
+        self.save_scan_cache({
             'scan_time': results['scan_time'],
-            'results': results
-        }
-        self.save_scan_cache(cache_data)
-        
-        print(f"✅ 持仓扫描完成，耗时 {scan_duration:.1f}秒，已保存到缓存")
-        
+            'results': results,
+            'positions': cache_entries,
+        })
+
+        print(f"✅ 持仓扫描完成，分析 {len(pending)} 个、复用 {results['reused_count']} 个，"
+              f"耗时 {scan_duration:.1f}秒")
+        yield {'type': 'done', 'results': results}
+
+    def scan_all_positions(self, force_refresh: bool = False) -> Dict:
+        """扫描所有持仓，返回完整结果"""
+        results = None
+        for event in self.iter_scan_positions(force_refresh):
+            if event['type'] == 'done':
+                results = event['results']
         return results
 
 
+def _write_json_atomic(path: str, data):
+    """先写临时文件再替换，读取方不会看到写了一半的文件"""
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
 # 便捷函数
 def create_portfolio_manager() -> PortfolioManager:
     """创建持仓管理器实例"""
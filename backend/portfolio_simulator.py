@@ -0,0 +1,213 @@
+"""
+按K线同步的组合回测核心 - 多只股票共用一个账户资金
+1. 信号（得分、置信度）与价格预先对齐为 时间 × 股票 的数组，不再逐时点查询DataFrame
+2. 开仓候选点一次性向量化筛出；持仓的平仓点（止损/止盈/持仓天数到期）在开仓时对后续K线切片一次求出；
+   事件按 (时间, 股票顺序) 放入堆中依次处理，只有开仓需要读取当时的现金
+3. 权益曲线、回撤、逐根收益率在事件处理完后按数组计算
+交易规则与 MultiTimeframeBacktester 逐时点循环一致，单只股票时结果逐笔相同
+"""
+import heapq
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+DAY_NS = 24 * 3600 * 10 ** 9
+
+
+def _ffill(values: np.ndarray, initial: float) -> np.ndarray:
+    """沿第0维前向填充NaN，开头的NaN填为initial"""
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    positions = np.where(valid, np.arange(len(values)).reshape((-1,) + (1,) * (values.ndim - 1)), -1)
+    positions = np.maximum.accumulate(positions, axis=0)
+    filled = np.take_along_axis(values, np.maximum(positions, 0), axis=0)
+    return np.where(positions >= 0, filled, initial)
+
+
+def _find_exit(bars: np.ndarray, bar_days: np.ndarray, prices: np.ndarray, days: np.ndarray, entry: int,
+               direction: str, stop_price: float, target_price: float, max_hold: int):
+    """开仓后第一根触发止损/止盈/时间止损的K线，返回 (时间下标, 原因)；数据结束前未触发返回 (None, None)"""
+    start = np.searchsorted(bars, entry, side='right')
+    # 持仓天数到期的第一根K线之后不必再看
+    limit = np.searchsorted(bar_days, days[entry] + max_hold, side='left')
+    window = bars[start:max(limit, start) + 1]
+    if len(window) == 0:
+        return None, None
+    window_prices = prices[window]
+    if direction == 'long':
+        stop_hit = window_prices <= stop_price
+        target_hit = window_prices >= target_price
+    else:
+        stop_hit = window_prices >= stop_price
+        target_hit = window_prices <= target_price
+    time_hit = days[window] - days[entry] >= max_hold
+    triggered = np.flatnonzero(stop_hit | target_hit | time_hit)
+    if len(triggered) == 0:
+        return None, None
+    k = triggered[0]
+    reason = 'stop_loss' if stop_hit[k] else ('take_profit' if target_hit[k] else 'time_stop')
+    return int(window[k]), reason
+
+
+def simulate_portfolio(times: pd.DatetimeIndex,
+                       prices: np.ndarray,
+                       scores: np.ndarray,
+                       confidences: np.ndarray,
+                       stock_codes: Sequence[str],
+                       config: Dict) -> Dict:
+    """
+    在统一时间轴上回测一个账户
+    prices/scores/confidences 形状为 (时间数, 股票数)，股票在某时点无K线时价格为NaN；
+    config 使用 MultiTimeframeBacktester.backtest_config 的键。
+    返回与逐时点回测相同结构的账户状态（capital/positions/trades/equity_curve/daily_returns/回撤），
+    可直接交给 _calculate_performance_metrics
+    """
+    prices = np.asarray(prices, dtype=float).reshape(len(times), len(stock_codes))
+    scores = np.asarray(scores, dtype=float).reshape(prices.shape)
+    confidences = np.asarray(confidences, dtype=float).reshape(prices.shape)
+    num_times, num_stocks = prices.shape
+    initial_capital = config['initial_capital']
+    commission_rate = config['commission_rate']
+    days = np.asarray(times.normalize().asi8 // DAY_NS) if num_times else np.zeros(0, dtype=np.int64)
+
+    with np.errstate(invalid='ignore'):
+        tradable = np.isfinite(prices) & (prices > 0)
+        can_open = (tradable & (np.abs(scores) > config['entry_score_threshold'])
+                    & (confidences > config['entry_confidence_threshold']))
+    bars = [np.flatnonzero(tradable[:, i]) for i in range(num_stocks)]
+    bar_days = [days[stock_bars] for stock_bars in bars]
+    candidates = [np.flatnonzero(can_open[:, i]) for i in range(num_stocks)]
+
+    def next_candidate(i, after):
+        k = np.searchsorted(candidates[i], after, side='right')
+        return int(candidates[i][k]) if k < len(candidates[i]) else None
+
+    heap = []
+    for i in range(num_stocks):
+        first = next_candidate(i, -1)
+        if first is not None:
+            heap.append((first, i))
+    heapq.heapify(heap)
+
+    capital = initial_capital
+    positions: Dict[int, Dict] = {}
+    trades: List[Dict] = []
+    cash_changes = np.full(num_times, np.nan)
+    holdings = []  # [股票下标, 开仓下标, 平仓下标或None, 股数]
+    open_holdings: Dict[int, List] = {}
+
+    while heap:
+        t, i = heapq.heappop(heap)
+        stock_code = stock_codes[i]
+        price = prices[t, i]
+        position = positions.get(i)
+        if position is None:
+            signal_score = scores[t, i]
+            position_size = min(config['max_position_size'], abs(signal_score) * 0.5)
+            available_capital = capital * position_size
+            commission = available_capital * commission_rate
+            net_capital = available_capital - commission
+            shares = int(net_capital / price / 100) * 100
+            if shares <= 0:
+                following = next_candidate(i, t)
+                if following is not None:
+                    heapq.heappush(heap, (following, i))
+                continue
+            actual_cost = shares * price + commission
+            direction = 'long' if signal_score > 0 else 'short'
+            if signal_score > 0:
+                stop_price = price * (1 - config['stop_loss_pct'])
+                target_price = price * (1 + config['take_profit_pct'])
+            else:
+                stop_price = price * (1 + config['stop_loss_pct'])
+                target_price = price * (1 - config['take_profit_pct'])
+            exit_index, exit_reason = _find_exit(bars[i], bar_days[i], prices[:, i], days, t, direction,
+                                                 stop_price, target_price, config['max_hold_periods'])
+            positions[i] = {
+                'shares': shares,
+                'entry_price': price,
+                'entry_time': times[t],
+                'entry_signal_score': signal_score,
+                'stop_loss_price': stop_price,
+                'take_profit_price': target_price,
+                'direction': direction,
+                'exit_reason': exit_reason
+            }
+            capital -= actual_cost
+            cash_changes[t] = capital
+            open_holdings[i] = [i, t, None, shares]
+            holdings.append(open_holdings[i])
+            trades.append({
+                'stock_code': stock_code,
+                'action': 'open',
+                'direction': direction,
+                'shares': shares,
+                'price': price,
+                'time': times[t],
+                'signal_score': signal_score,
+                'cost': actual_cost
+            })
+            if exit_index is not None:
+                heapq.heappush(heap, (exit_index, i))
+        else:
+            shares = position['shares']
+            entry_price = position['entry_price']
+            if position['direction'] == 'long':
+                gross_profit = shares * (price - entry_price)
+            else:
+                gross_profit = shares * (entry_price - price)
+            commission = shares * price * commission_rate
+            net_profit = gross_profit - commission
+            proceeds = shares * price - commission
+            capital += proceeds
+            cash_changes[t] = capital
+            open_holdings.pop(i)[2] = t
+            trades.append({
+                'stock_code': stock_code,
+                'action': 'close',
+                'direction': position['direction'],
+                'shares': shares,
+                'entry_price': entry_price,
+                'exit_price': price,
+                'entry_time': position['entry_time'],
+                'exit_time': times[t],
+                'gross_profit': gross_profit,
+                'net_profit': net_profit,
+                'return_pct': net_profit / (shares * entry_price),
+                'close_reason': position['exit_reason'],
+                'proceeds': proceeds
+            })
+            del positions[i]
+            # 平仓的K线上不再开仓
+            following = next_candidate(i, t)
+            if following is not None:
+                heapq.heappush(heap, (following, i))
+
+    # 权益 = 现金 + 持仓按最近价格计算的市值（开仓K线计入，平仓K线不计入）
+    cash = _ffill(cash_changes, initial_capital)
+    held = np.zeros((num_times, num_stocks))
+    for i, entry, exit_index, shares in holdings:
+        held[entry:exit_index, i] = shares
+    marks = _ffill(prices, np.nan) if num_stocks > 1 else prices
+    with np.errstate(invalid='ignore'):
+        position_value = np.where(held != 0, held * marks, 0.0).sum(axis=1)
+    equity = cash + position_value
+
+    peak = np.maximum.accumulate(np.maximum(equity, initial_capital)) if num_times else equity
+    drawdown = (peak - equity) / peak
+    daily_returns = (equity[1:] - equity[:-1]) / equity[:-1]
+
+    for position in positions.values():
+        position.pop('exit_reason')
+    return {
+        'capital': capital,
+        'positions': {stock_codes[i]: position for i, position in positions.items()},
+        'trades': trades,
+        'equity_curve': [{'time': time, 'equity': value, 'cash': cash_value}
+                         for time, value, cash_value in zip(times, equity.tolist(), cash.tolist())],
+        'daily_returns': daily_returns.tolist(),
+        'max_drawdown': max(0.0, float(drawdown.max())) if num_times else 0.0,
+        'current_drawdown': float(drawdown[-1]) if num_times else 0.0,
+        'peak_equity': float(peak[-1]) if num_times else initial_capital
+    }
@@ -20,7 +20,6 @@ import json
 from typing import Dict, List, Tuple, Optional
 import logging
 from dataclasses import dataclass, asdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -31,6 +30,7 @@ import data_loader
 import strategies
 import indicators
 import backtester
+from analysis_executor import AnalysisExecutor
 
 @dataclass
 class QuarterlyBacktestConfig:
@@ -268,54 +268,10 @@ class QuarterlyBacktester:
         data_start = quarter_start - timedelta(days=365)  # 提前一年加载数据
         
         stock_list = self.get_stock_list()
-        pool_candidates = []
-        
-        def process_stock(symbol):
-            try:
-                df = self.load_stock_data(symbol, data_start, selection_end)
-                if df is None or len(df) < 100:  # 需要足够的历史数据
-                    return None
-                
-                # 应用股票池选择策略
-                strategy_func = strategies.get_strategy_function(self.config.pool_selection_strategy)
-                if strategy_func is None:
-                    return None
-                
-                signals = strategy_func(df)
-                
-                # 检查选择期间是否有POST信号
-                selection_period_data = df[(df.index >= quarter_start) & (df.index <= selection_end)]
-                if selection_period_data.empty:
-                    return None
-                
-                selection_signals = signals.loc[selection_period_data.index]
-                
-                # 对于WEEKLY_GOLDEN_CROSS_MA策略，寻找BUY或HOLD信号
-                if self.config.pool_selection_strategy == 'WEEKLY_GOLDEN_CROSS_MA':
-                    has_signal = (selection_signals == 'BUY').any() or (selection_signals == 'HOLD').any()
-                else:
-                    # 对于其他策略，寻找POST信号
-                    has_signal = (selection_signals == 'POST').any()
-                
-                if has_signal:
-                    # 计算选择期间的表现作为排序依据
-                    period_return = (selection_period_data['close'].iloc[-1] / selection_period_data['close'].iloc[0] - 1)
-                    return (symbol, period_return)
-                
-                return None
-                
-            except Exception as e:
-                self.logger.debug(f"处理股票 {symbol} 失败: {e}")
-                return None
-        
-        # 并行处理股票
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            futures = [executor.submit(process_stock, symbol) for symbol in stock_list]
-            
-            for future in as_completed(futures):
-                result = future.result()
-                if result is not None:
-                    pool_candidates.append(result)
+        # 并行处理股票，结果按股票列表顺序返回
+        executor = AnalysisExecutor(self, logger=self.logger)
+        candidates = executor.map('_select_pool_candidate', stock_list, quarter_start, selection_end, data_start)
+        pool_candidates = [candidate for candidate in candidates if candidate is not None]
         
         # 按表现排序并选择股票池
         pool_candidates.sort(key=lambda x: x[1], reverse=True)
@@ -329,6 +285,133 @@ class QuarterlyBacktester:
         self.logger.info(f"选择了 {len(selected_pool)} 只股票进入季度股票池")
         return selected_pool
     
+    def _select_pool_candidate(self, symbol: str, quarter_start: datetime, selection_end: datetime,
+                               data_start: datetime) -> Optional[Tuple[str, float]]:
+        """单只股票的股票池选择：选择期间有信号时返回 (股票代码, 选择期间收益)"""
+        try:
+            df = self.load_stock_data(symbol, data_start, selection_end)
+            if df is None or len(df) < 100:  # 需要足够的历史数据
+                return None
+            
+            # 应用股票池选择策略
+            strategy_func = strategies.get_strategy_function(self.config.pool_selection_strategy)
+            if strategy_func is None:
+                return None
+            
+            signals = strategy_func(df)
+            
+            # 检查选择期间是否有POST信号
+            selection_period_data = df[(df.index >= quarter_start) & (df.index <= selection_end)]
+            if selection_period_data.empty:
+                return None
+            
+            selection_signals = signals.loc[selection_period_data.index]
+            
+            # 对于WEEKLY_GOLDEN_CROSS_MA策略，寻找BUY或HOLD信号
+            if self.config.pool_selection_strategy == 'WEEKLY_GOLDEN_CROSS_MA':
+                has_signal = (selection_signals == 'BUY').any() or (selection_signals == 'HOLD').any()
+            else:
+                # 对于其他策略，寻找POST信号
+                has_signal = (selection_signals == 'POST').any()
+            
+            if has_signal:
+                # 计算选择期间的表现作为排序依据
+                period_return = (selection_period_data['close'].iloc[-1] / selection_period_data['close'].iloc[0] - 1)
+                return (symbol, period_return)
+            
+            return None
+            
+        except Exception as e:
+            self.logger.debug(f"处理股票 {symbol} 失败: {e}")
+            return None
+    
+    def _test_stock_on_pool(self, symbol: str, strategy_name: str, data_start: datetime,
+                            test_start: datetime, test_end: datetime) -> Optional[List[Dict]]:
+        """在单只股票上测试策略，返回测试期间各信号点的交易"""
+        strategy_func = strategies.get_strategy_function(strategy_name)
+        try:
+            df = self.load_stock_data(symbol, data_start, test_end)
+            if df is None or len(df) < 50:
+                return None
+            
+            # 应用策略
+            signals = strategy_func(df)
+            
+            # 获取测试期间的信号
+            test_period_data = df[(df.index >= test_start) & (df.index <= test_end)]
+            if test_period_data.empty:
+                return None
+            
+            test_signals = signals.loc[test_period_data.index]
+            
+            # 找到信号点
+            signal_points = []
+            if strategy_name == 'WEEKLY_GOLDEN_CROSS_MA':
+                signal_points = test_period_data.index[test_signals == 'BUY'].tolist()
+            else:
+                signal_points = test_period_data.index[test_signals.isin(['PRE', 'MID', 'POST'])].tolist()
+            
+            if not signal_points:
+                return None
+            
+            # 对每个信号点进行回测
+            stock_trades = []
+            for signal_date in signal_points:
+                try:
+                    signal_state = test_signals.loc[signal_date]
+                    
+                    # 获取入场价格
+                    entry_price, entry_date, entry_strategy, filtered = backtester.get_optimal_entry_price(
+                        df, signal_date, signal_state
+                    )
+                    
+                    if filtered or entry_price is None:
+                        continue
+                    
+                    # 计算持有期收益
+                    entry_idx = df.index.get_loc(entry_date)
+                    max_hold_days = min(self.config.test_period_days, len(df) - entry_idx - 1)
+                    
+                    if max_hold_days <= 0:
+                        continue
+                    
+                    hold_period_data = df.iloc[entry_idx:entry_idx + max_hold_days + 1]
+                    
+                    # 计算最大收益和最大回撤
+                    returns = (hold_period_data['close'] / entry_price - 1)
+                    max_return = returns.max()
+                    min_return = returns.min()
+                    final_return = returns.iloc[-1]
+                    
+                    # 计算持有天数
+                    hold_days = len(hold_period_data) - 1
+                    
+                    trade = {
+                        'symbol': symbol,
+                        'signal_date': signal_date,
+                        'signal_state': signal_state,
+                        'entry_date': entry_date,
+                        'entry_price': entry_price,
+                        'entry_strategy': entry_strategy,
+                        'hold_days': hold_days,
+                        'max_return': max_return,
+                        'min_return': min_return,
+                        'final_return': final_return,
+                        'success': max_return >= 0.05  # 5%以上认为成功
+                    }
+                    
+                    stock_trades.append(trade)
+                    
+                except Exception as e:
+                    self.logger.debug(f"处理信号失败 {symbol} {signal_date}: {e}")
+                    continue
+            
+            return stock_trades
+            
+        except Exception as e:
+            self.logger.debug(f"测试股票 {symbol} 失败: {e}")
+            return None
+    
     def test_strategy_on_pool(self, strategy_name: str, stock_pool: List[str], 
                             test_start: datetime, test_end: datetime) -> Dict:
         """
@@ -356,99 +439,13 @@ class QuarterlyBacktester:
         successful_stocks = 0
         total_return = 0.0
         
-        def test_stock(symbol):
-            try:
-                df = self.load_stock_data(symbol, data_start, test_end)
-                if df is None or len(df) < 50:
-                    return None
-                
-                # 应用策略
-                signals = strategy_func(df)
-                
-                # 获取测试期间的信号
-                test_period_data = df[(df.index >= test_start) & (df.index <= test_end)]
-                if test_period_data.empty:
-                    return None
-                
-                test_signals = signals.loc[test_period_data.index]
-                
-                # 找到信号点
-                signal_points = []
-                if strategy_name == 'WEEKLY_GOLDEN_CROSS_MA':
-                    signal_points = test_period_data.index[test_signals == 'BUY'].tolist()
-                else:
-                    signal_points = test_period_data.index[test_signals.isin(['PRE', 'MID', 'POST'])].tolist()
-                
-                if not signal_points:
-                    return None
-                
-                # 对每个信号点进行回测
-                stock_trades = []
-                for signal_date in signal_points:
-                    try:
-                        signal_state = test_signals.loc[signal_date]
-                        
-                        # 获取入场价格
-                        entry_price, entry_date, entry_strategy, filtered = backtester.get_optimal_entry_price(
-                            df, signal_date, signal_state
-                        )
-                        
-                        if filtered or entry_price is None:
-                            continue
-                        
-                        # 计算持有期收益
-                        entry_idx = df.index.get_loc(entry_date)
-                        max_hold_days = min(self.config.test_period_days, len(df) - entry_idx - 1)
-                        
-                        if max_hold_days <= 0:
-                            continue
-                        
-                        hold_period_data = df.iloc[entry_idx:entry_idx + max_hold_days + 1]
-                        
-                        # 计算最大收益和最大回撤
-                        returns = (hold_period_data['close'] / entry_price - 1)
-                        max_return = returns.max()
-                        min_return = returns.min()
-                        final_return = returns.iloc[-1]
-                        
-                        # 计算持有天数
-                        hold_days = len(hold_period_data) - 1
-                        
-                        trade = {
-                            'symbol': symbol,
-                            'signal_date': signal_date,
-                            'signal_state': signal_state,
-                            'entry_date': entry_date,
-                            'entry_price': entry_price,
-                            'entry_strategy': entry_strategy,
-                            'hold_days': hold_days,
-                            'max_return': max_return,
-                            'min_return': min_return,
-                            'final_return': final_return,
-                            'success': max_return >= 0.05  # 5%以上认为成功
-                        }
-                        
-                        stock_trades.append(trade)
-                        
-                    except Exception as e:
-                        self.logger.debug(f"处理信号失败 {symbol} {signal_date}: {e}")
-                        continue
-                
-                return stock_trades
-                
-            except Exception as e:
-                self.logger.debug(f"测试股票 {symbol} 失败: {e}")
-                return None
-        
-        # 并行测试股票
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            futures = [executor.submit(test_stock, symbol) for symbol in stock_pool]
-            
-            for future in as_completed(futures):
-                result = future.result()
-                if result is not None and len(result) > 0:
-                    all_trades.extend(result)
-                    successful_stocks += 1
+        # 并行测试股票，按股票池顺序汇总交易
+        executor = AnalysisExecutor(self, logger=self.logger)
+        results = executor.map('_test_stock_on_pool', stock_pool, strategy_name, data_start, test_start, test_end)
+        for result in results:
+            if result is not None and len(result) > 0:
+                all_trades.extend(result)
+                successful_stocks += 1
         
         # 计算策略统计
         if not all_trades:
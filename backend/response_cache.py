@@ -0,0 +1,229 @@
+"""
+接口响应缓存 - 缓存序列化后的JSON响应体（/api/analysis 等重计算接口）
+键由请求参数与数据源文件的 (路径, mtime, 大小) 组成，通达信数据文件更新后键随之改变，旧条目自然失效。
+每个条目附带由响应体内容计算的ETag，配合 If-None-Match 可对未变化的图表直接返回304。
+内存层为按字节数和条目数限制的LRU；可选的磁盘层在重启后仍然有效。
+压缩后的响应体（gzip/br）按需生成一次并随条目保存，计入字节上限。
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+try:
+    from .payload_encoding import compress, MIN_COMPRESS_BYTES
+except ImportError:
+    from payload_encoding import compress, MIN_COMPRESS_BYTES
+
+
+def file_signature(paths: Iterable[str]) -> Tuple:
+    """数据源文件的 (路径, mtime_ns, 大小)；文件不存在记为None，之后出现时同样使键改变"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None))
+    return tuple(signature)
+
+
+def make_key(*parts) -> str:
+    """由可JSON序列化的键元素计算缓存键"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def compute_etag(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+class CachedResponse:
+    """缓存的响应体及其ETag；variants 保存已生成的压缩版本"""
+    __slots__ = ('body', 'etag', 'variants')
+
+    def __init__(self, body: bytes, etag: Optional[str] = None):
+        self.body = body
+        self.etag = etag or compute_etag(body)
+        self.variants: Dict[str, bytes] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(data) for data in self.variants.values())
+
+
+class ResponseCache:
+    """线程安全的LRU响应缓存（内存 + 可选磁盘），带命中/未命中计数"""
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = 256 * 1024 * 1024,
+                 disk_dir: Optional[str] = None, disk_max_entries: int = 2048):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self.enabled = True
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    # --- 内存层 ---
+
+    def _store(self, key: str, entry: CachedResponse):
+        """放入内存层并按条目数/字节数淘汰最久未用的条目；调用方持有锁"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.size
+        self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    # --- 磁盘层 ---
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _load_disk(self, key: str) -> Optional[CachedResponse]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return CachedResponse(f.read())
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, entry: CachedResponse):
+        if not self.disk_dir:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(entry.body)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ 写入响应缓存失败: {e}")
+            return
+        self._disk_writes += 1
+        if self._disk_writes % 64 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """只保留最近写入/读取的 disk_max_entries 个文件"""
+        try:
+            files = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir)
+                     if name.endswith('.json')]
+            files.sort(key=lambda path: os.stat(path).st_mtime, reverse=True)
+        except OSError:
+            return
+        for path in files[self.disk_max_entries:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # --- 接口 ---
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """先查内存再查磁盘，未命中返回None（计入misses）"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        entry = self._load_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, entry)
+        try:
+            # 刷新mtime，磁盘层按最近使用淘汰
+            os.utime(self._disk_path(key))
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, body: bytes) -> CachedResponse:
+        entry = CachedResponse(body)
+        if not self.enabled:
+            return entry
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+        return entry
+
+    def encoded(self, key: str, entry: CachedResponse, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """
+        返回 (响应体, 实际使用的压缩方式)；过小的响应不压缩。
+        压缩结果保存在条目上，条目仍在缓存中时计入字节上限
+        """
+        if encoding is None or len(entry.body) < MIN_COMPRESS_BYTES:
+            return entry.body, None
+        data = entry.variants.get(encoding)
+        if data is not None:
+            return data, encoding
+        data = compress(entry.body, encoding)
+        with self._lock:
+            if encoding not in entry.variants:
+                entry.variants[encoding] = data
+                if self._entries.get(key) is entry:
+                    self._bytes += len(data)
+                    self._evict()
+        return data, encoding
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        """清空内存层与磁盘层并重置计数"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._reset_counters()
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                try:
+                    os.remove(os.path.join(self.disk_dir, name))
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'disk_dir': self.disk_dir,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'hit_rate': hits / total if total else 0.0,
+            }
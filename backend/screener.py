@@ -2,14 +2,22 @@ import os
 import glob
 import json
 import pandas as pd
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
 from datetime import datetime
 import logging
 import data_loader
 import strategies
 import backtester
 import indicators
+from indicator_cache import indicator_cache
 from win_rate_filter import WinRateFilter, AdvancedTripleCrossFilter
+from market_bar_store import StoreBarRef, iter_bar_sources, bar_source_code, load_bar_source
+from streaming_screener import JsonlSink, CsvSink, stream_screening
+from incremental_indicators import (
+    INCREMENTAL_STRATEGIES, IndicatorParams, IndicatorStateStore,
+    init_state, advance_state, evaluate_signal, read_new_bars
+)
+from config import USE_BAR_STORE, USE_INCREMENTAL_SCREENING
 
 # --- 配置 ---
 BASE_PATH = os.path.expanduser("~/.local/share/tdxcfv/drive_c/tc/vipdoc")
@@ -329,8 +337,8 @@ def check_triple_cross_enhanced_filter(df, signal_idx, stock_code):
 
 def worker(args):
     """多进程工作函数 - 优化版本，提高执行效率"""
-    file_path, market = args
-    stock_code_full = os.path.basename(file_path).split('.')[0]
+    source, market = args
+    stock_code_full = bar_source_code(source)
     stock_code_no_prefix = stock_code_full.replace(market, '')
 
     # 快速过滤无效股票代码
@@ -339,8 +347,8 @@ def worker(args):
         return None
 
     try:
-        # 快速加载数据
-        df = data_loader.get_daily_data(file_path)
+        # 快速加载数据（.day文件或列式K线仓库）
+        df = load_bar_source(source)
         if df is None or len(df) < 150:
             return None
 
@@ -370,6 +378,61 @@ def worker(args):
     except Exception as e:
         logger.error(f"处理 {stock_code_full} 时发生未知错误: {e}")
         return None
+    finally:
+        # 每只股票只处理一次，释放其指标缓存，避免子进程内缓存随股票数增长
+        indicator_cache.release()
+
+_state_store = None  # 子进程内读取增量状态的连接，状态由主进程统一写入
+
+
+def incremental_worker(args):
+    """
+    增量筛选工作函数：推进已保存的指标状态，只在最近几行上判断最新一根K线的信号；
+    命中时再按完整历史走原有流程（过滤、回测统计），结果与全量筛选一致
+
+    Returns:
+        (筛选结果或None, 股票代码, 需要保存的新状态或None)
+    """
+    global _state_store
+    source, market = args
+    stock_code_full = bar_source_code(source)
+    stock_code_no_prefix = stock_code_full.replace(market, '')
+
+    valid_prefixes = ('600', '601', '603', '000', '001', '002', '003', '300', '688')
+    if not stock_code_no_prefix.startswith(valid_prefixes):
+        return None, stock_code_full, None
+
+    try:
+        if _state_store is None:
+            _state_store = IndicatorStateStore()
+        params = IndicatorParams.from_strategy_config(strategies.get_strategy_config(STRATEGY_TO_RUN))
+        state = _state_store.get(stock_code_full, params)
+        new_bars, source_size = read_new_bars(source, state) if state is not None else (None, None)
+
+        if new_bars is None:
+            # 首次运行、参数变化或历史被改写：全量计算一次
+            source_size = None if isinstance(source, StoreBarRef) else os.path.getsize(source)
+            df = load_bar_source(source)
+            if df is None or len(df) < 150:
+                return None, stock_code_full, None
+            state = changed_state = init_state(df, params, source_size)
+        elif len(new_bars) > 0:
+            state = changed_state = advance_state(state, new_bars, params)
+            state['source_size'] = source_size
+        else:
+            changed_state = None
+
+        if state['rows'] < 150:
+            return None, stock_code_full, changed_state
+
+        signal = evaluate_signal(state, STRATEGY_TO_RUN)
+        is_candidate = signal in ('PRE', 'MID', 'POST') if STRATEGY_TO_RUN == 'MACD_ZERO_AXIS' else signal
+        result = worker(args) if is_candidate else None
+        return result, stock_code_full, changed_state
+
+    except Exception as e:
+        logger.error(f"增量处理 {stock_code_full} 时发生错误: {e}")
+        return None, stock_code_full, None
 
 def _process_pre_cross_strategy(df, result_base):
     """处理PRE_CROSS策略"""
@@ -655,29 +718,50 @@ def main():
     print(f"🚀 开始执行批量筛选, 策略: {STRATEGY_TO_RUN}")
     print(f"⏰ 扫描时间: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
     
-    all_files = []
-    for market in MARKETS:
-        path = os.path.join(BASE_PATH, market, 'lday', '*.day')
-        files = glob.glob(path)
-        if not files:
-            print(f"⚠️ 警告: 在路径 {path} 未找到任何文件。")
-        all_files.extend([(f, market) for f in files])
-    
-    if not all_files:
+    # 数据源：逐个.day文件，或（USE_BAR_STORE时）增量同步后的列式K线仓库；边扫描边派发
+    all_files = iter_bar_sources(MARKETS, BASE_PATH, use_store=USE_BAR_STORE)
+    print(f"📊 开始流式多进程处理...")
+    
+    # 增量模式：只推进已保存的指标状态，命中的股票再按完整历史确认
+    incremental = USE_INCREMENTAL_SCREENING and STRATEGY_TO_RUN in INCREMENTAL_STRATEGIES
+    state_store = IndicatorStateStore() if incremental else None
+    pending_states = []
+    if incremental:
+        print(f"⚡ 增量筛选模式：只处理新增K线")
+    
+    def collect(output):
+        """取出筛选结果；增量模式下顺带批量保存新状态"""
+        if not incremental:
+            return [] if output is None else [output]
+        result, stock_code, state = output
+        if state is not None:
+            pending_states.append((stock_code, state))
+            if len(pending_states) >= 500:
+                state_store.put_many(pending_states)
+                pending_states.clear()
+        return [] if result is None else [result]
+    
+    # 流式筛选：命中结果到达即追加写入JSONL/CSV，不再等待全市场处理完毕
+    passed_stocks = []
+    jsonl_file = os.path.join(RESULT_DIR, f'signals_{DATE}.jsonl')
+    csv_file = os.path.join(RESULT_DIR, f'signals_{DATE}.csv')
+    with JsonlSink(jsonl_file) as jsonl_sink, CsvSink(csv_file) as csv_sink:
+        stream_stats = stream_screening(incremental_worker if incremental else worker, all_files,
+                                        sinks=[jsonl_sink, csv_sink], to_records=collect,
+                                        on_record=passed_stocks.append, reporter=print)
+    if incremental:
+        state_store.put_many(pending_states)
+        state_store.close()
+    
+    if stream_stats['processed'] == 0:
         print("❌ 错误: 未能在任何市场目录下找到日线文件，请检查BASE_PATH配置。")
         return
-
-    print(f"📊 共找到 {len(all_files)} 个日线文件，开始多进程处理...")
-    
-    # 使用多进程进行初步筛选
-    with Pool(processes=cpu_count()) as pool:
-        results = pool.map(worker, all_files)
     
-    passed_stocks = [r for r in results if r is not None]
     end_time = datetime.now()
     processing_time = (end_time - start_time).total_seconds()
     
-    print(f"📈 初步筛选完成，通过筛选: {len(passed_stocks)} 只股票")
+    print(f"📈 初步筛选完成，通过筛选: {len(passed_stocks)} 只股票 "
+          f"({stream_stats['stocks_per_second']:.1f} 只/秒)")
     
     # 保存详细信号列表
     output_file = os.path.join(RESULT_DIR, 'signals_summary.json')
@@ -687,7 +771,8 @@ def main():
     # 生成并保存汇总报告
     summary_report = generate_summary_report(passed_stocks)
     summary_report['scan_summary']['processing_time'] = f"{processing_time:.2f} 秒"
-    summary_report['scan_summary']['files_processed'] = len(all_files)
+    summary_report['scan_summary']['files_processed'] = stream_stats['processed']
+    summary_report['scan_summary']['stocks_per_second'] = stream_stats['stocks_per_second']
     
     summary_file = os.path.join(RESULT_DIR, 'scan_summary_report.json')
     with open(summary_file, 'w', encoding='utf-8') as f:
@@ -726,6 +811,7 @@ def main():
     print(f"💰 平均收益: {summary_report['scan_summary']['avg_profit_rate']}")
     print(f"📄 结果已保存至:")
     print(f"  - 信号列表: {output_file}")
+    print(f"  - 流式结果: {jsonl_file}, {csv_file}")
     print(f"  - 汇总报告: {summary_file}")
     print(f"  - 文本报告: {text_report_file}")
     
@@ -8,6 +8,10 @@ from datetime import datetime, timedelta
 import logging
 import warnings
 import struct
+
+from market_bar_store import StoreBarRef, collect_bar_sources, bar_source_code, load_bar_source
+from config import USE_BAR_STORE
+
 warnings.filterwarnings('ignore')
 
 # --- 配置 ---
@@ -555,16 +559,16 @@ def is_valid_stock_code(stock_code, market):
 
 def worker(args):
     """多进程工作函数"""
-    file_path, market = args
-    stock_code_full = os.path.basename(file_path).split('.')[0]
+    source, market = args
+    stock_code_full = bar_source_code(source)
     
     # 检查股票代码有效性
     if not is_valid_stock_code(stock_code_full, market):
         return None
 
     try:
-        # 读取股票数据
-        df = read_day_file(file_path)
+        # 读取股票数据（列式K线仓库或.day文件）
+        df = load_bar_source(source) if isinstance(source, StoreBarRef) else read_day_file(source)
         if df is None or len(df) < abyss_strategy.config['long_term_days']:
             return None
 
@@ -663,14 +667,7 @@ def main():
     print(f"📋 策略版本: {CONFIG.get('version', '2.0')} - {CONFIG.get('description', '')}")
     
     # 收集所有股票文件
-    all_files = []
-    for market in MARKETS:
-        path = os.path.join(BASE_PATH, market, 'lday', '*.day')
-        files = glob.glob(path)
-        if not files:
-            logger.warning(f"在路径 {path} 未找到任何文件")
-            print(f"⚠️ 警告: 在路径 {path} 未找到任何文件")
-        all_files.extend([(f, market) for f in files])
+    all_files = collect_bar_sources(MARKETS, BASE_PATH, use_store=USE_BAR_STORE)
     
     if not all_files:
         logger.error("未能在任何市场目录下找到日线文件，请检查BASE_PATH配置")
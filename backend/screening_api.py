@@ -5,7 +5,7 @@
 为前端提供策略管理和筛选功能的REST API
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 import os
 import json
@@ -16,6 +16,7 @@ from typing import Dict, List, Any
 from universal_screener import UniversalScreener
 from strategy_manager import strategy_manager
 from config_manager import config_manager
+from screening_jobs import ScreeningJobManager
 
 # 创建Flask应用
 app = Flask(__name__)
@@ -28,6 +29,9 @@ logger = logging.getLogger(__name__)
 # 全局筛选器实例
 screener = UniversalScreener()
 
+# 后台筛选任务表（全市场筛选不再阻塞请求线程）
+job_manager = ScreeningJobManager(screener)
+
 
 @app.route('/api/strategies', methods=['GET'])
 def get_strategies():
@@ -156,28 +160,24 @@ def update_strategy_config(strategy_id):
 
 @app.route('/api/screening/start', methods=['POST'])
 def start_screening():
-    """开始筛选"""
+    """提交后台筛选任务，立即返回任务ID"""
     try:
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         selected_strategies = data.get('strategies', None)
         
-        # 运行筛选
-        results = screener.run_screening(selected_strategies)
-        
-        # 保存结果
-        saved_files = screener.save_results(results)
+        job = job_manager.submit(selected_strategies)
+        job_id = job['job_id']
         
         return jsonify({
             'success': True,
-            'data': {
-                'total_signals': len(results),
-                'results': [result.to_dict() for result in results[:50]],  # 限制返回数量
-                'saved_files': saved_files,
-                'scan_timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-        })
+            'data': dict(job,
+                         status_url=f'/api/screening/jobs/{job_id}',
+                         events_url=f'/api/screening/jobs/{job_id}/events',
+                         cancel_url=f'/api/screening/jobs/{job_id}/cancel',
+                         results_url=f'/api/screening/results?job_id={job_id}')
+        }), 202
     except Exception as e:
-        logger.error(f"筛选失败: {e}")
+        logger.error(f"提交筛选任务失败: {e}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -186,16 +186,24 @@ def start_screening():
 
 @app.route('/api/screening/status', methods=['GET'])
 def get_screening_status():
-    """获取筛选状态"""
+    """获取筛选状态（指定 job_id，默认最近一次任务）"""
     try:
-        # 这里可以实现筛选进度跟踪
-        return jsonify({
-            'success': True,
-            'data': {
-                'status': 'idle',  # idle, running, completed, error
+        job_id = request.args.get('job_id')
+        job = job_manager.get(job_id) if job_id else job_manager.latest()
+        if job_id and job is None:
+            return jsonify({
+                'success': False,
+                'error': f'任务不存在: {job_id}'
+            }), 404
+        if job is None:
+            job = {
+                'status': 'idle',
                 'progress': 0,
                 'message': '就绪'
             }
+        return jsonify({
+            'success': True,
+            'data': job
         })
     except Exception as e:
         logger.error(f"获取筛选状态失败: {e}")
@@ -205,23 +213,98 @@ def get_screening_status():
         }), 500
 
 
+@app.route('/api/screening/jobs', methods=['GET'])
+def list_screening_jobs():
+    """列出筛选任务（最近的在前）"""
+    return jsonify({
+        'success': True,
+        'data': job_manager.list_jobs()
+    })
+
+
+@app.route('/api/screening/jobs/<job_id>', methods=['GET'])
+def get_screening_job(job_id):
+    """获取任务状态；wait_version 参数提供时长轮询，直到状态版本变化或 timeout 秒后返回"""
+    wait_version = request.args.get('wait_version', type=int)
+    if wait_version is not None:
+        timeout = min(request.args.get('timeout', 30, type=float), 60)
+        job = job_manager.wait(job_id, wait_version, timeout)
+    else:
+        job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': f'任务不存在: {job_id}'
+        }), 404
+    return jsonify({
+        'success': True,
+        'data': job
+    })
+
+
+@app.route('/api/screening/jobs/<job_id>/events', methods=['GET'])
+def stream_screening_job(job_id):
+    """以 Server-Sent Events 推送任务进度（event: progress / done）"""
+    if job_manager.get(job_id) is None:
+        return jsonify({
+            'success': False,
+            'error': f'任务不存在: {job_id}'
+        }), 404
+    return Response(stream_with_context(job_manager.iter_events(job_id)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/screening/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_screening_job(job_id):
+    """取消排队中或运行中的任务"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': f'任务不存在: {job_id}'
+        }), 404
+    return jsonify({
+        'success': True,
+        'data': job
+    })
+
+
 @app.route('/api/screening/results', methods=['GET'])
 def get_screening_results():
-    """获取筛选结果"""
+    """获取筛选结果（指定 job_id，默认最近一次完成的任务；读取已持久化的结果，不重新计算）"""
     try:
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 20))
         strategy_filter = request.args.get('strategy', None)
         signal_type_filter = request.args.get('signal_type', None)
+        job_id = request.args.get('job_id')
+        
+        if not job_id:
+            latest_job = job_manager.latest('completed')
+            job_id = latest_job['job_id'] if latest_job else None
+        
+        if job_id:
+            results = job_manager.get_results(job_id)
+            if results is None:
+                job = job_manager.get(job_id)
+                return jsonify({
+                    'success': False,
+                    'error': f'任务不存在: {job_id}' if job is None else f"任务尚未完成: {job['status']}",
+                    'data': job
+                }), 404 if job is None else 409
+        else:
+            # 没有后台任务时返回筛选器最近一次同步筛选的结果
+            results = [result.to_dict() for result in screener.results]
         
         # 过滤结果
-        filtered_results = screener.results
+        filtered_results = results
         
         if strategy_filter:
-            filtered_results = [r for r in filtered_results if r.strategy_name == strategy_filter]
+            filtered_results = [r for r in filtered_results if r.get('strategy') == strategy_filter]
         
         if signal_type_filter:
-            filtered_results = [r for r in filtered_results if r.signal_type == signal_type_filter]
+            filtered_results = [r for r in filtered_results if r.get('signal_type') == signal_type_filter]
         
         # 分页
         start_idx = (page - 1) * page_size
@@ -231,7 +314,8 @@ def get_screening_results():
         return jsonify({
             'success': True,
             'data': {
-                'results': [result.to_dict() for result in page_results],
+                'job_id': job_id,
+                'results': page_results,
                 'pagination': {
                     'page': page,
                     'page_size': page_size,
@@ -490,9 +574,12 @@ if __name__ == '__main__':
     print("  GET  /api/strategies - 获取策略列表")
     print("  POST /api/strategies/<id>/enable - 启用策略")
     print("  POST /api/strategies/<id>/disable - 禁用策略")
-    print("  POST /api/screening/start - 开始筛选")
+    print("  POST /api/screening/start - 提交后台筛选任务")
+    print("  GET  /api/screening/jobs/<id> - 任务进度")
+    print("  GET  /api/screening/jobs/<id>/events - 任务进度(SSE)")
+    print("  POST /api/screening/jobs/<id>/cancel - 取消任务")
     print("  GET  /api/screening/results - 获取结果")
     print("  GET  /api/screening/export/<type> - 导出结果")
     print("\n🌐 服务地址: http://localhost:5000")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
\ No newline at end of file
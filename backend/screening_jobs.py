@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台筛选任务
+1. 提交即返回任务ID，筛选在后台线程中执行（run_screening 内部使用进程池），同一时间只运行一个任务，其余排队
+2. 每处理完一只股票更新进度、吞吐量与预计剩余时间，登记在进程内的任务表中；
+   客户端可轮询状态，也可通过 Server-Sent Events 订阅（iter_events）
+3. 支持取消：排队中的任务直接取消，运行中的任务停止派发并终止进程池
+4. 完成的结果写入 data/result/screening_jobs/<任务ID>.json，重启后仍可直接读取，无需重新计算
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    from .config import SCREENING_JOB_PATH, SCREENING_JOBS_KEPT, SCREENING_PROGRESS_INTERVAL
+except ImportError:
+    from config import SCREENING_JOB_PATH, SCREENING_JOBS_KEPT, SCREENING_PROGRESS_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = ('completed', 'failed', 'cancelled')
+
+
+def _format_time(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else None
+
+
+@dataclass
+class ScreeningJob:
+    """一次筛选任务的状态；status 取值 pending/running/completed/failed/cancelled"""
+    job_id: str
+    strategies: Optional[List[str]] = None
+    status: str = 'pending'
+    message: str = '排队中'
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    processed: int = 0
+    total: Optional[int] = None
+    passed: int = 0
+    rate: float = 0.0
+    total_signals: Optional[int] = None
+    error: Optional[str] = None
+    saved_files: Dict[str, str] = field(default_factory=dict)
+    # 每次状态变化加1，SSE 据此判断是否需要推送
+    version: int = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        progress = 0.0
+        eta = None
+        if self.total:
+            progress = self.processed / self.total * 100
+            if self.status == 'running' and self.rate > 0:
+                eta = (self.total - self.processed) / self.rate
+        if self.status == 'completed':
+            progress = 100.0
+        return {
+            'job_id': self.job_id,
+            'strategies': self.strategies,
+            'status': self.status,
+            'message': self.message,
+            'progress': round(progress, 1),
+            'processed': self.processed,
+            'total': self.total,
+            'passed': self.passed,
+            'stocks_per_second': round(self.rate, 2),
+            'eta_seconds': round(eta, 1) if eta is not None else None,
+            'elapsed_seconds': round(elapsed, 1) if elapsed is not None else None,
+            'total_signals': self.total_signals,
+            'error': self.error,
+            'saved_files': self.saved_files,
+            'created_at': _format_time(self.created_at),
+            'started_at': _format_time(self.started_at),
+            'finished_at': _format_time(self.finished_at),
+            'version': self.version,
+        }
+
+
+class ScreeningJobManager:
+    """进程内的筛选任务表；screener 需提供 run_screening(strategies, progress_callback=, cancel_event=) 与 save_results"""
+
+    def __init__(self, screener, result_dir: str = None, max_jobs: int = SCREENING_JOBS_KEPT,
+                 progress_interval: float = SCREENING_PROGRESS_INTERVAL):
+        self.screener = screener
+        self.result_dir = result_dir or SCREENING_JOB_PATH
+        self.max_jobs = max_jobs
+        self.progress_interval = progress_interval
+        self._jobs: 'OrderedDict[str, ScreeningJob]' = OrderedDict()
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._results_cache: 'OrderedDict[str, List[dict]]' = OrderedDict()
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='screening-job')
+        self._load_persisted()
+
+    # --- 持久化 ---
+
+    def _result_path(self, job_id: str) -> str:
+        return os.path.join(self.result_dir, f"{job_id}.json")
+
+    def _load_persisted(self):
+        """启动时登记已持久化的任务（只读取任务信息，结果在请求时再加载）"""
+        if not os.path.isdir(self.result_dir):
+            return
+        jobs = []
+        for file_name in os.listdir(self.result_dir):
+            if not file_name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.result_dir, file_name), 'r', encoding='utf-8') as f:
+                    job_data = json.load(f)['job']
+                jobs.append(ScreeningJob(**job_data))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning(f"跳过无法读取的筛选任务文件 {file_name}: {e}")
+        for job in sorted(jobs, key=lambda job: job.created_at):
+            self._jobs[job.job_id] = job
+
+    def _persist(self, job: ScreeningJob, results: List[dict]):
+        os.makedirs(self.result_dir, exist_ok=True)
+        path = self._result_path(job.job_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'job': asdict(job), 'results': results}, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+    def _prune(self):
+        """只保留最近 max_jobs 个已结束的任务及其结果文件"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_jobs)]:
+            self._jobs.pop(job_id, None)
+            self._results_cache.pop(job_id, None)
+            try:
+                os.remove(self._result_path(job_id))
+            except OSError:
+                pass
+
+    # --- 任务生命周期 ---
+
+    def _update(self, job: ScreeningJob, **changes):
+        with self._condition:
+            for key, value in changes.items():
+                setattr(job, key, value)
+            job.version += 1
+            self._condition.notify_all()
+
+    def submit(self, strategies: Optional[List[str]] = None) -> Dict[str, Any]:
+        """提交筛选任务，立即返回任务状态"""
+        job = ScreeningJob(job_id=uuid.uuid4().hex[:12], strategies=strategies)
+        with self._condition:
+            self._jobs[job.job_id] = job
+            self._cancel_events[job.job_id] = threading.Event()
+            snapshot = job.to_dict()
+        self._executor.submit(self._run, job)
+        return snapshot
+
+    def _run(self, job: ScreeningJob):
+        with self._condition:
+            # 排队期间已被取消
+            cancel_event = self._cancel_events.get(job.job_id)
+            if cancel_event is None or cancel_event.is_set():
+                return
+        self._update(job, status='running', message='筛选中', started_at=time.time())
+        last_publish = [0.0]
+
+        def on_progress(processed, total, passed, rate):
+            # 字段每只股票都更新（轮询总能取到最新值），通知按间隔节流
+            job.processed, job.total, job.passed, job.rate = processed, total, passed, rate
+            now = time.monotonic()
+            if now - last_publish[0] >= self.progress_interval or processed == total:
+                last_publish[0] = now
+                self._update(job)
+
+        try:
+            results = self.screener.run_screening(job.strategies, progress_callback=on_progress,
+                                                  cancel_event=cancel_event)
+            records = [result.to_dict() if hasattr(result, 'to_dict') else result for result in results]
+            if cancel_event.is_set():
+                final = {'status': 'cancelled', 'message': f'已取消，已处理 {job.processed} 只'}
+            else:
+                saved_files = self.screener.save_results(results) if results else {}
+                final = {'status': 'completed', 'message': f'完成，发现 {len(records)} 个信号',
+                         'saved_files': saved_files}
+            final.update(total_signals=len(records), finished_at=time.time())
+            # 先落盘再标记结束，客户端看到结束状态时结果一定可读
+            self._persist(ScreeningJob(**{**asdict(job), **final}), records)
+            with self._condition:
+                for key, value in final.items():
+                    setattr(job, key, value)
+                self._results_cache[job.job_id] = records
+                while len(self._results_cache) > 2:
+                    self._results_cache.popitem(last=False)
+        except Exception as e:
+            logger.error(f"筛选任务 {job.job_id} 失败: {e}")
+            with self._condition:
+                job.status, job.message, job.error, job.finished_at = 'failed', '筛选失败', str(e), time.time()
+        finally:
+            with self._condition:
+                self._cancel_events.pop(job.job_id, None)
+                job.version += 1
+                self._prune()
+                self._condition.notify_all()
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """取消任务；任务不存在返回None，已结束的任务原样返回"""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            event = self._cancel_events.get(job_id)
+            if event is not None and not job.finished:
+                event.set()
+                if job.status == 'pending':
+                    job.status, job.message, job.finished_at = 'cancelled', '已取消', time.time()
+                    self._cancel_events.pop(job_id, None)
+                else:
+                    job.message = '正在取消'
+                job.version += 1
+                self._condition.notify_all()
+            return job.to_dict()
+
+    # --- 查询 ---
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._condition:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._condition:
+            return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def latest(self, status: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """最近提交的任务（可按状态过滤）"""
+        with self._condition:
+            for job in reversed(self._jobs.values()):
+                if status is None or job.status == status:
+                    return job.to_dict()
+        return None
+
+    def get_results(self, job_id: str) -> Optional[List[dict]]:
+        """已结束任务的结果（内存中没有时读取持久化文件）；任务未结束或不存在返回None"""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ('completed', 'cancelled'):
+                return None
+            if job_id in self._results_cache:
+                return self._results_cache[job_id]
+        try:
+            with open(self._result_path(job_id), 'r', encoding='utf-8') as f:
+                results = json.load(f)['results']
+        except (OSError, ValueError, KeyError):
+            return None
+        with self._condition:
+            self._results_cache[job_id] = results
+            while len(self._results_cache) > 2:
+                self._results_cache.popitem(last=False)
+        return results
+
+    def wait(self, job_id: str, after_version: int = -1, timeout: float = None) -> Optional[Dict[str, Any]]:
+        """阻塞直到任务状态版本大于 after_version 或超时，返回最新状态"""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._condition.wait_for(lambda: job.version > after_version or job.finished, timeout)
+            return job.to_dict()
+
+    def iter_events(self, job_id: str, heartbeat: float = 15.0) -> Iterator[str]:
+        """Server-Sent Events 流：每次状态变化推送一条 progress 事件，结束时推送 done 事件"""
+        version = -1
+        while True:
+            snapshot = self.wait(job_id, version, timeout=heartbeat)
+            if snapshot is None:
+                yield f"event: error\ndata: {json.dumps({'error': '任务不存在'}, ensure_ascii=False)}\n\n"
+                return
+            if snapshot['version'] == version and snapshot['status'] not in TERMINAL_STATES:
+                # 超时无变化：发送注释行保持连接
+                yield ": keep-alive\n\n"
+                continue
+            version = snapshot['version']
+            event = 'done' if snapshot['status'] in TERMINAL_STATES else 'progress'
+            yield f"event: {event}\nid: {version}\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+            if event == 'done':
+                return
+
+    def shutdown(self, wait: bool = True):
+        with self._condition:
+            for event in self._cancel_events.values():
+                event.set()
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享内存行情传输
+1. 主进程把一只股票的OHLCV数组、日期索引和信号序列一次性写入一块 multiprocessing.shared_memory
+2. 子进程任务只携带轻量的 SharedFrameHandle（段名 + 各数组的偏移/类型），按段名挂载后零拷贝重建 DataFrame
+3. 一批任务完成后由主进程统一释放（close + unlink）
+"""
+
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# 各数组在共享内存段中的起始位置按8字节对齐
+_ALIGNMENT = 8
+
+
+@dataclass(frozen=True)
+class SharedFrameHandle:
+    """可pickle的共享内存句柄，序列化后只有几百字节"""
+    name: str
+    rows: int
+    # (列名, dtype字符串, 字节偏移)
+    columns: Tuple[Tuple[str, str, int], ...]
+    index_offset: int
+    index_name: Optional[str] = None
+    signal_offset: Optional[int] = None
+    # 信号按 pd.factorize 编码：codes 存在共享内存中，取值表随句柄传递
+    signal_values: Optional[tuple] = None
+    signal_is_bool: bool = False
+
+
+def _layout(arrays):
+    offsets, size = [], 0
+    for array in arrays:
+        size = (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+        offsets.append(size)
+        size += array.nbytes
+    return offsets, max(size, 1)
+
+
+class SharedFrame:
+    """主进程持有的共享内存段；close() 释放并删除段"""
+
+    def __init__(self, df: pd.DataFrame, signals: pd.Series = None, columns=OHLCV_COLUMNS):
+        columns = [col for col in columns if col in df.columns]
+        arrays = [np.ascontiguousarray(df[col].to_numpy()) for col in columns]
+        arrays.append(np.ascontiguousarray(pd.DatetimeIndex(df.index).asi8))
+        signal_values, signal_is_bool = None, False
+        if signals is not None:
+            signal_is_bool = signals.dtype == bool
+            codes, uniques = pd.factorize(signals.to_numpy(), use_na_sentinel=True)
+            arrays.append(codes.astype(np.int64))
+            signal_values = tuple(uniques.tolist())
+
+        offsets, size = _layout(arrays)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        for array, offset in zip(arrays, offsets):
+            np.ndarray(array.shape, array.dtype, buffer=self._shm.buf, offset=offset)[:] = array
+
+        self.handle = SharedFrameHandle(
+            name=self._shm.name,
+            rows=len(df),
+            columns=tuple((col, array.dtype.str, offset) for col, array, offset in zip(columns, arrays, offsets)),
+            index_offset=offsets[len(columns)],
+            index_name=df.index.name,
+            signal_offset=offsets[-1] if signals is not None else None,
+            signal_values=signal_values,
+            signal_is_bool=signal_is_bool,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self._shm.size
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AttachedFrame:
+    """子进程按句柄挂载的只读视图；df/signals 的数值列直接引用共享内存"""
+
+    def __init__(self, handle: SharedFrameHandle):
+        self.handle = handle
+        self._shm = shared_memory.SharedMemory(name=handle.name)
+        buffer = self._shm.buf
+        rows = handle.rows
+
+        def view(dtype, offset):
+            array = np.ndarray((rows,), np.dtype(dtype), buffer=buffer, offset=offset)
+            array.flags.writeable = False
+            return array
+
+        # 索引很小且会被 DataFrame.copy() 等操作浅拷贝共享，复制一份以免在段关闭后仍引用共享内存
+        index = pd.DatetimeIndex(view('<i8', handle.index_offset).view('datetime64[ns]').copy(),
+                                 name=handle.index_name)
+        self.df = pd.DataFrame({col: view(dtype, offset) for col, dtype, offset in handle.columns},
+                               index=index, copy=False)
+        self.signals = None
+        if handle.signal_offset is not None:
+            codes = view('<i8', handle.signal_offset)
+            values = np.empty(len(handle.signal_values) + 1, dtype=object)
+            values[:-1] = handle.signal_values
+            values[-1] = np.nan  # 缺失值编码为-1
+            decoded = values[codes]
+            self.signals = pd.Series(decoded.astype(bool) if handle.signal_is_bool else decoded, index=index)
+
+    def close(self):
+        """释放对共享内存的引用；仍有数组视图存活时由垃圾回收兜底"""
+        self.df = self.signals = None
+        if self._shm is not None:
+            try:
+                self._shm.close()
+            except BufferError:
+                pass
+            self._shm = None
+
+
+def prepare_workers():
+    """在创建进程池之前调用：先启动资源跟踪进程，fork出的子进程才会共用它；
+    否则子进程各自启动跟踪进程，退出时会把挂载过的段当作泄漏提前删除"""
+    resource_tracker.ensure_running()
+
+
+def publish_frames(items: List[Tuple[pd.DataFrame, Optional[pd.Series]]]) -> List[SharedFrame]:
+    """批量发布；中途失败时释放已创建的段"""
+    frames = []
+    try:
+        for df, signals in items:
+            frames.append(SharedFrame(df, signals))
+    except Exception:
+        release_frames(frames)
+        raise
+    return frames
+
+
+def release_frames(frames: List[SharedFrame]):
+    for frame in frames:
+        frame.close()
@@ -2,8 +2,10 @@
 交易策略库 - 支持可配置参数
 所有函数接收一个包含OHLCV的DataFrame，并返回一个标记了信号日的布尔型或字符串型Series。
 """
+import numpy as np
 import pandas as pd
 import indicators
+import panel_indicators
 
 # 默认配置类
 class DefaultConfig:
@@ -71,21 +73,37 @@ def apply_triple_cross(df, config=None):
     rsi_short = indicators.calculate_rsi(df, config.rsi.period_short)
     rsi_long = indicators.calculate_rsi(df, config.rsi.period_long)
     
+    return triple_cross_signals(dif, dea, k, d, rsi_short, rsi_long, config)
+
+def _shift(values):
+    """上一根K线的值：Series 用 shift(1)，面板二维数组按列平移"""
+    if isinstance(values, (pd.Series, pd.DataFrame)):
+        return values.shift(1)
+    return panel_indicators.shift_panel(values)
+
+def _occurred_within(flags, window):
+    """最近window根K线内是否出现过True"""
+    if isinstance(flags, (pd.Series, pd.DataFrame)):
+        return flags.rolling(window=window, min_periods=1).sum() > 0
+    return panel_indicators.rolling_any_panel(flags, window)
+
+def triple_cross_signals(dif, dea, k, d, rsi_short, rsi_long, config):
+    """由已计算的指标序列判断"三重金叉"（增量筛选只传入最近几行；面板版传入二维数组）"""
     # 使用配置的阈值进行判断
     macd_cross = (
-        (dif.shift(1) < dea.shift(1)) & 
+        (_shift(dif) < _shift(dea)) & 
         (dif > dea) & 
         (dea < config.macd.dea_threshold)
     )
     
     kdj_cross = (
-        (k.shift(1) < d.shift(1)) & 
+        (_shift(k) < _shift(d)) & 
         (k > d) & 
         (d < config.kdj.d_low_threshold)
     )
     
     rsi_cross = (
-        (rsi_short.shift(1) < rsi_long.shift(1)) & 
+        (_shift(rsi_short) < _shift(rsi_long)) & 
         (rsi_short > rsi_long)
     )
     
@@ -113,23 +131,27 @@ def apply_pre_cross(df, config=None):
     
     rsi_short = indicators.calculate_rsi(df, config.rsi.period_short)
     
+    return pre_cross_signals(dif, dea, k, d, j, rsi_short, config)
+
+def pre_cross_signals(dif, dea, k, d, j, rsi_short, config):
+    """由已计算的指标序列判断"临界金叉"（增量筛选只传入最近几行；面板版传入二维数组）"""
     # 使用配置的阈值
     cond1_kdj = (
         (j > k) & 
         (k > d) & 
-        (k > k.shift(1)) & 
+        (k > _shift(k)) & 
         (d < config.kdj.d_low_threshold)
     )
     
     macd_bar = dif - dea
     cond2_macd = (
         (dif < dea) & 
-        (macd_bar > macd_bar.shift(1)) & 
+        (macd_bar > _shift(macd_bar)) & 
         (dea < config.macd.dea_threshold)
     )
     
     cond3_rsi = (
-        (rsi_short > rsi_short.shift(1)) & 
+        (rsi_short > _shift(rsi_short)) & 
         (rsi_short < config.rsi.neutral_high)
     )
     
@@ -152,6 +174,10 @@ def apply_macd_zero_axis_strategy(df, config=None, post_cross_days=None):
         signal=config.macd.signal_period
     )
     
+    return macd_zero_axis_signals(dif, dea, config)
+
+def macd_zero_axis_signals(dif, dea, config):
+    """由已计算的DIF/DEA判断"MACD零轴启动"状态（增量筛选只传入最近几行；面板版传入二维数组）"""
     macd_bar = dif - dea
     
     # 使用配置的零轴范围
@@ -159,26 +185,76 @@ def apply_macd_zero_axis_strategy(df, config=None, post_cross_days=None):
         (macd_bar > -config.macd.zero_axis_range) & 
         (macd_bar < config.macd.zero_axis_range)
     )
-    is_increasing = macd_bar > macd_bar.shift(1)
+    is_increasing = macd_bar > _shift(macd_bar)
     primary_filter_passed = is_near_zero & is_increasing
 
-    is_mid_cross = (dif.shift(1) < dea.shift(1)) & (dif > dea)
-    cross_occured_recently = is_mid_cross.rolling(
-        window=config.post_cross_days, 
-        min_periods=1
-    ).sum() > 0
+    is_mid_cross = (_shift(dif) < _shift(dea)) & (dif > dea)
+    cross_occured_recently = _occurred_within(is_mid_cross, config.post_cross_days)
     
     signal_pre = primary_filter_passed & (dif < dea)
     signal_mid = primary_filter_passed & is_mid_cross
     signal_post = primary_filter_passed & (dif > dea) & cross_occured_recently & (~is_mid_cross)
 
-    results = pd.Series([''] * len(df), index=df.index)
+    if isinstance(dif, pd.Series):
+        results = pd.Series([''] * len(dif), index=dif.index)
+    else:
+        results = np.full(np.shape(dif), '', dtype=object)
     results[signal_pre] = 'PRE'
     results[signal_post] = 'POST'
     results[signal_mid] = 'MID' 
     
     return results
 
+# --- 面板版本：对 MarketPanel 中的所有股票一次性计算信号 ---
+# 指标在连续布局（每只股票的K线移到列首）上计算，shift 即为该股票的上一根K线；
+# 信号条件与单股票版本共用 *_signals 函数，返回与 panel.close 同形状的日期对齐数组。
+
+def _compact_panel(panel):
+    layout = panel.layout
+    return layout, layout.compact(panel.close), layout.compact(panel.high), layout.compact(panel.low)
+
+def apply_triple_cross_panel(panel, config=None):
+    """面板版"三重金叉"策略，返回布尔型二维数组"""
+    if config is None:
+        config = get_strategy_config('TRIPLE_CROSS')
+    layout, close, high, low = _compact_panel(panel)
+
+    dif, dea = panel_indicators.compute_macd(
+        close, config.macd.fast_period, config.macd.slow_period, config.macd.signal_period)
+    k, d, j = panel_indicators.compute_kdj(
+        high, low, close, config.kdj.n_period, config.kdj.k_period, config.kdj.d_period, 'ema')
+    rsi_short = panel_indicators.compute_rsi(close, config.rsi.period_short, 'wilder')
+    rsi_long = panel_indicators.compute_rsi(close, config.rsi.period_long, 'wilder')
+
+    return layout.expand(triple_cross_signals(dif, dea, k, d, rsi_short, rsi_long, config), fill=False)
+
+def apply_pre_cross_panel(panel, config=None):
+    """面板版"临界金叉"策略，返回布尔型二维数组"""
+    if config is None:
+        config = get_strategy_config('PRE_CROSS')
+    layout, close, high, low = _compact_panel(panel)
+
+    dif, dea = panel_indicators.compute_macd(
+        close, config.macd.fast_period, config.macd.slow_period, config.macd.signal_period)
+    k, d, j = panel_indicators.compute_kdj(
+        high, low, close, config.kdj.n_period, config.kdj.k_period, config.kdj.d_period, 'ema')
+    rsi_short = panel_indicators.compute_rsi(close, config.rsi.period_short, 'wilder')
+
+    return layout.expand(pre_cross_signals(dif, dea, k, d, j, rsi_short, config), fill=False)
+
+def apply_macd_zero_axis_strategy_panel(panel, config=None, post_cross_days=None):
+    """面板版"MACD零轴启动策略"，返回取值为 ''/'PRE'/'MID'/'POST' 的二维数组"""
+    if config is None:
+        config = get_strategy_config('MACD_ZERO_AXIS')
+    if post_cross_days is not None:
+        config.post_cross_days = post_cross_days
+    layout, close, _, _ = _compact_panel(panel)
+
+    dif, dea = panel_indicators.compute_macd(
+        close, config.macd.fast_period, config.macd.slow_period, config.macd.signal_period)
+
+    return layout.expand(macd_zero_axis_signals(dif, dea, config), fill='')
+
 def apply_weekly_golden_cross_ma_strategy(df, weekly_df=None, config=None):
     """
     应用"周线金叉+日线MA策略"
@@ -381,4 +457,20 @@ def apply_strategy(strategy_name: str, df, config=None):
     if strategy_name == 'WEEKLY_GOLDEN_CROSS_MA':
         return strategy_function(df, config=config)
     else:
-        return strategy_function(df, config=config)
\ No newline at end of file
+        return strategy_function(df, config=config)
+def apply_strategy_panel(strategy_name: str, panel, config=None):
+    """
+    面板版统一策略接口：对 MarketPanel 中的所有股票一次性计算信号
+    
+    Returns:
+        与 panel.close 同形状的信号数组
+    """
+    panel_functions = {
+        'TRIPLE_CROSS': apply_triple_cross_panel,
+        'PRE_CROSS': apply_pre_cross_panel,
+        'MACD_ZERO_AXIS': apply_macd_zero_axis_strategy_panel
+    }
+    strategy_function = panel_functions.get(strategy_name)
+    if strategy_function is None:
+        raise ValueError(f"Strategy has no panel implementation: {strategy_name}")
+    return strategy_function(panel, config=config)
@@ -23,6 +23,14 @@ if os.path.exists(strategies_file):
     apply_pre_cross = strategies_module.apply_pre_cross
     apply_macd_zero_axis_strategy = strategies_module.apply_macd_zero_axis_strategy
     apply_weekly_golden_cross_ma_strategy = strategies_module.apply_weekly_golden_cross_ma_strategy
+    apply_triple_cross_panel = strategies_module.apply_triple_cross_panel
+    apply_pre_cross_panel = strategies_module.apply_pre_cross_panel
+    apply_macd_zero_axis_strategy_panel = strategies_module.apply_macd_zero_axis_strategy_panel
+    apply_strategy_panel = strategies_module.apply_strategy_panel
+    triple_cross_signals = strategies_module.triple_cross_signals
+    pre_cross_signals = strategies_module.pre_cross_signals
+    macd_zero_axis_signals = strategies_module.macd_zero_axis_signals
+    get_strategy_config = strategies_module.get_strategy_config
     apply_triple_cross_legacy = strategies_module.apply_triple_cross_legacy
     apply_pre_cross_legacy = strategies_module.apply_pre_cross_legacy
     apply_macd_zero_axis_strategy_legacy = strategies_module.apply_macd_zero_axis_strategy_legacy
@@ -38,6 +46,14 @@ if os.path.exists(strategies_file):
         'apply_pre_cross', 
         'apply_macd_zero_axis_strategy',
         'apply_weekly_golden_cross_ma_strategy',
+        'apply_triple_cross_panel',
+        'apply_pre_cross_panel',
+        'apply_macd_zero_axis_strategy_panel',
+        'apply_strategy_panel',
+        'triple_cross_signals',
+        'pre_cross_signals',
+        'macd_zero_axis_signals',
+        'get_strategy_config',
         'apply_triple_cross_legacy',
         'apply_pre_cross_legacy',
         'apply_macd_zero_axis_strategy_legacy',
@@ -3,10 +3,14 @@
 """
 深渊筑底策略
 基于经过测试验证的深渊筑底理论实现
+
+默认只判断最后一根K线；rolling_mode 为 True 时用滚动窗口一次性计算每根K线的各阶段条件，
+输出完整的历史信号序列（与逐日截取数据调用的结果一致），用于全市场回测
 """
 
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from typing import Dict, Any, Tuple, Optional
 import logging
 import sys
@@ -60,6 +64,9 @@ class AbyssBottomingStrategy(BaseStrategy):
             # 确认拉升参数
             'max_rise_from_bottom': 0.18,
             'liftoff_volume_increase_ratio': 1.15,
+
+            # 滚动模式：为每根K线生成信号（回测用）
+            'rolling_mode': False,
         }
     
     def validate_config(self) -> bool:
@@ -347,10 +354,149 @@ class AbyssBottomingStrategy(BaseStrategy):
             logger.error(f"拉升确认检查失败: {e}")
             return False, {"error": str(e)}
     
+    def calculate_rolling_stages(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        滚动计算每根K线的各阶段条件，第t行等价于对 df.iloc[:t+1] 逐阶段检查的结果。
+        df 需已计算技术指标；返回列 deep_decline / hibernation / washout / liftoff（布尔）
+        """
+        cfg = self.config
+        n = len(df)
+        close = df['close'].to_numpy(dtype=float)
+        open_ = df['open'].to_numpy(dtype=float)
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        volume = df['volume'].to_numpy(dtype=float)
+        length = np.arange(1, n + 1)
+
+        long_term_days = cfg['long_term_days']
+        recent_days = cfg['volume_analysis_days']
+        hibernation_days = cfg['hibernation_days']
+        washout_days = cfg['washout_days']
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 第零阶段：长期高低点位置与跌幅
+            long_term_high = _rolling_window(high, long_term_days, -np.inf).max(axis=1)
+            long_term_low = _rolling_window(low, long_term_days, np.inf).min(axis=1)
+            price_range = long_term_high - long_term_low
+            price_position = (close - long_term_low) / price_range
+            drop_percent = (long_term_high - close) / long_term_high
+            price_ok = ((price_range != 0) & (price_position <= cfg['price_low_percentile'])
+                        & (drop_percent >= cfg['min_drop_percent']))
+
+            # 成交量萎缩：基准为前一半数据的均值（随K线数增长），近期为最近 volume_analysis_days 根
+            cumulative = np.concatenate(([0.0], np.cumsum(volume)))
+            half = length // 2
+            historical_avg = cumulative[half] / np.maximum(half, 1)
+            recent = _rolling_window(volume, recent_days, np.nan)
+            recent_count = np.minimum(length, recent_days)
+            recent_avg = np.nansum(recent, axis=1) / recent_count
+            shrink_ratio = np.where(historical_avg > 0, recent_avg / historical_avg, 1.0)
+            threshold_volume = historical_avg * cfg['volume_shrink_threshold']
+            low_volume_days = (recent <= threshold_volume[:, None]).sum(axis=1)
+            volume_ok = ((length >= 250) & (shrink_ratio <= cfg['volume_shrink_threshold'])
+                         & (low_volume_days / recent_count >= cfg['volume_consistency_threshold']))
+            deep_decline = (length >= long_term_days) & price_ok & volume_ok
+
+            # 第一阶段：挖坑期之前 hibernation_days 根K线的横盘区间
+            support_level = _shift(_rolling_window(low, hibernation_days, np.inf).min(axis=1), washout_days)
+            resistance_level = _shift(_rolling_window(high, hibernation_days, -np.inf).max(axis=1), washout_days)
+            hibernation_volume = _rolling_window(volume, hibernation_days, np.nan)
+            hibernation_avg_volume = _shift(np.nansum(hibernation_volume, axis=1)
+                                            / np.minimum(length, hibernation_days), washout_days)
+            volatility = np.where(support_level > 0, (resistance_level - support_level) / support_level, np.inf)
+            hibernation = (length > washout_days) & (volatility <= cfg['hibernation_volatility_max'])
+            if 'ma20' in df.columns and 'ma30' in df.columns:
+                # 与 pandas 的 max/min/mean 一样跳过NaN
+                ma20 = df['ma20'].to_numpy(dtype=float)
+                ma30 = df['ma30'].to_numpy(dtype=float)
+                ma_mean = np.where(np.isnan(ma20), ma30, np.where(np.isnan(ma30), ma20, (ma20 + ma30) / 2))
+                ma_range = (np.fmax(ma20, ma30) - np.fmin(ma20, ma30)) / ma_mean
+                hibernation &= _shift(ma_range, washout_days) <= 0.05
+
+            # 第二阶段：最近 washout_days 根K线跌破支撑且坑内缩量
+            if washout_days > 0:
+                washout_low = _rolling_window(low, washout_days, np.inf).min(axis=1)
+                pit = _rolling_window(low, washout_days, np.inf) < support_level[:, None]
+                pit_days = pit.sum(axis=1)
+                pit_volume = np.where(pit, _rolling_window(volume, washout_days, 0.0), 0.0).sum(axis=1)
+                volume_shrink_ratio = np.where(hibernation_avg_volume > 0,
+                                               pit_volume / pit_days / hibernation_avg_volume, np.inf)
+                washout = ((washout_low < support_level * 0.95) & (pit_days > 0)
+                           & (volume_shrink_ratio <= cfg['washout_volume_shrink_ratio']))
+            else:
+                washout_low = np.full(n, np.nan)
+                washout = np.zeros(n, dtype=bool)
+
+            # 第三阶段：确认拉升（5个条件至少满足3个）
+            prev_close = np.concatenate((close[:1], close[:-1]))
+            price_recovering = (close > open_) & (close > prev_close) & (low >= washout_low * 0.98)
+            rise_from_bottom = np.where(washout_low > 0, (close - washout_low) / washout_low, 0.0)
+            near_bottom = rise_from_bottom <= cfg['max_rise_from_bottom']
+            volume_window = _rolling_window(volume, 10, np.nan)
+            volume_avg10 = np.nansum(volume_window, axis=1) / np.minimum(length, 10)
+            volume_increase = np.where(volume_avg10 > 0, volume / volume_avg10, 0.0)
+            volume_confirming = volume_increase >= cfg['liftoff_volume_increase_ratio']
+            if 'rsi' in df.columns:
+                rsi = df['rsi'].to_numpy(dtype=float)
+                rsi_ok = (rsi >= 25) & (rsi <= 60)
+            else:
+                rsi_ok = np.ones(n, dtype=bool)
+            if 'macd' in df.columns:
+                macd = df['macd'].to_numpy(dtype=float)
+                macd_improving = macd > np.concatenate((macd[:1], macd[:-1]))
+            else:
+                macd_improving = np.ones(n, dtype=bool)
+            conditions_met = (price_recovering.astype(int) + near_bottom + volume_confirming
+                              + rsi_ok + macd_improving)
+            liftoff = conditions_met >= 3
+
+        return pd.DataFrame({
+            'deep_decline': deep_decline,
+            'hibernation': hibernation,
+            'washout': washout,
+            'liftoff': liftoff,
+        }, index=df.index)
+
+    def apply_strategy_rolling(self, df: pd.DataFrame) -> Tuple[Optional[pd.Series], Optional[Dict[str, Any]]]:
+        """滚动模式：每根K线按截至当天的数据给出信号，状态与 apply_strategy 逐日调用一致"""
+        try:
+            if len(df) < self.get_required_data_length():
+                return None, None
+
+            df = self.preprocess_data(df)
+            df = self.calculate_technical_indicators(df)
+            stages = self.calculate_rolling_stages(df)
+
+            deep = stages['deep_decline'].to_numpy()
+            hibernation = deep & stages['hibernation'].to_numpy()
+            washout = hibernation & stages['washout'].to_numpy()
+            strong = washout & stages['liftoff'].to_numpy()
+            states = np.select([strong, hibernation, deep], ['STRONG_BUY', 'BUY', 'POTENTIAL_BUY'], default='')
+            if not deep.any():
+                return None, None
+
+            signal_series = pd.Series(states.astype(object), index=df.index)
+            signal_details = {
+                'signal_state': 'ROLLING',
+                'signal_counts': {state: int((states == state).sum())
+                                  for state in ('POTENTIAL_BUY', 'BUY', 'STRONG_BUY')},
+                'stage_counts': {name: int(values.sum()) for name, values in
+                                 (('deep_decline', deep), ('hibernation', hibernation),
+                                  ('washout', washout), ('liftoff', strong))},
+                'strategy_version': self.version
+            }
+            return signal_series, signal_details
+
+        except Exception as e:
+            logger.error(f"深渊筑底滚动计算失败: {e}")
+            return None, None
+
     def apply_strategy(self, df: pd.DataFrame) -> Tuple[Optional[pd.Series], Optional[Dict[str, Any]]]:
         """
         应用深渊筑底策略
         """
+        if self.config.get('rolling_mode'):
+            return self.apply_strategy_rolling(df)
         try:
             if len(df) < self.get_required_data_length():
                 return None, None
@@ -429,4 +575,22 @@ class AbyssBottomingStrategy(BaseStrategy):
             
         except Exception as e:
             logger.error(f"深渊筑底策略执行失败: {e}")
-            return None, None
\ No newline at end of file
+            return None, None
+
+
+def _rolling_window(values: np.ndarray, window: int, fill) -> np.ndarray:
+    """
+    每行为截至该位置的最近 window 个值（n x window）；不足 window 个时前面用 fill 补齐，
+    fill 取对应归约的单位元（max 用 -inf、min 用 inf、求和用 0/NaN）
+    """
+    padded = np.concatenate((np.full(window - 1, fill, dtype=float), values.astype(float)))
+    return sliding_window_view(padded, window)
+
+
+def _shift(values: np.ndarray, periods: int) -> np.ndarray:
+    """向后平移 periods 位，前面补NaN"""
+    if periods <= 0:
+        return values
+    shifted = np.full(len(values), np.nan)
+    shifted[periods:] = values[:-periods]
+    return shifted
@@ -8,8 +8,13 @@
 from abc import ABC, abstractmethod
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, Tuple, Optional, Callable, Hashable
 import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from indicator_cache import indicator_cache
 
 logger = logging.getLogger(__name__)
 
@@ -103,27 +108,9 @@ class BaseStrategy(ABC):
             添加了技术指标的数据
         """
         try:
-            # 基础移动平均线
-            for period in [5, 10, 20, 30, 60]:
-                df[f'ma{period}'] = df['close'].rolling(window=period).mean()
-            
-            # RSI指标
-            delta = df['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            df['rsi'] = 100 - (100 / (1 + rs))
-            
-            # MACD指标
-            exp1 = df['close'].ewm(span=12).mean()
-            exp2 = df['close'].ewm(span=26).mean()
-            df['macd'] = exp1 - exp2
-            df['macd_signal'] = df['macd'].ewm(span=9).mean()
-            df['macd_histogram'] = df['macd'] - df['macd_signal']
-            
-            # 成交量移动平均
-            df['volume_ma20'] = df['volume'].rolling(window=20).mean()
-            df['volume_ma60'] = df['volume'].rolling(window=60).mean()
+            columns = self.get_cached_indicator(df, 'base_technical', (), lambda: self._compute_base_indicators(df))
+            for name, values in columns.items():
+                df[name] = values
             
             return df
             
@@ -131,6 +118,49 @@ class BaseStrategy(ABC):
             logger.error(f"计算技术指标失败: {e}")
             return df
     
+    def get_cached_indicator(self, df: pd.DataFrame, indicator: str, params: Hashable,
+                             compute: Callable[[], Any], adjustment: Optional[str] = None):
+        """
+        通过共享指标缓存获取指标，同一份数据、同一参数只计算一次
+        子类计算自定义指标时应使用此方法
+        
+        Args:
+            df: 股票数据
+            indicator: 指标名称
+            params: 指标参数（需可哈希）
+            compute: 未命中时的计算函数
+            adjustment: 复权方式
+        """
+        return indicator_cache.get_or_compute(df, indicator, params, adjustment, compute)
+    
+    def _compute_base_indicators(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
+        """计算基础技术指标，返回 {列名: 序列}"""
+        columns = {}
+        
+        # 基础移动平均线
+        for period in [5, 10, 20, 30, 60]:
+            columns[f'ma{period}'] = df['close'].rolling(window=period).mean()
+        
+        # RSI指标
+        delta = df['close'].diff()
+        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+        rs = gain / loss
+        columns['rsi'] = 100 - (100 / (1 + rs))
+        
+        # MACD指标
+        exp1 = df['close'].ewm(span=12).mean()
+        exp2 = df['close'].ewm(span=26).mean()
+        columns['macd'] = exp1 - exp2
+        columns['macd_signal'] = columns['macd'].ewm(span=9).mean()
+        columns['macd_histogram'] = columns['macd'] - columns['macd_signal']
+        
+        # 成交量移动平均
+        columns['volume_ma20'] = df['volume'].rolling(window=20).mean()
+        columns['volume_ma60'] = df['volume'].rolling(window=60).mean()
+        
+        return columns
+    
     def get_strategy_info(self) -> Dict[str, Any]:
         """获取策略信息"""
         return {
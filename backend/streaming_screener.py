@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式全市场筛选管线
+1. 数据源惰性产出，经有界的在途窗口送入进程池：结果未被消费时不再派发新任务（背压）
+2. 进程池使用 imap_unordered，按完成顺序返回结果，chunksize 可配置
+3. 结果到达即写入 JSONL/CSV，内存占用与市场规模无关，首批结果几秒内即可落盘
+4. 运行过程中按固定间隔报告吞吐量（只/秒）
+"""
+
+import os
+import csv
+import json
+import time
+import threading
+import logging
+from multiprocessing import Pool, cpu_count
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+try:
+    from .config import STREAM_CHUNKSIZE, STREAM_MAX_PENDING, STREAM_REPORT_INTERVAL
+except ImportError:
+    from config import STREAM_CHUNKSIZE, STREAM_MAX_PENDING, STREAM_REPORT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+def _to_record(record):
+    """StrategyResult 等对象统一转为字典"""
+    return record.to_dict() if hasattr(record, 'to_dict') else record
+
+
+class JsonlSink:
+    """逐行写入JSON记录，每条写完即flush，中途中断也保留已写出的结果"""
+
+    def __init__(self, path: str, encoder: type = None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.encoder = encoder
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, record):
+        self._file.write(json.dumps(_to_record(record), ensure_ascii=False, cls=self.encoder) + '\n')
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvSink:
+    """逐行写入CSV；未指定列名时以第一条记录的字段为表头，嵌套字段写为JSON字符串"""
+
+    def __init__(self, path: str, fieldnames: List[str] = None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.fieldnames = fieldnames
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = None
+
+    def write(self, record):
+        record = _to_record(record)
+        if self._writer is None:
+            self.fieldnames = self.fieldnames or list(record)
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+            self._writer.writeheader()
+        self._writer.writerow({
+            key: json.dumps(value, ensure_ascii=False, default=str) if isinstance(value, (dict, list)) else value
+            for key, value in record.items()
+        })
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ThroughputMeter:
+    """统计已处理数量、命中数量与吞吐量，按间隔输出进度"""
+
+    def __init__(self, total: int = None, report_interval: float = STREAM_REPORT_INTERVAL,
+                 reporter: Callable[[str], None] = None):
+        self.total = total
+        self.report_interval = report_interval
+        self.reporter = reporter or logger.info
+        self.processed = 0
+        self.passed = 0
+        self.first_result_seconds = None
+        self._start = time.perf_counter()
+        self._last_report = self._start
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    @property
+    def rate(self) -> float:
+        elapsed = self.elapsed
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def update(self, passed: int = 0):
+        self.processed += 1
+        self.passed += passed
+        if passed and self.first_result_seconds is None:
+            self.first_result_seconds = self.elapsed
+        now = time.perf_counter()
+        if self.report_interval and now - self._last_report >= self.report_interval:
+            self._last_report = now
+            self.report()
+
+    def report(self):
+        progress = f"{self.processed}/{self.total}" if self.total else f"{self.processed}"
+        self.reporter(f"⏳ 已处理 {progress} 只, 命中 {self.passed} 个, {self.rate:.1f} 只/秒")
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'processed': self.processed,
+            'passed': self.passed,
+            'elapsed': round(self.elapsed, 3),
+            'stocks_per_second': round(self.rate, 2),
+            'first_result_seconds': (round(self.first_result_seconds, 3)
+                                     if self.first_result_seconds is not None else None),
+        }
+
+
+_EXHAUSTED = object()
+
+
+def _bounded(tasks: Iterator, slots: threading.Semaphore, stop: threading.Event):
+    """每派发一个任务占用一个名额，消费一个结果归还一个名额；stop置位后停止派发"""
+    while True:
+        # 先占名额再从数据源取任务，数据源的消费速度也受窗口约束
+        while not slots.acquire(timeout=0.1):
+            if stop.is_set():
+                return
+        if stop.is_set():
+            return
+        task = next(tasks, _EXHAUSTED)
+        if task is _EXHAUSTED:
+            return
+        yield task
+
+
+def iter_results(worker: Callable, tasks: Iterable, processes: int = None,
+                 chunksize: int = STREAM_CHUNKSIZE, max_pending: int = STREAM_MAX_PENDING) -> Iterator:
+    """
+    以完成顺序逐个产出 worker(task) 的结果
+
+    Args:
+        worker: 模块级工作函数（需可pickle）
+        tasks: 任务迭代器，按需惰性消费
+        processes: 进程数，默认CPU核数；为1时在当前进程内顺序执行
+        chunksize: imap_unordered 每次派发给子进程的任务数
+        max_pending: 最多同时在途（已派发、结果未被消费）的任务数
+    """
+    processes = processes or cpu_count()
+    if processes == 1:
+        yield from map(worker, tasks)
+        return
+
+    # 窗口至少容纳每个进程两批任务，否则凑不满一批会卡住派发
+    max_pending = max(max_pending, chunksize * processes * 2)
+    slots = threading.Semaphore(max_pending)
+    stop = threading.Event()
+    with Pool(processes=processes) as pool:
+        try:
+            for result in pool.imap_unordered(worker, _bounded(iter(tasks), slots, stop), chunksize):
+                yield result
+                # 调用方处理完这条结果后才归还名额
+                slots.release()
+        finally:
+            stop.set()
+
+
+def stream_screening(worker: Callable, tasks: Iterable,
+                     sinks: Iterable = (),
+                     to_records: Callable[[Any], List] = None,
+                     on_record: Callable[[Any], None] = None,
+                     total: int = None,
+                     processes: int = None,
+                     chunksize: int = STREAM_CHUNKSIZE,
+                     max_pending: int = STREAM_MAX_PENDING,
+                     report_interval: float = STREAM_REPORT_INTERVAL,
+                     reporter: Callable[[str], None] = None,
+                     on_progress: Callable[['ThroughputMeter'], None] = None,
+                     should_stop: Callable[[], bool] = None) -> Dict[str, Any]:
+    """
+    流式执行筛选，结果到达即写入各个sink
+
+    Args:
+        worker: 模块级工作函数
+        tasks: 任务迭代器（如 iter_bar_sources 的返回值）
+        sinks: 具有 write(record) 方法的输出目标（JsonlSink/CsvSink）
+        to_records: 把一次worker返回值转换为记录列表，默认None→[]、其余→[结果]
+        on_record: 每条记录的回调（如收集命中股票用于汇总报告）
+        total: 任务总数（已知时用于进度显示）
+        processes/chunksize/max_pending: 见 iter_results
+        report_interval: 吞吐量报告间隔（秒），0表示不报告
+        reporter: 进度输出函数，默认写日志
+        on_progress: 每处理完一只股票调用一次，参数为 ThroughputMeter（供后台任务发布进度）
+        should_stop: 每条结果后检查一次，返回True时停止派发并终止进程池（取消任务）
+
+    Returns:
+        运行统计：processed/passed/elapsed/stocks_per_second/first_result_seconds/stopped
+    """
+    sinks = list(sinks)
+    meter = ThroughputMeter(total, report_interval, reporter)
+    stopped = False
+    for result in iter_results(worker, tasks, processes, chunksize, max_pending):
+        if to_records is not None:
+            records = to_records(result) or []
+        else:
+            records = [] if result is None else [result]
+        for record in records:
+            for sink in sinks:
+                sink.write(record)
+            if on_record is not None:
+                on_record(record)
+        meter.update(len(records))
+        if on_progress is not None:
+            on_progress(meter)
+        if should_stop is not None and should_stop():
+            # 退出循环即关闭 iter_results 生成器：停止派发并终止进程池
+            stopped = True
+            break
+
+    if report_interval:
+        meter.report()
+    summary = meter.summary()
+    summary['stopped'] = stopped
+    return summary
@@ -0,0 +1,322 @@
+"""
+多周期K线立方 - 按股票缓存 5分钟/15分钟/30分钟/1小时/4小时/日线/周线 数据，供多周期模块共享
+1. 分时周期在同一个5分钟时间戳数组上计算各周期的桶起点，按桶边界 reduceat 聚合
+   （开=首根、高=最高、低=最低、收=末根、量/额=合计），结果与 resample(freq).agg(...).dropna() 一致；
+   周线由日线按周日结束的自然周聚合
+2. 条目以日线/5分钟线文件的 (mtime, 大小) 为签名；.lc5 只是追加了新记录时，只读取最后一根之后的记录，
+   并从受影响的4小时桶开始重算各分时周期，其余部分沿用
+3. 按字节数和条目数限制的LRU，线程安全；同一股票的并发请求只加载一次
+4. 条目上可挂载派生结果（同步数据、多周期指标），数据变化后随条目一起失效
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import data_loader
+    from .response_cache import file_signature
+    from .config import BASE_PATH, TIMEFRAME_CUBE_MAX_ENTRIES, TIMEFRAME_CUBE_MAX_BYTES
+except ImportError:
+    import data_loader
+    from response_cache import file_signature
+    from config import BASE_PATH, TIMEFRAME_CUBE_MAX_ENTRIES, TIMEFRAME_CUBE_MAX_BYTES
+
+# 由5分钟线聚合的分时周期及其pandas频率
+INTRADAY_FREQS = {'15min': '15min', '30min': '30min', '1hour': '1h', '4hour': '4h'}
+TIMEFRAMES = ['5min', '15min', '30min', '1hour', '4hour', '1day', '1week']
+OHLC_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'amount']
+LC5_RECORD_SIZE = 32
+
+
+def source_files(stock_code: str, base_path: Optional[str] = None) -> Tuple[str, str]:
+    """(日线文件, 5分钟线文件) 路径"""
+    base_path = base_path or BASE_PATH
+    market = 'ds' if '#' in stock_code else stock_code[:2]
+    return (os.path.join(base_path, market, 'lday', f'{stock_code}.day'),
+            os.path.join(base_path, market, 'fzline', f'{stock_code}.lc5'))
+
+
+def _aggregate(df: pd.DataFrame, labels: np.ndarray) -> pd.DataFrame:
+    """按非递减的桶标签聚合相邻行"""
+    if len(df) == 0:
+        return df.iloc[:0][[c for c in OHLC_COLUMNS if c in df.columns]]
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(labels)] - 1
+    columns = {}
+    for name in OHLC_COLUMNS:
+        if name not in df.columns:
+            continue
+        values = df[name].to_numpy()
+        if name == 'open':
+            columns[name] = values[starts]
+        elif name == 'close':
+            columns[name] = values[ends]
+        elif name == 'high':
+            columns[name] = np.maximum.reduceat(values, starts)
+        elif name == 'low':
+            columns[name] = np.minimum.reduceat(values, starts)
+        else:
+            columns[name] = np.add.reduceat(values, starts)
+    index = pd.DatetimeIndex(labels[starts].astype('datetime64[ns]'), name=df.index.name)
+    return pd.DataFrame(columns, index=index)
+
+
+def resample_intraday(min5_df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """一次遍历5分钟数据生成全部分时周期（左闭、左标签，与pandas默认一致）"""
+    ns = min5_df.index.asi8
+    frames = {}
+    for timeframe, freq in INTRADAY_FREQS.items():
+        step = pd.Timedelta(freq).value
+        frames[timeframe] = _aggregate(min5_df, ns // step * step)
+    return frames
+
+
+def resample_weekly(daily_df: pd.DataFrame) -> pd.DataFrame:
+    """日线聚合为周线，标签为该周的周日（与 resample('1W') 一致）"""
+    index = daily_df.index.normalize()
+    labels = (index + pd.to_timedelta(6 - index.dayofweek, unit='D')).asi8
+    return _aggregate(daily_df, labels)
+
+
+def _estimate_bytes(obj, shared: frozenset = frozenset()) -> int:
+    """派生结果的大致内存占用；shared 中的对象（条目已计入的K线）不重复计算"""
+    if id(obj) in shared:
+        return 0
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return 64 + sum(_estimate_bytes(value, shared) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        if obj and isinstance(obj[0], (int, float, np.number)):
+            # 数值列表：指针 + 数值对象
+            return 56 + 32 * len(obj)
+        return 56 + sum(_estimate_bytes(value, shared) for value in obj)
+    if isinstance(obj, str):
+        return 49 + len(obj)
+    return 32
+
+
+class CubeEntry:
+    """一只股票的各周期数据；frames 不应被调用方修改"""
+    __slots__ = ('signature', 'frames', 'derived', 'nbytes')
+
+    def __init__(self, signature: Tuple, frames: Dict[str, pd.DataFrame]):
+        self.signature = signature
+        self.frames = frames
+        self.derived: Dict[Hashable, Any] = {}
+        self.nbytes = sum(_estimate_bytes(df) for df in frames.values())
+
+
+class TimeframeCube:
+    """线程安全的多周期K线LRU缓存，带命中/增量/重建计数"""
+
+    def __init__(self, max_entries: int = TIMEFRAME_CUBE_MAX_ENTRIES, max_bytes: int = TIMEFRAME_CUBE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, CubeEntry]" = OrderedDict()
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.extends = 0
+
+    # --- 加载 ---
+
+    def _load(self, stock_code: str, paths: Tuple[str, str], signature: Tuple) -> Optional[CubeEntry]:
+        daily_file, min5_file = paths
+        daily_df = self._read(data_loader.get_daily_data, daily_file, stock_code)
+        min5_df = self._read(data_loader.get_5min_data, min5_file)
+        if daily_df is None and min5_df is None:
+            return None
+        frames = {}
+        if min5_df is not None:
+            frames['5min'] = min5_df
+            frames.update(resample_intraday(min5_df))
+        if daily_df is not None:
+            frames['1day'] = daily_df
+            frames['1week'] = resample_weekly(daily_df)
+        return CubeEntry(signature, frames)
+
+    @staticmethod
+    def _read(loader: Callable, path: str, *args, **kwargs) -> Optional[pd.DataFrame]:
+        if not os.path.exists(path):
+            return None
+        try:
+            df = loader(path, *args, **kwargs)
+        except Exception as e:
+            print(f"⚠️ 读取 {path} 失败: {e}")
+            return None
+        return df if df is not None and not df.empty else None
+
+    def _extend(self, stock_code: str, entry: CubeEntry, paths: Tuple[str, str],
+                signature: Tuple) -> Optional[CubeEntry]:
+        """
+        在旧条目基础上更新：日线文件变化时重读日线（数据量小）；
+        .lc5 按整条记录增长时视为追加，只读取最后一根及之后的记录，否则整体重读
+        """
+        old_min5 = entry.signature[1]
+        daily_changed = signature[0] != entry.signature[0]
+        min5_changed = signature[1] != old_min5
+        old_5min = entry.frames.get('5min')
+        appended = (min5_changed and old_5min is not None and old_min5[1] is not None
+                    and signature[1][1] is not None and signature[1][2] > old_min5[2]
+                    and (signature[1][2] - old_min5[2]) % LC5_RECORD_SIZE == 0)
+        if min5_changed and not appended:
+            return self._load(stock_code, paths, signature)
+
+        frames = dict(entry.frames)
+        if daily_changed:
+            daily_df = self._read(data_loader.get_daily_data, paths[0], stock_code)
+            frames.pop('1day', None)
+            frames.pop('1week', None)
+            if daily_df is not None:
+                frames['1day'] = daily_df
+                frames['1week'] = resample_weekly(daily_df)
+        if appended:
+            last = old_5min.index[-1]
+            tail = self._read(data_loader.get_5min_data, paths[1], start=last)
+            appended_rows = (signature[1][2] - old_min5[2]) // LC5_RECORD_SIZE
+            if tail is None or len(tail) != int((old_5min.index >= last).sum()) + appended_rows:
+                # 新记录不在末尾（非纯追加），整体重读
+                return self._load(stock_code, paths, signature)
+            min5_df = pd.concat([old_5min[old_5min.index < last], tail])
+            frames['5min'] = min5_df
+            # 从最后一根所在的4小时桶开始重算，更短周期的桶边界都与之对齐
+            step = max(pd.Timedelta(freq).value for freq in INTRADAY_FREQS.values())
+            boundary = pd.Timestamp(last.value // step * step)
+            recomputed = resample_intraday(min5_df[min5_df.index >= boundary])
+            for timeframe, new_part in recomputed.items():
+                old = entry.frames[timeframe]
+                frames[timeframe] = pd.concat([old[old.index < boundary], new_part])
+        if not frames:
+            return None
+        return CubeEntry(signature, frames)
+
+    # --- 内存层 ---
+
+    def _store(self, key: Tuple, entry: CubeEntry):
+        """放入缓存并淘汰最久未用的条目；调用方持有锁"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        if entry.nbytes > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            key, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._key_locks.pop(key, None)
+
+    # --- 接口 ---
+
+    def get(self, stock_code: str, base_path: Optional[str] = None) -> Optional[CubeEntry]:
+        """返回与数据文件当前状态一致的条目；两个数据文件都不可用时返回None"""
+        key = (stock_code, base_path or BASE_PATH)
+        paths = source_files(stock_code, base_path)
+        signature = tuple(item + (None,) * (3 - len(item)) for item in file_signature(paths))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # 等锁期间其他线程可能已经完成加载
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.signature == signature:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+            if entry is not None:
+                new_entry = self._extend(stock_code, entry, paths, signature)
+            else:
+                new_entry = self._load(stock_code, paths, signature)
+            with self._lock:
+                if entry is not None:
+                    self.extends += 1
+                else:
+                    self.misses += 1
+                if new_entry is None:
+                    old = self._entries.pop(key, None)
+                    if old is not None:
+                        self._bytes -= old.nbytes
+                    return None
+                self._store(key, new_entry)
+            return new_entry
+
+    def frames(self, stock_code: str, base_path: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+        entry = self.get(stock_code, base_path)
+        return dict(entry.frames) if entry is not None else {}
+
+    def derived(self, entry: CubeEntry, name: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        条目上的派生结果，同一条目只计算一次；条目仍在缓存中时计入字节上限。
+        compute 返回带 'error' 键的字典时不保存
+        """
+        if name in entry.derived:
+            return entry.derived[name]
+        value = compute()
+        if isinstance(value, dict) and 'error' in value:
+            return value
+        size = _estimate_bytes(value, frozenset(id(df) for df in entry.frames.values()))
+        with self._lock:
+            if name not in entry.derived:
+                entry.derived[name] = value
+                if entry in self._entries.values():
+                    entry.nbytes += size
+                    self._bytes += size
+                    self._evict()
+        return entry.derived[name]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._key_locks.clear()
+            self._bytes = 0
+            self._reset_counters()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses + self.extends
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'extends': self.extends,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+_shared_cube: Optional[TimeframeCube] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cube() -> TimeframeCube:
+    """进程内共享的多周期K线缓存（信号生成、监控、回测共用）"""
+    global _shared_cube
+    with _shared_lock:
+        if _shared_cube is None:
+            _shared_cube = TimeframeCube()
+        return _shared_cube
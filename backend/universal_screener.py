@@ -10,7 +10,7 @@ import glob
 import json
 import pandas as pd
 import numpy as np
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
 from datetime import datetime
 import logging
 import warnings
@@ -46,6 +46,10 @@ sys.path.append(os.path.dirname(__file__))
 # 导入策略相关模块
 from strategies.base_strategy import StrategyResult
 import backtester
+from market_bar_store import StoreBarRef, iter_bar_sources, bar_source_code, load_bar_source
+from streaming_screener import JsonlSink, stream_screening
+from indicator_cache import indicator_cache
+from config import STREAM_CHUNKSIZE
 
 warnings.filterwarnings('ignore')
 
@@ -77,7 +81,7 @@ def process_single_stock_worker(args):
     多进程工作函数 - 处理单只股票
     这个函数必须在模块级别定义以支持multiprocessing pickle
     """
-    file_path, market, enabled_strategies, config_data = args
+    source, market, enabled_strategies, config_data = args
     
     # 在工作进程中重新导入必要的模块
     from strategy_manager import StrategyManager
@@ -85,7 +89,7 @@ def process_single_stock_worker(args):
     # 【重要】导入新的数据处理器
     from data_handler import get_full_data_with_indicators
     
-    stock_code_full = os.path.basename(file_path).split('.')[0]
+    stock_code_full = bar_source_code(source)
     
     # 检查股票代码有效性
     valid_prefixes = {
@@ -105,7 +109,9 @@ def process_single_stock_worker(args):
     try:
         # 【优化】一次性获取包含所有指标的数据
         # 注意：这里不再需要手动复权和计算指标
-        df = get_full_data_with_indicators(stock_code_full)
+        # 使用列式K线仓库时直接从内存映射取原始日线，跳过文件读取
+        raw_df = load_bar_source(source) if isinstance(source, StoreBarRef) else None
+        df = get_full_data_with_indicators(stock_code_full, raw_df=raw_df)
         if df is None:
             return []
         
@@ -153,6 +159,9 @@ def process_single_stock_worker(args):
         
     except Exception as e:
         return []
+    finally:
+        # 每只股票只处理一次，释放其指标缓存，避免子进程内缓存随股票数增长
+        indicator_cache.release()
 
 
 # 【注意】read_day_file_worker 函数已删除，因为不再被使用
@@ -198,6 +207,7 @@ class UniversalScreener:
                 "max_concurrent_strategies": 5,
                 "default_data_length": 500,
                 "enable_parallel_processing": True,
+                "use_bar_store": False,
                 "log_level": "INFO"
             },
             "market_filters": {
@@ -251,8 +261,8 @@ class UniversalScreener:
     
     def process_single_stock(self, args) -> List[StrategyResult]:
         """处理单只股票"""
-        file_path, market = args
-        stock_code_full = os.path.basename(file_path).split('.')[0]
+        source, market = args
+        stock_code_full = bar_source_code(source)
         
         # 检查股票代码有效性
         if not self.is_valid_stock_code(stock_code_full, market):
@@ -260,7 +270,10 @@ class UniversalScreener:
         
         try:
             # 读取股票数据
-            df = self.read_day_file(file_path)
+            if isinstance(source, StoreBarRef):
+                df = load_bar_source(source)
+            else:
+                df = self.read_day_file(source)
             if df is None:
                 return []
             
@@ -316,23 +329,31 @@ class UniversalScreener:
     
     def collect_stock_files(self) -> List[tuple]:
         """收集所有股票文件"""
-        all_files = []
-        
-        for market in MARKETS:
-            path = os.path.join(BASE_PATH, market, 'lday', '*.day')
-            files = glob.glob(path)
-            if not files:
-                logger.warning(f"在路径 {path} 未找到任何文件")
-            all_files.extend([(f, market) for f in files])
+        all_files = list(self.iter_stock_files())
+        if not all_files:
+            logger.warning(f"在路径 {BASE_PATH} 下未找到任何日线文件")
         
         return all_files
     
-    def run_screening(self, selected_strategies: List[str] = None) -> List[StrategyResult]:
+    def iter_stock_files(self):
+        """惰性产出股票数据源，供流式筛选边扫描边派发"""
+        # global_settings.use_bar_store 为True时改用增量同步后的列式K线仓库
+        use_store = self.config.get('global_settings', {}).get('use_bar_store', False)
+        return iter_bar_sources(MARKETS, BASE_PATH, use_store=use_store)
+    
+    def run_screening(self, selected_strategies: List[str] = None,
+                      stream_output: str = None,
+                      progress_callback=None,
+                      cancel_event=None) -> List[StrategyResult]:
         """
         运行筛选
         
         Args:
             selected_strategies: 指定要运行的策略ID列表，None表示运行所有启用的策略
+            stream_output: JSONL文件路径，提供时每个信号到达即追加写入
+            progress_callback: 进度回调，每处理完一只股票调用一次 callback(processed, total, passed, rate)；
+                               提供时先列出全部数据源以得到总数
+            cancel_event: threading.Event，置位后停止派发并终止进程池，返回已得到的部分结果（不做回测）
             
         Returns:
             筛选结果列表
@@ -347,14 +368,6 @@ class UniversalScreener:
                 self.strategy_manager.enable_strategy(strategy_id)
         
         try:
-            # 收集股票文件
-            all_files = self.collect_stock_files()
-            if not all_files:
-                logger.error("未找到任何股票数据文件")
-                return []
-            
-            logger.info(f"共找到 {len(all_files)} 个股票文件")
-            
             # 获取启用的策略
             enabled_strategies = self.strategy_manager.get_enabled_strategies()
             logger.info(f"启用的策略: {enabled_strategies}")
@@ -363,28 +376,65 @@ class UniversalScreener:
                 logger.error("没有启用的策略")
                 return []
             
-            # 多进程处理
-            enable_parallel = self.config.get('global_settings', {}).get('enable_parallel_processing', True)
+            global_settings = self.config.get('global_settings', {})
+            enable_parallel = global_settings.get('enable_parallel_processing', True)
+            
+            sources, total = None, None
+            if progress_callback is not None:
+                sources = list(self.iter_stock_files())
+                total = len(sources)
+            hooks = {
+                'total': total,
+                'on_progress': (lambda meter: progress_callback(meter.processed, total, meter.passed, meter.rate))
+                if progress_callback is not None else None,
+                'should_stop': cancel_event.is_set if cancel_event is not None else None,
+            }
+            
+            def run_stream(parallel):
+                """流式处理：数据源边扫描边派发，信号按完成顺序收集并写出"""
+                all_results.clear()
+                sinks = [JsonlSink(stream_output, encoder=NumpyEncoder)] if stream_output else []
+                stock_files = sources if sources is not None else self.iter_stock_files()
+                try:
+                    if parallel:
+                        # 准备多进程参数（惰性生成）
+                        tasks = ((source, market, enabled_strategies, self.config)
+                                 for source, market in stock_files)
+                        return stream_screening(process_single_stock_worker, tasks, sinks=sinks,
+                                                to_records=lambda results: results,
+                                                on_record=all_results.append,
+                                                processes=min(cpu_count(), 32),
+                                                chunksize=global_settings.get('stream_chunksize', STREAM_CHUNKSIZE),
+                                                **hooks)
+                    return stream_screening(self.process_single_stock, stock_files, sinks=sinks,
+                                            to_records=lambda results: results,
+                                            on_record=all_results.append, processes=1, **hooks)
+                finally:
+                    for sink in sinks:
+                        sink.close()
             
+            all_results = []
             if enable_parallel:
                 try:
-                    max_workers = min(cpu_count(), 32)
-                    # 准备多进程参数
-                    process_args = [(file_path, market, enabled_strategies, self.config) for file_path, market in all_files]
-                    
-                    with Pool(processes=max_workers) as pool:
-                        results_list = pool.map(process_single_stock_worker, process_args)
+                    stream_stats = run_stream(parallel=True)
                 except Exception as e:
                     logger.error(f"多进程处理失败: {e}")
                     # 降级到单进程
-                    results_list = list(map(self.process_single_stock, all_files))
+                    stream_stats = run_stream(parallel=False)
             else:
-                results_list = list(map(self.process_single_stock, all_files))
+                stream_stats = run_stream(parallel=False)
             
-            # 合并结果
-            all_results = []
-            for results in results_list:
-                all_results.extend(results)
+            if stream_stats.get('stopped'):
+                logger.info(f"筛选已取消（已处理 {stream_stats['processed']} 只），返回已发现的 {len(all_results)} 个信号")
+                self.results = all_results
+                return all_results
+            
+            if stream_stats['processed'] == 0:
+                logger.error("未找到任何股票数据文件")
+                return []
+            
+            logger.info(f"共处理 {stream_stats['processed']} 个股票文件，"
+                        f"{stream_stats['stocks_per_second']:.1f} 只/秒")
 
             # 【新增】对筛选结果进行回测分析
             run_backtest = self.config.get('global_settings', {}).get('run_backtest_after_scan', True)
@@ -639,8 +689,9 @@ def main():
     
     print("\n🔍 开始筛选...")
     
-    # 运行筛选
-    results = screener.run_screening()
+    # 运行筛选（信号到达即写入JSONL）
+    stream_file = os.path.join(OUTPUT_PATH, 'UNIVERSAL_SCREENING', f'screening_stream_{DATE}.jsonl')
+    results = screener.run_screening(stream_output=stream_file)
     
     # 保存结果
     if results:
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滚动前推（walk-forward）参数优化
+1. 从历史起点开始切出滚动的 训练窗口 + 测试窗口，每折在训练窗口上搜索参数，在紧随其后的测试窗口上做样本外回测
+2. 每折的指标数组与信号只用截至测试窗口末尾的数据计算（无未来数据），连同参数搜索结果按数据指纹缓存到磁盘
+   （data/cache/walk_forward/<股票代码>/），历史向后延长一个窗口时只需计算新增的一折
+3. 汇总各折的样本内/样本外表现、参数稳定性
+"""
+
+import os
+import json
+import hashlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import indicators
+    from . import strategies
+    from .parametric_advisor import ParameterGridEvaluator
+    from .performance_optimizer import OptimizedParameterSearch
+    from .config import WALK_FORWARD_CACHE_PATH, WALK_FORWARD_TRAIN_DAYS, WALK_FORWARD_TEST_DAYS
+except ImportError:
+    import indicators
+    import strategies
+    from parametric_advisor import ParameterGridEvaluator
+    from performance_optimizer import OptimizedParameterSearch
+    from config import WALK_FORWARD_CACHE_PATH, WALK_FORWARD_TRAIN_DAYS, WALK_FORWARD_TEST_DAYS
+
+# 参与数据指纹的列
+FINGERPRINT_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# 可选的优化目标（越大越好）；composite 为 胜率 * 0.6 + 平均收益 * 0.4
+OPTIMIZATION_TARGETS = ('composite', 'win_rate', 'avg_pnl', 'profit_factor')
+
+DEFAULT_PARAM_RANGES = {
+    'pre_entry_discount': [0.01, 0.02, 0.03, 0.05],
+    'moderate_stop': [0.03, 0.05, 0.08],
+    'moderate_profit': [0.08, 0.12, 0.15, 0.20],
+    'max_holding_days': [15, 20, 30, 45]
+}
+
+
+@dataclass(frozen=True)
+class WalkForwardFold:
+    """一折的行号边界：训练 [train_start, train_end)，测试 [train_end, test_end)"""
+    index: int
+    train_start: int
+    train_end: int
+    test_end: int
+
+
+def make_folds(num_rows: int, train_days: int, test_days: int, step_days: Optional[int] = None) -> List[WalkForwardFold]:
+    """
+    从第0行开始切分滚动窗口，只保留测试窗口完整的折
+    边界只取决于窗口参数，历史向后延长时已有的折保持不变
+    """
+    step_days = step_days or test_days
+    folds = []
+    start = 0
+    while start + train_days + test_days <= num_rows:
+        folds.append(WalkForwardFold(len(folds), start, start + train_days, start + train_days + test_days))
+        start += step_days
+    return folds
+
+
+def prefix_fingerprints(df: pd.DataFrame, ends: List[int]) -> Dict[int, str]:
+    """
+    df.iloc[:end] 的数据指纹（日期 + OHLCV），一次顺序哈希得到所有前缀的指纹
+    按行连续哈希，前缀相同则指纹相同，与其他边界无关
+    """
+    columns = [col for col in FINGERPRINT_COLUMNS if col in df.columns]
+    dates = pd.DatetimeIndex(df.index).asi8.view(np.float64) if isinstance(df.index, pd.DatetimeIndex) \
+        else np.arange(len(df), dtype=np.int64).view(np.float64)
+    rows = np.column_stack([dates] + [df[col].to_numpy(dtype=np.float64) for col in columns])
+    rows = np.ascontiguousarray(rows)
+    hasher = hashlib.sha1(','.join(columns).encode())
+    fingerprints, position = {}, 0
+    for end in sorted(set(ends)):
+        hasher.update(rows[position:end].tobytes())
+        position = end
+        fingerprints[end] = hasher.copy().hexdigest()
+    return fingerprints
+
+
+def macd_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """默认指标：MACD零轴策略配置下的 DIF/DEA"""
+    config = strategies.get_strategy_config('MACD_ZERO_AXIS')
+    dif, dea = indicators.calculate_macd(df, fast=config.macd.fast_period, slow=config.macd.slow_period,
+                                         signal=config.macd.signal_period)
+    return pd.DataFrame({'dif': dif, 'dea': dea}, index=df.index)
+
+
+def macd_zero_axis_signals(df: pd.DataFrame, indicator_frame: pd.DataFrame) -> pd.Series:
+    """默认信号：MACD零轴启动策略（''/'PRE'/'MID'/'POST'）"""
+    config = strategies.get_strategy_config('MACD_ZERO_AXIS')
+    return strategies.macd_zero_axis_signals(indicator_frame['dif'], indicator_frame['dea'], config)
+
+
+def _date_label(value) -> str:
+    return value.strftime('%Y-%m-%d') if hasattr(value, 'strftime') else str(value)
+
+
+def _to_builtin(value):
+    """numpy 标量转为 JSON 可序列化的内置类型"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class WalkForwardCache:
+    """按股票分目录的磁盘缓存：fold_<key>.npz 保存指标与信号，search_<key>.json 保存搜索结果"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or WALK_FORWARD_CACHE_PATH
+        self.stats = {'fold_hits': 0, 'fold_misses': 0, 'search_hits': 0, 'search_misses': 0}
+
+    def _path(self, stock_code: str, name: str) -> str:
+        return os.path.join(self.cache_dir, stock_code, name)
+
+    def _write(self, path: str, writer: Callable):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        writer(tmp_path)
+        os.replace(tmp_path, path)
+
+    def load_fold(self, stock_code: str, key: str) -> Optional[Tuple[pd.DataFrame, pd.Series]]:
+        path = self._path(stock_code, f"fold_{key}.npz")
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                index = pd.DatetimeIndex(data['__index__'].view('datetime64[ns]')) if data['__is_datetime__'] \
+                    else pd.Index(data['__index__'])
+                columns = [str(col) for col in data['__columns__']]
+                indicator_frame = pd.DataFrame({col: data[f"col_{i}"] for i, col in enumerate(columns)}, index=index)
+                values = np.array(list(data['__signal_values__']) + [''], dtype=object)
+                signal_values = values[data['__signal_codes__']]
+                if data['__signal_is_bool__']:
+                    signal_values = signal_values == 'True'
+                signals = pd.Series(signal_values, index=index)
+        except (OSError, KeyError, ValueError):
+            self.stats['fold_misses'] += 1
+            return None
+        self.stats['fold_hits'] += 1
+        return indicator_frame, signals
+
+    def save_fold(self, stock_code: str, key: str, indicator_frame: pd.DataFrame, signals: pd.Series):
+        is_datetime = isinstance(indicator_frame.index, pd.DatetimeIndex)
+        is_bool = signals.dtype == bool
+        codes, uniques = pd.factorize(signals.astype(str) if is_bool else signals.fillna(''))
+        arrays = {
+            '__index__': indicator_frame.index.asi8 if is_datetime else indicator_frame.index.to_numpy(),
+            '__is_datetime__': np.array(is_datetime),
+            '__columns__': np.array([str(col) for col in indicator_frame.columns]),
+            '__signal_codes__': codes.astype(np.int64),
+            '__signal_values__': np.array([str(value) for value in uniques]),
+            '__signal_is_bool__': np.array(is_bool),
+        }
+        for i, col in enumerate(indicator_frame.columns):
+            arrays[f"col_{i}"] = indicator_frame[col].to_numpy(dtype=np.float64)
+
+        def writer(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+        self._write(self._path(stock_code, f"fold_{key}.npz"), writer)
+
+    def load_search(self, stock_code: str, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(stock_code, f"search_{key}.json"), 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self.stats['search_misses'] += 1
+            return None
+        self.stats['search_hits'] += 1
+        return result
+
+    def save_search(self, stock_code: str, key: str, result: dict):
+        def writer(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+        self._write(self._path(stock_code, f"search_{key}.json"), writer)
+
+
+class WalkForwardOptimizer:
+    """滚动前推优化：每折训练窗口上批量回测选参，测试窗口上样本外验证"""
+
+    def __init__(self,
+                 train_days: int = WALK_FORWARD_TRAIN_DAYS,
+                 test_days: int = WALK_FORWARD_TEST_DAYS,
+                 step_days: Optional[int] = None,
+                 param_ranges: Optional[Dict[str, List]] = None,
+                 optimization_target: str = 'composite',
+                 risk_level: str = 'moderate',
+                 min_trades: int = 3,
+                 indicator_func: Callable[[pd.DataFrame], pd.DataFrame] = macd_indicators,
+                 signal_func: Callable[[pd.DataFrame, pd.DataFrame], pd.Series] = macd_zero_axis_signals,
+                 signal_key: Optional[str] = None,
+                 search_strategy: str = 'grid',
+                 search_budget: Optional[int] = None,
+                 cache_dir: Optional[str] = None):
+        """
+        Args:
+            train_days/test_days/step_days: 训练、测试窗口长度与滚动步长（K线数），步长默认等于测试窗口
+            param_ranges: 参数空间，默认同 optimize_parameters_for_stock
+            optimization_target: 训练窗口上的选参目标，见 OPTIMIZATION_TARGETS
+            min_trades: 训练窗口上交易数不足的组合不参与选参
+            indicator_func: df -> 指标DataFrame（与df同索引），在截至测试窗口末尾的数据上计算
+            signal_func: (df, 指标DataFrame) -> 信号序列
+            signal_key: 指标/信号口径的缓存键，修改策略配置后应更换；默认取两个函数的名称
+            search_strategy/search_budget: 参数搜索策略，'grid' 为全部组合批量回测，
+                                           其他取值交给 OptimizedParameterSearch（halving 的资源为训练窗口末尾的比例）
+            cache_dir: 缓存目录，默认 WALK_FORWARD_CACHE_PATH
+        """
+        if optimization_target not in OPTIMIZATION_TARGETS:
+            raise ValueError(f"不支持的优化目标: {optimization_target}，可选: {', '.join(OPTIMIZATION_TARGETS)}")
+        self.train_days = train_days
+        self.test_days = test_days
+        self.step_days = step_days or test_days
+        self.param_ranges = param_ranges or DEFAULT_PARAM_RANGES
+        self.optimization_target = optimization_target
+        self.risk_level = risk_level
+        self.min_trades = min_trades
+        self.indicator_func = indicator_func
+        self.signal_func = signal_func
+        self.signal_key = signal_key or f"{indicator_func.__module__}.{indicator_func.__qualname__}|" \
+                                        f"{signal_func.__module__}.{signal_func.__qualname__}"
+        self.search_strategy = search_strategy
+        self.search_budget = search_budget
+        self.cache = WalkForwardCache(cache_dir)
+        self._searcher = None
+
+        self.param_sets = ParameterGridEvaluator.grid(self.param_ranges)
+        self._search_key = hashlib.sha1(json.dumps({
+            'param_ranges': self.param_ranges,
+            'target': optimization_target,
+            'risk_level': risk_level,
+            'min_trades': min_trades,
+            'signal_key': self.signal_key,
+            'search_strategy': search_strategy,
+            'search_budget': search_budget,
+        }, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+    def _fold_key(self, fold: WalkForwardFold, fingerprint: str) -> str:
+        # 训练起点决定缓存的行范围，指纹覆盖截至测试窗口末尾的全部数据
+        raw = f"{fingerprint}|{fold.train_start}|{fold.train_end}|{fold.test_end}|{self.signal_key}"
+        return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+    def _fold_data(self, df: pd.DataFrame, fold: WalkForwardFold, stock_code: str, key: str):
+        """指标与信号在 df.iloc[:test_end] 上计算后截取本折范围并缓存"""
+        cached = self.cache.load_fold(stock_code, key)
+        if cached is not None:
+            return cached
+        history = df.iloc[:fold.test_end]
+        indicator_frame = self.indicator_func(history)
+        signals = self.signal_func(history, indicator_frame)
+        indicator_frame = indicator_frame.iloc[fold.train_start:]
+        signals = signals.iloc[fold.train_start:]
+        self.cache.save_fold(stock_code, key, indicator_frame, signals)
+        return indicator_frame, signals
+
+    def _scores(self, stats: Dict[str, np.ndarray]) -> np.ndarray:
+        """选参得分，交易数不足或无效的组合记为负无穷"""
+        if self.optimization_target == 'composite':
+            scores, valid = ParameterGridEvaluator._composite(stats, self.min_trades)
+        else:
+            scores = stats[self.optimization_target]
+            valid = stats['total_trades'] >= self.min_trades
+        scores = np.asarray(scores, dtype=float)
+        return np.where(valid & ~np.isnan(scores), scores, -np.inf)
+
+    def _summary_stats(self, evaluator: ParameterGridEvaluator, param_set: Dict) -> Optional[Dict]:
+        if evaluator.error:
+            return {'total_trades': 0, 'error': evaluator.error}
+        stats = evaluator.evaluate([param_set])
+        return {key: _to_builtin(values[0]) for key, values in stats.items()}
+
+    def _search(self, train_df: pd.DataFrame, train_signals: pd.Series) -> Tuple[Optional[Dict], float]:
+        """训练窗口上搜索参数，返回 (最佳参数字典, 得分)"""
+        evaluator = ParameterGridEvaluator(train_df, train_signals, self.risk_level)
+        if evaluator.error:
+            return None, float('-inf')
+        if self.search_strategy == 'grid':
+            scores = self._scores(evaluator.evaluate(self.param_sets))
+            best = int(np.argmax(scores))
+            if not np.isfinite(scores[best]):
+                return None, float('-inf')
+            return self.param_sets[best], float(scores[best])
+
+        evaluators = {None: evaluator, 1.0: evaluator}
+
+        def batch_scores(param_sets, resource=None):
+            # halving：资源比例对应训练窗口末尾的一段
+            if resource not in evaluators:
+                start = len(train_df) - max(int(len(train_df) * resource), 1)
+                evaluators[resource] = ParameterGridEvaluator(train_df.iloc[start:], train_signals.iloc[start:],
+                                                              self.risk_level)
+            current = evaluators[resource]
+            if current.error:
+                return [float('-inf')] * len(param_sets)
+            return self._scores(current.evaluate(param_sets))
+
+        if self._searcher is None:
+            self._searcher = OptimizedParameterSearch(max_workers=1)
+        try:
+            result = self._searcher.search(self.param_ranges, batch_evaluation_func=batch_scores,
+                                   strategy=self.search_strategy, budget=self.search_budget, random_state=0)
+        except RuntimeError:
+            # 训练窗口内所有参数组合均无有效得分
+            return None, float('-inf')
+        if result['best_parameters'] is None or not np.isfinite(result['best_score']):
+            return None, float('-inf')
+        return result['best_parameters'], float(result['best_score'])
+
+    def _run_fold(self, df: pd.DataFrame, fold: WalkForwardFold, stock_code: str, fingerprint: str) -> dict:
+        key = self._fold_key(fold, fingerprint)
+        search_key = f"{key}_{self._search_key}"
+        record = self.cache.load_search(stock_code, search_key)
+        if record is not None:
+            record['cached'] = True
+            return record
+
+        _, signals = self._fold_data(df, fold, stock_code, key)
+        train_len = fold.train_end - fold.train_start
+        train_df = df.iloc[fold.train_start:fold.train_end]
+        test_df = df.iloc[fold.train_end:fold.test_end]
+        best_params, train_score = self._search(train_df, signals.iloc[:train_len])
+
+        dates = df.index
+        record = {
+            'fold': fold.index,
+            'train_start': _date_label(dates[fold.train_start]),
+            'train_end': _date_label(dates[fold.train_end - 1]),
+            'test_start': _date_label(dates[fold.train_end]),
+            'test_end': _date_label(dates[fold.test_end - 1]),
+            'best_parameters': best_params,
+            'train_score': train_score if np.isfinite(train_score) else None,
+            'train_stats': None,
+            'test_score': None,
+            'test_stats': None,
+        }
+        if best_params is not None:
+            record['train_stats'] = self._summary_stats(
+                ParameterGridEvaluator(train_df, signals.iloc[:train_len], self.risk_level), best_params)
+            test_evaluator = ParameterGridEvaluator(test_df, signals.iloc[train_len:], self.risk_level)
+            record['test_stats'] = self._summary_stats(test_evaluator, best_params)
+            if not test_evaluator.error:
+                test_score = self._scores(test_evaluator.evaluate([best_params]))[0]
+                record['test_score'] = float(test_score) if np.isfinite(test_score) else None
+        self.cache.save_search(stock_code, search_key, record)
+        record['cached'] = False
+        return record
+
+    def run(self, df: pd.DataFrame, stock_code: str = 'default') -> dict:
+        """
+        对一只股票做滚动前推优化
+
+        Returns:
+            dict: folds（每折的日期范围、最佳参数、样本内/样本外统计、是否命中缓存）、summary（汇总）
+        """
+        folds = make_folds(len(df), self.train_days, self.test_days, self.step_days)
+        if not folds:
+            return {'stock_code': stock_code, 'error': f'数据不足，至少需要 {self.train_days + self.test_days} 条K线',
+                    'folds': [], 'summary': summarize_folds([])}
+
+        fingerprints = prefix_fingerprints(df, [fold.test_end for fold in folds])
+        records = [self._run_fold(df, fold, stock_code, fingerprints[fold.test_end]) for fold in folds]
+        computed = sum(not record['cached'] for record in records)
+        print(f"🔁 {stock_code}: {len(records)} 折滚动优化, 新计算 {computed} 折, 缓存命中 {len(records) - computed} 折")
+        return {
+            'stock_code': stock_code,
+            'train_days': self.train_days,
+            'test_days': self.test_days,
+            'step_days': self.step_days,
+            'optimization_target': self.optimization_target,
+            'folds': records,
+            'summary': summarize_folds(records),
+        }
+
+
+def summarize_folds(records: List[dict]) -> dict:
+    """
+    汇总各折（可来自多只股票）：样本外交易按笔数加权的胜率/平均收益、
+    样本内外平均得分及其比值（前推效率）、最常被选中的参数及其占比
+    """
+    valid = [record for record in records if record.get('best_parameters') is not None]
+    tested = [record for record in valid if record.get('test_stats') and record['test_stats'].get('total_trades')]
+    total_trades = sum(record['test_stats']['total_trades'] for record in tested)
+    summary = {
+        'folds': len(records),
+        'optimized_folds': len(valid),
+        'oos_total_trades': int(total_trades),
+        'oos_win_rate': None,
+        'oos_avg_pnl': None,
+        'avg_train_score': None,
+        'avg_test_score': None,
+        'walk_forward_efficiency': None,
+        'most_common_parameters': None,
+        'parameter_stability': None,
+    }
+    if total_trades:
+        summary['oos_win_rate'] = sum(record['test_stats']['winning_trades'] for record in tested) / total_trades
+        summary['oos_avg_pnl'] = sum(record['test_stats']['avg_pnl'] * record['test_stats']['total_trades']
+                                     for record in tested) / total_trades
+    train_scores = [record['train_score'] for record in valid if record.get('train_score') is not None]
+    test_scores = [record['test_score'] for record in valid if record.get('test_score') is not None]
+    if train_scores:
+        summary['avg_train_score'] = float(np.mean(train_scores))
+    if test_scores:
+        summary['avg_test_score'] = float(np.mean(test_scores))
+    if train_scores and test_scores and summary['avg_train_score'] != 0:
+        summary['walk_forward_efficiency'] = summary['avg_test_score'] / summary['avg_train_score']
+    if valid:
+        counts = Counter(json.dumps(record['best_parameters'], sort_keys=True) for record in valid)
+        params, count = counts.most_common(1)[0]
+        summary['most_common_parameters'] = json.loads(params)
+        summary['parameter_stability'] = count / len(valid)
+    return summary
@@ -33,10 +33,16 @@ document.addEventListener('DOMContentLoaded', function () {
     const strategyConfigModal = document.getElementById('strategy-config-modal');
     const strategyConfigClose = document.getElementById('strategy-config-close');
 
+    // --- 图表数据窗口 ---
+    const CHART_MAX_POINTS = 8000;      // 单次渲染的最大K线数，超出时服务端按桶降采样
+    const INTRADAY_PAGE_BARS = 1500;    // 分时周期首次加载及每次向前平移加载的K线数
+    const INTRADAY_TIMEFRAMES = ['5min', '10min', '15min', '30min', '60min'];
+    let chartState = null;              // 当前图表的请求参数与已加载数据，平移到最左端时据此加载更早的K线
 
     // --- 事件监听 ---
     strategySelect.addEventListener('change', () => {
         populateStockList();
+        chartState = null;
         myChart.clear();
         if (advicePanel) advicePanel.style.display = 'none';
         if (backtestContainer) backtestContainer.style.display = 'none';
@@ -59,6 +65,9 @@ document.addEventListener('DOMContentLoaded', function () {
         if (stockSelect.value) loadChart();
     });
 
+    // 平移到最左端时加载更早的K线
+    myChart.on('datazoom', loadEarlierBars);
+
     if (adviceRefreshBtn) {
         adviceRefreshBtn.addEventListener('click', () => {
             const stockCode = stockSelect.value;
@@ -180,7 +189,14 @@ document.addEventListener('DOMContentLoaded', function () {
         // 将新策略ID映射为旧策略ID用于API调用
         const apiStrategy = mapNewToOldStrategyId(strategy);
 
-        fetch(`/api/analysis/${stockCode}?strategy=${apiStrategy}&adjustment=${adjustmentType}&timeframe=${timeframe}`)
+        // 列式格式：每个字段一个数组，体积远小于逐行记录；分时周期只取最近一段，平移时再向前加载
+        const query = `strategy=${apiStrategy}&adjustment=${adjustmentType}&timeframe=${timeframe}&format=columnar`;
+        const windowParams = `&max_points=${CHART_MAX_POINTS}` +
+            (INTRADAY_TIMEFRAMES.includes(timeframe) ? `&count=${INTRADAY_PAGE_BARS}` : '');
+        const state = { stockCode, strategy, query, chartData: null, loading: false };
+        chartState = state;
+
+        fetch(`/api/analysis/${stockCode}?${query}${windowParams}`)
             .then(response => response.json())
             .then(chartData => {
                 myChart.hideLoading();
@@ -188,6 +204,8 @@ document.addEventListener('DOMContentLoaded', function () {
                 if (!chartData.kline_data || !chartData.indicator_data) {
                     throw new Error('返回的数据格式不正确');
                 }
+                if (chartState !== state) return;  // 期间已切换股票/周期
+                state.chartData = chartData;
 
                 // 渲染回测和图表
                 renderBacktestResults(chartData.backtest_results);
@@ -209,23 +227,100 @@ document.addEventListener('DOMContentLoaded', function () {
             });
     }
 
-    function renderEchart(chartData, stockCode, strategy) {
-        const dates = chartData.kline_data.map(item => item.date);
-        const klineData = chartData.kline_data.map(item => [item.open, item.close, item.low, item.high]);
-        const volumeData = chartData.kline_data.map(item => item.volume);
+    // 列式日期还原: start为首根K线的epoch秒, deltas为相邻K线间隔(单位unit秒), 按UTC格式化
+    function decodeColumnarDates(dateBlock) {
+        if (dateBlock.labels) return dateBlock.labels;
+        const pad = value => String(value).padStart(2, '0');
+        const intraday = dateBlock.unit < 86400;
+        const dates = new Array(dateBlock.deltas.length);
+        let seconds = dateBlock.start;
+        for (let i = 0; i < dateBlock.deltas.length; i++) {
+            seconds += dateBlock.deltas[i] * dateBlock.unit;
+            const d = new Date(seconds * 1000);
+            let text = `${d.getUTCFullYear()}-${pad(d.getUTCMonth() + 1)}-${pad(d.getUTCDate())}`;
+            if (intraday) text += ` ${pad(d.getUTCHours())}:${pad(d.getUTCMinutes())}`;
+            dates[i] = text;
+        }
+        return dates;
+    }
+
+    // 平移到最左端且服务端还有更早的数据时，加载前一页并拼接到现有数据之前，保持当前可见范围
+    function loadEarlierBars() {
+        const state = chartState;
+        if (!state || !state.chartData || state.loading || state.chartData.format !== 'columnar') return;
+        const dataWindow = state.chartData.window;
+        // 降采样视图的每个点是一个桶，不能与原始K线拼接
+        if (!dataWindow || !dataWindow.has_more_before || dataWindow.bucket_size > 1) return;
+        const option = myChart.getOption();
+        const zoom = option && option.dataZoom ? option.dataZoom[0] : null;
+        if (!zoom || zoom.start > 0) return;
+
+        state.loading = true;
+        fetch(`/api/analysis/${state.stockCode}/bars?${state.query}&before=${encodeURIComponent(dataWindow.start)}&count=${INTRADAY_PAGE_BARS}`)
+            .then(response => response.json())
+            .then(page => {
+                if (chartState !== state) return;
+                if (page.error) throw new Error(page.error);
+                const prepended = page.kline_data.open.length;
+                state.chartData = prependColumnarPage(state.chartData, page);
+                renderEchart(state.chartData, state.stockCode, state.strategy, {
+                    startValue: zoom.startValue + prepended,
+                    endValue: zoom.endValue + prepended
+                });
+            })
+            .catch(error => {
+                console.error('Error loading earlier bars:', error);
+                // 出错后不再自动重试，避免每次平移都重复请求
+                if (state.chartData && state.chartData.window) state.chartData.window.has_more_before = false;
+            })
+            .finally(() => { state.loading = false; });
+    }
+
+    function prependColumnarPage(current, page) {
+        const concatColumns = (earlier, later) => {
+            const merged = {};
+            Object.keys(later).forEach(name => { merged[name] = (earlier[name] || []).concat(later[name]); });
+            return merged;
+        };
+        return {
+            ...current,
+            dates: { labels: decodeColumnarDates(page.dates).concat(decodeColumnarDates(current.dates)) },
+            kline_data: concatColumns(page.kline_data, current.kline_data),
+            indicator_data: concatColumns(page.indicator_data, current.indicator_data),
+            signal_points: (page.signal_points || []).concat(current.signal_points || []),
+            window: {
+                ...current.window,
+                start: page.window.start,
+                bars: current.window.bars + page.window.bars,
+                points: current.window.points + page.window.points,
+                has_more_before: page.window.has_more_before
+            }
+        };
+    }
+
+    function renderEchart(chartData, stockCode, strategy, zoomRange) {
+        // 兼容列式(format=columnar)与逐行记录两种格式
+        const columnar = chartData.format === 'columnar';
+        const klineColumn = name => columnar ? chartData.kline_data[name] : chartData.kline_data.map(item => item[name]);
+        const indicatorColumn = name => columnar ? chartData.indicator_data[name] : chartData.indicator_data.map(item => item[name]);
+
+        const dates = columnar ? decodeColumnarDates(chartData.dates) : klineColumn('date');
+        const opens = klineColumn('open'), closes = klineColumn('close'), lows = klineColumn('low'), highs = klineColumn('high');
+        const klineData = opens.map((open, i) => [open, closes[i], lows[i], highs[i]]);
+        const volumeData = klineColumn('volume');
 
         // 技术指标数据
-        const ma13Data = chartData.indicator_data.map(item => item.ma13);
-        const ma45Data = chartData.indicator_data.map(item => item.ma45);
-        const difData = chartData.indicator_data.map(item => item.dif);
-        const deaData = chartData.indicator_data.map(item => item.dea);
-        const macdData = chartData.indicator_data.map(item => item.macd);
-        const kData = chartData.indicator_data.map(item => item.k);
-        const dData = chartData.indicator_data.map(item => item.d);
-        const jData = chartData.indicator_data.map(item => item.j);
-        const rsi6Data = chartData.indicator_data.map(item => item.rsi6);
-        const rsi12Data = chartData.indicator_data.map(item => item.rsi12);
-        const rsi24Data = chartData.indicator_data.map(item => item.rsi24);
+        const ma13Data = indicatorColumn('ma13');
+        const ma45Data = indicatorColumn('ma45');
+        const difData = indicatorColumn('dif');
+        const deaData = indicatorColumn('dea');
+        const macdData = indicatorColumn('macd');
+        const kData = indicatorColumn('k');
+        const dData = indicatorColumn('d');
+        const jData = indicatorColumn('j');
+        const rsi6Data = indicatorColumn('rsi6');
+        const rsi12Data = indicatorColumn('rsi12');
+        const rsi24Data = indicatorColumn('rsi24');
 
         // 信号点数据
         const signalData = chartData.signal_points || [];
@@ -234,6 +329,10 @@ document.addEventListener('DOMContentLoaded', function () {
         const totalDataPoints = dates.length;
         const defaultShowCount = Math.min(252, totalDataPoints); // 默认显示最近60个交易日
         const startPercent = Math.max(0, ((totalDataPoints - defaultShowCount) / totalDataPoints) * 100);
+        // 指定 zoomRange（数据下标）时保持该可见范围，例如向前拼接数据后
+        const zoomWindow = zoomRange
+            ? { startValue: zoomRange.startValue, endValue: zoomRange.endValue }
+            : { start: startPercent, end: 100 };
 
         // 计算各指标的动态范围 - 修复版本
         // RSI指标范围计算 (0-100范围，适当扩展)
@@ -421,8 +520,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 {
                     type: 'inside',
                     xAxisIndex: [0, 1, 2, 3],
-                    start: startPercent,
-                    end: 100
+                    ...zoomWindow
                 },
                 {
                     show: true,
@@ -430,8 +528,7 @@ document.addEventListener('DOMContentLoaded', function () {
                     type: 'slider',
                     bottom: '0%',
                     height: 20,
-                    start: startPercent,
-                    end: 100,
+                    ...zoomWindow,
                     handleStyle: { color: '#007bff' },
                     textStyle: { fontSize: 10 }
                 }
@@ -1988,44 +2085,71 @@ document.addEventListener('DOMContentLoaded', function () {
         // 显示加载状态
         content.innerHTML = '<div style="text-align: center; padding: 2rem; color: #6c757d;">正在加载持仓分析数据...</div>';
         
+        const originalText = scanBtn ? scanBtn.textContent : '';
         if (scanBtn) {
-            const originalText = scanBtn.textContent;
             scanBtn.textContent = '分析中...';
             scanBtn.disabled = true;
-            
-            fetch('/api/portfolio/scan', { method: 'POST' })
-                .then(response => response.json())
-                .then(data => {
-                    scanBtn.textContent = originalText;
-                    scanBtn.disabled = false;
+        }
+        const restoreButton = () => {
+            if (scanBtn) {
+                scanBtn.textContent = originalText;
+                scanBtn.disabled = false;
+            }
+        };
 
-                    if (data.success) {
-                        displayScanResults(data.results);
-                    } else {
-                        content.innerHTML = `<div style="color: #dc3545; text-align: center; padding: 2rem;">扫描失败: ${data.error}</div>`;
-                    }
-                })
-                .catch(error => {
-                    scanBtn.textContent = originalText;
-                    scanBtn.disabled = false;
-                    console.error('Error scanning portfolio:', error);
-                    content.innerHTML = `<div style="color: #dc3545; text-align: center; padding: 2rem;">扫描出错: ${error.message}</div>`;
+        // 逐个持仓推送结果，已完成的持仓先显示
+        const partial = [];
+        streamPortfolioScan((event, data) => {
+            if (event === 'position') {
+                partial.push(data.position);
+                if (scanBtn) scanBtn.textContent = `分析中 ${data.completed}/${data.total}...`;
+                displayScanResults({
+                    total_positions: data.total,
+                    summary: data.summary,
+                    positions: partial.slice(),
+                    from_cache: false,
+                    scan_duration: `进行中 ${data.completed}/${data.total}`
                 });
-        } else {
-            // 如果没有扫描按钮（可能是自动触发），直接执行扫描
-            fetch('/api/portfolio/scan', { method: 'POST' })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        displayScanResults(data.results);
-                    } else {
-                        content.innerHTML = `<div style="color: #dc3545; text-align: center; padding: 2rem;">扫描失败: ${data.error}</div>`;
-                    }
-                })
-                .catch(error => {
-                    console.error('Error scanning portfolio:', error);
-                    content.innerHTML = `<div style="color: #dc3545; text-align: center; padding: 2rem;">扫描出错: ${error.message}</div>`;
+            } else if (event === 'done') {
+                restoreButton();
+                displayScanResults(data.results);
+            } else if (event === 'error') {
+                restoreButton();
+                content.innerHTML = `<div style="color: #dc3545; text-align: center; padding: 2rem;">扫描失败: ${data.error}</div>`;
+            }
+        }).catch(error => {
+            restoreButton();
+            console.error('Error scanning portfolio:', error);
+            content.innerHTML = `<div style="color: #dc3545; text-align: center; padding: 2rem;">扫描出错: ${error.message}</div>`;
+        });
+    }
+
+    async function streamPortfolioScan(onEvent) {
+        // EventSource 只支持GET，这里用fetch读取POST响应流并按SSE格式拆分事件
+        const response = await fetch('/api/portfolio/scan?stream=1', { method: 'POST' });
+        if (!response.ok) {
+            const data = await response.json();
+            throw new Error(data.error || `HTTP ${response.status}`);
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                let data = '';
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
                 });
+                if (data) onEvent(event, JSON.parse(data));
+            }
         }
     }
 
@@ -26,6 +26,7 @@ else:
 
 import data_loader
 import indicators
+from market_bar_store import collect_bar_sources, bar_source_code, load_bar_source
 
 @dataclass
 class RSIBottomSignal:
@@ -517,9 +518,10 @@ class RSIBottomAnalyzer:
 class RSIBottomScanner:
     """RSI底部扫描器主类"""
     
-    def __init__(self):
+    def __init__(self, use_bar_store: bool = False):
         self.base_path = os.path.expanduser("~/.local/share/tdxcfv/drive_c/tc/vipdoc")
         self.markets = ['sh', 'sz', 'bj']
+        self.use_bar_store = use_bar_store
         self.analyzer = RSIBottomAnalyzer()
         
         # 设置日志
@@ -543,8 +545,8 @@ class RSIBottomScanner:
     
     def scan_single_stock(self, args) -> Optional[RSIBottomSignal]:
         """扫描单只股票"""
-        file_path, market = args
-        stock_code_full = os.path.basename(file_path).split('.')[0]
+        source, market = args
+        stock_code_full = bar_source_code(source)
         stock_code_no_prefix = stock_code_full.replace(market, '')
         
         # 过滤无效股票代码
@@ -553,7 +555,7 @@ class RSIBottomScanner:
             return None
         
         try:
-            df = data_loader.get_daily_data(file_path)
+            df = load_bar_source(source)
             if df is None or len(df) < 120:
                 return None
             
@@ -570,11 +572,7 @@ class RSIBottomScanner:
         start_time = datetime.now()
         
         # 收集所有文件
-        all_files = []
-        for market in self.markets:
-            path = os.path.join(self.base_path, market, 'lday', '*.day')
-            files = glob.glob(path)
-            all_files.extend([(f, market) for f in files])
+        all_files = collect_bar_sources(self.markets, self.base_path, use_store=self.use_bar_store)
         
         if not all_files:
             print("❌ 未找到数据文件")
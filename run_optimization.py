@@ -19,6 +19,7 @@ import data_loader
 import strategies
 import indicators
 from parametric_advisor import ParametricTradingAdvisor, TradingParameters
+from walk_forward import WalkForwardOptimizer
 
 # 打印锁在多进程中不是必须的，因为进程的输出是独立的。但保留它也无害。
 print_lock = threading.Lock()
@@ -180,6 +181,53 @@ def compare_default_vs_optimized(stock_code):
             print("⚠️ 参数优化效果不明显")
 
 
+def walk_forward_optimize(stock_code, optimization_target='composite'):
+    """滚动前推优化：每折训练窗口选参、测试窗口样本外验证，结果按数据指纹缓存"""
+    base_path = os.path.expanduser("~/.local/share/tdxcfv/drive_c/tc/vipdoc")
+    if '#' in stock_code:
+        market = 'ds'
+    else:
+        market = stock_code[:2]
+    file_path = os.path.join(base_path, market, 'lday', f'{stock_code}.day')
+
+    if not os.path.exists(file_path):
+        print(f"❌ [{stock_code}] 股票数据文件不存在")
+        return None
+
+    df = data_loader.get_daily_data(file_path)
+    if df is None:
+        print(f"❌ [{stock_code}] 股票数据加载失败")
+        return None
+
+    result = WalkForwardOptimizer(optimization_target=optimization_target).run(df, stock_code)
+    if result.get('error'):
+        print(f"❌ [{stock_code}] {result['error']}")
+        return result
+
+    print("\n" + "=" * 60)
+    print(f"🔁 {stock_code} 滚动前推优化 (训练 {result['train_days']} 天 / 测试 {result['test_days']} 天)")
+    print("=" * 60)
+    for fold in result['folds']:
+        test_stats = fold['test_stats'] or {}
+        if fold['best_parameters'] is None or not test_stats.get('total_trades'):
+            print(f"  第{fold['fold'] + 1}折 {fold['test_start']} ~ {fold['test_end']}: 无有效样本外交易")
+            continue
+        print(f"  第{fold['fold'] + 1}折 {fold['test_start']} ~ {fold['test_end']}: "
+              f"样本内得分 {fold['train_score']:.4f} | 样本外胜率 {test_stats['win_rate']:.1%}, "
+              f"平均收益 {test_stats['avg_pnl']:.2%}, 交易 {test_stats['total_trades']} 次")
+
+    summary = result['summary']
+    print("\n📋 样本外汇总:")
+    print(f"  有效折数: {summary['optimized_folds']}/{summary['folds']}, 交易次数: {summary['oos_total_trades']}")
+    if summary['oos_win_rate'] is not None:
+        print(f"  胜率: {summary['oos_win_rate']:.1%}, 平均收益: {summary['oos_avg_pnl']:.2%}")
+    if summary['walk_forward_efficiency'] is not None:
+        print(f"  前推效率(样本外/样本内得分): {summary['walk_forward_efficiency']:.2f}")
+    if summary['most_common_parameters']:
+        print(f"  最常选中参数: {summary['most_common_parameters']} ({summary['parameter_stability']:.0%} 的折)")
+    return result
+
+
 def batch_optimize_stocks(stock_codes, optimization_target='win_rate', max_workers=None):
     """批量优化多只股票 (多进程)"""
     total_jobs = len(stock_codes)
@@ -240,6 +288,7 @@ def main():
         print("使用方法:")
         print("  python run_optimization.py <股票代码> [优化目标]")
         print("  python run_optimization.py <股票代码> compare  # 对比默认vs优化参数")
+        print("  python run_optimization.py <股票代码> walkforward [优化目标]  # 滚动前推优化(样本外验证)")
         print("  python run_optimization.py batch <股票代码1> <股票代码2> ...  # 批量优化")
         print("")
         print("优化目标选项:")
@@ -261,6 +310,13 @@ def main():
             return
         optimization_target = 'win_rate'
         batch_optimize_stocks(stock_codes, optimization_target)
+    elif len(sys.argv) >= 3 and sys.argv[2] == 'walkforward':
+        stock_code = sys.argv[1].lower()
+        optimization_target = sys.argv[3] if len(sys.argv) > 3 else 'composite'
+        if optimization_target not in ['composite', 'win_rate', 'avg_pnl', 'profit_factor']:
+            print(f"❌ 不支持的优化目标: {optimization_target}")
+            return
+        walk_forward_optimize(stock_code, optimization_target)
     elif len(sys.argv) >= 3 and sys.argv[2] == 'compare':
         stock_code = sys.argv[1].lower()
         compare_default_vs_optimized(stock_code)
@@ -281,4 +337,4 @@ def main():
 # 这是使用多进程(ProcessPoolExecutor)时的强制要求，尤其是在Windows和macOS上，
 # 它可以防止子进程无限递归地重新执行主程序代码。
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
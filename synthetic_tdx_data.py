@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+测试用合成通达信数据
+1. .day 日线记录（A股整数价格格式）与按市场组织的 lday 目录
+2. .lc5 5分钟线记录（A股交易时段，每天48根）
+3. 含送转/拆股跳跃的日线 DataFrame；指向临时目录的 Flask 应用与列式日期还原
+各测试文件共用这里的数据生成函数，不互相导入
+"""
+
+import sys
+import os
+import struct
+from datetime import datetime, timezone
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+
+def day_records(start_date, num_days, seed):
+    """从 start_date 起 num_days 个工作日的 .day 记录字节（每条一个块）"""
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for date in pd.bdate_range(start_date, periods=num_days):
+        c = int(rng.integers(900, 1100))
+        chunks.append(struct.pack('<IIIIIfII', int(date.strftime('%Y%m%d')), c - 5, c + 10, c - 10, c,
+                                  float(rng.uniform(1e6, 1e7)), int(rng.integers(1000, 100000)), 0))
+    return chunks
+
+
+def write_chunks(file_path, chunks, mode='wb'):
+    with open(file_path, mode) as f:
+        f.write(b''.join(chunks))
+
+
+def build_lday_tree(root_dir, symbols_per_market=20, num_days=300):
+    """sh/sz 两个市场的 lday 目录，返回 股票代码 -> .day 文件路径"""
+    paths = {}
+    for m_idx, market in enumerate(['sh', 'sz']):
+        lday_dir = os.path.join(root_dir, market, 'lday')
+        os.makedirs(lday_dir, exist_ok=True)
+        for i in range(symbols_per_market):
+            symbol = f'{market}{600000 + i}'
+            path = os.path.join(lday_dir, f'{symbol}.day')
+            write_chunks(path, day_records('2022-01-03', num_days + i, seed=m_idx * 1000 + i))
+            paths[symbol] = path
+    return paths
+
+
+def pack_lc5(ts, o, h, l, c, volume, amount):
+    packed_date = (ts.year - 2004) * 2048 + ts.month * 100 + ts.day
+    packed_time = ts.hour * 60 + ts.minute
+    return struct.pack('<HHffffffI', packed_date, packed_time, o, h, l, c, volume, amount, 0)
+
+
+def trading_timestamps(num_days):
+    """生成A股交易时段的5分钟时间戳（每天48根）"""
+    stamps = []
+    for day in pd.bdate_range('2024-01-02', periods=num_days):
+        morning = pd.date_range(day + pd.Timedelta(hours=9, minutes=35), periods=24, freq='5min')
+        afternoon = pd.date_range(day + pd.Timedelta(hours=13, minutes=5), periods=24, freq='5min')
+        stamps.extend(morning)
+        stamps.extend(afternoon)
+    return stamps
+
+
+def lc5_chunks(stamps, seed):
+    """给定时间戳上的随机游走 .lc5 记录"""
+    rng = np.random.default_rng(seed)
+    price = 10.0
+    chunks = []
+    for ts in stamps:
+        price = max(1.0, price + rng.normal(0, 0.05))
+        chunks.append(pack_lc5(ts, price, price * 1.01, price * 0.99, price,
+                               float(rng.integers(100, 10000)), float(rng.uniform(1e4, 1e6))))
+    return chunks
+
+
+def write_lc5(file_path, num_days=60, seed=7, extra_chunks=None):
+    """写入 num_days 天的 .lc5 文件；extra_chunks 为 (位置, 记录) 的插入项，末尾追加残缺字节"""
+    chunks = lc5_chunks(trading_timestamps(num_days), seed)
+    for pos, chunk in (extra_chunks or []):
+        chunks.insert(pos, chunk)
+    with open(file_path, 'wb') as f:
+        f.write(b''.join(chunks) + b'\x01\x02\x03')
+
+
+def setup_stock_files(root_dir, stock_code='sz000001', num_days=40, seed=0):
+    """临时通达信目录：日线 + 5分钟线，返回 (日线文件, 5分钟线文件, 全部5分钟时间戳)"""
+    market = stock_code[:2]
+    daily_file = os.path.join(root_dir, market, 'lday', f'{stock_code}.day')
+    min5_file = os.path.join(root_dir, market, 'fzline', f'{stock_code}.lc5')
+    os.makedirs(os.path.dirname(daily_file), exist_ok=True)
+    os.makedirs(os.path.dirname(min5_file), exist_ok=True)
+    write_chunks(daily_file, day_records('2023-01-02', 300, seed=seed))
+    stamps = trading_timestamps(num_days)
+    write_chunks(min5_file, lc5_chunks(stamps, seed))
+    return daily_file, min5_file, stamps
+
+
+def make_df_with_jumps(num_days=1500, num_jumps=6, seed=0, volume_dtype=float):
+    """含 num_jumps 个送转/拆股价格下跳的未复权日线"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.01, num_days)
+    jump_rows = rng.choice(np.arange(10, num_days - 10), num_jumps, replace=False)
+    returns[jump_rows] = np.log(rng.uniform(0.4, 0.7, num_jumps))  # 送转/拆股导致的价格下跳
+    close = 20 * np.exp(np.cumsum(returns))
+    return pd.DataFrame({
+        'open': close * (1 + rng.normal(0, 0.005, num_days)),
+        'high': close * 1.02,
+        'low': close * 0.98,
+        'close': close,
+        'volume': rng.integers(1000, 1000000, num_days).astype(volume_dtype),
+        'amount': rng.uniform(1e6, 1e8, num_days),
+    }, index=pd.bdate_range('2015-01-05', periods=num_days, name='date'))
+
+
+def setup_app(root_dir, num_days=600, lc5_days=0):
+    """把 Flask 应用的数据目录指向 root_dir（sz000001 的日线，可选5分钟线），并换用空的响应缓存"""
+    import app as app_module
+    from response_cache import ResponseCache
+    lday_dir = os.path.join(root_dir, 'sz', 'lday')
+    os.makedirs(lday_dir, exist_ok=True)
+    write_chunks(os.path.join(lday_dir, 'sz000001.day'), day_records('2021-01-04', num_days, seed=7))
+    if lc5_days:
+        fz_dir = os.path.join(root_dir, 'sz', 'fzline')
+        os.makedirs(fz_dir, exist_ok=True)
+        write_lc5(os.path.join(fz_dir, 'sz000001.lc5'), num_days=lc5_days)
+    app_module.BASE_PATH = root_dir
+    app_module.analysis_cache = ResponseCache()
+    return app_module
+
+
+def decode_columnar_dates(block):
+    """与 frontend/js/app.js 的 decodeColumnarDates 相同的还原逻辑"""
+    if 'labels' in block:
+        return block['labels']
+    fmt = '%Y-%m-%d %H:%M' if block['unit'] < 86400 else '%Y-%m-%d'
+    seconds = block['start'] + np.cumsum(block['deltas']) * block['unit']
+    return [datetime.fromtimestamp(int(s), tz=timezone.utc).strftime(fmt) for s in seconds]
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+测试深渊筑底策略的滚动模式
+1. 每根K线的信号与逐日截取数据调用 apply_strategy 的最后一根结果一致（含参数边界情况）
+2. 数据不足或全程未深跌时返回 (None, None)；默认配置仍只判断最后一根
+3. 逐日调用 vs 滚动计算的耗时对比
+"""
+
+import sys
+import os
+import time
+import logging
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend', 'strategies'))
+
+import numpy as np
+import pandas as pd
+
+from abyss_bottoming_strategy import AbyssBottomingStrategy
+
+# 放宽阈值，使随机数据在各阶段都能产生信号
+TEST_CONFIG = {
+    'long_term_days': 250,
+    'min_drop_percent': 0.3,
+    'price_low_percentile': 0.5,
+    'volume_shrink_threshold': 0.8,
+    'volume_consistency_threshold': 0.3,
+    'hibernation_days': 20,
+    'hibernation_volatility_max': 0.2,
+    'washout_days': 10,
+    'washout_volume_shrink_ratio': 1.2,
+}
+
+
+def _abyss_data(num_days, seed):
+    """先涨后深跌再低位横盘，低位阶段缩量"""
+    rng = np.random.default_rng(seed)
+    quarter = num_days // 4
+    trend = np.concatenate([np.linspace(0, 0.5, quarter), np.linspace(0.5, -0.9, quarter),
+                            np.full(num_days - 2 * quarter, -0.9)])
+    close = 20 * np.exp(trend + np.cumsum(rng.normal(0, 0.01, num_days)))
+    open_ = close * (1 + rng.normal(0, 0.01, num_days))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, num_days))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, num_days))
+    volume = rng.uniform(5e5, 2e6, num_days) * np.where(np.arange(num_days) > num_days // 2, 0.4, 1.0)
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume},
+                        index=pd.bdate_range('2018-01-01', periods=num_days))
+
+
+def _per_day_signals(strategy, df):
+    """逐日截取数据调用，取最后一根的信号"""
+    signals = []
+    for end in range(1, len(df) + 1):
+        series, _ = strategy.apply_strategy(df.iloc[:end])
+        signals.append('' if series is None else series.iloc[-1])
+    return signals
+
+
+def _rolling_signals(config, df):
+    series, details = AbyssBottomingStrategy({**config, 'rolling_mode': True}).apply_strategy(df)
+    return ([''] * len(df) if series is None else list(series)), details
+
+
+def test_rolling_matches_per_day():
+    print("🧪 测试滚动模式与逐日调用一致")
+    logging.disable(logging.CRITICAL)
+    try:
+        seen = set()
+        for seed in range(3):
+            df = _abyss_data(600, seed)
+            expected = _per_day_signals(AbyssBottomingStrategy(TEST_CONFIG), df)
+            rolled, details = _rolling_signals(TEST_CONFIG, df)
+            assert rolled == expected, [i for i, (a, b) in enumerate(zip(rolled, expected)) if a != b][:10]
+            seen.update(expected)
+            assert details['signal_state'] == 'ROLLING'
+            assert sum(details['signal_counts'].values()) == sum(1 for s in expected if s)
+        # 随机数据覆盖了各阶段
+        assert {'', 'POTENTIAL_BUY', 'BUY', 'STRONG_BUY'} <= seen, seen
+
+        # 参数边界：无挖坑期、横盘期长于已有数据、成交量窗口长于萎缩判断所需的250根
+        df = _abyss_data(450, 5)
+        for extra in ({'washout_days': 0},
+                      {'hibernation_days': 300, 'washout_days': 5, 'hibernation_volatility_max': 5.0},
+                      {'volume_analysis_days': 300}):
+            config = {**TEST_CONFIG, **extra}
+            assert _rolling_signals(config, df)[0] == _per_day_signals(AbyssBottomingStrategy(config), df), extra
+    finally:
+        logging.disable(logging.NOTSET)
+    print("  ✅ 各阶段信号逐根一致")
+
+
+def test_rolling_edge_cases():
+    df = _abyss_data(600, 0)
+    assert AbyssBottomingStrategy({**TEST_CONFIG, 'rolling_mode': True}).apply_strategy(df.iloc[:200]) == (None, None)
+    # 默认配置（跌幅40%、400根）下全程上涨的数据没有信号
+    rising = df.iloc[::-1].copy()
+    rising.index = df.index
+    assert AbyssBottomingStrategy({'rolling_mode': True}).apply_strategy(rising) == (None, None)
+
+    stages = AbyssBottomingStrategy(TEST_CONFIG).calculate_rolling_stages(
+        AbyssBottomingStrategy(TEST_CONFIG).calculate_technical_indicators(df.copy()))
+    assert list(stages.columns) == ['deep_decline', 'hibernation', 'washout', 'liftoff']
+    assert not stages['deep_decline'].iloc[:TEST_CONFIG['long_term_days'] - 1].any()
+
+    # 默认模式只在最后一根给出信号
+    series, _ = AbyssBottomingStrategy(TEST_CONFIG).apply_strategy(df)
+    assert series is None or (series.iloc[:-1] == '').all()
+
+
+def benchmark_rolling(num_days=1500):
+    """单只股票全历史信号：逐日调用 vs 滚动计算"""
+    logging.disable(logging.CRITICAL)
+    try:
+        df = _abyss_data(num_days, 1)
+        start = time.perf_counter()
+        _per_day_signals(AbyssBottomingStrategy(TEST_CONFIG), df)
+        per_day_time = time.perf_counter() - start
+        start = time.perf_counter()
+        _rolling_signals(TEST_CONFIG, df)
+        rolling_time = time.perf_counter() - start
+        print(f"📊 {num_days} 根K线: 逐日调用 {per_day_time:.2f} 秒, 滚动计算 {rolling_time * 1000:.1f} ms, "
+              f"加速 {per_day_time / rolling_time:.0f} 倍")
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    test_rolling_matches_per_day()
+    test_rolling_edge_cases()
+    benchmark_rolling()
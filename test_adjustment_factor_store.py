@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+测试复权因子仓库
+1. 基于仓库的复权结果与简化复权（全量跳跃检测）一致
+2. 新K线只增量检测，重新打开仓库后因子不变
+3. 传入已复权数据时不污染仓库，回退到原有处理
+4. 日线与5分钟线分别存放，交替处理时互不覆盖；默认不使用仓库
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+import adjustment_factor_store
+import adjustment_processor
+from adjustment_factor_store import AdjustmentFactorStore, timeframe_of
+from adjustment_processor import AdjustmentProcessor, create_adjustment_config
+from synthetic_tdx_data import make_df_with_jumps
+
+
+def _processors(adjustment_type, store):
+    config = create_adjustment_config(adjustment_type, cache_enabled=False)
+    return AdjustmentProcessor(config, factor_store=store), AdjustmentProcessor(config, factor_store=None)
+
+
+def test_store_matches_simple_adjustment():
+    print("🧪 测试仓库复权与全量检测一致")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = AdjustmentFactorStore(tmp_dir)
+        for adjustment_type in ('forward', 'backward'):
+            with_store, without_store = _processors(adjustment_type, store)
+            for seed in range(5):
+                df = make_df_with_jumps(seed=seed)
+                code = f'sz{seed:06d}'
+                pd.testing.assert_frame_equal(without_store.process_data(df, code),
+                                              with_store.process_data(df, code), rtol=1e-12)
+                # 截取部分区间（如图表窗口）同样一致
+                window = df.iloc[200:900]
+                pd.testing.assert_frame_equal(without_store.process_data(window, code),
+                                              with_store.process_data(window, code), rtol=1e-12)
+        store.close()
+    print("  ✅ 前复权/后复权一致")
+
+
+def test_incremental_update(monkeypatch):
+    print("🧪 测试增量更新")
+    df = make_df_with_jumps(num_days=1500, num_jumps=8, seed=3)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = AdjustmentFactorStore(tmp_dir)
+        store.update('sh600000', df.iloc[:1000])
+
+        scanned = []
+        original = adjustment_factor_store.detect_jumps
+
+        def recording(close, prev_close=None):
+            scanned.append(len(close))
+            return original(close, prev_close)
+
+        monkeypatch.setattr(adjustment_factor_store, 'detect_jumps', recording)
+        store.update('sh600000', df)
+        assert scanned == [500]  # 只检测新增的500根K线
+
+        incremental = store.get_factor_table('sh600000')
+        store.close()
+
+        # 重新打开仓库（从SQLite读取）
+        reopened = AdjustmentFactorStore(tmp_dir)
+        pd.testing.assert_frame_equal(incremental, reopened.get_factor_table('sh600000'))
+
+        # 与一次性全量构建的结果一致
+        with tempfile.TemporaryDirectory() as other_dir:
+            full = AdjustmentFactorStore(other_dir)
+            full.update('sh600000', df)
+            pd.testing.assert_frame_equal(full.get_factor_table('sh600000'), incremental, rtol=1e-12)
+            full.close()
+        reopened.close()
+    print(f"  ✅ {len(incremental)} 个除权事件")
+
+
+def test_adjusted_input_does_not_poison_store():
+    df = make_df_with_jumps(seed=4)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = AdjustmentFactorStore(tmp_dir)
+        with_store, without_store = _processors('forward', store)
+        adjusted = with_store.process_data(df, 'sz000004')
+        before = store.get_factor_table('sz000004')
+
+        # 已复权数据在除权点处与仓库失配：仓库不变，结果与原处理一致
+        assert store.update('sz000004', adjusted) is None
+        pd.testing.assert_frame_equal(without_store.process_data(adjusted, 'sz000004'),
+                                      with_store.process_data(adjusted, 'sz000004'))
+        pd.testing.assert_frame_equal(before, store.get_factor_table('sz000004'))
+
+        # 仓库过期（如历史数据被替换）且传入的是未复权数据时自动重建
+        replaced = make_df_with_jumps(seed=5)
+        pd.testing.assert_frame_equal(without_store.process_data(replaced, 'sz000004'),
+                                      with_store.process_data(replaced, 'sz000004'), rtol=1e-12)
+        store.close()
+
+
+def _intraday(df):
+    """同一组价格放到5分钟K线时间轴上（每天48根）"""
+    days = pd.bdate_range('2024-01-02', periods=len(df) // 48 + 1)
+    stamps = [day + pd.Timedelta(hours=9, minutes=35 + 5 * k) for day in days for k in range(48)][:len(df)]
+    return df.set_axis(pd.DatetimeIndex(stamps, name='datetime'))
+
+
+def test_timeframes_kept_apart(tmp_path):
+    print("🧪 测试日线与5分钟线交替处理")
+    daily = make_df_with_jumps(num_days=1500, num_jumps=6, seed=6)
+    min5 = _intraday(make_df_with_jumps(num_days=960, num_jumps=4, seed=7))
+    assert timeframe_of(daily.index) == '1day' and timeframe_of(min5.index) == '5min'
+
+    store = AdjustmentFactorStore(str(tmp_path))
+    with_store, without_store = _processors('forward', store)
+    rebuilds = []
+    build_entry = store._build_entry
+    store._build_entry = lambda dates, close: rebuilds.append(len(dates)) or build_entry(dates, close)
+
+    for df in (daily, min5, daily, min5.iloc[:-48], daily):
+        pd.testing.assert_frame_equal(without_store.process_data(df, 'sz000006'),
+                                      with_store.process_data(df, 'sz000006'), rtol=1e-12)
+    # 每个周期只全量构建一次，之后交替处理不再重建
+    assert rebuilds == [len(daily), len(min5)]
+
+    store.close()
+    reopened = AdjustmentFactorStore(str(tmp_path))
+    daily_table = reopened.get_factor_table('sz000006')
+    min5_table = reopened.get_factor_table('sz000006', '5min')
+    assert daily_table['date'].iloc[0] >= daily.index[0] and daily_table['date'].iloc[-1] <= daily.index[-1]
+    assert len(daily_table) == 6 and len(min5_table) == 4
+    assert (min5_table['date'].dt.hour > 0).all()
+    reopened.close()
+    print("  ✅ 两个周期各自保存，互不覆盖")
+
+
+def test_store_is_opt_in(tmp_path, monkeypatch):
+    default_store = AdjustmentFactorStore(str(tmp_path))
+    monkeypatch.setattr(adjustment_factor_store, '_default_store', default_store)
+    assert AdjustmentProcessor().factor_store is None
+
+    monkeypatch.setattr(adjustment_processor, 'USE_ADJUSTMENT_FACTOR_STORE', True)
+    assert AdjustmentProcessor().factor_store is default_store
+    # 显式传入None时不使用仓库
+    assert AdjustmentProcessor(factor_store=None).factor_store is None
+    default_store.close()
+
+
+def benchmark_factor_store(num_stocks=200, num_days=5000):
+    """模拟每日收盘后复权：仓库已有历史，每只股票只新增1根K线"""
+    frames = [make_df_with_jumps(num_days, 20, seed=i) for i in range(num_stocks)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = AdjustmentFactorStore(tmp_dir)
+        with_store, without_store = _processors('forward', store)
+        for i, df in enumerate(frames):
+            with_store.process_data(df.iloc[:-1], f'sz{i:06d}')
+
+        start = time.perf_counter()
+        for i, df in enumerate(frames):
+            without_store.process_data(df, f'sz{i:06d}')
+        simple_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i, df in enumerate(frames):
+            with_store.process_data(df, f'sz{i:06d}')
+        store_time = time.perf_counter() - start
+        store.close()
+
+    print(f"📊 {num_stocks} 只股票 × {num_days} 条K线, 每只新增1根")
+    print(f"  全量跳跃检测: {simple_time:.2f} 秒, 因子仓库: {store_time:.2f} 秒")
+
+
+if __name__ == "__main__":
+    test_store_matches_simple_adjustment()
+    test_adjusted_input_does_not_poison_store()
+    benchmark_factor_store()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+测试向量化复权处理
+1. 前复权/后复权与原逐跳跃循环实现一致
+2. 复权因子表调整（_apply_factor_adjustment）
+3. 多跳跃长历史数据上的耗时对比
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+from adjustment_processor import AdjustmentProcessor, create_adjustment_config
+from synthetic_tdx_data import make_df_with_jumps
+
+
+def _legacy_adjust(df, adjustment_type):
+    """原实现：逐个跳跃点改写 iloc 切片"""
+    price_changes = df['close'].pct_change().abs()
+    jump_points = price_changes > 0.15
+    adjusted_df = df.copy()
+    jump_indices = list(jump_points[jump_points].index)
+    if adjustment_type == 'forward':
+        jump_indices = reversed(jump_indices)
+
+    for jump_idx in jump_indices:
+        jump_pos = df.index.get_loc(jump_idx)
+        if adjustment_type == 'forward' and jump_pos == 0:
+            continue
+        if adjustment_type == 'backward' and jump_pos >= len(df) - 1:
+            continue
+        before_price = df.iloc[jump_pos - 1]['close']
+        after_price = df.iloc[jump_pos]['close']
+        if before_price > 0 and after_price > 0:
+            if adjustment_type == 'forward':
+                factor, rows = after_price / before_price, slice(None, jump_pos)
+            else:
+                factor, rows = before_price / after_price, slice(jump_pos, None)
+            for col in ['open', 'high', 'low', 'close']:
+                adjusted_df.iloc[rows, adjusted_df.columns.get_loc(col)] *= factor
+            volume_col = adjusted_df.columns.get_loc('volume')
+            adjusted_df.iloc[rows, volume_col] = (
+                adjusted_df.iloc[rows, volume_col].astype(float) / factor
+            ).astype(adjusted_df.dtypes['volume'])
+    return adjusted_df
+
+
+def test_parity_with_legacy_loop():
+    print("🧪 测试向量化复权与原实现一致")
+    for adjustment_type in ('forward', 'backward'):
+        processor = AdjustmentProcessor(create_adjustment_config(adjustment_type), factor_store=None)
+        for seed in range(5):
+            df = make_df_with_jumps(seed=seed)
+            expected = _legacy_adjust(df, adjustment_type)
+            actual = processor.process_data(df, f'sz{seed:06d}')
+            pd.testing.assert_frame_equal(expected, actual, rtol=1e-12)
+
+        # 整数成交量：原实现每次跳跃都截断一次（误差随后续因子放大），向量化只在最后截断一次
+        df = make_df_with_jumps(seed=9, volume_dtype=np.int64)
+        expected = _legacy_adjust(df, adjustment_type)
+        actual = processor.process_data(df)
+        pd.testing.assert_frame_equal(expected.drop(columns='volume'), actual.drop(columns='volume'), rtol=1e-12)
+        assert actual['volume'].dtype == np.int64
+        np.testing.assert_allclose(expected['volume'], actual['volume'], rtol=1e-3, atol=1)
+    print("  ✅ 前复权/后复权一致")
+
+
+def test_no_jump_returns_copy():
+    df = make_df_with_jumps(num_jumps=0)
+    adjusted = AdjustmentProcessor(create_adjustment_config('forward')).process_data(df)
+    pd.testing.assert_frame_equal(df, adjusted)
+    assert adjusted is not df
+
+
+def test_factor_table_adjustment():
+    print("🧪 测试复权因子表调整")
+    rng = np.random.default_rng(1)
+    dates = pd.bdate_range('2020-01-02', periods=300, name='date')
+    close = np.full(300, 10.0)
+    close[100:] = (10.0 - 0.5) / 2   # 10送10并每股派0.5元
+    close[200:] = close[200:] / 1.5  # 10转5
+    df = pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close,
+                       'volume': rng.integers(1000, 5000, 300).astype(float)}, index=dates)
+    factors = pd.DataFrame({
+        'date': [dates[100], dates[200], pd.Timestamp('2019-06-01')],
+        'dividend': [0.5, 0.0, 1.0],
+        'bonus_ratio': [1.0, 0.5, 0.0],
+    })
+
+    forward = AdjustmentProcessor(create_adjustment_config('forward'))._apply_factor_adjustment(df, factors)
+    np.testing.assert_allclose(forward['close'].to_numpy(), close[-1])
+    np.testing.assert_allclose(forward['volume'].iloc[-1], df['volume'].iloc[-1])
+
+    backward = AdjustmentProcessor(create_adjustment_config('backward'))._apply_factor_adjustment(df, factors)
+    np.testing.assert_allclose(backward['close'].to_numpy(), close[0])
+
+    # 直接给出的因子与按分红送转计算的因子等价
+    direct = factors.iloc[:2].assign(factor=[0.475, 1 / 1.5])[['date', 'factor']]
+    pd.testing.assert_frame_equal(
+        forward, AdjustmentProcessor(create_adjustment_config('forward'))._apply_factor_adjustment(df, direct))
+
+    # 不含分红时只按送转调整
+    no_dividend = create_adjustment_config('forward', include_dividends=False)
+    adjusted = AdjustmentProcessor(no_dividend)._apply_factor_adjustment(df, factors)
+    np.testing.assert_allclose(adjusted['close'].iloc[0], 10.0 / 2 / 1.5)
+    print("  ✅ 因子表调整正确")
+
+
+def benchmark_adjustment(num_days=5000, num_jumps=20, repeats=20):
+    df = make_df_with_jumps(num_days, num_jumps)
+    processor = AdjustmentProcessor(create_adjustment_config('forward', cache_enabled=False), factor_store=None)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        _legacy_adjust(df, 'forward')
+    legacy_time = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        processor.process_data(df)
+    vectorized_time = (time.perf_counter() - start) / repeats
+
+    print(f"📊 {num_days} 条K线, {num_jumps} 个除权点")
+    print(f"  原循环实现: {legacy_time * 1000:.1f} ms, 向量化: {vectorized_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    test_parity_with_legacy_loop()
+    test_no_jump_returns_copy()
+    test_factor_table_adjustment()
+    benchmark_adjustment()
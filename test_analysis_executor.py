@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+测试股票池分析执行器（analysis_executor.py）
+1. 进程池 / 线程池 / 当前线程三种方式结果一致，按输入顺序返回，按块提交
+2. 分析器在每个工作进程只初始化一次；单只股票异常或超时不影响其他股票
+3. 强势股分析、多周期验证、季度股票池选择与策略测试在进程池与线程池下结果一致
+4. 2000只股票的合成股票池：原线程池(4) vs 进程池 1..N 个工作进程的耗时
+"""
+
+import sys
+import os
+import time
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pandas as pd
+
+import analysis_executor
+from analysis_executor import AnalysisExecutor
+from momentum_strength_analyzer import MomentumStrengthAnalyzer
+from multi_timeframe_validator import MultiTimeframeValidator
+from quarterly_backtester import QuarterlyBacktester, QuarterlyBacktestConfig
+from synthetic_tdx_data import day_records, write_chunks
+
+
+class _Target:
+    def __init__(self):
+        self.calls = 0
+
+    def square(self, x, offset=0):
+        time.sleep(0.005 * (x % 3))
+        return x * x + offset
+
+    def where(self, x):
+        self.calls += 1
+        return os.getpid(), id(self), self.calls
+
+    def flaky(self, x):
+        if x == 3:
+            raise ValueError('bad input')
+        if x == 5:
+            time.sleep(3)
+        return x
+
+
+@contextmanager
+def _universe(num_stocks, num_days=400):
+    """临时HOME下的通达信日线目录，K线截止到今天"""
+    with tempfile.TemporaryDirectory() as home:
+        lday_dir = os.path.join(home, '.local/share/tdxcfv/drive_c/tc/vipdoc/sz/lday')
+        os.makedirs(lday_dir)
+        start = pd.Timestamp.today().normalize() - pd.offsets.BDay(num_days - 1)
+        codes = [f'sz{i + 1:06d}' for i in range(num_stocks)]
+        for i, code in enumerate(codes):
+            write_chunks(os.path.join(lday_dir, f'{code}.day'), day_records(start, num_days, seed=i))
+        old_home = os.environ.get('HOME')
+        os.environ['HOME'] = home
+        try:
+            yield codes
+        finally:
+            os.environ['HOME'] = old_home
+
+
+@contextmanager
+def _executor_defaults(kind, workers):
+    saved = analysis_executor.ANALYSIS_EXECUTOR_KIND, analysis_executor.ANALYSIS_EXECUTOR_WORKERS
+    analysis_executor.ANALYSIS_EXECUTOR_KIND, analysis_executor.ANALYSIS_EXECUTOR_WORKERS = kind, workers
+    try:
+        yield
+    finally:
+        analysis_executor.ANALYSIS_EXECUTOR_KIND, analysis_executor.ANALYSIS_EXECUTOR_WORKERS = saved
+
+
+def test_ordered_results():
+    print("🧪 测试三种执行方式按输入顺序返回")
+    items = list(range(20))
+    for kind, workers in (('process', 3), ('thread', 3), ('process', 1)):
+        seen = []
+        executor = AnalysisExecutor(_Target(), kind=kind, max_workers=workers, chunksize=3)
+        results = executor.map('square', items, offset=1, on_result=lambda index, item, value: seen.append(index))
+        assert results == [x * x + 1 for x in items], kind
+        assert sorted(seen) == items
+        assert executor.last_run['chunks'] == 7 and executor.last_run['failed'] == 0
+        assert executor.last_run['kind'] == (kind if workers > 1 else 'inline')
+
+    executor = AnalysisExecutor(_Target(), max_workers=4)
+    assert executor.map('square', []) == []
+    executor.map('square', items)
+    assert executor.last_run['chunksize'] == 2
+    try:
+        AnalysisExecutor(_Target(), kind='gpu')
+        assert False
+    except ValueError:
+        pass
+    print("  ✅ 结果顺序与逐个调用一致")
+
+
+def test_worker_initialized_once():
+    print("🧪 测试分析器在每个工作进程只初始化一次")
+    target = _Target()
+    results = AnalysisExecutor(target, kind='process', max_workers=2, chunksize=5).map('where', range(40))
+    pids = {pid for pid, _, _ in results}
+    assert os.getpid() not in pids and 1 <= len(pids) <= 2
+    for pid in pids:
+        calls = [calls for p, _, calls in results if p == pid]
+        # 同一进程内的任务共用一个分析器对象，状态在任务之间保留
+        assert len({target_id for p, target_id, _ in results if p == pid}) == 1
+        assert sorted(calls) == list(range(1, len(calls) + 1))
+    # 父进程中的对象不受影响
+    assert target.calls == 0
+    print(f"  ✅ {len(pids)} 个工作进程各持有一份分析器")
+
+
+def test_errors_and_timeout():
+    print("🧪 测试单只股票异常与超时")
+    start = time.perf_counter()
+    executor = AnalysisExecutor(_Target(), kind='process', max_workers=2, chunksize=2, task_timeout=0.5)
+    results = executor.map('flaky', range(8), on_error=lambda item, error: error)
+    assert time.perf_counter() - start < 2.5
+    assert results[:3] == [0, 1, 2] and results[4] == 4 and results[6:] == [6, 7]
+    assert 'ValueError' in results[3] and '超时' in results[5]
+    assert [item for item, _ in executor.failures] in ([3, 5], [5, 3])
+
+    results = AnalysisExecutor(_Target(), kind='thread', max_workers=2).map('flaky', [1, 3], default=-1)
+    assert results == [1, -1]
+    print("  ✅ 失败位置返回默认值，其他股票正常完成")
+
+
+def test_pool_analyzers_parity():
+    print("🧪 测试股票池分析在进程池与线程池下一致")
+    with _universe(16) as codes:
+        outputs = {}
+        for kind in ('thread', 'process'):
+            with _executor_defaults(kind, 3):
+                momentum = MomentumStrengthAnalyzer().analyze_stock_pool(codes)
+                validation = MultiTimeframeValidator().validate_stock_pool(codes)
+                # 合成数据的成交量较小，不按成交量过滤
+                backtester = QuarterlyBacktester(QuarterlyBacktestConfig(min_volume=0))
+                quarter_start = datetime.now() - pd.Timedelta(days=150)
+                pool = backtester.select_quarterly_pool(quarter_start, quarter_start + pd.Timedelta(days=90))
+                strategy = backtester.test_strategy_on_pool('WEEKLY_GOLDEN_CROSS_MA', codes,
+                                                            quarter_start, quarter_start + pd.Timedelta(days=90))
+                outputs[kind] = (momentum, validation, pool, strategy)
+
+        momentum, validation, pool, strategy = outputs['process']
+        assert momentum and validation and pool and strategy['total_trades'] > 0
+        assert [r.symbol for r in momentum] == [r.symbol for r in outputs['thread'][0]]
+        assert [r.final_score for r in momentum] == [r.final_score for r in outputs['thread'][0]]
+        assert [(r.symbol, r.multi_timeframe_strength) for r in validation] == \
+               [(r.symbol, r.multi_timeframe_strength) for r in outputs['thread'][1]]
+        assert pool == outputs['thread'][2]
+        assert strategy == outputs['thread'][3]
+
+        # 与逐个调用的结果一致
+        analyzer = MomentumStrengthAnalyzer()
+        expected = sorted(filter(None, (analyzer.analyze_stock_strength(code) for code in codes)),
+                          key=lambda r: r.final_score, reverse=True)
+        assert [r.symbol for r in expected] == [r.symbol for r in momentum]
+    print(f"  ✅ 强势股 {len(momentum)} 只、多周期验证 {len(validation)} 只、股票池 {len(pool)} 只结果一致")
+
+
+def benchmark_analysis_executor(num_stocks=2000):
+    """合成股票池上强势股分析：原线程池(4) vs 进程池 1..N 个工作进程"""
+    with _universe(num_stocks) as codes:
+        cpus = os.cpu_count() or 1
+        print(f"📊 {num_stocks} 只股票强势分析, CPU {cpus} 核")
+        runs = [('线程池(4)', 'thread', 4)]
+        workers = 1
+        while workers < cpus:
+            runs.append((f'进程池({workers})', 'process', workers))
+            workers *= 2
+        runs.append((f'进程池({cpus})', 'process', cpus))
+
+        baseline = None
+        for label, kind, workers in runs:
+            analyzer = MomentumStrengthAnalyzer()
+            analyzer.logger.setLevel('WARNING')
+            with _executor_defaults(kind, workers):
+                start = time.perf_counter()
+                results = analyzer.analyze_stock_pool(codes)
+                elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"  {label}: {elapsed:.2f} 秒, {len(results)} 个结果, 相对线程池 {baseline / elapsed:.2f} 倍")
+
+
+if __name__ == "__main__":
+    test_ordered_results()
+    test_worker_initialized_once()
+    test_errors_and_timeout()
+    test_pool_analyzers_parity()
+    benchmark_analysis_executor()
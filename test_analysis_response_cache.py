@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+测试 /api/analysis 响应缓存
+1. ResponseCache：按条目数/字节数淘汰、ETag、磁盘层重启后命中、统计
+2. 接口：第二次请求命中且响应体与重新计算一致；If-None-Match 返回304；切换策略/周期/复权为不同条目
+3. 数据文件更新后自动失效；错误响应不缓存；缓存统计接口；耗时对比
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from response_cache import ResponseCache, file_signature, make_key
+from synthetic_tdx_data import day_records, write_chunks, setup_app
+
+
+def test_response_cache_lru_and_disk():
+    cache = ResponseCache(max_entries=3, max_bytes=100)
+    for i in range(4):
+        cache.put(f'k{i}', b'x' * 10)
+    assert cache.get('k0') is None and cache.get('k3').body == b'x' * 10
+    cache.put('big', b'y' * 60)
+    cache.put('big2', b'z' * 50)
+    stats = cache.stats()
+    assert stats['bytes'] == 50 and stats['entries'] == 1
+    assert cache.get('big') is None and cache.get('big2').body == b'z' * 50
+    # 单个条目超过上限时不缓存
+    cache.put('huge', b'h' * 101)
+    assert cache.get('huge') is None
+
+    entry = cache.put('k', b'{"a": 1}')
+    assert entry.etag == ResponseCache().put('other', b'{"a": 1}').etag
+    assert entry.etag != cache.put('k', b'{"a": 2}').etag
+
+    with tempfile.TemporaryDirectory() as disk_dir:
+        first = ResponseCache(disk_dir=disk_dir)
+        stored = first.put('key', b'body')
+        restarted = ResponseCache(disk_dir=disk_dir)
+        loaded = restarted.get('key')
+        assert loaded.body == b'body' and loaded.etag == stored.etag
+        assert restarted.get('key') is loaded
+        stats = restarted.stats()
+        assert stats['disk_hits'] == 1 and stats['hits'] == 1 and stats['hit_rate'] == 1.0
+        restarted.clear()
+        assert os.listdir(disk_dir) == [] and ResponseCache(disk_dir=disk_dir).get('key') is None
+
+        pruned = ResponseCache(disk_dir=disk_dir, disk_max_entries=10)
+        for i in range(64):
+            pruned.put(f'p{i}', b'.')
+        assert len(os.listdir(disk_dir)) == 10
+
+
+def test_file_signature_and_key():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'sz000001.day')
+        missing = file_signature([path])
+        write_chunks(path, day_records('2023-01-02', 10, seed=0))
+        created = file_signature([path])
+        write_chunks(path, day_records('2023-01-16', 1, seed=1), mode='ab')
+        assert len({missing, created, file_signature([path])}) == 3
+    assert make_key('a', 1, {'x': 1, 'y': 2}) == make_key('a', 1, {'y': 2, 'x': 1})
+    assert make_key('a', 1) != make_key('a', 2)
+
+
+def test_analysis_endpoint_cache():
+    print("🧪 测试分析接口响应缓存")
+    import app as app_module
+    original_base, original_cache = app_module.BASE_PATH, app_module.analysis_cache
+    with tempfile.TemporaryDirectory() as root_dir:
+        try:
+            app_module = setup_app(root_dir)
+            path = os.path.join(root_dir, 'sz', 'lday', 'sz000001.day')
+            client = app_module.app.test_client()
+            url = '/api/analysis/sz000001?strategy=MACD_ZERO_AXIS&adjustment=none'
+
+            first = client.get(url)
+            assert first.status_code == 200 and first.headers['X-Cache'] == 'MISS'
+            etag = first.headers['ETag']
+            assert len(first.get_json()['kline_data']) == 600
+
+            second = client.get(url)
+            assert second.headers['X-Cache'] == 'HIT' and second.headers['ETag'] == etag
+            assert second.get_data() == first.get_data()
+            with app_module.app.app_context():
+                expected = app_module.compute_stock_analysis('sz000001', 'MACD_ZERO_AXIS', 'none', 'daily')
+            assert expected.get_data() == first.get_data()
+
+            not_modified = client.get(url, headers={'If-None-Match': etag})
+            assert not_modified.status_code == 304 and not_modified.get_data() == b''
+            assert client.get(url, headers={'If-None-Match': '"stale"'}).status_code == 200
+
+            # 切换策略、周期、复权方式：各自独立的条目
+            for other in ('/api/analysis/sz000001?strategy=PRE_CROSS&adjustment=none',
+                          '/api/analysis/sz000001?strategy=MACD_ZERO_AXIS&adjustment=none&timeframe=weekly',
+                          '/api/analysis/sz000001?strategy=MACD_ZERO_AXIS&adjustment=forward'):
+                assert client.get(other).headers['X-Cache'] == 'MISS'
+                assert client.get(other).headers['X-Cache'] == 'HIT'
+
+            # 数据文件追加新K线：自动失效
+            write_chunks(path, day_records('2023-05-01', 5, seed=8), mode='ab')
+            updated = client.get(url)
+            assert updated.headers['X-Cache'] == 'MISS' and updated.headers['ETag'] != etag
+            assert len(updated.get_json()['kline_data']) == 605
+            assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
+
+            # 错误不缓存
+            assert client.get('/api/analysis/sz999999').status_code == 404
+            assert client.get('/api/analysis/sz999999').status_code == 404
+
+            stats = client.get('/api/cache/analysis').get_json()
+            assert stats['hits'] == 7 and stats['misses'] == 7 and stats['not_modified'] == 1
+            assert stats['entries'] == 5
+            assert client.delete('/api/cache/analysis').get_json()['entries'] == 0
+            assert client.get(url).headers['X-Cache'] == 'MISS'
+        finally:
+            app_module.BASE_PATH, app_module.analysis_cache = original_base, original_cache
+    print(f"  ✅ 命中率 {stats['hit_rate']:.0%}, 304 次数 {stats['not_modified']}")
+
+
+def benchmark_analysis_cache(num_days=3000, repeats=20):
+    """首次计算 vs 缓存命中 vs 304"""
+    import app as app_module
+    original_base, original_cache = app_module.BASE_PATH, app_module.analysis_cache
+    with tempfile.TemporaryDirectory() as root_dir:
+        try:
+            app_module = setup_app(root_dir, num_days)
+            client = app_module.app.test_client()
+            url = '/api/analysis/sz000001?strategy=MACD_ZERO_AXIS'
+            start = time.perf_counter()
+            response = client.get(url)
+            miss_time = time.perf_counter() - start
+            etag = response.headers['ETag']
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                client.get(url)
+            hit_time = (time.perf_counter() - start) / repeats
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                client.get(url, headers={'If-None-Match': etag})
+            not_modified_time = (time.perf_counter() - start) / repeats
+        finally:
+            app_module.BASE_PATH, app_module.analysis_cache = original_base, original_cache
+    print(f"📊 {num_days} 条K线, 响应 {len(response.get_data()) / 1024:.0f} KB")
+    print(f"  首次计算: {miss_time * 1000:.1f} ms, 命中: {hit_time * 1000:.2f} ms, 304: {not_modified_time * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    test_response_cache_lru_and_disk()
+    test_file_signature_and_key()
+    test_analysis_endpoint_cache()
+    benchmark_analysis_cache()
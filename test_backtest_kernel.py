@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+测试向量化回测内核
+1. 与逐周期实现（_collect_trades_by_cycle）的交易明细与统计结果完全一致
+2. 覆盖PRE/MID/POST周期、布尔信号、数据首尾附近的信号、价格相同的底部/顶部
+3. 重复索引等非常规数据回退到逐周期实现；耗时对比
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+import backtester
+
+
+def _make_df(num_days=1200, seed=0):
+    rng = np.random.default_rng(seed)
+    # 保留一位小数，制造大量价格相同的高低点
+    close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.03, num_days))), 1)
+    return pd.DataFrame({
+        'open': close,
+        'high': np.round(close * (1 + rng.uniform(0, 0.04, num_days)), 1),
+        'low': np.round(close * (1 - rng.uniform(0, 0.04, num_days)), 1),
+        'close': close,
+        'volume': rng.integers(1000, 100000, num_days),
+    }, index=pd.bdate_range('2018-01-02', periods=num_days, name='date'))
+
+
+def _make_state_signals(df, seed=0, density=0.05):
+    """随机的PRE/MID/POST序列，首尾两根K线固定放置信号"""
+    rng = np.random.default_rng(seed)
+    states = rng.choice(['PRE', 'MID', 'POST'], len(df))
+    states[rng.random(len(df)) > density] = ''
+    states[[0, 1, -2, -1]] = ['PRE', 'POST', 'PRE', 'MID']
+    return pd.Series(states, index=df.index, dtype=object)
+
+
+def _legacy_backtest(df, signal_series):
+    """关闭内核，走原逐周期实现"""
+    kernel_applicable = backtester._kernel_applicable
+    backtester._kernel_applicable = lambda df, signals: False
+    try:
+        return backtester.run_backtest(df, signal_series)
+    finally:
+        backtester._kernel_applicable = kernel_applicable
+
+
+def _assert_same_result(expected, actual):
+    assert actual == expected
+    for expected_trade, actual_trade in zip(expected.get('trades', []), actual.get('trades', [])):
+        for key, value in expected_trade.items():
+            assert type(actual_trade[key]) is type(value), key
+
+
+def test_kernel_matches_per_cycle_backtest():
+    print("🧪 测试向量化内核与逐周期实现一致")
+    total_trades = 0
+    for seed in range(6):
+        df = _make_df(seed=seed)
+        for signals in (_make_state_signals(df, seed), _make_state_signals(df, seed, density=0.3),
+                        pd.Series(np.random.default_rng(seed).random(len(df)) < 0.03, index=df.index)):
+            assert backtester._kernel_applicable(df, signals)
+            expected = _legacy_backtest(df, signals)
+            actual = backtester.run_backtest(df, signals)
+            _assert_same_result(expected, actual)
+            total_trades += len(actual.get('trades', []))
+    print(f"  ✅ 共比较 {total_trades} 笔交易")
+
+
+def test_short_and_degenerate_inputs():
+    df = _make_df(num_days=8, seed=3)
+    for states in (['PRE', '', '', '', '', '', '', ''], ['', '', '', '', '', '', 'PRE', 'MID'],
+                   ['POST', 'MID', '', '', '', '', '', 'POST'], [''] * 8):
+        signals = pd.Series(states, index=df.index, dtype=object)
+        _assert_same_result(_legacy_backtest(df, signals), backtester.run_backtest(df, signals))
+    # 五日内涨幅超过25%的信号被过滤
+    jumped = df.copy()
+    jumped.iloc[5:, jumped.columns.get_indexer(['high', 'low', 'close'])] *= 1.5
+    signals = pd.Series(['', 'MID', '', '', '', 'MID', 'PRE', 'MID'], index=df.index, dtype=object)
+    expected = _legacy_backtest(jumped, signals)
+    assert expected['total_signals'] == 1
+    _assert_same_result(expected, backtester.run_backtest(jumped, signals))
+    # 整数价格
+    int_df = df.assign(**{col: (df[col] * 10).astype(np.int64) for col in ['high', 'low', 'close']})
+    signals = pd.Series(['PRE', 'MID', '', 'POST', 'MID', '', 'PRE', ''], index=df.index, dtype=object)
+    _assert_same_result(_legacy_backtest(int_df, signals), backtester.run_backtest(int_df, signals))
+
+
+def test_irregular_data_falls_back():
+    df = _make_df(num_days=200, seed=4)
+    signals = _make_state_signals(df, seed=4)
+    duplicated = pd.concat([df.iloc[:100], df.iloc[99:]])
+    assert not backtester._kernel_applicable(duplicated, signals)
+    with_nan = df.copy()
+    with_nan.iloc[50, with_nan.columns.get_loc('low')] = np.nan
+    assert not backtester._kernel_applicable(with_nan, signals)
+    assert not backtester._kernel_applicable(df, signals.iloc[10:])
+    assert backtester.run_backtest(with_nan, signals)['total_signals'] > 0
+
+
+def benchmark_backtest(num_days=3000, repeats=20):
+    """单只股票的一次回测：逐周期实现 vs 向量化内核"""
+    df = _make_df(num_days=num_days)
+    signals = _make_state_signals(df, density=0.05)
+    cycle_signals = backtester.group_signals_by_cycle(df, signals)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        backtester._collect_trades_by_cycle(df, cycle_signals)
+    legacy_time = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        backtester._collect_trades_vectorized(df, cycle_signals)
+    kernel_time = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        backtester.run_backtest(df, signals)
+    total_time = (time.perf_counter() - start) / repeats
+
+    print(f"📊 {num_days} 条K线, {len(cycle_signals)} 个信号周期")
+    print(f"  逐周期实现: {legacy_time * 1000:.1f} ms, 向量化内核: {kernel_time * 1000:.1f} ms, "
+          f"run_backtest 总计: {total_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    test_kernel_matches_per_cycle_backtest()
+    test_short_and_degenerate_inputs()
+    test_irregular_data_falls_back()
+    benchmark_backtest()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+测试图表窗口与降采样
+1. 窗口定位（start/end/before/count）与预热/前瞻截取；OHLC分桶聚合保留极值
+2. .lc5 按 count/lookback 只读取窗口所需的记录
+3. /api/analysis 指定窗口时指标与全量计算近似一致；max_points 降采样；/bars 向前翻页；非法参数返回400
+4. 分时数据有除权时，最新一页与向前翻页的复权价格在接缝处连续
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+from chart_window import ChartWindow, window_bounds, slice_with_warmup, downsample_ohlc
+from synthetic_tdx_data import pack_lc5, trading_timestamps, write_lc5, setup_app, decode_columnar_dates
+
+
+def test_window_bounds_and_warmup():
+    print("🧪 测试窗口定位与预热截取")
+    index = pd.bdate_range('2024-01-01', periods=100)
+    assert window_bounds(index, ChartWindow()) == (0, 100)
+    assert window_bounds(index, ChartWindow(start='2024-01-08', end='2024-01-12')) == (5, 10)
+    assert window_bounds(index, ChartWindow(count=10)) == (90, 100)
+    assert window_bounds(index, ChartWindow(before='2024-01-15', count=3)) == (7, 10)
+    assert window_bounds(index, ChartWindow(start='2024-01-08', before='2024-01-03')) == (5, 5)
+    assert window_bounds(index, ChartWindow(start='2030-01-01')) == (100, 100)
+
+    df = pd.DataFrame({'close': np.arange(100.0)}, index=index)
+    # 只有 max_points 时不截取
+    full, lo, hi = slice_with_warmup(df, ChartWindow(max_points=10, warmup=20))
+    assert full is df and (lo, hi) == (0, 100)
+
+    # count 取窗口内最后N根
+    sliced, lo, hi = slice_with_warmup(df, ChartWindow(start='2024-01-08', end='2024-02-01', count=5,
+                                                       warmup=3, lookahead=2))
+    assert list(sliced.iloc[lo:hi]['close']) == [19.0, 20.0, 21.0, 22.0, 23.0]
+    assert list(sliced['close']) == list(np.arange(16.0, 26.0)) and (lo, hi) == (3, 8)
+    sliced.loc[:, 'close'] = 0.0
+    assert df['close'].iloc[16] == 16.0
+
+    # 预热与前瞻在数据边界处截断
+    sliced, lo, hi = slice_with_warmup(df, ChartWindow(end='2024-01-03', warmup=50, lookahead=200))
+    assert (lo, hi) == (0, 3) and len(sliced) == 100
+    print("  ✅ 窗口定位正确")
+
+
+def test_downsample_ohlc():
+    print("🧪 测试OHLC分桶降采样")
+    index = pd.date_range('2024-01-02 09:35', periods=10, freq='5min')
+    df = pd.DataFrame({
+        'open': np.arange(10.0) + 100,
+        'high': [101, 109, 102, 103, 104, 105, 106, 107, 120, 108.0],
+        'low': [99, 98, 97, np.nan, 96, 95, 80, 94, 93, 92.0],
+        'close': np.arange(10.0) + 100.5,
+        'volume': np.arange(10, dtype=np.int64) * 100,
+        'dif': np.arange(10.0) / 10,
+    }, index=index)
+
+    same, bucket_size = downsample_ohlc(df, 10)
+    assert same is df and bucket_size == 1
+    same, bucket_size = downsample_ohlc(df, None)
+    assert same is df and bucket_size == 1
+
+    view, bucket_size = downsample_ohlc(df, 3)
+    assert bucket_size == 4 and len(view) == 3
+    assert list(view.index) == [index[0], index[4], index[8]]
+    assert list(view['open']) == [100.0, 104.0, 108.0]
+    assert list(view['close']) == [103.5, 107.5, 109.5]
+    assert list(view['high']) == [109.0, 107.0, 120.0]
+    # NaN 不会吞掉桶内其他K线的极值
+    assert list(view['low']) == [97.0, 80.0, 92.0]
+    assert list(view['volume']) == [600, 2200, 1700] and view['volume'].dtype.kind == 'i'
+    assert list(view['dif']) == [0.3, 0.7, 0.9]
+    print("  ✅ 开/高/低/收/量按桶聚合，指标取桶内末值")
+
+
+def test_lc5_count_and_lookback():
+    print("🧪 测试.lc5按count/lookback读取")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'sz000001.lc5')
+        write_lc5(file_path, num_days=20)
+        full = data_loader.get_5min_data(file_path)
+
+        tail = data_loader.get_5min_data(file_path, count=30)
+        pd.testing.assert_frame_equal(tail, full.iloc[-30:])
+        tail = data_loader.get_5min_data(file_path, count=30, lookback=10)
+        pd.testing.assert_frame_equal(tail, full.iloc[-40:])
+
+        window = data_loader.get_5min_data(file_path, start='2024-01-10', lookback=48)
+        start_pos = full.index.searchsorted(pd.Timestamp('2024-01-10'))
+        pd.testing.assert_frame_equal(window, full.iloc[start_pos - 48:])
+
+        window = data_loader.get_5min_data(file_path, end='2024-01-05 15:00', count=5, lookback=1000)
+        end_pos = full.index.searchsorted(pd.Timestamp('2024-01-06'))
+        pd.testing.assert_frame_equal(window, full.iloc[:end_pos])
+    print("  ✅ 与全量读取后切片一致")
+
+
+def _assert_close(windowed, full, section, tolerance=1e-3):
+    """窗口内的每一行与全量结果中同一日期的行一致"""
+    full_rows = {row['date']: row for row in full[section]}
+    for row in windowed[section]:
+        expected = full_rows[row['date']]
+        for name, value in row.items():
+            want = expected[name]
+            if value is None or want is None:
+                assert value is None and want is None, (section, row['date'], name, value, want)
+            elif isinstance(value, (int, float)):
+                assert abs(value - want) <= tolerance * max(1.0, abs(want)), (section, row['date'], name, value, want)
+
+
+def _with_app(test, **setup):
+    import app as app_module
+    original_base, original_cache = app_module.BASE_PATH, app_module.analysis_cache
+    with tempfile.TemporaryDirectory() as root_dir:
+        try:
+            test(setup_app(root_dir, **setup))
+        finally:
+            app_module.BASE_PATH, app_module.analysis_cache = original_base, original_cache
+
+
+def test_windowed_analysis_matches_full():
+    print("🧪 测试窗口化分析与全量计算一致")
+
+    def run(app_module):
+        client = app_module.app.test_client()
+        for query in ('strategy=MACD_ZERO_AXIS', 'strategy=PRE_CROSS&adjustment=none',
+                      'strategy=MACD_ZERO_AXIS&adjustment=none&timeframe=15min'):
+            base = f'/api/analysis/sz000001?{query}'
+            full = client.get(base).get_json()
+            assert 'window' not in full
+
+            dates = [row['date'] for row in full['kline_data']]
+            start, end = dates[len(dates) // 2][:10], dates[-40][:10]
+            windowed = client.get(f'{base}&start={start}&end={end}').get_json()
+            assert windowed['window']['start'][:10] >= start and windowed['window']['end'][:10] <= end
+            assert windowed['window']['bars'] == len(windowed['kline_data']) == windowed['window']['points']
+            assert windowed['window']['has_more_before'] and windowed['window']['bucket_size'] == 1
+            _assert_close(windowed, full, 'kline_data')
+            _assert_close(windowed, full, 'indicator_data')
+            window_dates = {row['date'] for row in windowed['kline_data']}
+            assert [p for p in windowed['signal_points']] == [
+                p for p in full['signal_points'] if p['date'] in window_dates]
+
+            latest = client.get(f'{base}&count=100').get_json()
+            assert [row['date'] for row in latest['kline_data']] == dates[-100:]
+            _assert_close(latest, full, 'indicator_data')
+
+            columnar = client.get(f'{base}&count=100&format=columnar').get_json()
+            assert decode_columnar_dates(columnar['dates']) == dates[-100:]
+            assert columnar['window'] == latest['window']
+
+    _with_app(run, num_days=900, lc5_days=40)
+    print("  ✅ 日线/15分钟窗口内的K线、指标与信号点一致")
+
+
+def test_max_points_downsampling():
+    print("🧪 测试max_points降采样")
+
+    def run(app_module):
+        client = app_module.app.test_client()
+        base = '/api/analysis/sz000001?strategy=MACD_ZERO_AXIS&adjustment=none'
+        full = client.get(base).get_json()
+        view = client.get(f'{base}&max_points=200').get_json()
+        bars = len(full['kline_data'])
+        assert view['window']['bars'] == bars and view['window']['points'] <= 200
+        bucket_size = view['window']['bucket_size']
+        assert bucket_size == -(-bars // 200)
+
+        rows = full['kline_data']
+        for i, point in enumerate(view['kline_data']):
+            bucket = rows[i * bucket_size:(i + 1) * bucket_size]
+            assert point['date'] == bucket[0]['date']
+            assert point['high'] == max(row['high'] for row in bucket)
+            assert point['low'] == min(row['low'] for row in bucket)
+            assert point['open'] == bucket[0]['open'] and point['close'] == bucket[-1]['close']
+
+        bucket_dates = {row['date'] for row in view['kline_data']}
+        assert len(view['signal_points']) == len(full['signal_points'])
+        for point, original in zip(view['signal_points'], full['signal_points']):
+            assert point['bar_date'] == original['date'] and point['date'] in bucket_dates
+            assert point['date'] <= point['bar_date']
+        assert view['backtest_results'] == full['backtest_results']
+
+    _with_app(run, num_days=1500)
+    print("  ✅ 桶内极值保留，信号点映射到所在桶")
+
+
+def test_bars_pagination():
+    print("🧪 测试/bars向前翻页")
+
+    def run(app_module):
+        client = app_module.app.test_client()
+        query = 'strategy=MACD_ZERO_AXIS&adjustment=none'
+        full = client.get(f'/api/analysis/sz000001?{query}').get_json()
+        dates = [row['date'] for row in full['kline_data']]
+
+        pages, before = [], dates[-1]
+        while True:
+            page = client.get(f'/api/analysis/sz000001/bars?{query}&before={before}&count=300').get_json()
+            assert page['backtest_results'] is None
+            pages.insert(0, page)
+            if not page['window']['has_more_before']:
+                break
+            before = page['window']['start']
+        loaded = [row['date'] for page in pages for row in page['kline_data']]
+        assert loaded == dates[:-1]
+        assert all(page['window']['bars'] == 300 for page in pages[1:])
+
+        # 翻页加载的信号点（含回测状态）与全量图表一致
+        paged_signals = [point for page in pages for point in page['signal_points']]
+        assert paged_signals == [point for point in full['signal_points'] if point['date'] != dates[-1]]
+
+        default = client.get(f'/api/analysis/sz000001/bars?{query}').get_json()
+        assert default['window']['bars'] == min(len(dates), app_module.ANALYSIS_PAGE_BARS)
+        assert [row['date'] for row in default['kline_data']] == dates[-default['window']['bars']:]
+
+    _with_app(run, num_days=1000)
+    print("  ✅ 逐页拼接与全量结果一致")
+
+
+def _write_lc5_with_split(file_path, num_days=30, split_day=8):
+    """第 split_day 天起价格减半（10送10），其余与 write_lc5 相同的随机游走"""
+    rng = np.random.default_rng(3)
+    price = 10.0
+    chunks = []
+    for i, ts in enumerate(trading_timestamps(num_days)):
+        price = max(1.0, price + rng.normal(0, 0.02))
+        scale = 0.5 if i >= split_day * 48 else 1.0
+        p = price * scale
+        chunks.append(pack_lc5(ts, p, p * 1.01, p * 0.99, p, float(rng.integers(100, 10000)), 1e5))
+    with open(file_path, 'wb') as f:
+        f.write(b''.join(chunks))
+
+
+def test_paged_adjustment_is_continuous():
+    print("🧪 测试分时翻页的复权价格连续")
+
+    def run(app_module):
+        _write_lc5_with_split(os.path.join(app_module.BASE_PATH, 'sz', 'fzline', 'sz000001.lc5'))
+        client = app_module.app.test_client()
+        for adjustment in ('backward', 'forward'):
+            query = f'strategy=MACD_ZERO_AXIS&adjustment={adjustment}&timeframe=5min'
+            full = {row['date']: row for row in client.get(f'/api/analysis/sz000001?{query}').get_json()['kline_data']}
+            latest = client.get(f'/api/analysis/sz000001?{query}&count=300').get_json()
+            before = latest['window']['start']
+            earlier = client.get(f'/api/analysis/sz000001/bars?{query}&before={before}&count=300').get_json()
+
+            joined = earlier['kline_data'] + latest['kline_data']
+            assert len(joined) == 600 and joined[299]['date'] < joined[300]['date']
+            for row in joined:
+                assert abs(row['close'] - full[row['date']]['close']) < 1e-6, (adjustment, row['date'])
+            # 接缝两侧没有复权造成的跳变
+            assert abs(joined[300]['close'] / joined[299]['close'] - 1) < 0.05, adjustment
+
+    _with_app(run, num_days=300, lc5_days=1)
+    print("  ✅ 前复权/后复权两页拼接与全量复权一致")
+
+
+def test_invalid_window_params():
+    def run(app_module):
+        client = app_module.app.test_client()
+        for query in ('count=0', 'count=abc', 'max_points=-5', 'start=not-a-date', 'before=2024-13-45'):
+            assert client.get(f'/api/analysis/sz000001?{query}').status_code == 400, query
+            assert client.get(f'/api/analysis/sz000001/bars?{query}').status_code == 400, query
+        assert client.get('/api/analysis/sz000001?start=2035-01-01').status_code == 404
+        # 不同窗口使用不同的缓存键
+        client.get('/api/analysis/sz000001?count=50')
+        second = client.get('/api/analysis/sz000001?count=60')
+        assert second.headers['X-Cache'] == 'MISS' and len(second.get_json()['kline_data']) == 60
+
+    _with_app(run, num_days=300)
+
+
+def benchmark_windowed_requests(lc5_days=1000):
+    """5分钟线：全量请求 vs 最近N根窗口请求的耗时与响应体积"""
+
+    def run(app_module):
+        app_module.analysis_cache.enabled = False
+        client = app_module.app.test_client()
+        base = '/api/analysis/sz000001?strategy=MACD_ZERO_AXIS&adjustment=none&timeframe=5min&format=columnar'
+        print(f"📊 {lc5_days} 天5分钟线（{lc5_days * 48} 根）")
+        for label, url in (('全量', base), ('最近1500根', f'{base}&count=1500'),
+                           ('全量降采样到3000点', f'{base}&max_points=3000')):
+            start = time.perf_counter()
+            body = client.get(url).get_data()
+            elapsed = time.perf_counter() - start
+            print(f"  {label}: {elapsed * 1000:.0f} ms, {len(body) / 1024:.0f} KB")
+
+    _with_app(run, num_days=300, lc5_days=lc5_days)
+
+
+if __name__ == "__main__":
+    test_window_bounds_and_warmup()
+    test_downsample_ohlc()
+    test_lc5_count_and_lookback()
+    test_windowed_analysis_matches_full()
+    test_max_points_downsampling()
+    test_bars_pagination()
+    test_paged_adjustment_is_continuous()
+    test_invalid_window_params()
+    benchmark_windowed_requests()
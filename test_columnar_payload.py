@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+测试 /api/analysis 列式编码
+1. 日期差分编码还原后与逐行格式的日期字符串一致（日线/周线/分时）；浮点数按精度四舍五入，NaN 输出 null
+2. format=columnar 与默认逐行格式内容一致；precision 参数；未知格式返回400
+3. Accept-Encoding 协商 gzip/br 压缩，ETag 随压缩方式区分；体积与耗时对比
+"""
+
+import sys
+import os
+import gzip
+import json
+import time
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+from payload_encoding import encode_dates, encode_column, encode_columns, negotiate_encoding, brotli
+from response_cache import ResponseCache
+from synthetic_tdx_data import setup_app, decode_columnar_dates
+
+
+def test_encode_dates_and_columns():
+    daily = pd.bdate_range('2020-01-01', periods=300)
+    block = encode_dates(daily)
+    assert block['unit'] == 86400 and set(block['deltas'][1:]) == {1, 3}
+    assert decode_columnar_dates(block) == list(daily.strftime('%Y-%m-%d'))
+
+    weekly = pd.Series(1.0, index=daily).resample('W').last().index
+    assert decode_columnar_dates(encode_dates(weekly)) == list(weekly.strftime('%Y-%m-%d'))
+
+    intraday = pd.DatetimeIndex(['2024-03-01 09:35', '2024-03-01 09:40', '2024-03-01 15:00', '2024-03-04 09:35'])
+    block = encode_dates(intraday, intraday=True)
+    assert block['deltas'] == [0, 5, 320, 3 * 1440 - 325]
+    assert decode_columnar_dates(block) == list(intraday.strftime('%Y-%m-%d %H:%M'))
+
+    assert encode_dates(pd.Index(['a', 'b'])) == {'labels': ['a', 'b']}
+    assert encode_dates(pd.DatetimeIndex([])) == {'labels': []}
+
+    assert encode_column(np.array([1.23456, np.nan, -0.000049, np.inf]), 4) == [1.2346, None, -0.0, None]
+    assert encode_column(np.array([3, 4], dtype=np.int64), 2) == [3, 4]
+    assert encode_column(np.array([10.126, 9.994]), 2) == [10.13, 9.99]
+    df = pd.DataFrame({'a': [1.0, 2.5]})
+    assert encode_columns(df, ['a', 'missing'], 1) == {'a': [1.0, 2.5], 'missing': [None, None]}
+
+
+def test_negotiate_encoding():
+    preferred = 'br' if brotli is not None else 'gzip'
+    assert negotiate_encoding('gzip, deflate, br') == preferred
+    assert negotiate_encoding('gzip') == 'gzip'
+    assert negotiate_encoding('br;q=0, gzip;q=0.5') == 'gzip'
+    assert negotiate_encoding('gzip;q=0') is None
+    assert negotiate_encoding('identity') is None
+    assert negotiate_encoding('') is None and negotiate_encoding(None) is None
+    assert negotiate_encoding('*') == preferred
+
+
+def _assert_same_content(records, columnar, precision):
+    dates = decode_columnar_dates(columnar['dates'])
+    assert dates == [row['date'] for row in records['kline_data']]
+    for section in ('kline_data', 'indicator_data'):
+        for name, values in columnar[section].items():
+            expected = [row[name] for row in records[section]]
+            assert len(values) == len(expected)
+            for got, want in zip(values, expected):
+                if want is None:
+                    assert got is None, (section, name)
+                else:
+                    assert got == round(want, precision) or got == want, (section, name, got, want)
+    assert columnar['signal_points'] == records['signal_points']
+    assert columnar['backtest_results'] == records['backtest_results']
+
+
+def test_columnar_matches_records():
+    print("🧪 测试列式格式与逐行格式一致")
+    import app as app_module
+    original_base, original_cache = app_module.BASE_PATH, app_module.analysis_cache
+    with tempfile.TemporaryDirectory() as root_dir:
+        try:
+            app_module = setup_app(root_dir, lc5_days=20)
+            client = app_module.app.test_client()
+            for query in ('strategy=MACD_ZERO_AXIS&adjustment=none', 'strategy=PRE_CROSS&timeframe=weekly',
+                          'strategy=MACD_ZERO_AXIS&adjustment=none&timeframe=15min'):
+                base = f'/api/analysis/sz000001?{query}'
+                records = client.get(base).get_json()
+                columnar = client.get(f'{base}&format=columnar').get_json()
+                assert columnar['format'] == 'columnar' and 'format' not in records
+                _assert_same_content(records, columnar, 4)
+
+            low = client.get('/api/analysis/sz000001?strategy=MACD_ZERO_AXIS&format=columnar&precision=1').get_json()
+            assert all(v is None or v == round(v, 1) for v in low['indicator_data']['dif'])
+            assert client.get('/api/analysis/sz000001?format=xml').status_code == 400
+        finally:
+            app_module.BASE_PATH, app_module.analysis_cache = original_base, original_cache
+    print("  ✅ 日线/周线/15分钟一致")
+
+
+def test_compression_negotiation():
+    import app as app_module
+    original_base, original_cache = app_module.BASE_PATH, app_module.analysis_cache
+    with tempfile.TemporaryDirectory() as root_dir:
+        try:
+            app_module = setup_app(root_dir)
+            client = app_module.app.test_client()
+            url = '/api/analysis/sz000001?strategy=MACD_ZERO_AXIS&format=columnar'
+            plain = client.get(url)
+            assert 'Content-Encoding' not in plain.headers and 'Accept-Encoding' in plain.headers['Vary']
+
+            zipped = client.get(url, headers={'Accept-Encoding': 'gzip'})
+            assert zipped.headers['Content-Encoding'] == 'gzip' and zipped.headers['X-Cache'] == 'HIT'
+            assert gzip.decompress(zipped.get_data()) == plain.get_data()
+            assert len(zipped.get_data()) < len(plain.get_data()) / 2
+            assert zipped.headers['ETag'] != plain.headers['ETag']
+
+            again = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': zipped.headers['ETag']})
+            assert again.status_code == 304
+            # 压缩结果随条目保存并计入字节数
+            stats = app_module.analysis_cache.stats()
+            assert stats['bytes'] == len(plain.get_data()) + len(zipped.get_data())
+
+            if brotli is not None:
+                br = client.get(url, headers={'Accept-Encoding': 'br, gzip'})
+                assert br.headers['Content-Encoding'] == 'br'
+                assert brotli.decompress(br.get_data()) == plain.get_data()
+
+            # 过小的响应不压缩
+            small = ResponseCache()
+            entry = small.put('k', b'{}')
+            assert small.encoded('k', entry, 'gzip') == (b'{}', None)
+        finally:
+            app_module.BASE_PATH, app_module.analysis_cache = original_base, original_cache
+
+
+def benchmark_payload(num_days=4000):
+    """逐行记录 vs 列式：响应体积（原始/gzip）与序列化耗时"""
+    import app as app_module
+    original_base, original_cache = app_module.BASE_PATH, app_module.analysis_cache
+    with tempfile.TemporaryDirectory() as root_dir:
+        try:
+            app_module = setup_app(root_dir, num_days)
+            app_module.analysis_cache.enabled = False
+            client = app_module.app.test_client()
+            base = '/api/analysis/sz000001?strategy=MACD_ZERO_AXIS'
+            print(f"📊 {num_days} 条K线")
+            for label, url in (('逐行记录', base), ('列式', f'{base}&format=columnar')):
+                start = time.perf_counter()
+                body = client.get(url).get_data()
+                elapsed = time.perf_counter() - start
+                print(f"  {label}: {len(body) / 1024:.0f} KB, gzip {len(gzip.compress(body, 5)) / 1024:.0f} KB, "
+                      f"请求耗时 {elapsed * 1000:.0f} ms")
+
+            df = pd.DataFrame(np.random.default_rng(0).normal(10, 1, (num_days, 11)),
+                              index=pd.bdate_range('2010-01-01', periods=num_days),
+                              columns=['ma13', 'ma45', 'dif', 'dea', 'macd', 'k', 'd', 'j', 'rsi6', 'rsi12', 'rsi24'])
+            start = time.perf_counter()
+            json.dumps(df.reset_index().assign(index=lambda x: x['index'].dt.strftime('%Y-%m-%d'))
+                       .replace({np.nan: None}).to_dict('records'))
+            records_time = time.perf_counter() - start
+            start = time.perf_counter()
+            json.dumps({'dates': encode_dates(df.index), 'columns': encode_columns(df, df.columns, 4)})
+            columnar_time = time.perf_counter() - start
+            print(f"  指标序列化: 逐行 {records_time * 1000:.1f} ms, 列式 {columnar_time * 1000:.1f} ms")
+        finally:
+            app_module.BASE_PATH, app_module.analysis_cache = original_base, original_cache
+
+
+if __name__ == "__main__":
+    test_encode_dates_and_columns()
+    test_negotiate_encoding()
+    test_columnar_matches_records()
+    test_compression_negotiation()
+    benchmark_payload()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+测试增量筛选
+1. 逐日推进的指标状态与全量重算逐位一致，最近几行上的信号与完整历史一致
+2. .day文件只读取新增的尾部记录，历史被改写时要求重建
+3. 增量worker与全量worker的筛选结果一致；每日扫描耗时对比
+"""
+
+import sys
+import os
+import time
+import struct
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+import indicators
+import strategies
+import data_loader
+from incremental_indicators import (
+    IndicatorParams, IndicatorStateStore, init_state, advance_state, evaluate_signal,
+    read_new_bars, state_frame
+)
+from synthetic_tdx_data import day_records, write_chunks
+
+
+def _make_df(num_days=800, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(np.maximum(1.0, 10 + np.cumsum(rng.normal(0, 0.2, num_days))), 2)
+    return pd.DataFrame({
+        'open': close,
+        'high': np.round(close * (1 + rng.uniform(0, 0.03, num_days)), 2),
+        'low': np.round(close * (1 - rng.uniform(0, 0.03, num_days)), 2),
+        'close': close,
+        'volume': rng.integers(1000, 100000, num_days),
+    }, index=pd.bdate_range('2020-01-02', periods=num_days, name='date'))
+
+
+STRATEGY_FUNCTIONS = {
+    'MACD_ZERO_AXIS': strategies.apply_macd_zero_axis_strategy,
+    'TRIPLE_CROSS': strategies.apply_triple_cross,
+    'PRE_CROSS': strategies.apply_pre_cross,
+}
+
+
+def test_advanced_state_matches_full_recompute():
+    print("🧪 测试逐日推进与全量重算一致")
+    params = IndicatorParams.from_strategy_config()
+    signals = {name: 0 for name in STRATEGY_FUNCTIONS}
+    for seed in range(3):
+        df = _make_df(seed=seed)
+        state = init_state(df.iloc[:500], params)
+        for i in range(500, len(df)):
+            state = advance_state(state, df.iloc[i:i + 1], params)
+            full = df.iloc[:i + 1]
+            tail = state_frame(state)
+
+            dif, dea = indicators.calculate_macd(full, fast=12, slow=26, signal=9)
+            k, d, j = indicators.calculate_kdj(full, n=9, k_period=9, d_period=3)
+            expected = pd.DataFrame({'close': full['close'], 'dif': dif, 'dea': dea, 'k': k, 'd': d, 'j': j,
+                                     'rsi6': indicators.calculate_rsi(full, 6),
+                                     'rsi14': indicators.calculate_rsi(full, 14)}).iloc[-len(tail):]
+            pd.testing.assert_frame_equal(expected, tail, check_exact=True, check_freq=False)
+
+            for name, func in STRATEGY_FUNCTIONS.items():
+                expected_signal = func(full).iloc[-1]
+                assert evaluate_signal(state, name) == expected_signal
+                signals[name] += bool(expected_signal)
+    # 多根K线一次推进与逐根推进相同
+    df = _make_df(seed=7)
+    one_step = advance_state(init_state(df.iloc[:600], params), df.iloc[600:], params)
+    full_state = init_state(df, params)
+    for key in ('rows', 'last_date', 'ema_fast', 'ema_slow', 'dea', 'k', 'd', 'rsi', 'highs', 'lows'):
+        assert one_step[key] == full_state[key]
+    pd.testing.assert_frame_equal(state_frame(one_step), state_frame(full_state))
+    print(f"  ✅ 覆盖的信号数: {signals}")
+
+
+def test_read_new_bars_from_day_file():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'sh600000.day')
+        records = day_records('2022-01-03', 400, seed=1)
+        write_chunks(path, records[:300])
+        params = IndicatorParams.from_strategy_config()
+        state = init_state(data_loader.get_daily_data(path), params, os.path.getsize(path))
+
+        # 没有新K线
+        new_bars, size = read_new_bars(path, state)
+        assert len(new_bars) == 0 and size == state['source_size']
+
+        # 追加100根：只返回新增部分
+        write_chunks(path, records[300:], mode='ab')
+        new_bars, size = read_new_bars(path, state)
+        pd.testing.assert_frame_equal(new_bars, data_loader.get_daily_data(path).iloc[300:])
+        assert size == os.path.getsize(path)
+
+        # 历史被改写：要求全量重建
+        write_chunks(path, day_records('2022-01-03', 400, seed=2))
+        assert read_new_bars(path, state) == (None, None)
+
+
+def test_state_store_roundtrip():
+    params = IndicatorParams.from_strategy_config()
+    state = init_state(_make_df(), params, 1024)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = IndicatorStateStore(tmp_dir)
+        store.put_many([('sz000001', state)])
+        assert store.get('sz000001', params) == state
+        # 参数不同视为没有状态
+        assert store.get('sz000001', IndicatorParams(fast=10)) is None
+        store.close()
+
+
+def _build_day_tree(root_dir, num_stocks, num_days):
+    lday_dir = os.path.join(root_dir, 'sh', 'lday')
+    os.makedirs(lday_dir, exist_ok=True)
+    all_records = {}
+    for i in range(num_stocks):
+        symbol = f'sh{600000 + i}'
+        all_records[symbol] = day_records('2015-01-05', num_days, seed=i)
+    return lday_dir, all_records
+
+
+def _run_workers(screener, func, tasks, state_store):
+    results, states = {}, []
+    for task in tasks:
+        output = func(task)
+        if func is screener.incremental_worker:
+            output, code, state = output
+            if state is not None:
+                states.append((code, state))
+        if output is not None:
+            output.pop('scan_timestamp')
+            results[output['stock_code']] = output
+    state_store.put_many(states)
+    return results
+
+
+def test_incremental_worker_matches_full_worker(monkeypatch):
+    print("🧪 测试增量worker与全量worker一致")
+    import screener
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        lday_dir, all_records = _build_day_tree(tmp_dir, num_stocks=30, num_days=420)
+        state_store = IndicatorStateStore(os.path.join(tmp_dir, 'state'))
+        monkeypatch.setattr(screener, '_state_store', state_store)
+        tasks = [(os.path.join(lday_dir, f'{symbol}.day'), 'sh') for symbol in all_records]
+
+        hits = 0
+        for strategy_name in ('MACD_ZERO_AXIS', 'PRE_CROSS'):
+            monkeypatch.setattr(screener, 'STRATEGY_TO_RUN', strategy_name)
+            for symbol, records in all_records.items():
+                write_chunks(os.path.join(lday_dir, f'{symbol}.day'), records[:400])
+            for day in range(400, 420):
+                if day > 400:
+                    for symbol, records in all_records.items():
+                        write_chunks(os.path.join(lday_dir, f'{symbol}.day'), records[day - 1:day], mode='ab')
+                expected = _run_workers(screener, screener.worker, tasks, state_store)
+                actual = _run_workers(screener, screener.incremental_worker, tasks, state_store)
+                assert actual == expected
+                hits += len(expected)
+        state_store.close()
+    print(f"  ✅ 20个交易日 × 2个策略, 命中 {hits} 次")
+
+
+def _walk_records(num_days, seed):
+    """随机游走价格的.day记录（信号频率接近真实市场）"""
+    rng = np.random.default_rng(seed)
+    close = np.maximum(100, 1000 * np.exp(np.cumsum(rng.normal(0, 0.02, num_days)))).astype(int)
+    return [struct.pack('<IIIIIfII', int(date.strftime('%Y%m%d')), int(c), int(c * 1.02), int(c * 0.98),
+                        int(c), 1e6, 10000, 0)
+            for date, c in zip(pd.bdate_range('2010-01-04', periods=num_days), close)]
+
+
+def benchmark_daily_scan(num_stocks=300, num_days=3000):
+    """首次运行建立状态后，每只股票追加1根K线，对比全量worker与增量worker（均为单进程）"""
+    import screener
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        lday_dir = os.path.join(tmp_dir, 'sh', 'lday')
+        os.makedirs(lday_dir)
+        all_records = {f'sh{600000 + i}': _walk_records(num_days + 1, seed=i) for i in range(num_stocks)}
+        for symbol, records in all_records.items():
+            write_chunks(os.path.join(lday_dir, f'{symbol}.day'), records[:-1])
+        tasks = [(os.path.join(lday_dir, f'{symbol}.day'), 'sh') for symbol in all_records]
+
+        state_store = IndicatorStateStore(os.path.join(tmp_dir, 'state'))
+        screener._state_store = state_store
+        _run_workers(screener, screener.incremental_worker, tasks, state_store)
+
+        for symbol, records in all_records.items():
+            write_chunks(os.path.join(lday_dir, f'{symbol}.day'), records[-1:], mode='ab')
+
+        # 只比较信号判断（不含命中后的过滤与回测统计，两种模式完全相同）
+        start = time.perf_counter()
+        for source, _ in tasks:
+            strategies.apply_macd_zero_axis_strategy(data_loader.get_daily_data(source)).iloc[-1]
+        full_detect = time.perf_counter() - start
+
+        full_worker = screener.worker
+        screener.worker = lambda args: None
+        start = time.perf_counter()
+        for task in tasks:
+            screener.incremental_worker(task)
+        incremental_detect = time.perf_counter() - start
+        screener.worker = full_worker
+
+        start = time.perf_counter()
+        expected = _run_workers(screener, screener.worker, tasks, state_store)
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = _run_workers(screener, screener.incremental_worker, tasks, state_store)
+        incremental_time = time.perf_counter() - start
+        assert actual == expected
+        state_store.close()
+        screener._state_store = None
+
+    print(f"📊 {num_stocks} 只股票 × {num_days} 条K线, 每只新增1根, 命中 {len(expected)} 只 (单进程)")
+    print(f"  信号判断: 全量 {full_detect:.2f} 秒, 增量 {incremental_detect:.2f} 秒")
+    print(f"  含命中确认: 全量 {full_time:.2f} 秒, 增量 {incremental_time:.2f} 秒")
+
+
+if __name__ == "__main__":
+    test_advanced_state_matches_full_recompute()
+    test_read_new_bars_from_day_file()
+    test_state_store_roundtrip()
+    benchmark_daily_scan()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+测试共享指标缓存
+1. 相同数据、相同参数的重复计算命中缓存，结果与未缓存时一致
+2. 追加指标列不影响命中，价格变化/参数变化/复权方式变化时不误命中
+3. 策略链路（策略 + 回测统计）中的重复计算被消除
+4. 按条目数/字节数淘汰，scope() 结束时释放条目
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+import indicators
+import strategies
+from indicator_cache import IndicatorCache, indicator_cache, data_fingerprint
+from adjustment_processor import create_adjustment_config
+
+
+def _make_df(num_days=500, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.maximum(1.0, 10 + np.cumsum(rng.normal(0, 0.2, num_days)))
+    return pd.DataFrame({
+        'open': close * (1 + rng.normal(0, 0.01, num_days)),
+        'high': close * 1.02,
+        'low': close * 0.98,
+        'close': close,
+        'volume': rng.integers(1000, 100000, num_days).astype(float),
+    }, index=pd.bdate_range('2022-01-03', periods=num_days, name='date'))
+
+
+def test_repeated_calls_hit_cache():
+    print("🧪 测试重复计算命中缓存")
+    indicator_cache.clear()
+    df = _make_df()
+
+    dif1, dea1 = indicators.calculate_macd(df)
+    k1, d1, j1 = indicators.calculate_kdj(df)
+    rsi1 = indicators.calculate_rsi(df, 6)
+    assert indicator_cache.stats()['misses'] == 3
+
+    # 追加指标列后再次计算：指纹只看OHLCV，仍然命中
+    df['dif'], df['dea'] = dif1, dea1
+    dif2, dea2 = indicators.calculate_macd(df)
+    k2, d2, j2 = indicators.calculate_kdj(df)
+    rsi2 = indicators.calculate_rsi(df, 6)
+    stats = indicator_cache.stats()
+    assert stats['hits'] == 3 and stats['misses'] == 3
+
+    pd.testing.assert_series_equal(dif1, dif2)
+    pd.testing.assert_series_equal(j1, j2)
+    pd.testing.assert_series_equal(rsi1, rsi2)
+
+    # 调用方原地修改返回值不应污染缓存
+    dif2.iloc[:] = 0
+    pd.testing.assert_series_equal(dif1, indicators.calculate_macd(df)[0])
+    print(f"  ✅ {indicator_cache.stats()}")
+
+
+def test_cache_keys_are_distinct():
+    indicator_cache.clear()
+    df = _make_df()
+    base = indicators.calculate_rsi(df, 6)
+
+    # 参数不同
+    assert not indicators.calculate_rsi(df, 12).equals(base)
+    # 价格数据不同（如复权后）
+    changed = df.copy()
+    changed.loc[changed.index[100], 'close'] *= 1.5
+    assert data_fingerprint(changed) != data_fingerprint(df)
+    assert not indicators.calculate_rsi(changed, 6).equals(base)
+    # 复权方式不同
+    config = indicators.RSIIndicatorConfig(period=6, adjustment_config=create_adjustment_config('backward'))
+    indicators.calculate_rsi(df, config=config, stock_code='sz000001')
+    assert indicator_cache.stats()['hits'] == 0
+
+    # 关闭缓存后结果不变
+    indicator_cache.enabled = False
+    try:
+        pd.testing.assert_series_equal(base, indicators.calculate_rsi(df, 6))
+    finally:
+        indicator_cache.enabled = True
+
+
+def test_strategy_instances_use_cache():
+    sys.path.append(os.path.join(os.path.dirname(__file__), 'backend', 'strategies'))
+    from macd_zero_axis_strategy import MacdZeroAxisStrategy
+    from abyss_bottoming_strategy import AbyssBottomingStrategy
+
+    indicator_cache.clear()
+    df = _make_df()
+    strategy = MacdZeroAxisStrategy()
+    signals1, _ = strategy.apply_strategy(df)
+    signals2, _ = strategy.apply_strategy(df)
+    pd.testing.assert_series_equal(signals1, signals2)
+    assert indicator_cache.stats()['hits'] >= 1
+
+    abyss = AbyssBottomingStrategy()
+    first = abyss.calculate_technical_indicators(df.copy())
+    hits = indicator_cache.stats()['hits']
+    second = abyss.calculate_technical_indicators(df.copy())
+    assert indicator_cache.stats()['hits'] == hits + 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_eviction_bounds():
+    print("🧪 测试缓存上限与按股票释放")
+    frames = [_make_df(seed=i) for i in range(10)]
+    macd = lambda df: lambda: indicators.calculate_macd(df)
+    result_bytes = sum(series.nbytes for series in indicators.calculate_macd(frames[0]))
+
+    cache = IndicatorCache(max_entries=100, max_bytes=int(result_bytes * 3.5))
+    for df in frames:
+        cache.get_or_compute(df, 'macd', (), None, macd(df))
+    stats = cache.stats()
+    assert stats['entries'] == 3 and stats['bytes'] == 3 * result_bytes <= stats['max_bytes']
+    # 最久未用的条目已被淘汰，最近的仍命中
+    cache.get_or_compute(frames[-1], 'macd', (), None, macd(frames[-1]))
+    cache.get_or_compute(frames[0], 'macd', (), None, macd(frames[0]))
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 11
+
+    cache = IndicatorCache(max_entries=2)
+    for df in frames:
+        cache.get_or_compute(df, 'macd', (), None, macd(df))
+    assert cache.stats()['entries'] == 2
+
+    # 超过字节上限的单个结果不缓存
+    cache = IndicatorCache(max_bytes=result_bytes - 1)
+    cache.get_or_compute(frames[0], 'macd', (), None, macd(frames[0]))
+    assert cache.stats()['entries'] == 0 and cache.stats()['bytes'] == 0
+
+    # 逐只股票处理：scope 结束时释放条目，保留命中统计
+    cache = IndicatorCache()
+    for df in frames:
+        with cache.scope():
+            cache.get_or_compute(df, 'macd', (), None, macd(df))
+            cache.get_or_compute(df, 'macd', (), None, macd(df))
+        assert cache.stats()['entries'] == 0 and cache.stats()['bytes'] == 0
+    assert cache.stats()['hits'] == 10 and cache.stats()['misses'] == 10
+    print("  ✅ 条目数与字节数不超过上限")
+
+
+def benchmark_analysis_pipeline(num_stocks=200, repeats=2):
+    """模拟 /api/analysis 流程：图表指标 + 策略信号 + 回测指标，每只股票被请求repeats次"""
+    frames = [_make_df(seed=i) for i in range(num_stocks)]
+
+    def analysis(df):
+        df = df.copy()
+        df['dif'], df['dea'] = indicators.calculate_macd(df)
+        df['k'], df['d'], df['j'] = indicators.calculate_kdj(df)
+        for period in (6, 12, 24):
+            df[f'rsi{period}'] = indicators.calculate_rsi(df, period)
+        strategies.apply_macd_zero_axis_strategy(df)
+        indicators.calculate_macd(df)
+        indicators.calculate_kdj(df)
+
+    timings = {}
+    for enabled in (False, True):
+        indicator_cache.clear()
+        indicator_cache.enabled = enabled
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for df in frames:
+                analysis(df)
+        timings['cached' if enabled else 'uncached'] = time.perf_counter() - start
+    indicator_cache.enabled = True
+
+    print(f"📊 {num_stocks} 只股票 × {repeats} 次分析请求")
+    print(f"  无缓存: {timings['uncached']:.2f} 秒, 有缓存: {timings['cached']:.2f} 秒")
+    print(f"  缓存统计: {indicator_cache.stats()}")
+    return timings
+
+
+if __name__ == "__main__":
+    test_repeated_calls_hit_cache()
+    test_cache_keys_are_distinct()
+    test_strategy_instances_use_cache()
+    test_eviction_bounds()
+    benchmark_analysis_pipeline()
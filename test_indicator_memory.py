@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+测试指标计算的免复制路径
+1. 不复权时指标函数不再复制整个DataFrame，结果不变
+2. 复权时同一只股票的复权数据只计算一次，被MACD/KDJ/RSI共用
+3. tracemalloc 峰值内存对比（旧版每次调用都先 df.copy()）
+"""
+
+import sys
+import os
+import tracemalloc
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+import indicators
+from indicator_cache import indicator_cache
+from adjustment_processor import AdjustmentProcessor, create_adjustment_config
+
+
+def _make_wide_df(num_days=2500, num_extra_columns=12, seed=0):
+    """模拟分析接口中的DataFrame：OHLCV + 已追加的指标列"""
+    rng = np.random.default_rng(seed)
+    close = np.maximum(1.0, 10 + np.cumsum(rng.normal(0, 0.2, num_days)))
+    data = {
+        'open': close * (1 + rng.normal(0, 0.01, num_days)),
+        'high': close * 1.02,
+        'low': close * 0.98,
+        'close': close,
+        'volume': rng.integers(1000, 100000, num_days).astype(float),
+    }
+    for i in range(num_extra_columns):
+        data[f'extra{i}'] = rng.normal(size=num_days)
+    return pd.DataFrame(data, index=pd.bdate_range('2015-01-05', periods=num_days, name='date'))
+
+
+def _all_indicators(df):
+    indicators.calculate_macd(df)
+    indicators.calculate_kdj(df)
+    for period in (6, 12, 24):
+        indicators.calculate_rsi(df, period)
+
+
+def test_results_unchanged_and_input_untouched():
+    indicator_cache.clear()
+    indicator_cache.enabled = False
+    try:
+        df = _make_wide_df(num_days=300)
+        snapshot = df.copy()
+        results = indicators.calculate_all_indicators(df)
+        pd.testing.assert_frame_equal(df, snapshot)
+
+        # 与传入独立副本时的结果一致
+        expected = indicators.calculate_all_indicators(df.copy())
+        for name, series in expected.items():
+            pd.testing.assert_series_equal(series, results[name])
+    finally:
+        indicator_cache.enabled = True
+
+
+def test_adjusted_frame_computed_once(monkeypatch):
+    indicator_cache.clear()
+    calls = []
+    original = AdjustmentProcessor._apply_adjustment
+
+    def counting(self, df, stock_code=None):
+        calls.append(stock_code)
+        return original(self, df, stock_code)
+
+    monkeypatch.setattr(AdjustmentProcessor, '_apply_adjustment', counting)
+
+    df = _make_wide_df(num_days=300)
+    adjustment_config = create_adjustment_config('forward')
+    indicators.calculate_macd(df, config=indicators.MACDIndicatorConfig(adjustment_config=adjustment_config),
+                              stock_code='sz000001')
+    indicators.calculate_kdj(df, config=indicators.KDJIndicatorConfig(adjustment_config=adjustment_config),
+                             stock_code='sz000001')
+    indicators.calculate_rsi(df, config=indicators.RSIIndicatorConfig(adjustment_config=adjustment_config),
+                             stock_code='sz000001')
+    assert calls == ['sz000001']
+
+    # 另一只股票或另一种复权方式需要重新复权
+    indicators.calculate_macd(df, config=indicators.MACDIndicatorConfig(adjustment_config=adjustment_config),
+                              stock_code='sz000002')
+    backward_config = indicators.MACDIndicatorConfig(adjustment_config=create_adjustment_config('backward'))
+    indicators.calculate_macd(df, config=backward_config, stock_code='sz000001')
+    assert len(calls) == 3
+
+
+def _traced_peak(func):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def benchmark_peak_memory(num_stocks=50, num_days=2500):
+    """每只股票计算MACD/KDJ/RSI6/12/24，比较免复制路径与旧版先复制再计算的峰值内存"""
+    frames = [_make_wide_df(num_days, seed=i) for i in range(num_stocks)]
+    indicator_cache.enabled = False
+    try:
+        def copy_free():
+            for df in frames:
+                _all_indicators(df)
+
+        def legacy_copy():
+            # 旧版实现：每个指标函数内部都先 working_df = df.copy()
+            for df in frames:
+                indicators.calculate_macd(df.copy())
+                indicators.calculate_kdj(df.copy())
+                for period in (6, 12, 24):
+                    indicators.calculate_rsi(df.copy(), period)
+
+        legacy_peak = _traced_peak(legacy_copy)
+        copy_free_peak = _traced_peak(copy_free)
+    finally:
+        indicator_cache.enabled = True
+
+    frame_bytes = frames[0].memory_usage(deep=True).sum()
+    print(f"📊 {num_stocks} 只股票 × {num_days} 条K线 (单个DataFrame {frame_bytes / 1024:.0f} KB)")
+    print(f"  旧版(复制)峰值: {legacy_peak / 1024:.0f} KB")
+    print(f"  免复制峰值:     {copy_free_peak / 1024:.0f} KB")
+    print(f"  额外分配总量(旧版): {frame_bytes * 5 * num_stocks / 1024 / 1024:.1f} MB")
+    return legacy_peak, copy_free_peak
+
+
+def test_copy_free_peak_is_lower():
+    legacy_peak, copy_free_peak = benchmark_peak_memory(num_stocks=3, num_days=1500)
+    assert copy_free_peak < legacy_peak
+
+
+if __name__ == "__main__":
+    test_results_unchanged_and_input_untouched()
+    benchmark_peak_memory()
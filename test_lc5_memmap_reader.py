@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+测试基于内存映射的.lc5 5分钟线读取器
+1. 与旧版逐条struct解析器的一致性
+2. start/end窗口读取与全量读取后切片的一致性
+"""
+
+import sys
+import os
+import time
+import struct
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pandas as pd
+
+import data_loader
+from synthetic_tdx_data import pack_lc5, trading_timestamps, write_lc5
+
+
+def test_full_read_parity():
+    """全量读取：与旧版解析器结果一致（含非法记录与残缺尾部）"""
+    print("🧪 测试.lc5全量读取一致性")
+    bad_records = [
+        (5, struct.pack('<HHffffffI', 20 * 2048 + 230, 600, 1, 1, 1, 1, 1, 1, 0)),        # 2月30日
+        (50, pack_lc5(pd.Timestamp('2024-01-03 10:00'), 0.0, 1, 1, 1, 1, 1)),            # 开盘价为0
+        (80, struct.pack('<HHffffffI', 20 * 2048 + 105, 24 * 60 + 5, 1, 1, 1, 1, 1, 1, 0)),  # 小时越界
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'sz000001.lc5')
+        write_lc5(file_path, extra_chunks=bad_records)
+
+        legacy_df = data_loader._get_5min_data_struct(file_path)
+        memmap_df = data_loader.get_5min_data(file_path)
+
+    pd.testing.assert_frame_equal(legacy_df, memmap_df, check_freq=False)
+    print(f"  ✅ {len(memmap_df)} 条记录一致")
+
+
+def test_windowed_read_matches_slice():
+    """窗口读取：结果应等于全量读取后按时间切片"""
+    print("🧪 测试.lc5窗口读取")
+    windows = [
+        ('2024-01-15', '2024-01-20'),
+        ('2024-01-15', '2024-01-19'),  # 终点为交易日：包含当天全部K线
+        ('2024-01-19', '2024-01-19'),
+        ('2024-01-15 10:02:30', '2024-01'),
+        ('2024-01-15 10:02:30', '2024-01-15 14:00'),
+        (None, '2024-01-05 11:30'),
+        ('2024-03-20', None),
+        ('2001-01-01', '2002-01-01'),
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'sz000001.lc5')
+        write_lc5(file_path)
+        full_df = data_loader.get_5min_data(file_path)
+
+        for start, end in windows:
+            window_df = data_loader.get_5min_data(file_path, start=start, end=end)
+            expected = full_df.loc[start:end]
+            if expected.empty:
+                assert window_df is None
+            else:
+                pd.testing.assert_frame_equal(expected, window_df, check_freq=False)
+            if end == '2024-01-19':
+                assert window_df.index[-1] == pd.Timestamp('2024-01-19 15:00')
+            print(f"  ✅ [{start}, {end}] -> {0 if window_df is None else len(window_df)} 条")
+
+
+def test_empty_file():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'sz000002.lc5')
+        open(file_path, 'wb').close()
+        assert data_loader.get_5min_data(file_path) is None
+
+
+def benchmark_lc5_reader(num_days=250):
+    """一年5分钟数据：旧版解析 vs 内存映射全量读取 vs 最近5天窗口读取"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'sz000001.lc5')
+        write_lc5(file_path, num_days=num_days)
+        last_day = trading_timestamps(num_days)[-1].normalize()
+
+        timings = {}
+        for name, func in [
+            ('旧版struct解析', lambda: data_loader._get_5min_data_struct(file_path)),
+            ('memmap全量读取', lambda: data_loader.get_5min_data(file_path)),
+            ('memmap最近5天', lambda: data_loader.get_5min_data(file_path, start=last_day - pd.Timedelta(days=7))),
+        ]:
+            start = time.perf_counter()
+            for _ in range(5):
+                func()
+            timings[name] = (time.perf_counter() - start) / 5
+
+    for name, seconds in timings.items():
+        print(f"  {name}: {seconds * 1000:.1f} ms")
+    return timings
+
+
+if __name__ == "__main__":
+    test_full_read_parity()
+    test_windowed_read_matches_slice()
+    test_empty_file()
+    benchmark_lc5_reader()
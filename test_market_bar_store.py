@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+测试全市场列式K线仓库 MarketBarStore
+1. 全量同步后每只股票与 data_loader.get_daily_data 完全一致
+2. 增量同步只追加新K线，历史改写时整只重载，源文件删除的股票从仓库移除
+3. 压缩后数据不变，压缩中途失败时仍读到旧数据；筛选器数据源抽象可用
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pandas as pd
+
+import data_loader
+from market_bar_store import (
+    MarketBarStore, StoreBarRef, collect_bar_sources, bar_source_code, load_bar_source
+)
+from synthetic_tdx_data import day_records, write_chunks, build_lday_tree
+
+
+def _assert_store_matches_files(store, paths):
+    for symbol, path in paths.items():
+        expected = data_loader.get_daily_data(path, symbol)
+        actual = store.get_frame(symbol)
+        pd.testing.assert_frame_equal(expected, actual, check_freq=False)
+
+
+def test_full_sync_matches_files():
+    print("🧪 测试全量同步")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base_path = os.path.join(tmp_dir, 'vipdoc')
+        paths = build_lday_tree(base_path)
+        store = MarketBarStore(os.path.join(tmp_dir, 'store'), base_path)
+
+        stats = store.sync(['sh', 'sz'])
+        assert stats['sh']['files'] == 20 and stats['sh']['new_rows'] > 0
+        _assert_store_matches_files(store, paths)
+
+        # 重新打开仓库也能读到相同数据
+        reopened = MarketBarStore(os.path.join(tmp_dir, 'store'), base_path)
+        _assert_store_matches_files(reopened, paths)
+
+        # 未改动的文件再次同步全部跳过
+        stats = store.sync(['sh', 'sz'])
+        assert stats['sh']['skipped'] == 20 and stats['sh']['new_rows'] == 0
+    print("  ✅ 全量同步一致")
+
+
+def test_incremental_append_and_reload():
+    print("🧪 测试增量追加与重载")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base_path = os.path.join(tmp_dir, 'vipdoc')
+        paths = build_lday_tree(base_path, symbols_per_market=5)
+        store = MarketBarStore(os.path.join(tmp_dir, 'store'), base_path)
+        store.sync(['sh', 'sz'])
+
+        # sh600000 追加3个交易日
+        append_path = paths['sh600000']
+        last_date = data_loader.get_daily_data(append_path).index[-1]
+        write_chunks(append_path, day_records(last_date + pd.Timedelta(days=1), 3, seed=99), mode='ab')
+
+        # sh600001 历史被整体改写（文件变短）
+        write_chunks(paths['sh600001'], day_records('2023-01-02', 50, seed=123))
+
+        stats = store.sync(['sh'])
+        assert stats['sh']['appended'] == 1
+        assert stats['sh']['reloaded'] == 1
+        assert stats['sh']['new_rows'] == 3 + 50
+        _assert_store_matches_files(store, {k: v for k, v in paths.items() if k.startswith('sh')})
+
+        # 追加的K线位于新数据段，压缩后合并为单一区段且数据不变
+        index = store._load_index('sh')
+        assert len(index['symbols']['sh600000']['extents']) == 2
+        assert index['dead_rows'] > 0
+
+        store.compact('sh')
+        index = store._load_index('sh')
+        assert index['dead_rows'] == 0
+        assert all(len(e['extents']) == 1 for e in index['symbols'].values())
+        _assert_store_matches_files(store, {k: v for k, v in paths.items() if k.startswith('sh')})
+    print("  ✅ 增量追加/重载/压缩正确")
+
+
+def test_removed_sources_and_interrupted_compact():
+    print("🧪 测试源文件删除与压缩中断")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base_path = os.path.join(tmp_dir, 'vipdoc')
+        store_dir = os.path.join(tmp_dir, 'store')
+        paths = build_lday_tree(base_path, symbols_per_market=5)
+        store = MarketBarStore(store_dir, base_path)
+        store.sync(['sh'])
+
+        # sh600002 退市：源文件删除后不再提供
+        os.remove(paths.pop('sh600002'))
+        stats = store.sync(['sh'])
+        assert stats['sh']['removed'] == 1 and stats['sh']['skipped'] == 4
+        assert 'sh600002' not in store.symbols('sh') and store.get_frame('sh600002') is None
+        assert store._load_index('sh')['dead_rows'] > 0
+        sh_paths = {k: v for k, v in paths.items() if k.startswith('sh')}
+
+        # 保存新索引前失败：旧索引与旧数据文件保持一致
+        def fail(market, index):
+            raise IOError('disk full')
+        store._save_index = fail
+        try:
+            store.compact('sh')
+            assert False
+        except IOError:
+            pass
+        for reader in (store, MarketBarStore(store_dir, base_path)):
+            _assert_store_matches_files(reader, sh_paths)
+
+        # 正常压缩：切换到新一代数据文件，旧文件与中断留下的文件都被删除
+        store = MarketBarStore(store_dir, base_path)
+        store.compact('sh')
+        index = store._load_index('sh')
+        assert index['dead_rows'] == 0 and index['data_file'] == 'sh.1.bars'
+        assert sorted(name for name in os.listdir(store_dir) if name.endswith('.bars')) == ['sh.1.bars']
+        _assert_store_matches_files(MarketBarStore(store_dir, base_path), sh_paths)
+
+        # 新一代数据文件上继续增量追加
+        last_date = data_loader.get_daily_data(paths['sh600000']).index[-1]
+        write_chunks(paths['sh600000'], day_records(last_date + pd.Timedelta(days=1), 2, seed=5), mode='ab')
+        assert store.sync(['sh'])['sh']['appended'] == 1
+        _assert_store_matches_files(MarketBarStore(store_dir, base_path), sh_paths)
+    print("  ✅ 退市股票被移除，压缩中断不影响读取")
+
+
+def test_screener_sources():
+    print("🧪 测试筛选器数据源抽象")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base_path = os.path.join(tmp_dir, 'vipdoc')
+        paths = build_lday_tree(base_path, symbols_per_market=3)
+        store_dir = os.path.join(tmp_dir, 'store')
+
+        file_sources = collect_bar_sources(['sh', 'sz'], base_path, use_store=False)
+        store_sources = collect_bar_sources(['sh', 'sz'], base_path, use_store=True, store_dir=store_dir)
+        assert len(file_sources) == len(store_sources) == 6
+        assert all(isinstance(src, StoreBarRef) for src, _ in store_sources)
+
+        for src, market in store_sources:
+            symbol = bar_source_code(src)
+            assert symbol.startswith(market)
+            pd.testing.assert_frame_equal(load_bar_source(src), load_bar_source(paths[symbol], symbol),
+                                          check_freq=False)
+    print("  ✅ 文件源与仓库源数据一致")
+
+
+def benchmark_store_scan(symbols_per_market=2500, num_days=1000):
+    """全市场扫描：逐个读取.day文件 vs 从仓库内存映射读取"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base_path = os.path.join(tmp_dir, 'vipdoc')
+        paths = build_lday_tree(base_path, symbols_per_market, num_days)
+        store = MarketBarStore(os.path.join(tmp_dir, 'store'), base_path)
+
+        start = time.perf_counter()
+        store.sync(['sh', 'sz'])
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for symbol, path in paths.items():
+            data_loader.get_daily_data(path, symbol)
+        file_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for market in ['sh', 'sz']:
+            for _ in store.iter_frames(market):
+                pass
+        store_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store.sync(['sh', 'sz'])
+        resync_time = time.perf_counter() - start
+
+    print(f"📊 {len(paths)} 只股票 × ~{num_days} 条K线")
+    print(f"  首次构建仓库: {build_time:.2f} 秒, 无变化再同步: {resync_time:.2f} 秒")
+    print(f"  逐文件读取: {file_time:.2f} 秒, 仓库读取: {store_time:.2f} 秒")
+
+
+if __name__ == "__main__":
+    test_full_sync_matches_files()
+    test_incremental_append_and_reload()
+    test_removed_sources_and_interrupted_compact()
+    test_screener_sources()
+    benchmark_store_scan()
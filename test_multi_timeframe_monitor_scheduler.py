@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+测试多周期监控的并发刷新调度
+1. 只刷新数据文件（.day/.lc5）有变化的股票，未变化的跳过
+2. 并发数不超过 max_workers；需要刷新的股票在 spread_over 内均匀提交
+3. get_monitoring_status 返回每只股票的刷新耗时直方图；监控循环可及时停止
+4. 刷新线程追加信号与监控线程检查预警并发时，预警统计与通知数一致
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+from pathlib import Path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pandas as pd
+
+from multi_timeframe_data_manager import MultiTimeframeDataManager
+from multi_timeframe_monitor import MultiTimeframeMonitor, LatencyHistogram
+from timeframe_cube import TimeframeCube
+from synthetic_tdx_data import write_chunks, lc5_chunks, setup_stock_files
+
+
+class _Notifications:
+    def __init__(self):
+        self.sent = []
+
+    def send_notification(self, **kwargs):
+        self.sent.append(kwargs)
+
+
+class _SlowSignals:
+    """记录并发数与提交时间的信号生成器"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.started = []
+        self.lock = threading.Lock()
+
+    def generate_composite_signals(self, stock_code):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.started.append((stock_code, time.perf_counter()))
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return {'stock_code': stock_code, 'composite_signal': {'final_score': 0.0, 'confidence_level': 0.0}}
+
+
+def _monitor(root_dir, reports_dir, signal_generator=None, **config):
+    data_manager = MultiTimeframeDataManager(os.path.join(reports_dir, 'cache'), base_path=root_dir, cube=TimeframeCube())
+    monitor = MultiTimeframeMonitor(data_manager, signal_generator, _Notifications())
+    monitor.reports_dir = Path(reports_dir)
+    monitor.monitoring_config.update(config)
+    return monitor
+
+
+def test_refresh_only_changed():
+    print("🧪 测试只刷新数据有变化的股票")
+    with tempfile.TemporaryDirectory() as root_dir, tempfile.TemporaryDirectory() as reports_dir:
+        codes = [f'sz{i:06d}' for i in range(1, 4)]
+        files = {code: setup_stock_files(root_dir, code, num_days=20, seed=i) for i, code in enumerate(codes)}
+        monitor = _monitor(root_dir, reports_dir)
+        for code in codes + ['sz999999']:
+            monitor.add_stock_to_monitor(code)
+
+        first = monitor._update_all_signals()
+        assert first['due'] == 4 and first['refreshed'] == 3
+        assert all(len(monitor.signal_history[code]) == 1 for code in codes)
+
+        # 数据未变化：只重试失败的股票
+        second = monitor._update_all_signals()
+        assert second['due'] == 1 and second['skipped'] == 3 and second['refreshed'] == 0
+
+        # 追加一根5分钟线：只刷新这一只
+        _, min5_file, stamps = files[codes[1]]
+        write_chunks(min5_file, lc5_chunks([stamps[-1] + pd.Timedelta(days=3)], 1), mode='ab')
+        third = monitor._update_all_signals()
+        assert third['refreshed'] == 1 and [len(monitor.signal_history[code]) for code in codes] == [1, 2, 1]
+
+        forced = monitor._update_all_signals(force=True)
+        assert forced['refreshed'] == 3
+
+        status = monitor.get_monitoring_status()
+        assert status['stats']['successful_signals'] == 7 and status['stats']['failed_signals'] == 4
+        assert status['stats']['last_cycle'] == forced
+        assert status['latency'][codes[1]]['count'] == 3
+        assert sum(status['latency'][codes[0]]['buckets'].values()) == 2
+
+        monitor.remove_stock_from_monitor(codes[0])
+        assert codes[0] not in monitor.get_monitoring_status()['latency'] and codes[0] not in monitor.data_signatures
+    print("  ✅ 未变化的股票跳过，变化的股票重新计算")
+
+
+def test_bounded_and_spread():
+    print("🧪 测试并发上限与分散提交")
+    with tempfile.TemporaryDirectory() as root_dir, tempfile.TemporaryDirectory() as reports_dir:
+        signals = _SlowSignals()
+        monitor = _monitor(root_dir, reports_dir, signals, max_workers=3)
+        for i in range(9):
+            monitor.add_stock_to_monitor(f'sz{i + 1:06d}')
+
+        start = time.perf_counter()
+        cycle = monitor._update_all_signals()
+        assert cycle['refreshed'] == 9 and signals.peak == 3
+        assert time.perf_counter() - start < 9 * signals.delay
+
+        signals.started.clear()
+        signals.peak = 0
+        cycle = monitor._update_all_signals(spread_over=0.9, force=True)
+        gaps = [b - a for (_, a), (_, b) in zip(signals.started, signals.started[1:])]
+        assert len(gaps) == 8 and min(gaps) >= 0.09 and cycle['duration'] >= 0.8
+        assert signals.peak == 1
+    print("  ✅ 并发数受限，提交在间隔内均匀分布")
+
+
+def test_monitoring_loop_stops_promptly():
+    print("🧪 测试监控循环")
+    with tempfile.TemporaryDirectory() as root_dir, tempfile.TemporaryDirectory() as reports_dir:
+        monitor = _monitor(root_dir, reports_dir, _SlowSignals(0.01), update_interval=0.2)
+        for i in range(3):
+            monitor.add_stock_to_monitor(f'sz{i + 1:06d}')
+        assert monitor.start_monitoring()
+        deadline = time.time() + 5
+        while monitor.monitoring_stats['total_updates'] < 3 and time.time() < deadline:
+            time.sleep(0.02)
+        monitor.monitoring_config['update_interval'] = 60
+        time.sleep(0.3)
+        start = time.perf_counter()
+        assert monitor.stop_monitoring()
+        assert time.perf_counter() - start < 1.0
+        assert monitor.monitoring_stats['total_updates'] >= 3
+        assert monitor.monitoring_stats['avg_update_time'] < 0.2
+        assert list(Path(reports_dir).glob('monitoring_report_*.json'))
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    for seconds in (0.01, 0.02, 0.3, 0.4, 20.0):
+        histogram.observe(seconds)
+    summary = histogram.to_dict()
+    assert summary['count'] == 5 and summary['max'] == 20.0 and summary['last'] == 20.0
+    assert summary['buckets']['<=0.05s'] == 2 and summary['buckets']['<=0.5s'] == 2 and summary['buckets']['>10.0s'] == 1
+    assert summary['p50'] == 0.5 and summary['p95'] == 20.0
+    assert LatencyHistogram().to_dict()['p95'] == 0.0
+
+
+class _ConvergingSignals:
+    """每次都满足信号收敛预警的信号生成器"""
+
+    def generate_composite_signals(self, stock_code):
+        return {'stock_code': stock_code,
+                'composite_signal': {'final_score': 0.9, 'confidence_level': 0.9, 'signal_strength': 'buy'}}
+
+
+def test_concurrent_alert_bookkeeping():
+    print("🧪 测试并发刷新与预警检查")
+    with tempfile.TemporaryDirectory() as root_dir, tempfile.TemporaryDirectory() as reports_dir:
+        monitor = _monitor(root_dir, reports_dir, _ConvergingSignals(), alert_cooldown=0)
+        codes = [f'sz{i + 1:06d}' for i in range(4)]
+        for code in codes:
+            monitor.add_stock_to_monitor(code)
+            assert monitor._update_stock_signal(code)
+
+        rounds = 300
+        errors = []
+        monitor.logger.error = lambda message, *args, **kwargs: errors.append(message)
+
+        def refresh(code):
+            for _ in range(rounds):
+                monitor._update_stock_signal(code)
+
+        def check(code):
+            for _ in range(rounds):
+                monitor._check_stock_alerts(code)
+
+        threads = [threading.Thread(target=target, args=(code,)) for code in codes for target in (refresh, check)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        total_alerts = monitor.get_monitoring_status()['stats']['total_alerts']
+        assert not errors, errors[:3]
+        assert total_alerts >= len(codes) * rounds
+        assert total_alerts == len(monitor.notification_system.sent)
+        assert set(monitor.last_alerts) == set(codes)
+        assert all(len(monitor.get_stock_alert_history(code, 0)) == 100 for code in codes)
+    print(f"  ✅ {total_alerts} 条预警，统计与通知数一致")
+
+
+def benchmark_monitor_cycle(num_stocks=200, delay=0.02):
+    """200只股票：逐个刷新 vs 并发刷新 vs 数据未变化时的一轮"""
+    with tempfile.TemporaryDirectory() as root_dir, tempfile.TemporaryDirectory() as reports_dir:
+        print(f"📊 {num_stocks} 只股票，单只刷新 {delay * 1000:.0f} ms")
+        for label, workers in (('逐个刷新', 1), ('并发刷新(8)', 8)):
+            monitor = _monitor(root_dir, reports_dir, _SlowSignals(delay), max_workers=workers, max_stocks=num_stocks)
+            for i in range(num_stocks):
+                monitor.add_stock_to_monitor(f'sz{i + 1:06d}')
+            start = time.perf_counter()
+            monitor._update_all_signals(force=True)
+            print(f"  {label}: {time.perf_counter() - start:.2f} 秒")
+
+        # 数据文件存在且未变化时整轮只检查文件状态
+        for i in range(num_stocks):
+            setup_stock_files(root_dir, f'sz{i + 1:06d}', num_days=2, seed=i)
+        monitor = _monitor(root_dir, reports_dir, _SlowSignals(delay), max_workers=8, max_stocks=num_stocks)
+        for i in range(num_stocks):
+            monitor.add_stock_to_monitor(f'sz{i + 1:06d}')
+        monitor._update_all_signals()
+        start = time.perf_counter()
+        cycle = monitor._update_all_signals()
+        print(f"  数据未变化: {(time.perf_counter() - start) * 1000:.1f} ms（跳过 {cycle['skipped']} 只）")
+
+
+if __name__ == "__main__":
+    test_refresh_only_changed()
+    test_bounded_and_spread()
+    test_monitoring_loop_stops_promptly()
+    test_latency_histogram()
+    test_concurrent_alert_bookkeeping()
+    benchmark_monitor_cycle()
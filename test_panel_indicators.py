@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+测试面板指标引擎
+1. 面板MACD/KDJ/RSI与逐只计算结果一致（含上市日期不同、停牌空洞）
+2. 面板版策略信号与单股票策略函数一致
+3. 全市场逐只计算 vs 面板一次性计算的耗时对比
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+import indicators
+import panel_indicators
+import strategies
+from panel_indicators import MarketPanel
+
+
+def _make_frames(num_symbols=30, num_days=400, seed=3):
+    """生成上市日期各不相同、带随机停牌的日线数据"""
+    rng = np.random.default_rng(seed)
+    all_dates = pd.bdate_range('2022-01-03', periods=num_days)
+    frames = {}
+    for i in range(num_symbols):
+        start = int(rng.integers(0, num_days // 3))
+        dates = all_dates[start:]
+        keep = rng.random(len(dates)) > 0.05  # 约5%的交易日停牌
+        dates = dates[keep]
+        close = np.maximum(1.0, 10 + np.cumsum(rng.normal(0, 0.3, len(dates))))
+        high = close * (1 + rng.uniform(0, 0.03, len(dates)))
+        low = close * (1 - rng.uniform(0, 0.03, len(dates)))
+        frames[f'sz{i:06d}'] = pd.DataFrame({
+            'open': close * (1 + rng.normal(0, 0.01, len(dates))),
+            'high': high, 'low': low, 'close': close,
+            'volume': rng.integers(1000, 100000, len(dates)).astype(float),
+        }, index=pd.DatetimeIndex(dates, name='date'))
+    return frames
+
+
+def _assert_close(expected, actual):
+    pd.testing.assert_series_equal(expected, actual, check_names=False, check_freq=False,
+                                   check_index_type=False, rtol=1e-9, atol=1e-9)
+
+
+def test_indicator_parity():
+    print("🧪 测试面板指标一致性")
+    frames = _make_frames()
+    panel = MarketPanel.from_frames(frames)
+    assert not panel.layout.is_contiguous
+
+    dif, dea = panel_indicators.calculate_macd_panel(panel.close)
+    k, d, j = panel_indicators.calculate_kdj_panel(panel.high, panel.low, panel.close, n=9, k_period=3, d_period=3)
+    k_sma, d_sma, _ = panel_indicators.calculate_kdj_panel(panel.high, panel.low, panel.close, smoothing_method='sma')
+    rsi6 = panel_indicators.calculate_rsi_panel(panel.close, 6)
+    rsi_ema = panel_indicators.calculate_rsi_panel(panel.close, 12, smoothing_method='ema')
+
+    for symbol, df in frames.items():
+        exp_dif, exp_dea = indicators.calculate_macd(df)
+        _assert_close(exp_dif, panel.series(symbol, dif))
+        _assert_close(exp_dea, panel.series(symbol, dea))
+
+        exp_k, exp_d, exp_j = indicators.calculate_kdj(df, n=9, k_period=3, d_period=3)
+        _assert_close(exp_k, panel.series(symbol, k))
+        _assert_close(exp_d, panel.series(symbol, d))
+        _assert_close(exp_j, panel.series(symbol, j))
+
+        sma_config = indicators.KDJIndicatorConfig(smoothing_method='sma')
+        exp_k, exp_d, _ = indicators.calculate_kdj(df, config=sma_config)
+        _assert_close(exp_k, panel.series(symbol, k_sma))
+        _assert_close(exp_d, panel.series(symbol, d_sma))
+
+        _assert_close(indicators.calculate_rsi(df, 6), panel.series(symbol, rsi6))
+        ema_config = indicators.RSIIndicatorConfig(period=12, smoothing_method='ema')
+        _assert_close(indicators.calculate_rsi(df, config=ema_config), panel.series(symbol, rsi_ema))
+    print(f"  ✅ {len(frames)} 只股票指标一致")
+
+
+def test_rolling_extremes_match_pandas():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(103, 4))
+    values[:7, 1] = np.nan
+    for window in (1, 2, 9, 27, 103, 200):
+        expected = pd.DataFrame(values).rolling(window).min().to_numpy()
+        np.testing.assert_array_equal(expected, panel_indicators.rolling_min_panel(values, window))
+        expected = pd.DataFrame(values).rolling(window).max().to_numpy()
+        np.testing.assert_array_equal(expected, panel_indicators.rolling_max_panel(values, window))
+
+
+def test_strategy_parity():
+    print("🧪 测试面板策略信号一致性")
+    frames = _make_frames(num_symbols=40, num_days=500, seed=11)
+    panel = MarketPanel.from_frames(frames)
+
+    triple = strategies.apply_triple_cross_panel(panel)
+    pre = strategies.apply_pre_cross_panel(panel)
+    zero_axis = strategies.apply_strategy_panel('MACD_ZERO_AXIS', panel)
+
+    total = 0
+    for symbol, df in frames.items():
+        j = panel.symbols.index(symbol)
+        rows = panel.dates.get_indexer(df.index)
+        np.testing.assert_array_equal(strategies.apply_triple_cross(df).to_numpy(), triple[rows, j])
+        np.testing.assert_array_equal(strategies.apply_pre_cross(df).to_numpy(), pre[rows, j])
+        np.testing.assert_array_equal(strategies.apply_macd_zero_axis_strategy(df).to_numpy(dtype=object),
+                                      zero_axis[rows, j])
+        total += int(pre[rows, j].sum()) + int((zero_axis[rows, j] != '').sum())
+    assert total > 0
+    print(f"  ✅ 信号一致，共 {total} 个信号")
+
+
+def benchmark_panel(num_symbols=2000, num_days=1000):
+    """全市场：逐只调用 calculate_macd/kdj/rsi vs 面板一次性计算"""
+    frames = _make_frames(num_symbols, num_days, seed=5)
+
+    start = time.perf_counter()
+    for df in frames.values():
+        indicators.calculate_macd(df)
+        indicators.calculate_kdj(df)
+        for period in (6, 12, 24):
+            indicators.calculate_rsi(df, period)
+    per_stock_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    panel = MarketPanel.from_frames(frames)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    panel_indicators.compute_panel_indicators(panel)
+    panel_time = time.perf_counter() - start
+
+    print(f"📊 {num_symbols} 只股票 × {num_days} 个交易日")
+    print(f"  逐只计算: {per_stock_time:.2f} 秒")
+    print(f"  面板计算: {panel_time:.2f} 秒 (构建面板 {build_time:.2f} 秒)")
+    print(f"  加速比: {per_stock_time / panel_time:.1f}x")
+
+
+if __name__ == "__main__":
+    test_indicator_parity()
+    test_rolling_extremes_match_pandas()
+    test_strategy_parity()
+    benchmark_panel()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+测试参数网格批量回测
+1. ParameterGridEvaluator 的统计结果与逐组合 backtest_parameters 一致
+2. optimize_parameters_for_stock 的最佳参数与前10结果与原逐组合实现一致
+3. 综合评分可直接用于 OptimizedParameterSearch；单只股票优化耗时对比
+"""
+
+import sys
+import os
+import time
+import itertools
+from dataclasses import asdict
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+from parametric_advisor import ParametricTradingAdvisor, TradingParameters, ParameterGridEvaluator
+
+
+PARAM_RANGES = {
+    'pre_entry_discount': [0.01, 0.02, 0.03, 0.05],
+    'moderate_stop': [0.03, 0.05, 0.08],
+    'moderate_profit': [0.08, 0.12, 0.15, 0.20],
+    'max_holding_days': [15, 20, 30, 45]
+}
+
+
+def _make_data(num_days=300, num_signals=25, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, num_days)))
+    df = pd.DataFrame({
+        'open': close,
+        'high': close * (1 + rng.uniform(0, 0.03, num_days)),
+        'low': close * (1 - rng.uniform(0, 0.03, num_days)),
+        'close': close,
+        'volume': rng.integers(1000, 100000, num_days),
+    }, index=pd.bdate_range('2021-01-04', periods=num_days))
+    signals = pd.Series('', index=df.index, dtype=object)
+    # 包含最后10根K线内（不参与统计）和临近末尾（持有期被截断）的信号
+    positions = np.concatenate([rng.choice(num_days - 60, num_signals - 4, replace=False),
+                                [num_days - 40, num_days - 15, num_days - 5, num_days - 1]])
+    signals.iloc[positions] = rng.choice(['PRE', 'MID', 'POST'], len(positions))
+    return df, signals
+
+
+def _legacy_backtest(df, signals, param_set, risk_level='moderate'):
+    params = TradingParameters()
+    for key, value in param_set.items():
+        setattr(params, key, value)
+    return ParametricTradingAdvisor(params).backtest_parameters(df, signals, risk_level)
+
+
+def test_evaluate_matches_backtest_parameters():
+    print("🧪 测试批量回测与逐组合回测一致")
+    for seed in range(2):
+        df, signals = _make_data(seed=seed)
+        param_sets = ParameterGridEvaluator.grid(PARAM_RANGES)
+        evaluator = ParameterGridEvaluator(df, signals)
+        stats = evaluator.evaluate(param_sets)
+        for i, param_set in enumerate(param_sets):
+            expected = _legacy_backtest(df, signals, param_set)
+            for key in ('total_trades', 'winning_trades', 'losing_trades', 'win_rate', 'avg_pnl',
+                        'max_win', 'max_loss', 'avg_holding_days', 'profit_factor'):
+                assert stats[key][i] == expected[key], (key, param_set)
+            for key in ('avg_win', 'avg_loss'):
+                np.testing.assert_allclose(stats[key][i], expected[key], rtol=1e-12)
+            if i % 17 == 0:
+                assert evaluator.backtest_stats(param_set) == expected
+    print(f"  ✅ {len(param_sets)} 种组合 × 2 组数据一致")
+
+
+def test_other_risk_levels_and_bool_signals():
+    df, signals = _make_data(seed=5)
+    param_sets = [{'aggressive_stop': 0.06, 'aggressive_profit': 0.1, 'post_entry_discount': 0.03},
+                  {'aggressive_stop': 0.1, 'mid_entry_premium': 0.0, 'max_holding_days': 60}]
+    evaluator = ParameterGridEvaluator(df, signals, risk_level='aggressive')
+    for param_set in param_sets:
+        assert evaluator.backtest_stats(param_set) == _legacy_backtest(df, signals, param_set, 'aggressive')
+
+    # 布尔信号：原实现把每根K线都当作信号，入场价为收盘价
+    bool_signals = signals != ''
+    evaluator = ParameterGridEvaluator(df, bool_signals)
+    assert evaluator.backtest_stats({}) == _legacy_backtest(df, bool_signals, {})
+
+    # 无信号 / 信号都在末尾
+    tail_only = pd.Series('', index=df.index, dtype=object)
+    assert ParameterGridEvaluator(df, tail_only).backtest_stats({}) == {'error': '无有效信号进行回测'}
+    tail_only.iloc[-3] = 'MID'
+    evaluator = ParameterGridEvaluator(df, tail_only)
+    assert evaluator.backtest_stats({}) == _legacy_backtest(df, tail_only, {})
+    assert evaluator.evaluate([{}])['total_trades'][0] == 0
+
+
+def test_irregular_index_falls_back():
+    df, signals = _make_data(num_days=200, num_signals=10, seed=6)
+    shuffled = signals.sample(frac=1, random_state=0)
+    evaluator = ParameterGridEvaluator(df, shuffled)
+    assert not evaluator.vectorized
+    param_set = {'moderate_stop': 0.05}
+    expected = _legacy_backtest(df, shuffled, param_set)
+    assert evaluator.backtest_stats(param_set) == expected
+    assert evaluator.evaluate([param_set])['win_rate'][0] == expected['win_rate']
+
+
+def _legacy_optimize(backtests, optimization_target):
+    """原 optimize_parameters_for_stock 的选优逻辑；backtests 为逐组合 backtest_parameters 的结果"""
+    best_params, optimization_results = None, []
+    best_score = -float('inf') if optimization_target in ['win_rate', 'avg_pnl', 'profit_factor'] else float('inf')
+    for test_params, backtest_result in backtests:
+        if 'error' not in backtest_result and backtest_result['total_trades'] >= 3:
+            score = backtest_result.get(optimization_target, 0)
+            optimization_results.append({'parameters': asdict(test_params), 'score': score, 'stats': backtest_result})
+            if optimization_target in ['win_rate', 'avg_pnl', 'profit_factor']:
+                if score > best_score:
+                    best_score, best_params = score, test_params
+            elif score < best_score:
+                best_score, best_params = score, test_params
+    return {
+        'best_parameters': best_params,
+        'best_score': best_score,
+        'optimization_results': sorted(optimization_results, key=lambda x: x['score'], reverse=True)[:10],
+        'optimization_target': optimization_target
+    }
+
+
+def test_optimize_parameters_matches_legacy():
+    print("🧪 测试单股参数优化与原实现一致")
+    df, signals = _make_data(seed=1)
+    backtests = []
+    for combination in itertools.product(*PARAM_RANGES.values()):
+        test_params = TradingParameters(pre_entry_discount=combination[0], moderate_stop=combination[1],
+                                        moderate_profit=combination[2], max_holding_days=combination[3])
+        backtests.append((test_params, ParametricTradingAdvisor(test_params).backtest_parameters(df, signals)))
+    for target in ('win_rate', 'avg_pnl', 'profit_factor', 'max_loss', 'avg_holding_days'):
+        advisor = ParametricTradingAdvisor()
+        result = advisor.optimize_parameters_for_stock(df, signals, target)
+        assert result == _legacy_optimize(backtests, target), target
+        assert advisor.optimization_history[-1]['total_combinations_tested'] == 192
+    print("  ✅ 5个优化目标结果一致")
+
+
+def test_composite_score_search():
+    from performance_optimizer import OptimizedParameterSearch
+    df, signals = _make_data(seed=2)
+    ranges = {'pre_entry_discount': [0.02, 0.03, 0.05], 'moderate_stop': [0.03, 0.05, 0.08],
+              'moderate_profit': [0.10, 0.15, 0.20], 'max_holding_days': [20, 30]}
+    param_sets = ParameterGridEvaluator.grid(ranges)
+    evaluator = ParameterGridEvaluator(df, signals)
+
+    expected = []
+    for param_set in param_sets:
+        result = _legacy_backtest(df, signals, param_set)
+        expected.append(result['win_rate'] * 0.6 + max(0, result['avg_pnl']) * 0.4)
+    np.testing.assert_array_equal(evaluator.composite_scores(param_sets), expected)
+
+    best_score, best_params, best_result = evaluator.best_composite(param_sets)
+    best_index = int(np.argmax(expected))
+    assert best_score == expected[best_index]
+    assert asdict(best_params) == asdict(evaluator.parameters_for(param_sets[best_index]))
+    assert best_result == _legacy_backtest(df, signals, param_sets[best_index])
+
+    search = OptimizedParameterSearch.__new__(OptimizedParameterSearch)
+    result = search.search(ranges, batch_evaluation_func=evaluator.composite_scores)
+    assert result['best_parameters'] == param_sets[best_index] and result['best_score'] == best_score
+
+
+def benchmark_grid_search(num_days=2000, num_signals=120, grid_scale=1):
+    """单只股票192组合：逐组合回测 vs 批量回测；以及扩大网格后的批量回测耗时"""
+    df, signals = _make_data(num_days, num_signals)
+    param_sets = ParameterGridEvaluator.grid(PARAM_RANGES)
+
+    start = time.perf_counter()
+    for param_set in param_sets:
+        _legacy_backtest(df, signals, param_set)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ParameterGridEvaluator(df, signals).evaluate(param_sets)
+    batch_time = time.perf_counter() - start
+
+    wide_ranges = {
+        'pre_entry_discount': list(np.round(np.arange(0.005, 0.0601, 0.005), 3)),
+        'moderate_stop': list(np.round(np.arange(0.02, 0.1001, 0.01), 2)),
+        'moderate_profit': list(np.round(np.arange(0.05, 0.3001, 0.025), 3)),
+        'max_holding_days': [10, 15, 20, 25, 30, 40, 45, 60],
+    }
+    wide_sets = ParameterGridEvaluator.grid(wide_ranges)
+    start = time.perf_counter()
+    ParameterGridEvaluator(df, signals).evaluate(wide_sets)
+    wide_time = time.perf_counter() - start
+
+    print(f"📊 {num_days} 条K线, {num_signals} 个信号")
+    print(f"  {len(param_sets)} 种组合: 逐组合回测 {legacy_time:.2f} 秒, 批量回测 {batch_time * 1000:.1f} ms")
+    print(f"  {len(wide_sets)} 种组合: 批量回测 {wide_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    test_evaluate_matches_backtest_parameters()
+    test_other_risk_levels_and_bool_signals()
+    test_irregular_index_falls_back()
+    test_optimize_parameters_matches_legacy()
+    test_composite_score_search()
+    benchmark_grid_search()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+测试参数搜索策略
+1. random / halving / bayesian 在预算内找到（接近）最优组合，结果字典与穷举一致
+2. 单组评估函数走进程池，无法pickle的评估函数退回线程池；批量评估函数直接调用
+3. 提前停止；与穷举搜索的耗时对比
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+
+from performance_optimizer import OptimizedParameterSearch, _ParameterSpace
+
+
+SPACE = {
+    'pre_entry_discount': [0.005, 0.01, 0.015, 0.02, 0.025, 0.03, 0.04, 0.05],
+    'moderate_stop': [0.02, 0.03, 0.04, 0.05, 0.06, 0.08, 0.10],
+    'moderate_profit': [0.05, 0.08, 0.10, 0.12, 0.15, 0.20, 0.25, 0.30],
+    'max_holding_days': [10, 15, 20, 25, 30, 45],
+}
+OPTIMUM = {'pre_entry_discount': 0.02, 'moderate_stop': 0.05, 'moderate_profit': 0.15, 'max_holding_days': 25}
+
+
+def _peak_score(params):
+    """单峰得分，最优点为 OPTIMUM"""
+    return -sum(((params[name] - OPTIMUM[name]) / (max(values) - min(values))) ** 2
+                for name, values in SPACE.items())
+
+
+def _slow_peak_score(params, resource=1.0):
+    """模拟CPU密集的单次回测，耗时与使用的数据比例成正比"""
+    total = 0.0
+    for i in range(int(200_000 * resource)):
+        total += i % 7
+    return _peak_score(params) + total * 0.0
+
+
+def _low_fidelity_score(params, resource):
+    """资源越少噪声越大的得分（噪声由参数确定，可复现）"""
+    noise = np.random.default_rng(abs(hash(tuple(params.values()))) % (2 ** 32)).normal(0, 0.05)
+    return _peak_score(params) + noise * (1 - resource)
+
+
+def _failing_score(params):
+    if params['max_holding_days'] == 45:
+        raise ValueError("回测失败")
+    return _peak_score(params)
+
+
+def _make_search():
+    search = OptimizedParameterSearch(max_workers=4)
+    return search
+
+
+def test_parameter_space_indexing():
+    space = _ParameterSpace(SPACE)
+    assert space.size == 8 * 7 * 8 * 6
+    import itertools
+    grid = list(itertools.product(*SPACE.values()))
+    for index in (0, 1, 100, space.size - 1):
+        assert tuple(space.params(index).values()) == grid[index]
+    sample = space.sample(np.random.default_rng(0), 50, exclude=range(10))
+    assert len(set(sample.tolist())) == 50 and min(sample) >= 10
+    assert len(space.sample(np.random.default_rng(0), space.size)) == space.size
+    coords = space.coordinates([0, space.size - 1])
+    assert coords.min() == 0 and coords.max() == 1
+
+
+def test_strategies_find_optimum():
+    print("🧪 测试各搜索策略")
+    search = _make_search()
+    grid = search.search(SPACE, batch_evaluation_func=lambda sets: [_peak_score(p) for p in sets])
+    assert grid['best_parameters'] == OPTIMUM
+    assert grid['strategy'] == 'grid' and grid['evaluations'] == grid['search_space_size'] == 2688
+
+    random_result = search.search(SPACE, _peak_score, strategy='random', budget=300, random_state=1)
+    assert set(random_result) == set(grid)
+    assert random_result['evaluations'] == 300 and random_result['search_space_size'] == 2688
+    assert random_result['best_score'] == _peak_score(random_result['best_parameters'])
+    assert random_result['best_score'] > -0.05
+
+    halving = search.search(SPACE, _low_fidelity_score, strategy='halving', budget=243, random_state=2)
+    # 最终得分在完整资源上评估
+    assert halving['best_score'] == _peak_score(halving['best_parameters'])
+    assert halving['evaluations'] < 243 * 1.5
+    assert halving['best_score'] > -0.05
+
+    bayesian = search.search(SPACE, _peak_score, strategy='bayesian', budget=120, random_state=3)
+    assert bayesian['evaluations'] <= 120
+    assert bayesian['best_score'] > -0.01, bayesian
+    print(f"  ✅ 穷举 {grid['evaluations']} 组; random {random_result['best_score']:.4f}, "
+          f"halving {halving['best_score']:.4f} ({halving['evaluations']} 组), bayesian {bayesian['best_score']:.4f}")
+
+
+def test_execution_paths_and_early_stopping():
+    search = _make_search()
+    # 无法pickle的闭包退回线程池
+    calls = []
+    result = search.search(SPACE, lambda params: calls.append(1) or _peak_score(params),
+                           strategy='random', budget=40, random_state=0)
+    assert len(calls) == 40 and result['evaluations'] == 40
+
+    # 批量评估函数（halving 时多一个资源参数）
+    batches = []
+
+    def batch_score(param_sets, resource):
+        batches.append((len(param_sets), resource))
+        return [_low_fidelity_score(params, resource) for params in param_sets]
+
+    result = search.search(SPACE, batch_evaluation_func=batch_score, strategy='halving', budget=27,
+                           min_resource=0.25, reduction_factor=2, random_state=0)
+    assert batches == [(27, 0.25), (14, 0.5), (7, 1.0)]
+    assert result['evaluations'] == 48
+
+    # 评估异常记为负无穷，不影响其他组合
+    result = search.search(SPACE, _failing_score, strategy='random', budget=100, random_state=0)
+    assert result['best_parameters']['max_holding_days'] != 45
+
+    # 常数得分：第一轮之后不再提升
+    result = search.search(SPACE, batch_evaluation_func=lambda sets: [0.0] * len(sets), strategy='bayesian',
+                           budget=500, early_stopping_rounds=3, random_state=0)
+    assert result['evaluations'] < 500
+
+    # 预算超过网格大小时只评估整个网格一次
+    small = {'a': [1, 2, 3], 'b': [0, 1]}
+    result = search.search(small, batch_evaluation_func=lambda sets: [p['a'] + p['b'] for p in sets],
+                           strategy='random', budget=100)
+    assert result['evaluations'] == 6 and result['best_parameters'] == {'a': 3, 'b': 1}
+
+    try:
+        search.search(small, _peak_score, strategy='anneal')
+        assert False, "应拒绝未知策略"
+    except ValueError:
+        pass
+
+    # halving 的评估函数缺少 resource 参数时直接报错，而不是全部记为负无穷
+    try:
+        search.search(small, _peak_score, strategy='halving', budget=6)
+        assert False, "应拒绝缺少 resource 参数的评估函数"
+    except TypeError:
+        pass
+    try:
+        search.search(small, batch_evaluation_func=lambda sets: [0.0] * len(sets), strategy='halving')
+        assert False, "应拒绝缺少 resource 参数的批量评估函数"
+    except TypeError:
+        pass
+    try:
+        search.search(small, _low_fidelity_score, strategy='random')
+        assert False, "random 的评估函数只接收参数字典"
+    except TypeError:
+        pass
+
+    # 全部评估失败时报错，不返回任意的"最佳"参数
+    for strategy in ('random', 'halving'):
+        try:
+            search.search(small, batch_evaluation_func=lambda sets, *resource: [float('-inf')] * len(sets),
+                          strategy=strategy)
+            assert False, "全部失败时应报错"
+        except RuntimeError:
+            pass
+
+
+def test_cache_key():
+    search = _make_search()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        from performance_optimizer import SmartCache
+        search.cache = SmartCache(cache_dir)
+        first = search.search(SPACE, _peak_score, strategy='random', budget=20, random_state=0, cache_key='rnd')
+        # 相同参数命中缓存
+        again = search.search(SPACE, _peak_score, strategy='random', budget=20, random_state=0, cache_key='rnd')
+        assert again == first
+        # 策略、预算或随机种子不同时重新搜索，不复用其他搜索的结果
+        grid = search.search(SPACE, _peak_score, strategy='grid', cache_key='rnd')
+        assert grid['strategy'] == 'grid' and grid['evaluations'] == grid['search_space_size']
+        reseeded = search.search(SPACE, _peak_score, strategy='random', budget=20, random_state=5, cache_key='rnd')
+        assert reseeded['best_parameters'] != first['best_parameters']
+        larger = search.search(SPACE, _peak_score, strategy='random', budget=30, random_state=0, cache_key='rnd')
+        assert first['evaluations'] == 20 and larger['evaluations'] == 30
+        assert search.search(SPACE, _peak_score, strategy='grid', cache_key='rnd') == grid
+
+
+def benchmark_search(budget=150):
+    """CPU密集评估：穷举（线程池，受GIL限制） vs 采样策略（进程池）"""
+    search = _make_search()
+    search.max_workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    grid = search.search(SPACE, _slow_peak_score)
+    grid_time = time.perf_counter() - start
+
+    rows = []
+    for strategy in ('random', 'halving', 'bayesian'):
+        start = time.perf_counter()
+        result = search.search(SPACE, _slow_peak_score, strategy=strategy, budget=budget, random_state=0,
+                               early_stopping_rounds=5)
+        rows.append((strategy, time.perf_counter() - start, result))
+
+    print(f"📊 网格 {grid['search_space_size']} 种组合, CPU {os.cpu_count()} 核")
+    print(f"  穷举(线程池): {grid_time:.2f} 秒, 最佳得分 {grid['best_score']:.4f}")
+    for strategy, elapsed, result in rows:
+        print(f"  {strategy}(进程池): {elapsed:.2f} 秒, 评估 {result['evaluations']} 组, "
+              f"最佳得分 {result['best_score']:.4f}")
+
+
+if __name__ == "__main__":
+    test_parameter_space_indexing()
+    test_strategies_find_optimum()
+    test_execution_paths_and_early_stopping()
+    test_cache_key()
+    benchmark_search()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+测试持仓并行扫描
+1. 进程池并行分析与逐个分析结果一致；持仓文件只写入一次
+2. 按持仓缓存：日线文件与买入价/日期未变化的持仓复用结果，变化的持仓重新分析，失败的持仓不缓存
+3. /api/portfolio/scan?stream=1 逐个推送完成的持仓
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import data_handler
+import portfolio_manager as portfolio_module
+from portfolio_manager import PortfolioManager
+from synthetic_tdx_data import day_records, write_chunks
+
+ANALYSIS_FIELDS = ('current_price', 'profit_loss_pct', 'position_advice', 'backtest_analysis')
+
+
+def _setup(root_dir, num_positions=4, num_days=400):
+    """临时日线目录 + 指向临时文件的持仓管理器"""
+    lday_dir = os.path.join(root_dir, 'vipdoc', 'sz', 'lday')
+    os.makedirs(lday_dir, exist_ok=True)
+    portfolio = []
+    for i in range(num_positions):
+        stock_code = f'sz{1 + i:06d}'
+        write_chunks(os.path.join(lday_dir, f'{stock_code}.day'), day_records('2022-01-03', num_days, seed=i))
+        portfolio.append({'stock_code': stock_code, 'purchase_price': 10.0 + i, 'quantity': 100,
+                          'purchase_date': '2023-06-01', 'note': '', 'created_time': '2023-06-01 09:30:00',
+                          'last_analysis_time': None})
+    data_handler.BASE_PATH = os.path.join(root_dir, 'vipdoc')
+
+    manager = PortfolioManager()
+    portfolio_dir = os.path.join(root_dir, 'portfolio')
+    os.makedirs(portfolio_dir, exist_ok=True)
+    manager.portfolio_file = os.path.join(portfolio_dir, 'portfolio.json')
+    manager.cache_file = os.path.join(portfolio_dir, 'portfolio_scan_cache.json')
+    manager.save_portfolio(portfolio)
+    return manager, lday_dir
+
+
+def _with_manager(test, **setup):
+    original_base = data_handler.BASE_PATH
+    with tempfile.TemporaryDirectory() as root_dir:
+        try:
+            test(*_setup(root_dir, **setup))
+        finally:
+            data_handler.BASE_PATH = original_base
+
+
+def _clear_backtest_cache(manager):
+    """删除深度分析自带的7天回测缓存，使下一次扫描真正重新计算"""
+    cache_dir = os.path.dirname(manager.cache_file)
+    for name in os.listdir(cache_dir):
+        if name.startswith('backtest_cache_'):
+            os.remove(os.path.join(cache_dir, name))
+
+
+def _scan(manager, force_refresh=False, max_workers=2):
+    events = list(manager.iter_scan_positions(force_refresh, max_workers=max_workers))
+    assert events[-1]['type'] == 'done'
+    return events[:-1], events[-1]['results']
+
+
+def test_parallel_matches_sequential():
+    print("🧪 测试并行扫描与逐个扫描一致")
+
+    def run(manager, lday_dir):
+        writes = []
+        write_json = portfolio_module._write_json_atomic
+        portfolio_module._write_json_atomic = lambda path, data: (writes.append(path), write_json(path, data))
+        try:
+            sequential = manager.scan_all_positions(force_refresh=True)
+            _clear_backtest_cache(manager)
+            events, parallel = _scan(manager, force_refresh=True, max_workers=3)
+        finally:
+            portfolio_module._write_json_atomic = write_json
+        assert writes.count(manager.portfolio_file) == 2 and writes.count(manager.cache_file) == 2
+
+        assert [p['stock_code'] for p in parallel['positions']] == [p['stock_code'] for p in sequential['positions']]
+        for got, want in zip(parallel['positions'], sequential['positions']):
+            assert 'error' not in got, got
+            for field in ANALYSIS_FIELDS:
+                assert got[field] == want[field], (got['stock_code'], field)
+        assert parallel['summary'] == sequential['summary']
+        assert parallel['analyzed_count'] == 4 and not parallel['from_cache']
+
+        # 每完成一个持仓一条事件，汇总随完成数累积
+        assert [event['completed'] for event in events] == [1, 2, 3, 4]
+        assert sorted(event['position']['stock_code'] for event in events) == [
+            p['stock_code'] for p in parallel['positions']]
+        assert events[-1]['summary'] == parallel['summary']
+
+        saved = manager.load_portfolio()
+        assert all(p['last_analysis_time'] for p in saved)
+        assert not [name for name in os.listdir(os.path.dirname(manager.portfolio_file)) if name.endswith('.tmp')]
+
+    _with_manager(run)
+    print("  ✅ 结果一致，持仓文件每次扫描只写入一次")
+
+
+def test_per_position_cache():
+    print("🧪 测试按持仓缓存")
+
+    def run(manager, lday_dir):
+        first = manager.scan_all_positions()
+        assert first['analyzed_count'] == 4
+
+        _, second = _scan(manager)
+        assert second['analyzed_count'] == 0 and second['reused_count'] == 4 and second['from_cache']
+        # 复用的结果来自JSON缓存，与接口返回的形式一致
+        for got, want in zip(second['positions'], first['positions']):
+            for field in ANALYSIS_FIELDS:
+                assert got[field] == json.loads(json.dumps(want[field]))
+
+        # 日线文件更新：只重新分析该持仓
+        write_chunks(os.path.join(lday_dir, 'sz000002.day'), day_records('2022-01-03', 410, seed=1))
+        _, third = _scan(manager)
+        assert third['analyzed_count'] == 1 and not third['from_cache']
+        assert [p['stock_code'] for p in third['positions']] == [p['stock_code'] for p in first['positions']]
+
+        # 买入价变化同样使该持仓失效
+        manager.update_position('sz000003', purchase_price=50.0)
+        _, fourth = _scan(manager)
+        assert fourth['analyzed_count'] == 1
+        updated = next(p for p in fourth['positions'] if p['stock_code'] == 'sz000003')
+        assert updated['purchase_price'] == 50.0 and updated['profit_loss_pct'] < 0
+
+        # 数据缺失的持仓返回错误且不缓存，下次扫描重试
+        os.remove(os.path.join(lday_dir, 'sz000004.day'))
+        _, fifth = _scan(manager)
+        failed = next(p for p in fifth['positions'] if p['stock_code'] == 'sz000004')
+        assert 'error' in failed and fifth['summary']['profitable_count'] + fifth['summary']['loss_count'] == 3
+        with open(manager.cache_file, 'r', encoding='utf-8') as f:
+            assert 'sz000004' not in json.load(f)['positions']
+        _, sixth = _scan(manager)
+        assert sixth['analyzed_count'] == 1
+
+        _, forced = _scan(manager, force_refresh=True)
+        assert forced['analyzed_count'] == 4
+
+    _with_manager(run)
+    print("  ✅ 只分析数据或持仓参数变化的持仓")
+
+
+def test_stream_endpoint():
+    print("🧪 测试流式扫描接口")
+    import app as app_module
+
+    def run(manager, lday_dir):
+        original_factory = app_module.create_portfolio_manager
+        app_module.create_portfolio_manager = lambda: manager
+        try:
+            client = app_module.app.test_client()
+            response = client.post('/api/portfolio/scan?stream=1&force=1')
+            assert response.mimetype == 'text/event-stream'
+            events = []
+            for block in response.get_data(as_text=True).strip().split('\n\n'):
+                lines = dict(line.split(': ', 1) for line in block.split('\n'))
+                events.append((lines['event'], json.loads(lines['data'])))
+            assert [name for name, _ in events] == ['position'] * 3 + ['done']
+            assert events[-1][1]['results']['analyzed_count'] == 3
+
+            plain = client.post('/api/portfolio/scan').get_json()
+            assert plain['success'] and plain['results']['from_cache']
+            assert plain['results']['summary'] == events[-1][1]['results']['summary']
+        finally:
+            app_module.create_portfolio_manager = original_factory
+
+    _with_manager(run, num_positions=3)
+    print("  ✅ 每个持仓一条 position 事件，最后 done")
+
+
+def benchmark_portfolio_scan(num_positions=16):
+    """逐个分析 vs 进程池并行 vs 全部复用缓存"""
+
+    def run(manager, lday_dir):
+        print(f"📊 {num_positions} 个持仓")
+        for label, kwargs in (('逐个分析', {'force_refresh': True, 'max_workers': 1}),
+                              ('进程池并行', {'force_refresh': True, 'max_workers': os.cpu_count() or 1}),
+                              ('数据未变化', {'force_refresh': False})):
+            _clear_backtest_cache(manager)
+            start = time.perf_counter()
+            _scan(manager, **kwargs)
+            print(f"  {label}: {time.perf_counter() - start:.2f} 秒")
+
+    _with_manager(run, num_positions=num_positions, num_days=600)
+
+
+if __name__ == "__main__":
+    test_parallel_matches_sequential()
+    test_per_position_cache()
+    test_stream_endpoint()
+    benchmark_portfolio_scan()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+测试按K线同步的组合回测核心（portfolio_simulator.py）
+1. 单只股票：与 MultiTimeframeBacktester 逐时点循环的交易、权益曲线、绩效指标逐项一致（日线 / 仅5分钟线）
+2. 多只股票共用资金：与按时点、按股票顺序调用原有开平仓方法的朴素循环一致
+3. 逐时点循环 vs 数组推进的耗时对比
+"""
+
+import sys
+import os
+import time
+import zlib
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+from multi_timeframe_data_manager import MultiTimeframeDataManager
+from multi_timeframe_backtester import MultiTimeframeBacktester
+from portfolio_simulator import simulate_portfolio
+from timeframe_cube import TimeframeCube
+from synthetic_tdx_data import setup_stock_files
+
+
+def _backtester(root_dir, reports_dir, **config):
+    """使用临时数据目录、按股票代码生成确定性信号的回测引擎"""
+    data_manager = MultiTimeframeDataManager(os.path.join(reports_dir, 'cache'), base_path=root_dir, cube=TimeframeCube())
+    backtester = MultiTimeframeBacktester(data_manager, signal_generator=object())
+    backtester.reports_dir = reports_dir
+    backtester.backtest_config.update(config)
+
+    def signals(stock_code, time_index, historical_data, strategy_types):
+        rng = np.random.default_rng(zlib.crc32(stock_code.encode()))
+        return pd.DataFrame({'final_score': rng.uniform(-1, 1, len(time_index)),
+                             'confidence_level': rng.uniform(0.4, 1.0, len(time_index))}, index=time_index)
+
+    backtester._precompute_signals = signals
+    return backtester
+
+
+def _assert_same_run(got, expected):
+    assert got['trades'] == expected['trades']
+    assert got['equity_curve'] == expected['equity_curve']
+    assert got['performance_metrics'] == expected['performance_metrics']
+    assert got['final_capital'] == expected['final_capital']
+
+
+def test_single_stock_matches_reference():
+    print("🧪 测试单只股票与逐时点循环一致")
+    with tempfile.TemporaryDirectory() as root_dir, tempfile.TemporaryDirectory() as reports_dir:
+        codes = ['sz000001', 'sz000002']
+        for i, code in enumerate(codes):
+            setup_stock_files(root_dir, code, num_days=30, seed=i)
+        # sz000002 只有5分钟线
+        os.remove(os.path.join(root_dir, 'sz', 'lday', 'sz000002.day'))
+
+        for config in ({}, {'max_hold_periods': 2, 'stop_loss_pct': 0.02, 'take_profit_pct': 0.03},
+                       {'max_hold_periods': 0, 'max_position_size': 0.5}):
+            backtester = _backtester(root_dir, reports_dir, **config)
+            for code in codes:
+                expected = backtester._backtest_single_stock_reference(code, None, None, None)
+                got = backtester._backtest_single_stock(code, None, None, None)
+                assert 'error' not in got, got
+                _assert_same_run(got, expected)
+                closes = [t for t in got['trades'] if t['action'] == 'close']
+                assert closes and got['performance_metrics']['total_trades'] == len(closes)
+                assert {t['direction'] for t in got['trades']} == {'long', 'short'}
+                if 'stop_loss_pct' in config:
+                    assert {t['close_reason'] for t in closes} >= {'stop_loss', 'time_stop'}, config
+
+        assert 'error' in _backtester(root_dir, reports_dir)._backtest_single_stock('sz999999', None, None, None)
+    print("  ✅ 交易、权益曲线与绩效指标逐项一致")
+
+
+def _naive_portfolio(backtester, stock_list):
+    """按时点、按股票顺序调用原有开平仓方法的共用资金回测"""
+    stocks = []
+    for code in stock_list:
+        historical_data = backtester._get_historical_data(code, None, None)
+        index = backtester._get_unified_index(historical_data)
+        stocks.append((code, dict(zip(index, backtester._get_price_array(index, historical_data))),
+                       backtester._precompute_signals(code, index, historical_data, None)))
+    times = stocks[0][2].index
+    for _, _, signals in stocks[1:]:
+        times = times.union(signals.index)
+
+    config = backtester.backtest_config
+    state = {'capital': config['initial_capital'], 'positions': {}, 'trades': []}
+    last_prices = {}
+    equity = []
+    for current_time in times:
+        for code, prices, signals in stocks:
+            if current_time not in prices:
+                continue
+            price = prices[current_time]
+            last_prices[code] = price
+            position = state['positions'].get(code)
+            if position:
+                backtester._check_close_conditions(code, current_time, price, position, state)
+            elif (abs(signals.at[current_time, 'final_score']) > config['entry_score_threshold'] and
+                  signals.at[current_time, 'confidence_level'] > config['entry_confidence_threshold']):
+                backtester._open_position(code, current_time, price, signals.at[current_time, 'final_score'], state)
+        equity.append(state['capital'] + sum(p['shares'] * last_prices[code] for code, p in state['positions'].items()))
+    return state, equity
+
+
+def test_shared_capital_portfolio():
+    print("🧪 测试多只股票共用资金")
+    with tempfile.TemporaryDirectory() as root_dir, tempfile.TemporaryDirectory() as reports_dir:
+        codes = ['sz000001', 'sz000002', 'sz000003', 'sz000004']
+        for i, code in enumerate(codes):
+            setup_stock_files(root_dir, code, num_days=20, seed=i)
+        # 两只股票只有5分钟线：时间轴为日线与5分钟线的并集，各股票在自己没有K线的时点不交易
+        for code in codes[2:]:
+            os.remove(os.path.join(root_dir, 'sz', 'lday', f'{code}.day'))
+
+        backtester = _backtester(root_dir, reports_dir, max_hold_periods=3, max_position_size=0.4)
+        result = backtester.run_portfolio_backtest(codes)
+        state, equity = _naive_portfolio(backtester, codes)
+
+        assert result['trades'] == state['trades']
+        assert {t['stock_code'] for t in result['trades']} == set(codes)
+        assert result['final_capital'] == state['capital']
+        assert set(result['open_positions']) == set(state['positions'])
+        np.testing.assert_allclose([point['equity'] for point in result['equity_curve']], equity, rtol=1e-12)
+        metrics = result['performance_metrics']
+        assert metrics['final_equity'] == result['equity_curve'][-1]['equity']
+        assert 0 < metrics['max_drawdown'] < 1
+
+        # 同一时点多只股票开仓时，后面的股票使用前面开仓后剩余的现金
+        opens = pd.DataFrame([t for t in result['trades'] if t['action'] == 'open'])
+        assert opens['time'].duplicated().any()
+
+        assert backtester.run_portfolio_backtest(['sz999999'])['error']
+
+        empty = simulate_portfolio(pd.DatetimeIndex([]), np.zeros((0, 1)), np.zeros((0, 1)), np.zeros((0, 1)),
+                                   codes[:1], backtester.backtest_config)
+        assert empty['trades'] == [] and empty['equity_curve'] == [] and empty['max_drawdown'] == 0.0
+    print("  ✅ 与逐时点共用资金循环一致")
+
+
+def benchmark_portfolio_simulator(num_days=250, num_stocks=4):
+    """一年5分钟线：逐时点循环 vs 数组推进"""
+    with tempfile.TemporaryDirectory() as root_dir, tempfile.TemporaryDirectory() as reports_dir:
+        codes = [f'sz{i + 1:06d}' for i in range(num_stocks)]
+        for i, code in enumerate(codes):
+            setup_stock_files(root_dir, code, num_days=num_days, seed=i)
+            os.remove(os.path.join(root_dir, 'sz', 'lday', f'{code}.day'))
+        backtester = _backtester(root_dir, reports_dir, max_hold_periods=3)
+        for code in codes:
+            backtester._get_historical_data(code, None, None)
+
+        print(f"📊 {num_stocks} 只股票 × {num_days * 48} 根5分钟K线")
+        start = time.perf_counter()
+        for code in codes:
+            backtester._backtest_single_stock_reference(code, None, None, None)
+        reference_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for code in codes:
+            backtester._backtest_single_stock(code, None, None, None)
+        engine_time = time.perf_counter() - start
+        print(f"  逐时点循环: {reference_time:.2f} 秒, 数组推进: {engine_time * 1000:.0f} ms, "
+              f"加速 {reference_time / engine_time:.0f} 倍")
+        start = time.perf_counter()
+        result = backtester.run_portfolio_backtest(codes)
+        print(f"  共用资金组合回测: {(time.perf_counter() - start) * 1000:.0f} ms, {result['total_trades']} 笔交易")
+
+
+if __name__ == "__main__":
+    test_single_stock_matches_reference()
+    test_shared_capital_portfolio()
+    benchmark_portfolio_simulator()
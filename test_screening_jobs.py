@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+测试后台筛选任务
+1. stream_screening 的进度回调与取消（真实进程池）；run_screening 透传进度与取消
+2. 任务表：提交立即返回、进度/吞吐量/ETA、取消运行中与排队中的任务、失败、结果持久化与重启后读取、SSE事件流
+3. API：/api/screening/start 立即返回任务ID，status/jobs/events/cancel/results 接口
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from streaming_screener import stream_screening
+from screening_jobs import ScreeningJobManager
+
+
+def _slow_worker(task):
+    time.sleep(0.02)
+    return {'code': task} if task % 3 == 0 else None
+
+
+def test_stream_progress_and_stop():
+    print("🧪 测试流式筛选进度回调与取消")
+    progress = []
+    start = time.perf_counter()
+    stats = stream_screening(_slow_worker, iter(range(2000)), processes=2, chunksize=1, max_pending=4,
+                             report_interval=0, on_progress=lambda meter: progress.append(meter.processed),
+                             should_stop=lambda: len(progress) >= 10)
+    elapsed = time.perf_counter() - start
+    assert stats['stopped'] and stats['processed'] == 10
+    assert progress == list(range(1, 11))
+    assert elapsed < 5, elapsed
+
+    stats = stream_screening(_slow_worker, iter(range(12)), processes=1, report_interval=0)
+    assert not stats['stopped'] and stats['processed'] == 12 and stats['passed'] == 4
+    print(f"  ✅ 处理10只后取消, 耗时 {elapsed:.2f} 秒")
+
+
+class FakeResult:
+    def __init__(self, code, strategy):
+        self.code, self.strategy = code, strategy
+
+    def to_dict(self):
+        return {'stock_code': self.code, 'strategy': self.strategy, 'signal_type': 'BUY'}
+
+
+class FakeScreener:
+    """模拟 UniversalScreener：逐只处理，支持进度回调与取消"""
+
+    def __init__(self, total=40, delay=0.005, fail=False):
+        self.total, self.delay, self.fail = total, delay, fail
+        self.saved = []
+        self.started = threading.Event()
+
+    def run_screening(self, selected_strategies=None, progress_callback=None, cancel_event=None):
+        self.started.set()
+        if self.fail:
+            raise RuntimeError("数据目录不存在")
+        results = []
+        for i in range(self.total):
+            time.sleep(self.delay)
+            if i % 4 == 0:
+                results.append(FakeResult(f'sz{i:06d}', (selected_strategies or ['默认'])[0]))
+            progress_callback(i + 1, self.total, len(results), (i + 1) / ((i + 1) * self.delay))
+            if cancel_event.is_set():
+                break
+        return results
+
+    def save_results(self, results):
+        self.saved.append(len(results))
+        return {'json': 'screening_results.json'}
+
+
+def _wait_finished(manager, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.wait(job_id, manager.get(job_id)['version'], timeout=0.5)
+        if job['status'] in ('completed', 'failed', 'cancelled'):
+            return job
+    raise AssertionError(f"任务 {job_id} 未在 {timeout} 秒内结束")
+
+
+def test_job_lifecycle_and_persistence():
+    print("🧪 测试任务生命周期与持久化")
+    with tempfile.TemporaryDirectory() as result_dir:
+        screener = FakeScreener()
+        manager = ScreeningJobManager(screener, result_dir, progress_interval=0)
+        start = time.perf_counter()
+        job = manager.submit(['策略A'])
+        assert time.perf_counter() - start < 0.1
+        assert job['status'] in ('pending', 'running')
+
+        job = _wait_finished(manager, job['job_id'])
+        assert job['status'] == 'completed' and job['progress'] == 100
+        assert job['processed'] == job['total'] == 40 and job['total_signals'] == 10
+        assert job['saved_files'] == {'json': 'screening_results.json'} and screener.saved == [10]
+        results = manager.get_results(job['job_id'])
+        assert len(results) == 10 and results[0] == {'stock_code': 'sz000000', 'strategy': '策略A', 'signal_type': 'BUY'}
+
+        # 重启后从文件读取，不重新计算
+        restarted = ScreeningJobManager(FakeScreener(), result_dir)
+        assert restarted.latest('completed')['job_id'] == job['job_id']
+        assert restarted.get_results(job['job_id']) == results
+
+        # SSE：progress 事件后以 done 结束
+        events = list(manager.iter_events(manager.submit()['job_id']))
+        assert events[-1].startswith('event: done')
+        done = json.loads(events[-1].split('data: ', 1)[1])
+        assert done['status'] == 'completed'
+        assert all(event.startswith('event: progress') or event.startswith(':') for event in events[:-1])
+        assert list(manager.iter_events('missing'))[0].startswith('event: error')
+        manager.shutdown()
+    print("  ✅ 完成、持久化、重启读取、SSE 正常")
+
+
+def test_cancel_and_failure():
+    print("🧪 测试取消与失败")
+    with tempfile.TemporaryDirectory() as result_dir:
+        screener = FakeScreener(total=2000, delay=0.005)
+        manager = ScreeningJobManager(screener, result_dir, progress_interval=0)
+        running = manager.submit()
+        queued = manager.submit()
+        assert screener.started.wait(5)
+        time.sleep(0.05)
+
+        # 排队中的任务立即取消
+        assert manager.cancel(queued['job_id'])['status'] == 'cancelled'
+        # 运行中的任务停止后保留部分结果
+        snapshot = manager.get(running['job_id'])
+        assert snapshot['status'] == 'running' and snapshot['eta_seconds'] is not None
+        manager.cancel(running['job_id'])
+        job = _wait_finished(manager, running['job_id'])
+        assert job['status'] == 'cancelled' and job['processed'] < 2000
+        assert len(manager.get_results(running['job_id'])) == job['total_signals']
+        assert manager.cancel('missing') is None
+
+        manager.screener = FakeScreener(fail=True)
+        job = _wait_finished(manager, manager.submit()['job_id'])
+        assert job['status'] == 'failed' and '数据目录不存在' in job['error']
+        assert manager.get_results(job['job_id']) is None
+
+        # 只保留最近 max_jobs 个已结束任务
+        manager.max_jobs = 2
+        manager.screener = FakeScreener(total=2)
+        for _ in range(3):
+            _wait_finished(manager, manager.submit()['job_id'])
+        assert len(manager.list_jobs()) == 2
+        assert len(os.listdir(result_dir)) == 2
+        manager.shutdown()
+    print("  ✅ 取消排队/运行中任务、失败任务、清理旧任务正常")
+
+
+def test_run_screening_hooks():
+    """UniversalScreener.run_screening 透传进度回调与取消"""
+    from universal_screener import UniversalScreener
+    screener = UniversalScreener()
+    screener.config.setdefault('global_settings', {})['enable_parallel_processing'] = False
+    screener.iter_stock_files = lambda: iter([(f'/tmp/sz{i:06d}.day', 'sz') for i in range(50)])
+    screener.process_single_stock = lambda args: []
+    progress = []
+    screener.run_screening(progress_callback=lambda *args: progress.append(args))
+    assert len(progress) == 50 and progress[-1][:3] == (50, 50, 0)
+
+    cancel_event = threading.Event()
+
+    def on_progress(processed, total, passed, rate):
+        if processed == 7:
+            cancel_event.set()
+    assert screener.run_screening(progress_callback=on_progress, cancel_event=cancel_event) == []
+
+
+def test_api_endpoints():
+    print("🧪 测试筛选任务API")
+    import screening_api
+    with tempfile.TemporaryDirectory() as result_dir:
+        original = screening_api.job_manager
+        screening_api.job_manager = ScreeningJobManager(FakeScreener(total=30), result_dir, progress_interval=0)
+        try:
+            with screening_api.app.test_client() as client:
+                response = client.post('/api/screening/start', json={'strategies': ['策略B']})
+                assert response.status_code == 202
+                job = response.get_json()['data']
+                job_id = job['job_id']
+                assert job['events_url'] == f'/api/screening/jobs/{job_id}/events'
+
+                body = client.get(f'/api/screening/jobs/{job_id}/events').get_data(as_text=True)
+                assert 'event: done' in body
+
+                status = client.get(f'/api/screening/status?job_id={job_id}').get_json()['data']
+                assert status['status'] == 'completed'
+                assert client.get('/api/screening/status').get_json()['data']['job_id'] == job_id
+                assert client.get('/api/screening/jobs').get_json()['data'][0]['job_id'] == job_id
+                waited = client.get(f"/api/screening/jobs/{job_id}?wait_version={status['version']}&timeout=0.1")
+                assert waited.get_json()['data']['status'] == 'completed'
+
+                results = client.get('/api/screening/results?page_size=5').get_json()['data']
+                assert results['job_id'] == job_id and results['pagination']['total'] == 8
+                assert len(results['results']) == 5 and results['results'][0]['strategy'] == '策略B'
+                filtered = client.get('/api/screening/results?strategy=其他').get_json()['data']
+                assert filtered['pagination']['total'] == 0
+
+                assert client.get('/api/screening/jobs/missing').status_code == 404
+                assert client.post('/api/screening/jobs/missing/cancel').status_code == 404
+                assert client.get('/api/screening/results?job_id=missing').status_code == 404
+                assert client.post(f'/api/screening/jobs/{job_id}/cancel').get_json()['data']['status'] == 'completed'
+        finally:
+            screening_api.job_manager.shutdown()
+            screening_api.job_manager = original
+    print("  ✅ API 正常")
+
+
+def benchmark_submit_latency(repeats=20):
+    """提交任务的响应时间（原实现需等待整个筛选完成）"""
+    with tempfile.TemporaryDirectory() as result_dir:
+        manager = ScreeningJobManager(FakeScreener(total=200, delay=0.01), result_dir)
+        start = time.perf_counter()
+        jobs = [manager.submit() for _ in range(repeats)]
+        submit_time = (time.perf_counter() - start) / repeats
+        for job in jobs[1:]:
+            manager.cancel(job['job_id'])
+        start = time.perf_counter()
+        _wait_finished(manager, jobs[0]['job_id'], timeout=30)
+        run_time = time.perf_counter() - start
+        manager.shutdown()
+    print(f"📊 提交任务平均 {submit_time * 1000:.2f} ms 返回; 同一筛选同步执行需 {run_time:.2f} 秒")
+
+
+if __name__ == "__main__":
+    test_stream_progress_and_stop()
+    test_job_lifecycle_and_persistence()
+    test_cancel_and_failure()
+    test_run_screening_hooks()
+    test_api_endpoints()
+    benchmark_submit_latency()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+测试共享内存行情传输
+1. 发布/挂载往返一致（主进程与子进程），句柄序列化体积小，释放后段被删除
+2. 多进程共享内存优化与单进程批量回测结果一致，批次结束后不残留共享内存段；
+   参数网格只有一块时不创建进程池，分块任务完成后立即卸载共享内存
+3. 传输开销对比：每个任务pickle整个DataFrame vs 只传句柄
+"""
+
+import sys
+import os
+import time
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+from shared_frame import SharedFrame, AttachedFrame, prepare_workers, publish_frames, release_frames
+from parametric_advisor import ParameterGridEvaluator
+import parallel_optimizer
+from parallel_optimizer import ParallelStockOptimizer
+
+
+def _make_stock(num_days=800, num_signals=30, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, num_days)))
+    df = pd.DataFrame({
+        'open': close,
+        'high': close * (1 + rng.uniform(0, 0.03, num_days)),
+        'low': close * (1 - rng.uniform(0, 0.03, num_days)),
+        'close': close,
+        'volume': rng.integers(1000, 100000, num_days),
+        'ma20': close,  # 非OHLCV列不发布
+    }, index=pd.bdate_range('2019-01-02', periods=num_days, name='date'))
+    signals = pd.Series('', index=df.index, dtype=object)
+    signals.iloc[rng.choice(num_days - 20, num_signals, replace=False)] = rng.choice(['PRE', 'MID', 'POST'],
+                                                                                      num_signals)
+    return df, signals
+
+
+def _attach_and_summarize(handle):
+    frame = AttachedFrame(handle)
+    summary = (frame.df.copy(), frame.signals.copy())
+    frame.close()
+    return summary
+
+
+def _shm_segments():
+    return {name for name in os.listdir('/dev/shm') if name.startswith('psm_')} if os.path.isdir('/dev/shm') else set()
+
+
+def test_publish_attach_roundtrip():
+    print("🧪 测试共享内存往返")
+    df, signals = _make_stock()
+    signals.iloc[5] = np.nan
+    with SharedFrame(df, signals) as shared:
+        assert len(pickle.dumps(shared.handle)) < 1024
+        expected = df[['open', 'high', 'low', 'close', 'volume']]
+
+        frame = AttachedFrame(shared.handle)
+        pd.testing.assert_frame_equal(frame.df, expected, check_freq=False)
+        pd.testing.assert_series_equal(frame.signals, signals, check_freq=False)
+        assert not frame.df['close'].to_numpy().flags.writeable
+        frame.close()
+
+        prepare_workers()
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            child_df, child_signals = executor.submit(_attach_and_summarize, shared.handle).result()
+        pd.testing.assert_frame_equal(child_df, expected, check_freq=False)
+        pd.testing.assert_series_equal(child_signals, signals, check_freq=False)
+        name = shared.handle.name
+
+    # 释放后无法再挂载
+    try:
+        AttachedFrame(shared.handle)
+        assert False, "段应已删除"
+    except FileNotFoundError:
+        pass
+    assert name not in _shm_segments()
+
+    # 布尔信号、无信号
+    frames = publish_frames([(df, signals != ''), (df, None)])
+    bool_frame, plain_frame = AttachedFrame(frames[0].handle), AttachedFrame(frames[1].handle)
+    pd.testing.assert_series_equal(bool_frame.signals, signals != '', check_freq=False)
+    assert plain_frame.signals is None
+    bool_frame.close()
+    plain_frame.close()
+    release_frames(frames)
+    print(f"  ✅ 句柄 {len(pickle.dumps(shared.handle))} 字节, 整个DataFrame {len(pickle.dumps((df, signals)))} 字节")
+
+
+def _strip_time(results):
+    return {code: {k: v for k, v in result.items() if k != 'optimization_time'} for code, result in results.items()}
+
+
+def test_shared_batch_matches_in_process():
+    print("🧪 测试共享内存多进程优化与单进程一致")
+    stocks = []
+    for i in range(5):
+        df, signals = _make_stock(seed=i)
+        stocks.append({'stock_code': f'sz{i:06d}', 'df': df, 'signals': signals})
+    few_df, few_signals = _make_stock(num_signals=2, seed=9)
+    stocks.append({'stock_code': 'sz000009', 'df': few_df, 'signals': few_signals})
+    # 非日期索引走进程内计算
+    int_df, int_signals = _make_stock(seed=10)
+    int_df = int_df.reset_index(drop=True)
+    stocks.append({'stock_code': 'sz000010', 'df': int_df, 'signals': int_signals.reset_index(drop=True)})
+
+    wide_ranges = dict(ParallelStockOptimizer.PARAM_RANGES, max_holding_days=[10, 20, 30, 45])
+    before = _shm_segments()
+    with tempfile.TemporaryDirectory() as serial_dir, tempfile.TemporaryDirectory() as shared_dir:
+        serial = ParallelStockOptimizer(max_workers=1, cache_dir=serial_dir, param_ranges=wide_ranges)
+        expected = serial.optimize_stocks_batch(stocks)
+        optimizer = ParallelStockOptimizer(max_workers=2, max_stocks_parallel=3, cache_dir=shared_dir,
+                                           combo_chunk_size=20, param_ranges=wide_ranges)
+        actual = optimizer.optimize_stocks_batch(stocks)
+
+    assert _strip_time(actual) == _strip_time(expected)
+    assert actual['sz000009'] == {'error': '信号数量不足，需要至少3个信号，当前: 2'}
+    assert actual['sz000000']['combinations_tested'] == 108
+    assert _shm_segments() <= before
+    print(f"  ✅ {len(stocks)} 只股票结果一致, 无残留共享内存段")
+
+
+def _mappings(name):
+    """当前进程对某个共享内存段的映射数"""
+    if not os.path.exists('/proc/self/maps'):
+        return 0
+    with open('/proc/self/maps') as f:
+        return sum(1 for line in f if line.rstrip().endswith('/dev/shm/' + name.lstrip('/')))
+
+
+def test_single_chunk_stays_in_process():
+    print("🧪 测试参数网格只有一块时在当前进程内计算")
+    stocks = []
+    for i in range(3):
+        df, signals = _make_stock(seed=i)
+        stocks.append({'stock_code': f'sz{i:06d}', 'df': df, 'signals': signals})
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("默认参数网格不应创建进程池")
+
+    saved = parallel_optimizer.ProcessPoolExecutor
+    parallel_optimizer.ProcessPoolExecutor = no_pool
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            optimizer = ParallelStockOptimizer(max_workers=4, cache_dir=cache_dir)
+            results = optimizer.optimize_stocks_batch(stocks)
+    finally:
+        parallel_optimizer.ProcessPoolExecutor = saved
+    assert all(result['combinations_tested'] == 54 for result in results.values())
+
+    # 分块任务完成后卸载挂载的共享内存段（发布方自身的映射保留到批次结束）
+    df, signals = stocks[0]['df'], stocks[0]['signals']
+    param_sets = ParameterGridEvaluator.grid(ParallelStockOptimizer.PARAM_RANGES)
+    with SharedFrame(df, signals) as shared:
+        published = _mappings(shared.handle.name)
+        stats = parallel_optimizer._evaluate_chunk_worker(shared.handle, param_sets[:20])
+        assert _mappings(shared.handle.name) == published
+    expected = ParameterGridEvaluator(df, signals, 'moderate').evaluate(param_sets[:20])
+    for key in expected:
+        np.testing.assert_array_equal(stats[key], expected[key])
+    print("  ✅ 54 种组合未创建进程池, 分块任务结束后已卸载共享内存")
+
+
+def _pickled_chunk_worker(df, signals, param_sets):
+    """对照组：每个任务携带整个DataFrame"""
+    return ParameterGridEvaluator(df, signals, 'moderate').evaluate(param_sets)
+
+
+def benchmark_transport(num_stocks=16, num_days=4000, chunk_size=64):
+    stocks = [_make_stock(num_days=num_days, num_signals=150, seed=i) for i in range(num_stocks)]
+    param_sets = ParameterGridEvaluator.grid(dict(ParallelStockOptimizer.PARAM_RANGES,
+                                                  moderate_profit=[0.08, 0.10, 0.12, 0.15, 0.20, 0.25],
+                                                  max_holding_days=[10, 15, 20, 30, 45]))
+    chunks = [param_sets[i:i + chunk_size] for i in range(0, len(param_sets), chunk_size)]
+    tasks = num_stocks * len(chunks)
+
+    prepare_workers()
+    with ProcessPoolExecutor() as executor:
+        list(executor.map(abs, range(64)))  # 预热进程池
+        start = time.perf_counter()
+        futures = [executor.submit(_pickled_chunk_worker, df, signals, chunk)
+                   for df, signals in stocks for chunk in chunks]
+        [future.result() for future in futures]
+        pickled_time = time.perf_counter() - start
+        pickled_bytes = len(pickle.dumps((stocks[0][0], stocks[0][1], chunks[0])))
+
+        start = time.perf_counter()
+        frames = publish_frames(stocks)
+        try:
+            futures = [executor.submit(parallel_optimizer._evaluate_chunk_worker, frame.handle, chunk)
+                       for frame in frames for chunk in chunks]
+            [future.result() for future in futures]
+        finally:
+            release_frames(frames)
+        shared_time = time.perf_counter() - start
+        shared_bytes = len(pickle.dumps((frames[0].handle, chunks[0])))
+
+    print(f"📊 {num_stocks} 只股票 × {num_days} 条K线, {len(param_sets)} 种组合, 每任务 {chunk_size} 组, 共 {tasks} 个任务")
+    print(f"  每任务pickle DataFrame: {pickled_time:.2f} 秒 (每任务 {pickled_bytes / 1024:.0f} KB)")
+    print(f"  共享内存句柄: {shared_time:.2f} 秒 (每任务 {shared_bytes / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    test_publish_attach_roundtrip()
+    test_shared_batch_matches_in_process()
+    test_single_chunk_stays_in_process()
+    benchmark_transport()
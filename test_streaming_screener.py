@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+测试流式筛选管线
+1. imap_unordered 流式结果与 pool.map 全量结果一致（忽略顺序）
+2. 在途任务数受 max_pending 约束（背压），数据源按需惰性消费
+3. JSONL/CSV 增量写出，惰性数据源与 collect_bar_sources 一致
+"""
+
+import sys
+import os
+import csv
+import json
+import time
+import tempfile
+import threading
+from multiprocessing import Pool
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+
+from streaming_screener import JsonlSink, CsvSink, iter_results, stream_screening
+from market_bar_store import collect_bar_sources, iter_bar_sources, bar_source_code, load_bar_source
+from synthetic_tdx_data import build_lday_tree
+
+
+def _signal_worker(args):
+    """模拟筛选worker：读取日线，最新收盘价高于20日均线时返回信号"""
+    source, market = args
+    df = load_bar_source(source)
+    if df is None or len(df) < 20:
+        return None
+    ma20 = df['close'].rolling(20).mean().iloc[-1]
+    if df['close'].iloc[-1] <= ma20:
+        return None
+    return {'stock_code': bar_source_code(source), 'market': market,
+            'close': float(df['close'].iloc[-1]), 'details': {'ma20': float(ma20)}}
+
+
+def _slow_square(x):
+    time.sleep(0.001)
+    return x * x
+
+
+def test_stream_matches_pool_map():
+    print("🧪 测试流式结果与 pool.map 一致")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        build_lday_tree(tmp_dir, symbols_per_market=30)
+        sources = collect_bar_sources(['sh', 'sz'], tmp_dir)
+        with Pool(processes=2) as pool:
+            expected = [r for r in pool.map(_signal_worker, sources) if r is not None]
+
+        streamed = []
+        stats = stream_screening(_signal_worker, iter_bar_sources(['sh', 'sz'], tmp_dir),
+                                 on_record=streamed.append, processes=2, chunksize=4, report_interval=0)
+        key = lambda r: r['stock_code']
+        assert sorted(streamed, key=key) == sorted(expected, key=key)
+        assert stats['processed'] == len(sources) and stats['passed'] == len(expected)
+
+        # 惰性数据源与列表版本一致
+        assert sorted(iter_bar_sources(['sh', 'sz', 'bj'], tmp_dir)) == sorted(sources)
+    print(f"  ✅ {stats}")
+
+
+def test_backpressure_bounds_in_flight_tasks():
+    print("🧪 测试背压")
+    lock = threading.Lock()
+    state = {'dispatched': 0, 'consumed': 0, 'max_in_flight': 0}
+
+    def tasks():
+        for i in range(400):
+            with lock:
+                state['dispatched'] += 1
+                state['max_in_flight'] = max(state['max_in_flight'], state['dispatched'] - state['consumed'])
+            yield i
+
+    results = []
+    for value in iter_results(_slow_square, tasks(), processes=2, chunksize=4, max_pending=32):
+        time.sleep(0.002)  # 消费端慢于生产端
+        with lock:
+            state['consumed'] += 1
+        results.append(value)
+
+    assert sorted(results) == [i * i for i in range(400)]
+    assert state['max_in_flight'] <= 32
+    print(f"  ✅ 最大在途任务数 {state['max_in_flight']}")
+
+
+def test_early_exit_does_not_hang():
+    for value in iter_results(_slow_square, iter(range(10000)), processes=2, chunksize=2, max_pending=16):
+        if value > 100:
+            break
+
+
+def test_sinks_write_incrementally():
+    records = [{'stock_code': 'sh600000', 'close': np.float64(10.5), 'details': {'stage': 2}},
+               {'stock_code': 'sz000001', 'close': 8.0, 'details': {'stage': 3}, 'extra': 1}]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jsonl_path = os.path.join(tmp_dir, 'out', 'signals.jsonl')
+        csv_path = os.path.join(tmp_dir, 'out', 'signals.csv')
+        with JsonlSink(jsonl_path) as jsonl_sink, CsvSink(csv_path) as csv_sink:
+            for record in records:
+                jsonl_sink.write(record)
+                csv_sink.write(record)
+            # 写出后立即可读
+            with open(jsonl_path, encoding='utf-8') as f:
+                assert len(f.readlines()) == 2
+
+        with open(jsonl_path, encoding='utf-8') as f:
+            assert [json.loads(line)['details'] for line in f] == [{'stage': 2}, {'stage': 3}]
+        with open(csv_path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+        assert [row['stock_code'] for row in rows] == ['sh600000', 'sz000001']
+        assert json.loads(rows[1]['details']) == {'stage': 3}
+        assert 'extra' not in rows[0]
+
+
+def benchmark_streaming(symbols_per_market=400, num_days=1500):
+    """对比 pool.map 与流式管线：总耗时、首个结果出现时间"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        build_lday_tree(tmp_dir, symbols_per_market=symbols_per_market, num_days=num_days)
+
+        start = time.perf_counter()
+        with Pool() as pool:
+            results = pool.map(_signal_worker, collect_bar_sources(['sh', 'sz'], tmp_dir))
+        passed = [r for r in results if r is not None]
+        map_time = time.perf_counter() - start
+
+        stats = stream_screening(_signal_worker, iter_bar_sources(['sh', 'sz'], tmp_dir),
+                                 sinks=[JsonlSink(os.path.join(tmp_dir, 'signals.jsonl'))],
+                                 report_interval=1.0, reporter=print)
+
+    print(f"📊 {symbols_per_market * 2} 只股票 × {num_days} 条K线")
+    print(f"  pool.map: {map_time:.2f} 秒 (首个结果 {map_time:.2f} 秒, 命中 {len(passed)})")
+    print(f"  流式: {stats['elapsed']:.2f} 秒 (首个结果 {stats['first_result_seconds']} 秒, "
+          f"命中 {stats['passed']}, {stats['stocks_per_second']:.0f} 只/秒)")
+
+
+if __name__ == "__main__":
+    test_stream_matches_pool_map()
+    test_backpressure_bounds_in_flight_tasks()
+    test_sinks_write_incrementally()
+    benchmark_streaming()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+测试多周期K线立方（timeframe_cube.py）
+1. 单次聚合得到的15分钟/30分钟/1小时/4小时/周线与逐周期 resample 的结果一致
+2. .lc5 追加新记录后增量更新的结果与整体重建一致；非追加的修改整体重读
+3. 按条目数/字节数的LRU淘汰；并发请求同一只股票只加载一次
+4. 多个 MultiTimeframeDataManager 共享同一份数据与派生结果，数据文件变化后失效
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+from timeframe_cube import TimeframeCube, resample_intraday, INTRADAY_FREQS
+from multi_timeframe_data_manager import MultiTimeframeDataManager
+from synthetic_tdx_data import day_records, write_chunks, pack_lc5, lc5_chunks, setup_stock_files
+
+STOCK = 'sz000001'
+
+
+def _reference(frames):
+    """逐周期 resample 的参考结果"""
+    manager = MultiTimeframeDataManager(cube=TimeframeCube())
+    expected = {tf: manager._resample_data(frames['5min'], tf) for tf in INTRADAY_FREQS}
+    expected['1week'] = manager._resample_data(frames['1day'], '1week')
+    return expected
+
+
+def _assert_frames_equal(got, expected):
+    for timeframe, df in expected.items():
+        pd.testing.assert_frame_equal(got[timeframe], df, check_freq=False, obj=timeframe)
+
+
+def test_resample_parity():
+    print("🧪 测试单次聚合与逐周期 resample 一致")
+    with tempfile.TemporaryDirectory() as root_dir:
+        setup_stock_files(root_dir)
+        frames = TimeframeCube().frames(STOCK, root_dir)
+        assert set(frames) == {'5min', '15min', '30min', '1hour', '4hour', '1day', '1week'}
+        _assert_frames_equal(frames, _reference(frames))
+        # 跨午休、跨日的桶边界
+        assert frames['1hour'].index[0] == pd.Timestamp('2024-01-02 09:00')
+        assert frames['1week'].index[0].dayofweek == 6
+
+    frames = resample_intraday(pd.DataFrame(columns=['open', 'high', 'low', 'close', 'volume'],
+                                            index=pd.DatetimeIndex([], name='datetime'), dtype=float))
+    assert all(df.empty for df in frames.values())
+    print("  ✅ 各周期逐行一致")
+
+
+def test_incremental_append():
+    print("🧪 测试追加记录后的增量更新")
+    with tempfile.TemporaryDirectory() as root_dir:
+        daily_file, min5_file, stamps = setup_stock_files(root_dir, num_days=30)
+        # 追加的记录先落入当前最后一个4小时桶（同日15:00之后），再延续到之后的交易日
+        extra = ([stamps[-1] + pd.Timedelta(minutes=5 * k) for k in range(1, 12)]
+                 + [ts + pd.Timedelta(days=3) for ts in stamps[-48:]])
+        cube = TimeframeCube()
+        cube.get(STOCK, root_dir)
+        write_chunks(min5_file, lc5_chunks(extra, 99), mode='ab')
+        write_chunks(daily_file, day_records('2024-03-01', 2, seed=5), mode='ab')
+        extended = cube.frames(STOCK, root_dir)
+        assert cube.stats()['extends'] == 1 and cube.stats()['misses'] == 1
+
+        rebuilt = TimeframeCube().frames(STOCK, root_dir)
+        assert len(extended['5min']) == len(stamps) + len(extra)
+        for timeframe, df in rebuilt.items():
+            pd.testing.assert_frame_equal(extended[timeframe], df, check_freq=False, obj=timeframe)
+        _assert_frames_equal(extended, _reference(rebuilt))
+
+        # 未变化时直接命中
+        assert cube.get(STOCK, root_dir) is cube.get(STOCK, root_dir)
+        assert cube.stats()['hits'] == 2
+
+        # 在中间插入记录（非追加）：整体重读，结果仍与重建一致
+        chunks = lc5_chunks(stamps, 0)
+        chunks.insert(10, pack_lc5(stamps[9] + pd.Timedelta(minutes=1), 9, 9, 9, 9, 1, 1))
+        write_chunks(min5_file, chunks)
+        reread = cube.frames(STOCK, root_dir)
+        _assert_frames_equal(reread, {tf: df for tf, df in TimeframeCube().frames(STOCK, root_dir).items()})
+        assert len(reread['5min']) == len(stamps) + 1
+    print("  ✅ 增量更新与整体重建一致")
+
+
+def test_lru_and_concurrency():
+    print("🧪 测试LRU淘汰与并发加载")
+    with tempfile.TemporaryDirectory() as root_dir:
+        codes = [f'sz{i:06d}' for i in range(1, 5)]
+        for i, code in enumerate(codes):
+            setup_stock_files(root_dir, code, num_days=10, seed=i)
+
+        cube = TimeframeCube(max_entries=2)
+        for code in codes:
+            cube.get(code, root_dir)
+        assert cube.stats()['entries'] == 2
+        assert [key[0] for key in cube._entries] == codes[-2:]
+
+        entry_bytes = cube.get(codes[-1], root_dir).nbytes
+        cube = TimeframeCube(max_bytes=int(entry_bytes * 2.5))
+        for code in codes:
+            cube.get(code, root_dir)
+        stats = cube.stats()
+        assert stats['entries'] == 2 and stats['bytes'] <= stats['max_bytes']
+
+        # 派生结果计入字节数，超出上限时淘汰最久未用的条目
+        entry = cube.get(codes[-1], root_dir)
+        cube.derived(entry, 'big', lambda: np.zeros(entry_bytes // 8))
+        assert cube.stats()['entries'] == 1 and (STOCK, root_dir) not in cube._entries
+
+        # 错误结果不缓存
+        calls = []
+        cube.derived(entry, 'bad', lambda: calls.append(1) or {'error': 'x'})
+        cube.derived(entry, 'bad', lambda: calls.append(1) or {'error': 'x'})
+        assert len(calls) == 2
+
+        # 并发请求同一只股票只加载一次
+        cube = TimeframeCube()
+        loads = []
+        load = cube._load
+        cube._load = lambda *args: (loads.append(1), time.sleep(0.05), load(*args))[2]
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cube.get(codes[0], root_dir))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(loads) == 1 and all(result is results[0] for result in results)
+
+        assert cube.get('sz999999', root_dir) is None
+    print("  ✅ 条目数/字节上限生效，同一股票只加载一次")
+
+
+def test_managers_share_cube():
+    print("🧪 测试多个管理器共享数据")
+    with tempfile.TemporaryDirectory() as root_dir, tempfile.TemporaryDirectory() as cache_dir:
+        daily_file, min5_file, stamps = setup_stock_files(root_dir, num_days=30)
+        cube = TimeframeCube()
+        first = MultiTimeframeDataManager(cache_dir, base_path=root_dir, cube=cube)
+        second = MultiTimeframeDataManager(cache_dir, base_path=root_dir, cube=cube)
+
+        sync = first.get_synchronized_data(STOCK)
+        assert 'error' not in sync and set(sync['timeframes']) == set(first.timeframes)
+        assert second.get_synchronized_data(STOCK) is sync
+        indicators_result = second.calculate_multi_timeframe_indicators(STOCK, ['1day', '1hour'])
+        assert first.calculate_multi_timeframe_indicators(STOCK, ['1day', '1hour']) is indicators_result
+        assert cube.stats()['misses'] == 1
+
+        # 数据文件更新后派生结果重新计算
+        write_chunks(min5_file, lc5_chunks([stamps[-1] + pd.Timedelta(days=3)], 1), mode='ab')
+        updated = second.get_synchronized_data(STOCK)
+        assert updated is not sync and len(updated['timeframes']['5min']) == len(stamps) + 1
+
+        assert 'error' in first.get_synchronized_data('sz999999')
+        assert first.get_cache_info()['cube']['entries'] == 1
+        first.clear_cache()
+        assert second.get_cache_info()['cube']['entries'] == 0
+
+        # 默认使用进程内共享的 cube
+        assert MultiTimeframeDataManager(cache_dir).cube is MultiTimeframeDataManager(cache_dir).cube
+    print("  ✅ 管理器共享数据与派生结果")
+
+
+def benchmark_timeframe_cube(num_days=250):
+    """逐周期 resample vs 单次聚合 vs 命中缓存 vs 追加一天后增量更新"""
+    with tempfile.TemporaryDirectory() as root_dir:
+        daily_file, min5_file, stamps = setup_stock_files(root_dir, num_days=num_days)
+        min5_df = data_loader.get_5min_data(min5_file)
+        manager = MultiTimeframeDataManager(root_dir, cube=TimeframeCube())
+        print(f"📊 {len(min5_df)} 根5分钟K线")
+
+        start = time.perf_counter()
+        for timeframe in INTRADAY_FREQS:
+            manager._resample_data(min5_df, timeframe)
+        print(f"  逐周期resample: {(time.perf_counter() - start) * 1000:.1f} ms")
+        start = time.perf_counter()
+        resample_intraday(min5_df)
+        print(f"  单次聚合: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        cube = TimeframeCube()
+        start = time.perf_counter()
+        cube.get(STOCK, root_dir)
+        print(f"  首次加载（读取+聚合）: {(time.perf_counter() - start) * 1000:.1f} ms")
+        start = time.perf_counter()
+        cube.get(STOCK, root_dir)
+        print(f"  命中缓存: {(time.perf_counter() - start) * 1000:.2f} ms")
+        write_chunks(min5_file, lc5_chunks([ts + pd.Timedelta(days=7) for ts in stamps[-48:]], 3), mode='ab')
+        start = time.perf_counter()
+        cube.get(STOCK, root_dir)
+        print(f"  追加一天后增量更新: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    test_resample_parity()
+    test_incremental_append()
+    test_lru_and_concurrency()
+    test_managers_share_cube()
+    benchmark_timeframe_cube()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+测试向量化.day文件解析器
+1. 与旧版逐条struct解析器的一致性校验（A股/港股格式）
+2. 合成5000个文件目录上的微基准测试
+"""
+
+import sys
+import os
+import time
+import struct
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+
+
+def _make_a_share_records(num_days=600, seed=0):
+    """生成A股格式的原始记录字节"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2021-01-04', periods=num_days)
+    close = np.maximum(100, (1000 + np.cumsum(rng.normal(0, 20, num_days)))).astype(int)
+    chunks = []
+    for i, date in enumerate(dates):
+        c = int(close[i])
+        o = c + int(rng.integers(-10, 10))
+        h = max(o, c) + int(rng.integers(0, 15))
+        l = min(o, c) - int(rng.integers(0, 15))
+        amount = float(rng.uniform(1e6, 1e8))
+        volume = int(rng.integers(10000, 10000000))
+        chunks.append(struct.pack('<IIIIIfII', int(date.strftime('%Y%m%d')), o, h, l, c, amount, volume, 0))
+    return chunks
+
+
+def _make_hk_records(num_days=300, seed=1):
+    """生成港股格式的原始记录字节"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2022-03-01', periods=num_days)
+    chunks = []
+    for date in dates:
+        c = float(rng.uniform(5, 50))
+        chunks.append(struct.pack('<IfffffIi', int(date.strftime('%Y%m%d')),
+                                  c * 0.99, c * 1.02, c * 0.97, c,
+                                  float(rng.uniform(1e5, 1e7)), int(rng.integers(1000, 100000)), -1))
+    return chunks
+
+
+def _assert_frames_equal(legacy_df, vectorized_df):
+    assert legacy_df is not None and vectorized_df is not None
+    pd.testing.assert_frame_equal(legacy_df, vectorized_df, check_freq=False, check_names=False)
+
+
+def test_a_share_parity():
+    """A股格式：向量化解析结果应与旧版完全一致"""
+    print("🧪 测试A股.day解析一致性")
+    chunks = _make_a_share_records()
+    # 插入异常记录：非法日期、零开盘价，并在末尾追加残缺字节
+    chunks.insert(10, struct.pack('<IIIIIfII', 20230230, 100, 100, 100, 100, 1.0, 1, 0))
+    chunks.insert(20, struct.pack('<IIIIIfII', 20230105, 0, 100, 100, 100, 1.0, 1, 0))
+    chunks.insert(30, struct.pack('<IIIIIfII', 20231301, 100, 100, 100, 100, 1.0, 1, 0))
+    payload = b''.join(chunks) + b'\x00' * 7
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'sz000001.day')
+        with open(file_path, 'wb') as f:
+            f.write(payload)
+
+        legacy_df = data_loader._get_daily_data_struct(file_path)
+        vectorized_df = data_loader.get_daily_data(file_path)
+
+    _assert_frames_equal(legacy_df, vectorized_df)
+    assert isinstance(vectorized_df.index, pd.DatetimeIndex)
+    print(f"  ✅ {len(vectorized_df)} 条记录一致")
+
+
+def test_hk_parity():
+    """港股格式：浮点价格解析结果应与旧版完全一致"""
+    print("🧪 测试港股.day解析一致性")
+    payload = b''.join(_make_hk_records())
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, '31#00700.day')
+        with open(file_path, 'wb') as f:
+            f.write(payload)
+
+        legacy_df = data_loader._get_daily_data_struct(file_path, '31#00700')
+        vectorized_df = data_loader.get_daily_data(file_path, '31#00700')
+
+    _assert_frames_equal(legacy_df, vectorized_df)
+    print(f"  ✅ {len(vectorized_df)} 条记录一致")
+
+
+def test_unsorted_and_empty_files():
+    """乱序记录应按日期排序，空文件返回None"""
+    chunks = _make_a_share_records(num_days=50)
+    payload = b''.join(reversed(chunks))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'sh600000.day')
+        with open(file_path, 'wb') as f:
+            f.write(payload)
+        df = data_loader.get_daily_data(file_path)
+        assert df.index.is_monotonic_increasing
+        _assert_frames_equal(data_loader._get_daily_data_struct(file_path), df)
+
+        empty_path = os.path.join(tmp_dir, 'sh600001.day')
+        open(empty_path, 'wb').close()
+        assert data_loader.get_daily_data(empty_path) is None
+
+
+def _build_synthetic_tree(root_dir, num_files, num_days):
+    """构建 sh/sz/bj 的 lday 目录结构"""
+    payload = b''.join(_make_a_share_records(num_days=num_days))
+    markets = ['sh', 'sz', 'bj']
+    files = []
+    for market in markets:
+        os.makedirs(os.path.join(root_dir, market, 'lday'), exist_ok=True)
+    for i in range(num_files):
+        market = markets[i % len(markets)]
+        file_path = os.path.join(root_dir, market, 'lday', f'{market}{600000 + i}.day')
+        with open(file_path, 'wb') as f:
+            f.write(payload)
+        files.append(file_path)
+    return files
+
+
+def benchmark_daily_decoder(num_files=5000, num_days=1000):
+    """在合成的全市场目录上对比新旧解析器的耗时"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = _build_synthetic_tree(tmp_dir, num_files, num_days)
+
+        start = time.perf_counter()
+        for file_path in files:
+            data_loader.get_daily_data(file_path)
+        vectorized_time = time.perf_counter() - start
+
+        # 旧版解析器较慢，只抽样计时后按比例估算
+        sample = files[:max(1, num_files // 50)]
+        start = time.perf_counter()
+        for file_path in sample:
+            data_loader._get_daily_data_struct(file_path)
+        legacy_time = (time.perf_counter() - start) * len(files) / len(sample)
+
+    print(f"📊 {num_files} 个文件 × {num_days} 条记录")
+    print(f"  旧版struct解析(估算): {legacy_time:.2f} 秒")
+    print(f"  向量化解析:           {vectorized_time:.2f} 秒")
+    print(f"  加速比: {legacy_time / vectorized_time:.1f}x")
+    return legacy_time, vectorized_time
+
+
+def test_benchmark_small_tree():
+    """小规模基准：只打印耗时（计时受机器负载影响，不作断言），校验每个文件的解析结果与旧版一致"""
+    benchmark_daily_decoder(num_files=60, num_days=500)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for file_path in _build_synthetic_tree(tmp_dir, 6, 500):
+            _assert_frames_equal(data_loader._get_daily_data_struct(file_path), data_loader.get_daily_data(file_path))
+
+
+if __name__ == "__main__":
+    test_a_share_parity()
+    test_hk_parity()
+    test_unsorted_and_empty_files()
+    benchmark_daily_decoder()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+测试滚动前推优化
+1. 折边界与数据指纹只取决于前缀，历史延长时已有的折不变
+2. 每折结果与直接在训练/测试窗口上批量回测一致；指标只用截至测试窗口末尾的数据
+3. 历史延长一个窗口时只计算新增的一折；修改旧数据后受影响的折重新计算；耗时对比
+4. run_optimization.py 的 walkforward 命令能从 .day 文件读取数据并完成优化
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+
+from parametric_advisor import ParameterGridEvaluator
+import walk_forward
+from walk_forward import (WalkForwardOptimizer, make_folds, prefix_fingerprints, macd_indicators,
+                          macd_zero_axis_signals, summarize_folds)
+from synthetic_tdx_data import day_records, write_chunks
+
+
+def _make_df(num_days=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, num_days)))
+    return pd.DataFrame({
+        'open': close,
+        'high': close * (1 + rng.uniform(0, 0.03, num_days)),
+        'low': close * (1 - rng.uniform(0, 0.03, num_days)),
+        'close': close,
+        'volume': rng.integers(1000, 100000, num_days),
+    }, index=pd.bdate_range('2015-01-01', periods=num_days, name='date'))
+
+
+def test_folds_and_fingerprints():
+    folds = make_folds(1000, 400, 100)
+    assert [(f.train_start, f.train_end, f.test_end) for f in folds] == \
+        [(0, 400, 500), (100, 500, 600), (200, 600, 700), (300, 700, 800), (400, 800, 900), (500, 900, 1000)]
+    assert make_folds(1099, 400, 100) == folds
+    assert make_folds(1000, 400, 100, step_days=300)[-1].test_end == 800
+    assert make_folds(499, 400, 100) == []
+
+    df = _make_df(800)
+    full = prefix_fingerprints(df, [300, 500, 800])
+    assert prefix_fingerprints(df.iloc[:500], [500]) == {500: full[500]}
+    assert prefix_fingerprints(df, [500]) == {500: full[500]}
+    changed = df.copy()
+    changed.iloc[400, changed.columns.get_loc('close')] += 0.01
+    fingerprints = prefix_fingerprints(changed, [300, 500, 800])
+    assert fingerprints[300] == full[300] and fingerprints[500] != full[500]
+
+
+def test_folds_match_direct_evaluation():
+    print("🧪 测试每折结果与直接回测一致")
+    df = _make_df()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        optimizer = WalkForwardOptimizer(train_days=400, test_days=100, cache_dir=cache_dir)
+        result = optimizer.run(df, 'sz000001')
+        assert len(result['folds']) == 11
+
+        full_signals = macd_zero_axis_signals(df, macd_indicators(df))
+        for fold, record in zip(make_folds(len(df), 400, 100), result['folds']):
+            train_df, test_df = df.iloc[fold.train_start:fold.train_end], df.iloc[fold.train_end:fold.test_end]
+            # MACD 只依赖过去的数据：截至测试窗口末尾计算的信号与全量计算一致
+            train_signals = full_signals.iloc[fold.train_start:fold.train_end]
+            test_signals = full_signals.iloc[fold.train_end:fold.test_end]
+
+            evaluator = ParameterGridEvaluator(train_df, train_signals)
+            stats = evaluator.evaluate(optimizer.param_sets)
+            scores, valid = ParameterGridEvaluator._composite(stats, 3)
+            scores = np.where(valid, scores, -np.inf)
+            best = int(np.argmax(scores))
+            assert record['best_parameters'] == optimizer.param_sets[best]
+            assert record['train_score'] == scores[best]
+            assert record['test_start'] == test_df.index[0].strftime('%Y-%m-%d')
+
+            test_stats = ParameterGridEvaluator(test_df, test_signals).evaluate([optimizer.param_sets[best]])
+            assert record['test_stats']['total_trades'] == test_stats['total_trades'][0]
+            assert record['test_stats']['win_rate'] == test_stats['win_rate'][0]
+            assert not record['cached']
+
+        summary = result['summary']
+        tested = [r for r in result['folds'] if r['test_stats']['total_trades']]
+        assert summary['oos_total_trades'] == sum(r['test_stats']['total_trades'] for r in tested)
+        assert summary['optimized_folds'] == 11
+        assert 0 < summary['parameter_stability'] <= 1
+    print(f"  ✅ {len(result['folds'])} 折一致, 样本外胜率 {summary['oos_win_rate']:.1%}")
+
+
+def test_incremental_extension_and_invalidation():
+    print("🧪 测试历史延长只计算新增折")
+    df = _make_df()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        first = WalkForwardOptimizer(train_days=400, test_days=100, cache_dir=cache_dir).run(df.iloc[:1400], 'sz1')
+
+        optimizer = WalkForwardOptimizer(train_days=400, test_days=100, cache_dir=cache_dir)
+        extended = optimizer.run(df, 'sz1')
+        assert [r['cached'] for r in extended['folds']] == [True] * 10 + [False]
+        strip = lambda records: [{k: v for k, v in r.items() if k != 'cached'} for r in records]
+        assert strip(extended['folds'][:10]) == strip(first['folds'])
+
+        # 只改变选参目标：复用各折的指标缓存，重新搜索
+        other_target = WalkForwardOptimizer(train_days=400, test_days=100, optimization_target='win_rate',
+                                            cache_dir=cache_dir)
+        other_target.run(df, 'sz1')
+        assert other_target.cache.stats['fold_hits'] == 11 and other_target.cache.stats['search_hits'] == 0
+
+        # 修改第1050行的价格：测试窗口末尾在其之后的折全部重新计算
+        changed = df.copy()
+        changed.iloc[1050, changed.columns.get_loc('close')] *= 1.01
+        rerun = WalkForwardOptimizer(train_days=400, test_days=100, cache_dir=cache_dir).run(changed, 'sz1')
+        assert [r['cached'] for r in rerun['folds']] == [True] * 6 + [False] * 5
+
+        # 另一种搜索策略
+        sampled = WalkForwardOptimizer(train_days=400, test_days=100, search_strategy='random', search_budget=40,
+                                       cache_dir=cache_dir).run(df, 'sz1')
+        assert all(r['best_parameters'] in optimizer.param_sets for r in sampled['folds'])
+    print("  ✅ 新增1折, 修改旧数据后重算5折")
+
+
+def test_short_history_and_no_signals():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        optimizer = WalkForwardOptimizer(train_days=400, test_days=100, cache_dir=cache_dir)
+        result = optimizer.run(_make_df(300), 'short')
+        assert result['folds'] == [] and 'error' in result
+
+        no_signals = WalkForwardOptimizer(train_days=200, test_days=100, cache_dir=cache_dir,
+                                          signal_func=lambda df, ind: pd.Series('', index=df.index, dtype=object),
+                                          signal_key='none')
+        result = no_signals.run(_make_df(500), 'empty')
+        assert all(r['best_parameters'] is None for r in result['folds'])
+        assert result['summary']['oos_total_trades'] == 0 and result['summary']['oos_win_rate'] is None
+
+        # 布尔信号经缓存往返后不变
+        bool_optimizer = WalkForwardOptimizer(train_days=200, test_days=100, cache_dir=cache_dir,
+                                              signal_func=lambda df, ind: ind['dif'] > ind['dea'],
+                                              signal_key='bool')
+        first = bool_optimizer.run(_make_df(500), 'bool')
+        bool_optimizer.cache.stats['fold_hits'] = 0
+        key = bool_optimizer._fold_key(make_folds(500, 200, 100)[0], prefix_fingerprints(_make_df(500), [300])[300])
+        _, signals = bool_optimizer.cache.load_fold('bool', key)
+        assert signals.dtype == bool and len(signals) == 300
+        assert summarize_folds(first['folds'])['folds'] == 3
+
+
+def test_cli_walk_forward_optimize():
+    print("🧪 测试 run_optimization.py walkforward 命令")
+    import run_optimization
+    with tempfile.TemporaryDirectory() as home, tempfile.TemporaryDirectory() as cache_dir:
+        lday_dir = os.path.join(home, '.local/share/tdxcfv/drive_c/tc/vipdoc/sz/lday')
+        os.makedirs(lday_dir)
+        write_chunks(os.path.join(lday_dir, 'sz000001.day'), day_records('2020-01-02', 900, seed=3))
+        old_home, old_cache = os.environ.get('HOME'), walk_forward.WALK_FORWARD_CACHE_PATH
+        os.environ['HOME'] = home
+        walk_forward.WALK_FORWARD_CACHE_PATH = cache_dir
+        try:
+            result = run_optimization.walk_forward_optimize('sz000001')
+            missing = run_optimization.walk_forward_optimize('sz000002')
+        finally:
+            os.environ['HOME'] = old_home
+            walk_forward.WALK_FORWARD_CACHE_PATH = old_cache
+    assert missing is None
+    assert 'error' not in result and len(result['folds']) == result['summary']['folds'] >= 2
+    print(f"  ✅ {len(result['folds'])} 折完成")
+
+
+def benchmark_walk_forward(num_days=4000):
+    """历史延长一个测试窗口：全部重算 vs 增量（只算新增折）"""
+    df = _make_df(num_days)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        optimizer = WalkForwardOptimizer(train_days=500, test_days=120, cache_dir=cache_dir)
+        start = time.perf_counter()
+        optimizer.run(df.iloc[:-120], 'bench')
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = optimizer.run(df, 'bench')
+        incremental_time = time.perf_counter() - start
+
+    print(f"📊 {num_days} 条K线, {len(result['folds'])} 折, 每折 {len(optimizer.param_sets)} 种组合")
+    print(f"  全部计算: {full_time:.2f} 秒, 延长一个窗口后增量计算: {incremental_time:.2f} 秒")
+
+
+if __name__ == "__main__":
+    test_folds_and_fingerprints()
+    test_folds_match_direct_evaluation()
+    test_incremental_extension_and_invalidation()
+    test_short_history_and_no_signals()
+    test_cli_walk_forward_optimize()
+    benchmark_walk_forward()